@@ -2,6 +2,7 @@
 # Created by Wazuh, Inc. <info@wazuh.com>.
 # This program is a free software; you can redistribute it and/or modify it under the terms of GPLv2
 
+import asyncio
 import logging
 
 from aiohttp import web
@@ -10,7 +11,7 @@ from api.encoder import dumps, prettify
 from api.util import remove_nones_to_dict, parse_api_param, raise_if_exc
 from wazuh.core.cluster.dapi.dapi import DistributedAPI
 from wazuh.core.common import DATABASE_LIMIT
-from wazuh.task import get_task_status
+from wazuh.task import get_task_status, get_upgrade_summary as get_upgrade_summary_f
 
 logger = logging.getLogger('wazuh')
 
@@ -83,3 +84,77 @@ async def get_tasks_status(request, pretty: bool = False, wait_for_complete: boo
     data = raise_if_exc(await dapi.distribute_function())
 
     return web.json_response(data=data, status=200, dumps=prettify if pretty else dumps)
+
+
+async def get_upgrade_summary(request, pretty: bool = False, wait_for_complete: bool = False) -> web.Response:
+    """Count the agent upgrade tasks by status, by node and by agent version.
+
+    Parameters
+    ----------
+    request : request.connexion
+    pretty : bool
+        Show results in human-readable format.
+    wait_for_complete : bool
+        Disable timeout response.
+
+    Returns
+    -------
+    web.Response
+        API response.
+    """
+    dapi = DistributedAPI(f=get_upgrade_summary_f,
+                          f_kwargs={},
+                          request_type='local_master',
+                          is_async=False,
+                          wait_for_complete=wait_for_complete,
+                          logger=logger,
+                          rbac_permissions=request['token_info']['rbac_policies']
+                          )
+    data = raise_if_exc(await dapi.distribute_function())
+
+    return web.json_response(data=data, status=200, dumps=prettify if pretty else dumps)
+
+
+async def get_upgrade_summary_stream(request, interval: int = 5) -> web.StreamResponse:
+    """Send the upgrade tasks summary as server-sent events each time it changes.
+
+    Parameters
+    ----------
+    request : request.connexion
+    interval : int
+        Seconds between checks for changes.
+
+    Returns
+    -------
+    web.StreamResponse
+        API response, streamed until the client closes the connection.
+    """
+    response = web.StreamResponse(status=200, headers={'Content-Type': 'text/event-stream',
+                                                       'Cache-Control': 'no-cache'})
+    await response.prepare(request)
+
+    last_summary = None
+    try:
+        while True:
+            dapi = DistributedAPI(f=get_upgrade_summary_f,
+                                  f_kwargs={},
+                                  request_type='local_master',
+                                  is_async=False,
+                                  wait_for_complete=False,
+                                  logger=logger,
+                                  rbac_permissions=request['token_info']['rbac_policies']
+                                  )
+            summary = raise_if_exc(await dapi.distribute_function())['data']
+
+            if summary != last_summary:
+                await response.write(f'event: summary\ndata: {dumps(summary)}\n\n'.encode())
+                last_summary = summary
+            else:
+                # Comment line used as heartbeat, so closed connections are detected
+                await response.write(b': keep-alive\n\n')
+
+            await asyncio.sleep(interval)
+    except (ConnectionResetError, asyncio.CancelledError):
+        logger.debug('Upgrade tasks summary stream closed by the client')
+
+    return response
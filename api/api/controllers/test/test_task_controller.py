@@ -1,3 +1,4 @@
+import asyncio
 import sys
 from unittest.mock import ANY, AsyncMock, MagicMock, patch
 
@@ -9,7 +10,8 @@ with patch('wazuh.common.wazuh_uid'):
     with patch('wazuh.common.wazuh_gid'):
         sys.modules['wazuh.rbac.orm'] = MagicMock()
         import wazuh.rbac.decorators
-        from api.controllers.task_controller import get_tasks_status
+        from api.controllers.task_controller import get_tasks_status, get_upgrade_summary, \
+            get_upgrade_summary_stream
         from wazuh import task
         from wazuh.core.common import DATABASE_LIMIT
         from wazuh.tests.util import RBAC_bypasser
@@ -51,3 +53,42 @@ async def test_get_tasks_status(mock_exc, mock_dapi, mock_remove, mock_dfunc, mo
     mock_exc.assert_called_once_with(mock_dfunc.return_value)
     mock_remove.assert_called_once_with(f_kwargs)
     assert isinstance(result, web_response.Response)
+
+
+@pytest.mark.asyncio
+@patch('api.controllers.task_controller.DistributedAPI.distribute_function', return_value=AsyncMock())
+@patch('api.controllers.task_controller.DistributedAPI.__init__', return_value=None)
+@patch('api.controllers.task_controller.raise_if_exc', return_value=CustomAffectedItems())
+async def test_get_upgrade_summary(mock_exc, mock_dapi, mock_dfunc, mock_request=MagicMock()):
+    """Verify 'get_upgrade_summary' endpoint is working as expected."""
+    result = await get_upgrade_summary(request=mock_request)
+    mock_dapi.assert_called_once_with(f=task.get_upgrade_summary,
+                                      f_kwargs={},
+                                      request_type='local_master',
+                                      is_async=False,
+                                      wait_for_complete=False,
+                                      logger=ANY,
+                                      rbac_permissions=mock_request['token_info']['rbac_policies']
+                                      )
+    mock_exc.assert_called_once_with(mock_dfunc.return_value)
+    assert isinstance(result, web_response.Response)
+
+
+@pytest.mark.asyncio
+@patch('api.controllers.task_controller.asyncio.sleep', side_effect=[None, None, asyncio.CancelledError])
+@patch('api.controllers.task_controller.web.StreamResponse')
+@patch('api.controllers.task_controller.DistributedAPI.distribute_function', return_value=AsyncMock())
+@patch('api.controllers.task_controller.DistributedAPI.__init__', return_value=None)
+@patch('api.controllers.task_controller.raise_if_exc')
+async def test_get_upgrade_summary_stream(mock_exc, mock_dapi, mock_dfunc, mock_stream, mock_sleep,
+                                          mock_request=MagicMock()):
+    """Verify 'get_upgrade_summary_stream' endpoint only sends an event when the summary changes."""
+    mock_exc.side_effect = [{'data': {'total': 1}}, {'data': {'total': 1}}, {'data': {'total': 2}}]
+    mock_stream.return_value.prepare = AsyncMock()
+    mock_stream.return_value.write = AsyncMock()
+
+    result = await get_upgrade_summary_stream(request=mock_request, interval=1)
+
+    assert result == mock_stream.return_value
+    assert [c.args[0] for c in mock_stream.return_value.write.call_args_list] == [
+        b'event: summary\ndata: {"total": 1}\n\n', b': keep-alive\n\n', b'event: summary\ndata: {"total": 2}\n\n']
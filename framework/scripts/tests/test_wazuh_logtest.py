@@ -3,9 +3,12 @@
 # Copyright (C) 2015, Wazuh Inc.
 # Created by Wazuh, Inc. <info@wazuh.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
+import json
 import logging
 import socket
+import struct
 import sys
+from collections import deque
 from datetime import timedelta
 from unittest.mock import patch, call
 
@@ -30,6 +33,51 @@ class WazuhSocketMock:
             raise ConnectionError()
 
 
+class LogtestConnectionMock:
+    """Auxiliary mock that replies to the requests in order, like the wazuh-logtest server."""
+
+    def __init__(self, fail_after=None):
+        self.requests = []
+        self.queue = deque()
+        self.max_pending = 0
+        self.pending_before_token = []
+        self.connections = 0
+        self.replies = 0
+        self.fail_after = fail_after
+
+    def connect(self):
+        # Requests without reply are lost with the connection
+        self.connections += 1
+        self.queue.clear()
+
+    def close(self):
+        pass
+
+    def send_msg(self, msg):
+        request = json.loads(msg)
+        self.requests.append(request)
+        self.queue.append(request)
+        self.max_pending = max(self.max_pending, len(self.queue))
+        if 'token' not in request['parameters']:
+            self.pending_before_token.append(len(self.queue))
+
+    def recv_msg(self):
+        if self.fail_after is not None and self.replies == self.fail_after:
+            self.fail_after = None
+            raise ConnectionError()
+
+        request = self.queue.popleft()
+        self.replies += 1
+        event = request['parameters']['event']
+        if event == 'bad':
+            data = {'codemsg': -1, 'messages': ['bad event'], 'token': 'token'}
+        else:
+            data = {'codemsg': 1, 'token': 'token', 'alert': event != '3',
+                    'output': {'rule': {'id': event, 'level': 3, 'description': 'rule'},
+                               'decoder': {'name': 'decoder'}}}
+        return json.dumps({'error': 0, 'data': data}).encode()
+
+
 class WazuhDeamonProtocolMock:
     """Auxiliary mock."""
 
@@ -77,15 +125,19 @@ def test_init_argparse(argument_parser_mock):
     wazuh_logtest.init_argparse()
 
     argument_parser_mock.assert_called_once_with(description='Tool for developing, tuning, and debugging rules.')
-    assert argument_parser_mock.return_value.flag == ['-V', '-d', '-U', '-l', '-q', '-v']
+    assert argument_parser_mock.return_value.flag == ['-V', '-d', '-U', '-l', '-q', '-v', '-b']
     assert argument_parser_mock.return_value.help == ['Version and license message', 'Execute in debug mode',
                                                       'Unit test. Refer to ruleset/testing/runtests.py',
                                                       'Use custom location. Default "stdin"',
-                                                      'Quiet execution', 'Verbose (full) output/rule debugging']
-    assert argument_parser_mock.return_value.action == ['store_true', 'store_true', '', '', 'store_true', 'store_true']
-    assert argument_parser_mock.return_value.dest == ['version', 'debug', 'ut', 'location', 'quiet', 'verbose']
-    assert argument_parser_mock.return_value.metavar == ['', '', 'rule:alert:decoder', 'location', '', '']
-    assert argument_parser_mock.return_value.default == ['', '', '', 'stdin', '', '']
+                                                      'Quiet execution', 'Verbose (full) output/rule debugging',
+                                                      'Batch mode. Process one log per line of file ("-" for stdin) '
+                                                      'and show a summary']
+    assert argument_parser_mock.return_value.action == ['store_true', 'store_true', '', '', 'store_true', 'store_true',
+                                                        '']
+    assert argument_parser_mock.return_value.dest == ['version', 'debug', 'ut', 'location', 'quiet', 'verbose',
+                                                      'batch']
+    assert argument_parser_mock.return_value.metavar == ['', '', 'rule:alert:decoder', 'location', '', '', 'file']
+    assert argument_parser_mock.return_value.default == ['', '', '', 'stdin', '', '', '']
 
 
 @patch('sys.exit')
@@ -109,6 +161,7 @@ def test_main(input_mock, argparse_mock, wazuh_logtest_class_mock, init_logger_m
             self.version = "1.0.0"
             self.location = "World"
             self.verbose = True
+            self.batch = None
 
     class ParserMock:
         """Auxiliary class."""
@@ -242,6 +295,29 @@ def test_main(input_mock, argparse_mock, wazuh_logtest_class_mock, init_logger_m
     logger_error_mock.assert_called_once_with('** Wazuh-logtest error when connecting with wazuh-analysisd')
 
 
+@patch('sys.exit')
+@patch('scripts.wazuh_logtest.run_batch', return_value=0)
+@patch('scripts.wazuh_logtest.WazuhLogtest')
+@patch('scripts.wazuh_logtest.init_logger')
+@patch('scripts.wazuh_logtest.init_argparse')
+def test_main_batch(argparse_mock, init_logger_mock, wazuh_logtest_class_mock, run_batch_mock, sys_exit_mock):
+    """Check that the main function runs the batch mode when requested."""
+    args = argparse_mock.return_value.parse_args.return_value
+    args.version = False
+    args.ut = None
+    args.verbose = True
+    args.batch = 'events.log'
+    args.location = 'stdin'
+    sys_exit_mock.side_effect = SystemExit
+
+    with pytest.raises(SystemExit):
+        wazuh_logtest.main()
+
+    run_batch_mock.assert_called_once_with('events.log', 'stdin', {'rules_debug': True})
+    sys_exit_mock.assert_called_once_with(run_batch_mock.return_value)
+    wazuh_logtest_class_mock.assert_not_called()
+
+
 # Test WazuhDaemonProtocol class methods
 
 def create_wazuh_daemon_protocol_class():
@@ -360,6 +436,56 @@ def test_ws_sent(unpack_mock, pack_mock, msg_waitall_mock, stream_mock, unix_moc
         ws.send(file)
 
 
+@patch('socket.socket')
+def test_ws_send_persistent(socket_socket_mock):
+    """Check that a persistent socket reuses its connection and reconnects when the server closes it."""
+
+    class WLogtestConn:
+        """Auxiliary class."""
+
+        def __init__(self, replies):
+            self.replies = replies
+            self.sent = []
+            self.closed = False
+
+        def connect(self, file):
+            pass
+
+        def sendall(self, msg):
+            self.sent.append(msg)
+
+        def recv(self, size, flags):
+            return self.replies.pop(0) if self.replies else b''
+
+        def close(self):
+            self.closed = True
+
+    reply = b'reply'
+    first_conn = WLogtestConn([struct.pack('<I', len(reply)), reply])
+    second_conn = WLogtestConn([struct.pack('<I', len(reply)), reply])
+    socket_socket_mock.side_effect = [first_conn, second_conn]
+    ws = wazuh_logtest.WazuhSocket(file='', persistent=True)
+
+    assert ws.send('msg') == reply
+    assert ws.conn is first_conn
+    assert first_conn.sent == [struct.pack('<I', 3) + b'msg']
+
+    # The server closed the first connection, so the message is sent again through a new one
+    assert ws.send('msg') == reply
+    assert first_conn.closed is True
+    assert ws.conn is second_conn
+    assert len(second_conn.sent) == 1
+
+    ws.close()
+    assert second_conn.closed is True
+    assert ws.conn is None
+
+    # The server is not reachable
+    socket_socket_mock.side_effect = Exception()
+    with pytest.raises(ConnectionError):
+        ws.send('msg')
+
+
 # Test WazuhLogtest class methods
 
 @patch('scripts.wazuh_logtest.WazuhSocket', return_value=WazuhSocketMock())
@@ -445,6 +571,106 @@ def test_wl_get_last_ut():
     assert wl.get_last_ut() == wl.ut
 
 
+@pytest.mark.parametrize('fail_after', [None, 0, 4])
+@patch('scripts.wazuh_logtest.WazuhLogtest.remove_session')
+def test_wl_process_batch(remove_session_mock, fail_after):
+    """Check that a batch is sent through one session with several requests waiting for their reply."""
+    wl = create_wazuh_logtest_class()
+    wl.protocol = wazuh_logtest.WazuhDeamonProtocol()
+    wl.socket = LogtestConnectionMock(fail_after=fail_after)
+    events = ['1', '', '2', 'bad'] + [str(i) for i in range(3, 20)]
+
+    results = list(wl.process_batch(events, options={'rules_debug': True}, window=4))
+
+    assert [event for event, _, _ in results] == [event for event in events if event]
+    assert all(latency >= 0 for _, _, latency in results)
+    assert isinstance(results[2][1], ValueError)
+    assert str(results[2][1]) == '-1: \n\tbad event'
+    assert results[0][1]['output']['rule']['id'] == '1'
+    assert results[-1][1]['output']['rule']['id'] == '19'
+
+    # Only the first request is sent without token, and alone
+    assert wl.socket.pending_before_token == [1] * (1 + (fail_after == 0))
+    assert 1 < wl.socket.max_pending <= 4
+    assert all(request['parameters']['options'] == {'rules_debug': True} for request in wl.socket.requests)
+    assert wl.socket.connections == 1 + (fail_after is not None)
+    assert wl.last_token == 'token'
+    remove_session_mock.assert_not_called()
+
+
+def test_wl_process_batch_connection_error():
+    """Check that a batch stops if the connection keeps breaking without replies."""
+    wl = create_wazuh_logtest_class()
+    wl.protocol = wazuh_logtest.WazuhDeamonProtocol()
+    wl.socket = LogtestConnectionMock(fail_after=1)
+
+    with patch.object(wl.socket, 'connect', side_effect=[None, ConnectionError()]):
+        with pytest.raises(ConnectionError):
+            list(wl.process_batch(['1', '2', '3']))
+
+
+# Test LogtestBatchSummary class methods
+
+def test_logtest_batch_summary():
+    """Check that the outcome of a batch is properly aggregated and displayed."""
+    summary = wazuh_logtest.LogtestBatchSummary()
+    rule = {'id': '5715', 'level': 3, 'description': 'sshd: authentication success.'}
+    summary.add({'alert': True, 'output': {'rule': rule, 'decoder': {'name': 'sshd'}}}, 0.001)
+    summary.add({'alert': False, 'output': {'rule': rule, 'decoder': {'name': 'sshd'}}}, 0.003)
+    summary.add({'alert': False, 'output': {}}, 0.002)
+    summary.add(ValueError('error'), 0.004)
+
+    assert summary.events == 4
+    assert summary.errors == 1
+    assert summary.alerts == 1
+    assert summary.rules == {'5715': 2}
+    assert summary.decoders == {'sshd': 2}
+    assert summary.no_rule == 1
+    assert summary.no_decoder == 1
+    assert summary.get_latency_percentile(50) == 0.002
+    assert summary.get_latency_percentile(100) == 0.004
+    assert wazuh_logtest.LogtestBatchSummary().get_latency_percentile(50) == 0.0
+
+    with patch('logging.info') as info_mock:
+        summary.show()
+    info_mock.assert_any_call('\tevents: %d', 4)
+    info_mock.assert_any_call("\t%s (level %s): %d\t'%s'", '5715', 3, 2, 'sshd: authentication success.')
+    info_mock.assert_any_call('\t%s: %d', 'sshd', 2)
+    info_mock.assert_any_call('\tNo decoder matched: %d', 1)
+
+
+@patch('logging.error')
+@patch('scripts.wazuh_logtest.LogtestBatchSummary.show')
+@patch('scripts.wazuh_logtest.WazuhLogtest')
+def test_run_batch(wazuh_logtest_class_mock, show_mock, error_mock, tmp_path):
+    """Check that the events of a file are processed as a batch."""
+    events_file = tmp_path / 'events.log'
+    events_file.write_text('event 1\r\nevent 2\n')
+    w_logtest = wazuh_logtest_class_mock.return_value
+    w_logtest.process_batch.side_effect = lambda events, options: [(event, {'output': {}}, 0.1) for event in events]
+
+    assert wazuh_logtest.run_batch(str(events_file), 'stdin', {'rules_debug': True}) == 0
+    wazuh_logtest_class_mock.assert_called_once_with(location='stdin', persistent=True)
+    show_mock.assert_called_once_with()
+    w_logtest.remove_last_session.assert_called_once_with()
+    w_logtest.socket.close.assert_called_once_with()
+
+    # Processing errors are reported
+    error = ValueError('-1: error')
+    w_logtest.process_batch.side_effect = lambda events, options: [(event, error, 0.1) for event in events]
+    assert wazuh_logtest.run_batch(str(events_file), 'stdin') == 0
+    error_mock.assert_has_calls([call('** Wazuh-logtest error %s (event "%s")', error, 'event 1'),
+                                 call('** Wazuh-logtest error %s (event "%s")', error, 'event 2')])
+
+    # wazuh-analysisd is not reachable
+    w_logtest.process_batch.side_effect = ConnectionError()
+    assert wazuh_logtest.run_batch(str(events_file), 'stdin') == 1
+    error_mock.assert_called_with('** Wazuh-logtest error when connecting with wazuh-analysisd')
+
+    # The file does not exist
+    assert wazuh_logtest.run_batch(str(tmp_path / 'missing.log'), 'stdin') == 1
+
+
 @patch('logging.debug')
 @patch('json.dumps', return_value='')
 @patch('scripts.wazuh_logtest.WazuhLogtest.show_ossec_logtest_like')
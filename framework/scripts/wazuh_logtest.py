@@ -14,11 +14,19 @@ import struct
 import subprocess
 import sys
 import textwrap
-from typing import Union
+import time
+from collections import Counter, deque
+from typing import Iterable, Iterator, Tuple, Union
 
 from wazuh.core import common
 from wazuh.core.common import LOGTEST_SOCKET
 
+# Maximum number of batch requests waiting for their reply
+BATCH_WINDOW = 32
+# Maximum size of the batch requests waiting for their reply. It keeps them below the socket buffer size, so sending
+# never blocks while the server waits for us to read its replies
+BATCH_WINDOW_BYTES = 64 * 1024
+
 
 def init_argparse() -> argparse.Namespace:
     """Setup argparse for handle command line parameters.
@@ -62,6 +70,11 @@ def init_argparse() -> argparse.Namespace:
         dest='verbose',
         action='store_true'
     )
+    parser.add_argument(
+        '-b', help='Batch mode. Process one log per line of file ("-" for stdin) and show a summary',
+        metavar='file',
+        dest='batch'
+    )
     return parser
 
 
@@ -88,6 +101,10 @@ def main():
     if args.verbose:
         options['rules_debug'] = True
 
+    # Handle batch request
+    if args.batch:
+        sys.exit(run_batch(args.batch, args.location, options))
+
     # Initialize wazuh-logtest component
     w_logtest = WazuhLogtest(location=args.location)
     logging.info('Starting wazuh-logtest %s', Wazuh.get_version_str())
@@ -228,15 +245,103 @@ class WazuhDeamonProtocol:
 class WazuhSocket:
     """Encapsulate wazuh-socket communication (header with message size)."""
 
-    def __init__(self, file: str):
+    def __init__(self, file: str, persistent: bool = False):
         """Class constructor.
 
         Parameters
         ----------
         file : str
             Socket path.
+        persistent : bool
+            Keep the connection open between messages instead of opening one per message. Default: False
         """
         self.file = file
+        self.persistent = persistent
+        self.conn = None
+
+    def connect(self):
+        """Open a new connection to wazuh-socket, closing the current one if any.
+
+        Raises
+        ------
+        ConnectionError
+        """
+        self.close()
+        try:
+            self.conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.conn.connect(self.file)
+        except Exception:
+            self.close()
+            raise ConnectionError
+
+    def close(self):
+        """Close the current connection, if any."""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def send_msg(self, msg: str):
+        """Send data through the open connection without waiting for the reply.
+
+        Parameters
+        ----------
+        msg : str
+            Data to send.
+
+        Raises
+        ------
+        ConnectionError
+        """
+        try:
+            encoded_msg = msg.encode('utf-8')
+            self.conn.sendall(struct.pack("<I", len(encoded_msg)) + encoded_msg)
+        except Exception:
+            raise ConnectionError
+
+    def recv_msg(self) -> bytes:
+        """Receive the next reply from the open connection.
+
+        Raises
+        ------
+        ConnectionError
+
+        Returns
+        -------
+        bytes
+            Received data.
+        """
+        try:
+            size = struct.unpack("<I", self.conn.recv(4, socket.MSG_WAITALL))[0]
+            recv_msg = self.conn.recv(size, socket.MSG_WAITALL)
+        except Exception:
+            raise ConnectionError
+        if len(recv_msg) != size:
+            raise ConnectionError
+        return recv_msg
+
+    def _exchange(self, msg: str) -> bytes:
+        """Send data through the open connection and receive its reply, closing the connection on failure.
+
+        Parameters
+        ----------
+        msg : str
+            Data to send.
+
+        Raises
+        ------
+        ConnectionError
+
+        Returns
+        -------
+        bytes
+            Received data.
+        """
+        try:
+            self.send_msg(msg)
+            return self.recv_msg()
+        except ConnectionError:
+            self.close()
+            raise
 
     def send(self, msg: str) -> bytes:
         """Send and receive data to wazuh-socket (header with message size).
@@ -246,11 +351,25 @@ class WazuhSocket:
         msg : str
             Data to send.
 
+        Raises
+        ------
+        ConnectionError
+
         Returns
         -------
         bytes
             Received data.
         """
+        if self.persistent:
+            if self.conn is not None:
+                # The server may have closed the connection since the last message
+                try:
+                    return self._exchange(msg)
+                except ConnectionError:
+                    pass
+            self.connect()
+            return self._exchange(msg)
+
         try:
             wlogtest_conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
             wlogtest_conn.connect(self.file)
@@ -267,7 +386,7 @@ class WazuhSocket:
 class WazuhLogtest:
     """Top level class to interact with wazuh-logtest feature, part of wazuh-analysisd."""
 
-    def __init__(self, location: str = "stdin", log_format: str = "syslog"):
+    def __init__(self, location: str = "stdin", log_format: str = "syslog", persistent: bool = False):
         """Class constructor.
 
         Parameters
@@ -276,9 +395,11 @@ class WazuhLogtest:
             Log origin. Default: "master->/var/log/syslog"
         log_format : str
             Type of log. Default: "syslog"
+        persistent : bool
+            Use one connection to wazuh-analysisd for all the requests. Default: False
         """
         self.protocol = WazuhDeamonProtocol()
-        self.socket = WazuhSocket(LOGTEST_SOCKET)
+        self.socket = WazuhSocket(LOGTEST_SOCKET, persistent)
         self.fixed_fields = dict()
         self.fixed_fields['location'] = location
         self.fixed_fields['log_format'] = log_format
@@ -343,6 +464,111 @@ class WazuhLogtest:
         # Return logtest payload
         return reply
 
+    def process_batch(self, events: Iterable[str], options: dict = None,
+                      window: int = BATCH_WINDOW) -> Iterator[Tuple[str, Union[dict, ValueError], float]]:
+        """Send several log events to wazuh-logtest through one connection and session.
+
+        Up to `window` requests are sent before reading their replies, which come back in the same order. The first
+        event is sent alone to get the session token used by the rest. If the connection breaks, the requests
+        without reply are sent again through a new one.
+
+        Parameters
+        ----------
+        events : Iterable[str]
+            Event logs to process. Empty events are skipped.
+        options : dict
+            Processing options. Default: None.
+        window : int
+            Maximum number of requests waiting for their reply. Default: BATCH_WINDOW.
+
+        Raises
+        ------
+        ConnectionError
+            If wazuh-analysisd cannot be reached or keeps closing the connection without replying.
+
+        Yields
+        ------
+        tuple
+            Event, logtest outcome or the ValueError returned for it, and seconds elapsed until its reply arrived.
+        """
+        events = iter(events)
+        exhausted = False
+        pending = deque()
+        pending_bytes = 0
+        token = ''
+        tokens = set()
+        self.socket.connect()
+
+        try:
+            while True:
+                # Fill the window. Wait for the token of the session before sending more than one request
+                while not exhausted and (not pending or (token and len(pending) < window and
+                                                         pending_bytes < BATCH_WINDOW_BYTES)):
+                    event = next(events, None)
+                    if event is None:
+                        exhausted = True
+                    elif event:
+                        data = {field: self.fixed_fields[field] for field in ('location', 'log_format')}
+                        if token:
+                            data['token'] = token
+                        data['event'] = event
+                        if options:
+                            data['options'] = options
+                        request = self.protocol.wrap('log_processing', data)
+                        logging.debug('Request: %s\n', request)
+                        pending.append((event, request, time.monotonic()))
+                        pending_bytes += len(request)
+                        try:
+                            self.socket.send_msg(request)
+                        except ConnectionError:
+                            # Reading the replies detects the broken connection
+                            break
+
+                if not pending:
+                    break
+
+                try:
+                    recv_packet = self.socket.recv_msg()
+                except ConnectionError:
+                    # Send the requests without reply again through a new connection. Servers that close the
+                    # connection after each reply still answer the first one
+                    self.socket.connect()
+                    try:
+                        for _, request, _ in pending:
+                            self.socket.send_msg(request)
+                    except ConnectionError:
+                        pass
+                    recv_packet = self.socket.recv_msg()
+
+                event, request, sent_time = pending.popleft()
+                pending_bytes -= len(request)
+                latency = time.monotonic() - sent_time
+                logging.debug('Reply: %s\n', str(recv_packet, 'utf-8'))
+
+                try:
+                    reply = self.protocol.unwrap(recv_packet)
+                except ValueError as error:
+                    yield event, error, latency
+                    continue
+
+                if reply.get('token'):
+                    token = self.last_token = reply['token']
+                    tokens.add(token)
+
+                if reply['codemsg'] < 0:
+                    error_msg = ['\n\t{0}'.format(i) for i in reply['messages']]
+                    yield event, ValueError(f'{reply["codemsg"]}: {"".join(error_msg)}'), latency
+                else:
+                    yield event, reply, latency
+        finally:
+            # Do not leave replies behind in the connection
+            if pending:
+                self.socket.close()
+
+        # Requests sent with an expired token opened their own sessions
+        for stale_token in tokens - {self.last_token}:
+            self.remove_session(stale_token)
+
     def remove_session(self, token: str) -> bool:
         """Remove session by token.
 
@@ -491,6 +717,148 @@ class WazuhLogtest:
             logging.info('Unit test FAIL. Expected %s , Result %s', ut, self.get_last_ut())
 
 
+class LogtestBatchSummary:
+    """Aggregate the outcome of a batch of wazuh-logtest events."""
+
+    def __init__(self):
+        """Class constructor."""
+        self.events = 0
+        self.errors = 0
+        self.alerts = 0
+        self.no_decoder = 0
+        self.no_rule = 0
+        self.rules = Counter()
+        self.rules_info = dict()
+        self.decoders = Counter()
+        self.latencies = list()
+        self.start_time = time.monotonic()
+        self.elapsed = 0.0
+
+    def add(self, output: Union[dict, ValueError], latency: float):
+        """Account the outcome of an event.
+
+        Parameters
+        ----------
+        output : dict or ValueError
+            Logtest outcome or the error returned for the event.
+        latency : float
+            Seconds elapsed until the reply arrived.
+        """
+        self.events += 1
+        self.latencies.append(latency)
+        self.elapsed = time.monotonic() - self.start_time
+
+        if isinstance(output, ValueError):
+            self.errors += 1
+            return
+
+        output_data = output['output']
+        if output_data.get('decoder'):
+            self.decoders[output_data['decoder'].get('name', '')] += 1
+        else:
+            self.no_decoder += 1
+        if 'rule' in output_data:
+            rule = output_data['rule']
+            self.rules[rule['id']] += 1
+            self.rules_info[rule['id']] = (rule.get('level', ''), rule.get('description', ''))
+        else:
+            self.no_rule += 1
+        if output.get('alert'):
+            self.alerts += 1
+
+    def get_latency_percentile(self, percentile: float) -> float:
+        """Get a latency percentile (nearest rank).
+
+        Parameters
+        ----------
+        percentile : float
+            Percentile to get, between 0 and 100.
+
+        Returns
+        -------
+        float
+            Latency in seconds. 0 if no event was processed.
+        """
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        index = max(0, -(-len(latencies) * percentile // 100) - 1)
+        return latencies[int(index)]
+
+    def show(self):
+        """Display the summary."""
+        logging.info('**Batch summary:')
+        logging.info('\tevents: %d', self.events)
+        logging.info('\terrors: %d', self.errors)
+        logging.info('\talerts: %d', self.alerts)
+        logging.info('\telapsed: %.3f s', self.elapsed)
+        logging.info('\tthroughput: %.1f events/s', self.events / self.elapsed if self.elapsed else 0.0)
+        if self.latencies:
+            logging.info('\tlatency (ms): avg %.2f, p50 %.2f, p95 %.2f, p99 %.2f, max %.2f',
+                         sum(self.latencies) * 1000 / len(self.latencies),
+                         self.get_latency_percentile(50) * 1000, self.get_latency_percentile(95) * 1000,
+                         self.get_latency_percentile(99) * 1000, max(self.latencies) * 1000)
+
+        logging.info('')
+        logging.info('**Rules:')
+        for rule_id, count in self.rules.most_common():
+            level, description = self.rules_info[rule_id]
+            logging.info("\t%s (level %s): %d\t'%s'", rule_id, level, count, description)
+        if self.no_rule:
+            logging.info('\tNo rule matched: %d', self.no_rule)
+
+        logging.info('')
+        logging.info('**Decoders:')
+        for name, count in self.decoders.most_common():
+            logging.info('\t%s: %d', name, count)
+        if self.no_decoder:
+            logging.info('\tNo decoder matched: %d', self.no_decoder)
+
+
+def run_batch(path: str, location: str, options: dict = None) -> int:
+    """Process the events of a file through one wazuh-logtest session and show a summary.
+
+    Parameters
+    ----------
+    path : str
+        File with one log per line, or "-" to read them from stdin.
+    location : str
+        Log origin.
+    options : dict
+        Processing options. Default: None.
+
+    Returns
+    -------
+    int
+        Exit code. 0 if every event was sent, 1 otherwise.
+    """
+    w_logtest = WazuhLogtest(location=location, persistent=True)
+    summary = LogtestBatchSummary()
+
+    try:
+        events_file = sys.stdin if path == '-' else open(path, errors='replace')
+    except OSError as error:
+        logging.error('** Wazuh-logtest error opening %s: %s', path, error.strerror)
+        return 1
+
+    try:
+        with events_file:
+            events = (line.rstrip('\r\n') for line in events_file)
+            for event, output, latency in w_logtest.process_batch(events, options):
+                if isinstance(output, ValueError):
+                    logging.error('** Wazuh-logtest error %s (event "%s")', output, event)
+                summary.add(output, latency)
+    except ConnectionError:
+        logging.error('** Wazuh-logtest error when connecting with wazuh-analysisd')
+        return 1
+    finally:
+        w_logtest.remove_last_session()
+        w_logtest.socket.close()
+
+    summary.show()
+    return 0
+
+
 class Wazuh:
     def get_install_path() -> str:
         """Get Wazuh installation path, obtained relative to the path of this file.
@@ -10,7 +10,8 @@ from typing import Union
 from wazuh.core import common, configuration
 from wazuh.core.InputValidator import InputValidator
 from wazuh.core.agent import WazuhDBQueryAgents, WazuhDBQueryGroupByAgents, WazuhDBQueryMultigroups, Agent, \
-    WazuhDBQueryGroup, create_upgrade_tasks, get_agents_info, get_groups, get_rbac_filters, send_restart_command
+    WazuhDBQueryGroup, agents_summary_cache, create_upgrade_tasks, get_agents_info, get_groups, get_rbac_filters, \
+    send_restart_commands
 from wazuh.core.cluster.cluster import get_node
 from wazuh.core.cluster.utils import read_cluster_config
 from wazuh.core.exception import WazuhError, WazuhInternalError, WazuhException, WazuhResourceNotFound
@@ -105,25 +106,8 @@ def get_agents_summary_status(agent_list: list[str] = None) -> WazuhResult:
     WazuhResult
         WazuhResult object.
     """
-    connection = {'active': 0, 'disconnected': 0, 'never_connected': 0, 'pending': 0, 'total': 0}
-    sync_configuration = {'synced': 0, 'not synced': 0, 'total': 0}
-    if agent_list:
-        rbac_filters = get_rbac_filters(system_resources=get_agents_info(), permitted_resources=agent_list)
-
-        # We don't consider agent 000 in order to get the summary
-        with WazuhDBQueryAgents(limit=None, select=['status', 'group_config_status'], query="id!=000",
-                                **rbac_filters) as db_query:
-            data = db_query.run()
-
-        items = data['items']
-        for agent in items:
-            connection[agent['status']] += 1
-            sync_configuration[agent['group_config_status']] += 1
-
-        connection['total'] = sync_configuration['total'] = len(items)
-
-    sync_configuration['not_synced'] = sync_configuration.pop('not synced')
-    return WazuhResult({'data': {'connection': connection, 'configuration': sync_configuration}})
+    # We don't consider agent 000 in order to get the summary
+    return WazuhResult({'data': agents_summary_cache.get_status_summary(agent_list or [])})
 
 
 @expose_resources(actions=["agent:read"], resources=["agent:id:{agent_list}"], post_proc_func=None)
@@ -144,15 +128,37 @@ def get_agents_summary_os(agent_list: list[str] = None) -> AffectedItemsWazuhRes
                                       all_msg='Showing the operative system of all specified agents',
                                       some_msg='Could not get the operative system of some agents')
     if agent_list:
-        rbac_filters = get_rbac_filters(system_resources=get_agents_info(), permitted_resources=agent_list)
-
         # We don't consider agent 000 in order to get the summary
-        with WazuhDBQueryAgents(select=['os.platform'], default_sort_field='os_platform', min_select_fields=set(),
-                                distinct=True, query="id!=000", **rbac_filters) as db_query:
-            query_data = db_query.run()
+        result.affected_items = agents_summary_cache.get_distinct_values('os.platform', agent_list)
+        result.total_affected_items = len(result.affected_items)
+
+    return result
 
-        query_data['items'] = [row['os']['platform'] for row in query_data['items']]
-        result.affected_items = query_data['items']
+
+@expose_resources(actions=["agent:read"], resources=["agent:id:{agent_list}"], post_proc_func=None)
+def get_agents_summary_distinct(agent_list: list[str] = None, fields: list = None) -> AffectedItemsWazuhResult:
+    """Count the agents sharing the same values for the selected fields, using the in-memory agents summary.
+
+    Parameters
+    ----------
+    agent_list : list[str]
+       List of agents ID's
+    fields : list
+        List of fields to group by. Only 'status', 'group_config_status', 'os.name', 'os.platform', 'os.version',
+        'version' and 'node_name' are available.
+
+    Returns
+    -------
+    AffectedItemsWazuhResult
+        Affected items.
+    """
+    result = AffectedItemsWazuhResult(all_msg='All selected agents information was returned',
+                                      some_msg='Some agents information was not returned',
+                                      none_msg='No agent information was returned'
+                                      )
+    if agent_list:
+        # We don't consider agent 000 in order to get the summary
+        result.affected_items = agents_summary_cache.get_distinct(fields, agent_list)
         result.total_affected_items = len(result.affected_items)
 
     return result
@@ -179,17 +185,35 @@ def reconnect_agents(agent_list: Union[list, str] = None) -> AffectedItemsWazuhR
                                       )
 
     system_agents = get_agents_info()
-    with WazuhQueue(common.AR_SOCKET) as wq:
-        for agent_id in agent_list:
-            try:
-                if agent_id not in system_agents:
-                    raise WazuhResourceNotFound(1701)
-                if agent_id == "000":
-                    raise WazuhError(1703)
-                Agent(agent_id).reconnect(wq)
-                result.affected_items.append(agent_id)
-            except WazuhException as e:
-                result.add_failed_item(id_=agent_id, error=e)
+    eligible_agents = []
+    for agent_id in agent_list:
+        if agent_id not in system_agents:
+            result.add_failed_item(id_=agent_id, error=WazuhResourceNotFound(1701))
+        elif agent_id == "000":
+            result.add_failed_item(id_=agent_id, error=WazuhError(1703))
+        else:
+            eligible_agents.append(agent_id)
+
+    if eligible_agents:
+        with WazuhDBQueryAgents(limit=None, select=["id", "status"], filters={'rbac_ids': eligible_agents},
+                                rbac_negate=False, count=False) as db_query:
+            agents_status = {agent['id']: agent['status'] for agent in db_query.run()['items']}
+
+        active_agents = []
+        for agent_id in eligible_agents:
+            if agent_id not in agents_status:
+                result.add_failed_item(id_=agent_id, error=WazuhResourceNotFound(1701))
+            elif agents_status[agent_id].lower() != 'active':
+                result.add_failed_item(id_=agent_id, error=WazuhError(1707))
+            else:
+                active_agents.append(agent_id)
+
+        with WazuhQueue(common.AR_SOCKET) as wq:
+            for agent_id, sent in wq.send_msg_to_agents(WazuhQueue.HC_FORCE_RECONNECT, active_agents):
+                if isinstance(sent, WazuhException):
+                    result.add_failed_item(id_=agent_id, error=sent)
+                else:
+                    result.affected_items.append(agent_id)
 
     result.total_affected_items = len(result.affected_items)
     result.affected_items.sort(key=int)
@@ -244,12 +268,11 @@ def restart_agents(agent_list: list = None) -> AffectedItemsWazuhResult:
         eligible_agents = [agent for agent in agents_with_data if agent not in non_active_agents] if non_active_agents \
             else agents_with_data
         with WazuhQueue(common.AR_SOCKET) as wq:
-            for agent in eligible_agents:
-                try:
-                    send_restart_command(agent['id'], agent['version'], wq)
-                    result.affected_items.append(agent['id'])
-                except WazuhException as e:
-                    result.add_failed_item(id_=agent['id'], error=e)
+            for agent_id, sent in send_restart_commands(eligible_agents, wq):
+                if isinstance(sent, WazuhException):
+                    result.add_failed_item(id_=agent_id, error=sent)
+                else:
+                    result.affected_items.append(agent_id)
 
         result.total_affected_items = len(result.affected_items)
         result.affected_items.sort(key=int)
@@ -491,19 +514,18 @@ def delete_agents(agent_list: list = None, purge: bool = False, filters: dict =
             )
         )), non_eligible_agents))
 
-        for agent_id in agent_list.intersection(system_agents).intersection(can_purge_agents):
-            try:
-                my_agent = Agent(agent_id)
-                my_agent.remove(purge=purge)
-                result.affected_items.append(agent_id)
-            except WazuhError as e:
-                if e.code == 1726:
-                    raise e
-
-                result.add_failed_item(id_=agent_id, error=e)
+        agents_to_remove = agent_list.intersection(system_agents).intersection(can_purge_agents)
+        if agents_to_remove:
+            failed_agents = Agent.remove_agents(sorted(agents_to_remove), purge=purge)
+            for agent_id in agents_to_remove:
+                if agent_id in failed_agents:
+                    result.add_failed_item(id_=agent_id, error=failed_agents[agent_id])
+                else:
+                    result.affected_items.append(agent_id)
 
         # Clear temporary cache
         clear_temporary_caches()
+        agents_summary_cache.invalidate()
 
         result.total_affected_items = len(result.affected_items)
         result.affected_items.sort(key=int)
@@ -544,6 +566,7 @@ def add_agent(name: str = None, agent_id: str = None, key: str = None, ip: str =
         raise WazuhError(1738)
 
     new_agent = Agent(name=name, ip=ip, id=agent_id, key=key, force=force)
+    agents_summary_cache.invalidate()
 
     return WazuhResult({'data': {'id': new_agent.id, 'key': new_agent.key}})
 
@@ -841,13 +864,28 @@ def assign_agents_to_group(group_list: list = None, agent_list: list = None, rep
 
     agent_list -= not_found_agents
 
+    # Validate the assignment of every agent before sending them to wazuh-db in batches
+    try:
+        agents_groups = Agent.get_agents_groups(agent_list)
+    except Exception as e:
+        raise WazuhInternalError(2007, extra_message=str(e))
+
+    agents_to_assign = {}
     for agent_id in agent_list:
         try:
-            Agent.add_group_to_agent(group_id, agent_id, replace=replace, replace_list=replace_list)
-            result.affected_items.append(agent_id)
+            Agent.check_group_assignment(group_id, agents_groups.get(agent_id, []), replace=replace,
+                                         replace_list=replace_list)
+            agents_to_assign[agent_id] = [group_id]
         except WazuhException as e:
             result.add_failed_item(id_=agent_id, error=e)
 
+    failed_agents = Agent.set_agents_groups_relationship(agents_to_assign, override=replace)
+    for agent_id in agents_to_assign:
+        if agent_id in failed_agents:
+            result.add_failed_item(id_=agent_id, error=failed_agents[agent_id][1])
+        else:
+            result.affected_items.append(agent_id)
+
     result.total_affected_items = len(result.affected_items)
     result.affected_items.sort(key=int)
 
@@ -939,14 +977,25 @@ def remove_agent_from_groups(agent_list: list = None, group_list: list = None) -
         pass
 
     system_groups = get_groups()
+    agent_groups = set(Agent.get_agent_groups(agent_id))
+    groups_to_remove = []
     for group_id in group_list:
         try:
             if group_id not in system_groups:
                 raise WazuhResourceNotFound(1710)
-            Agent.unset_single_group_agent(agent_id=agent_id, group_id=group_id, force=True)
-            result.affected_items.append(group_id)
+            agent_groups = Agent.check_group_unassignment(group_id, agent_groups)
+            groups_to_remove.append(group_id)
         except WazuhException as e:
             result.add_failed_item(id_=group_id, error=e)
+
+    # Remove all the groups with a single command, in the same order they were checked
+    failed_groups, error = Agent.set_agents_groups_relationship(
+        {agent_id: groups_to_remove}, remove=True).get(agent_id, ([], None)) if groups_to_remove else ([], None)
+    for group_id in groups_to_remove:
+        if group_id in failed_groups:
+            result.add_failed_item(id_=group_id, error=error)
+        else:
+            result.affected_items.append(group_id)
     result.total_affected_items = len(result.affected_items)
     result.affected_items.sort()
 
@@ -988,16 +1037,33 @@ def remove_agents_from_group(agent_list: list = None, group_list: list = None) -
     if group_id not in system_groups:
         raise WazuhResourceNotFound(1710)
 
+    existing_agents = []
     for agent_id in agent_list:
         try:
             if agent_id == '000':
                 raise WazuhError(1703)
             elif agent_id not in system_agents:
                 raise WazuhResourceNotFound(1701)
-            Agent.unset_single_group_agent(agent_id=agent_id, group_id=group_id, force=True)
-            result.affected_items.append(agent_id)
+            existing_agents.append(agent_id)
+        except WazuhException as e:
+            result.add_failed_item(id_=agent_id, error=e)
+
+    # Validate the unassignment of every agent before sending them to wazuh-db in batches
+    agents_groups = Agent.get_agents_groups(existing_agents)
+    agents_to_unassign = {}
+    for agent_id in existing_agents:
+        try:
+            Agent.check_group_unassignment(group_id, set(agents_groups.get(agent_id, [])))
+            agents_to_unassign[agent_id] = [group_id]
         except WazuhException as e:
             result.add_failed_item(id_=agent_id, error=e)
+
+    failed_agents = Agent.set_agents_groups_relationship(agents_to_unassign, remove=True)
+    for agent_id in agents_to_unassign:
+        if agent_id in failed_agents:
+            result.add_failed_item(id_=agent_id, error=failed_agents[agent_id][1])
+        else:
+            result.affected_items.append(agent_id)
     result.total_affected_items = len(result.affected_items)
     result.affected_items.sort(key=int)
 
@@ -1146,30 +1212,29 @@ def upgrade_agents(agent_list: list = None, wpk_repo: str = None, version: str =
                                              wpk_repo=wpk_repo, version=version, force=force, use_http=use_http,
                                              file_path=file_path, installer=installer)
 
-        for agent_result_chunk in tasks_results:
-            for agent_result in agent_result_chunk['data']:
-                socket_error = agent_result['error']
-                # Success, return agent and task IDs
-                if socket_error == 0:
-                    task_agent = {
-                        'agent': str(agent_result['agent']).zfill(3),
-                        'task_id': agent_result['task_id']
-                    }
-                    result.affected_items.append(task_agent)
-                    result.total_affected_items += 1
-
-                # Upgrade error for specific agents
-                elif (error_code := 1810 + socket_error) in ERROR_CODES_UPGRADE_SOCKET:
-                    error = WazuhError(error_code, cmd_error=True, extra_message=agent_result['message'])
-                    result.add_failed_item(id_=str(agent_result['agent']).zfill(3), error=error)
-
-                # Upgrade error for all agents, bad request
-                elif error_code in ERROR_CODES_UPGRADE_SOCKET_BAD_REQUEST:
-                    raise WazuhError(error_code, cmd_error=True, extra_message=agent_result['message'])
-
-                # Upgrade error for all agents, internal server error
-                else:
-                    raise WazuhInternalError(error_code, cmd_error=True, extra_message=agent_result['message'])
+        for agent_result in tasks_results:
+            socket_error = agent_result['error']
+            # Success, return agent and task IDs
+            if socket_error == 0:
+                task_agent = {
+                    'agent': str(agent_result['agent']).zfill(3),
+                    'task_id': agent_result['task_id']
+                }
+                result.affected_items.append(task_agent)
+                result.total_affected_items += 1
+
+            # Upgrade error for specific agents
+            elif (error_code := 1810 + socket_error) in ERROR_CODES_UPGRADE_SOCKET:
+                error = WazuhError(error_code, cmd_error=True, extra_message=agent_result['message'])
+                result.add_failed_item(id_=str(agent_result['agent']).zfill(3), error=error)
+
+            # Upgrade error for all agents, bad request
+            elif error_code in ERROR_CODES_UPGRADE_SOCKET_BAD_REQUEST:
+                raise WazuhError(error_code, cmd_error=True, extra_message=agent_result['message'])
+
+            # Upgrade error for all agents, internal server error
+            else:
+                raise WazuhInternalError(error_code, cmd_error=True, extra_message=agent_result['message'])
 
     result.affected_items.sort(key=operator.itemgetter('agent'))
 
@@ -1249,23 +1314,22 @@ def get_upgrade_result(agent_list: list = None, filters: dict = None, q: str = N
         task_results = create_upgrade_tasks(eligible_agents=eligible_agents, chunk_size=UPGRADE_RESULT_CHUNK_SIZE,
                                             command='upgrade_result', get_result=True)
 
-        for task_result_chunk in task_results:
-            for task_result in task_result_chunk['data']:
-                task_error = task_result.pop('error')
-                # Success, return agent and task IDs
-                if task_error == 0:
-                    task_result['agent'] = str(task_result['agent']).zfill(3)
-                    result.affected_items.append(task_result)
-                    result.total_affected_items += 1
-
-                # Upgrade error for specific agents (no task in DB)
-                elif (error_code := 1810 + task_error) in ERROR_CODES_UPGRADE_SOCKET_GET_UPGRADE_RESULT:
-                    error = WazuhError(error_code, cmd_error=True, extra_message=task_result['message'])
-                    result.add_failed_item(id_=str(task_result['agent']).zfill(3), error=error)
-
-                # Upgrade error for all agents, internal server error
-                else:
-                    raise WazuhInternalError(error_code, cmd_error=True, extra_message=task_result['message'])
+        for task_result in task_results:
+            task_error = task_result.pop('error')
+            # Success, return agent and task IDs
+            if task_error == 0:
+                task_result['agent'] = str(task_result['agent']).zfill(3)
+                result.affected_items.append(task_result)
+                result.total_affected_items += 1
+
+            # Upgrade error for specific agents (no task in DB)
+            elif (error_code := 1810 + task_error) in ERROR_CODES_UPGRADE_SOCKET_GET_UPGRADE_RESULT:
+                error = WazuhError(error_code, cmd_error=True, extra_message=task_result['message'])
+                result.add_failed_item(id_=str(task_result['agent']).zfill(3), error=error)
+
+            # Upgrade error for all agents, internal server error
+            else:
+                raise WazuhInternalError(error_code, cmd_error=True, extra_message=task_result['message'])
 
     result.affected_items.sort(key=operator.itemgetter('agent'))
 
@@ -1457,12 +1521,11 @@ def get_full_overview() -> WazuhResult:
     # We don't consider agent 000 in order to get the summary
     q = "id!=000"
 
-    # Get information from different methods of Agent class
-    stats_distinct_node = get_distinct_agents(fields=['node_name'], q=q).affected_items
+    # Get information from different methods of Agent class. Agent fields are grouped using the agents summary cache
+    stats_distinct_node = get_agents_summary_distinct(fields=['node_name']).affected_items
     groups = get_agent_groups().affected_items
-    stats_distinct_os = get_distinct_agents(fields=['os.name',
-                                                    'os.platform', 'os.version'], q=q).affected_items
-    stats_version = get_distinct_agents(fields=['version'], q=q).affected_items
+    stats_distinct_os = get_agents_summary_distinct(fields=['os.name', 'os.platform', 'os.version']).affected_items
+    stats_version = get_agents_summary_distinct(fields=['version']).affected_items
     agent_summary_status = get_agents_summary_status()
     summary = agent_summary_status['data'] if 'data' in agent_summary_status else dict()
     try:
@@ -6,12 +6,15 @@ import ipaddress
 import json
 import re
 import threading
+import time
 from base64 import b64encode
+from collections import deque
 from datetime import datetime, timezone
 from functools import lru_cache
 from json import dumps, loads
 from os import listdir, path
 from shutil import rmtree
+from typing import Iterator, Tuple, Union
 
 from wazuh.core import common, configuration, stats
 from wazuh.core.InputValidator import InputValidator
@@ -34,6 +37,18 @@ lock_acquired = False
 
 agent_regex = re.compile(r"^(\d{3,}) [^!].* .* .*$", re.MULTILINE)
 
+# Seconds an agents summary snapshot is served from memory before being reloaded from wazuh-db
+AGENTS_SUMMARY_CACHE_TTL = 10
+
+# Maximum size, in bytes, expected for the response to a single request sent to the upgrade socket
+UPGRADE_RESPONSE_BUDGET = 48 * 1024
+
+# Maximum number of requests sent to the upgrade socket that may wait for their response at the same time
+UPGRADE_MAX_IN_FLIGHT = 4
+
+# Maximum number of agents removed by a single request to authd, so that its response fits in the socket buffer
+AUTHD_REMOVE_CHUNK_SIZE = 500
+
 
 class WazuhDBQueryAgents(WazuhDBQuery):
     """Class used to query Wazuh agents."""
@@ -460,6 +475,199 @@ class WazuhDBQueryMultigroups(WazuhDBQueryAgents):
         self.query += ' GROUP BY a.id '
 
 
+class AgentsSummaryCache:
+    """In-memory snapshot of the agent fields used to build the agents summaries and overview.
+
+    The snapshot is loaded from wazuh-db with a single query and kept for `ttl` seconds. In the meantime, it is updated
+    incrementally with the agent-info chunks received by the master node, so summaries can be computed in memory for
+    any subset of agents.
+    """
+
+    # Agent field -> column name in the agent-info chunks sent by the workers
+    fields = {'status': 'connection_status', 'group_config_status': 'group_config_status', 'os.name': 'os_name',
+              'os.platform': 'os_platform', 'os.version': 'os_version', 'version': 'version',
+              'node_name': 'node_name'}
+
+    def __init__(self, ttl: int = AGENTS_SUMMARY_CACHE_TTL):
+        """Class constructor.
+
+        Parameters
+        ----------
+        ttl : int
+            Seconds the snapshot is valid before being reloaded from wazuh-db.
+        """
+        self.ttl = ttl
+        self._agents = {}
+        self._last_update = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        """Read the summary fields of all the agents (except the manager) from wazuh-db.
+
+        Returns
+        -------
+        dict
+            Summary fields of every agent, by agent ID.
+        """
+        with WazuhDBQueryAgents(limit=None, select=list(self.fields.keys()), query='id!=000') as db_query:
+            data = db_query.run()
+
+        agents = {}
+        for item in data['items']:
+            os_info = item.get('os', {})
+            agents[item['id']] = {'status': item.get('status'),
+                                  'group_config_status': item.get('group_config_status'),
+                                  'os.name': os_info.get('name'), 'os.platform': os_info.get('platform'),
+                                  'os.version': os_info.get('version'), 'version': item.get('version'),
+                                  'node_name': item.get('node_name')}
+
+        return agents
+
+    def get_agents(self) -> dict:
+        """Get the summary fields of all the agents, reloading them from wazuh-db if the snapshot expired.
+
+        Returns
+        -------
+        dict
+            Summary fields of every agent, by agent ID.
+        """
+        with self._lock:
+            if self._last_update is None or time.monotonic() - self._last_update > self.ttl:
+                self._agents = self._load()
+                self._last_update = time.monotonic()
+
+            return self._agents
+
+    def invalidate(self):
+        """Discard the current snapshot so the next access reloads it from wazuh-db."""
+        with self._lock:
+            self._agents = {}
+            self._last_update = None
+
+    def update_agents_info(self, chunks: list):
+        """Update the snapshot with agent-info chunks, as received by the master node from the workers.
+
+        Agents not present in the snapshot are ignored, as they will be included in the next reload. If a chunk
+        cannot be parsed, the whole snapshot is invalidated.
+
+        Parameters
+        ----------
+        chunks : list
+            JSON strings containing lists of agent rows.
+        """
+        with self._lock:
+            if self._last_update is None:
+                return
+
+            try:
+                for chunk in chunks:
+                    for row in loads(chunk):
+                        agent_id = str(row['id']).zfill(3)
+                        if agent_id not in self._agents:
+                            continue
+                        for field, column in self.fields.items():
+                            if column in row:
+                                self._agents[agent_id][field] = row[column]
+            except (TypeError, ValueError, KeyError):
+                self._agents = {}
+                self._last_update = None
+
+    def _select(self, agent_list: list = None) -> list:
+        """Get the summary fields of the specified agents.
+
+        Parameters
+        ----------
+        agent_list : list
+            Agent IDs to include. If None, all the agents are included.
+
+        Returns
+        -------
+        list
+            Summary fields of each selected agent.
+        """
+        if agent_list is not None and not agent_list:
+            return []
+
+        agents = self.get_agents()
+        if agent_list is None:
+            return list(agents.values())
+
+        return [agents[agent_id] for agent_id in agent_list if agent_id in agents]
+
+    def get_status_summary(self, agent_list: list = None) -> dict:
+        """Count the agents by connection and group configuration synchronization statuses.
+
+        Parameters
+        ----------
+        agent_list : list
+            Agent IDs to include. If None, all the agents are included.
+
+        Returns
+        -------
+        dict
+            Counters by connection status and by group configuration status.
+        """
+        connection = {'active': 0, 'disconnected': 0, 'never_connected': 0, 'pending': 0, 'total': 0}
+        sync_configuration = {'synced': 0, 'not synced': 0, 'total': 0}
+        agents = self._select(agent_list)
+        for agent in agents:
+            connection[agent['status']] = connection.get(agent['status'], 0) + 1
+            sync_configuration[agent['group_config_status']] = \
+                sync_configuration.get(agent['group_config_status'], 0) + 1
+
+        connection['total'] = sync_configuration['total'] = len(agents)
+        sync_configuration['not_synced'] = sync_configuration.pop('not synced')
+
+        return {'connection': connection, 'configuration': sync_configuration}
+
+    def get_distinct(self, fields: list, agent_list: list = None) -> list:
+        """Count the agents sharing the same values for the specified fields.
+
+        The items have the same format as those returned by `WazuhDBQueryGroupByAgents`, using 'unknown' for the
+        fields without value.
+
+        Parameters
+        ----------
+        fields : list
+            Summary fields to group by.
+        agent_list : list
+            Agent IDs to include. If None, all the agents are included.
+
+        Returns
+        -------
+        list
+            Combinations of values and the number of agents that have each one, sorted by value.
+        """
+        counters = {}
+        for agent in self._select(agent_list):
+            key = tuple(agent[field] if agent[field] is not None else 'unknown' for field in fields)
+            counters[key] = counters.get(key, 0) + 1
+
+        fields_to_nest, non_nested = get_fields_to_nest(fields, ['os'], '.')
+        return [{**plain_dict_to_nested_dict(dict(zip(fields, key)), fields_to_nest, non_nested, ['os'], '.'),
+                 'count': count} for key, count in sorted(counters.items(), key=lambda item: str(item[0]))]
+
+    def get_distinct_values(self, field: str, agent_list: list = None) -> list:
+        """Get the different values a summary field has, excluding empty ones.
+
+        Parameters
+        ----------
+        field : str
+            Summary field.
+        agent_list : list
+            Agent IDs to include. If None, all the agents are included.
+
+        Returns
+        -------
+        list
+            Sorted distinct values.
+        """
+        return sorted({agent[field] for agent in self._select(agent_list) if agent[field] is not None})
+
+
+agents_summary_cache = AgentsSummaryCache()
+
+
 class Agent:
     """Wazuh Agent object."""
     fields = {'id': 'id', 'name': 'name', 'ip': 'coalesce(ip,register_ip)', 'status': 'connection_status',
@@ -647,16 +855,7 @@ class Agent:
         str
             Message generated by Wazuh.
         """
-        # Check that wazuh-authd is running
-        try:
-            manager_status = get_manager_status(cache=True)
-        except WazuhInternalError as e:
-            # wazuh-authd is not running due to a problem with /proc availability
-            raise WazuhError(1726, extra_message=str(e))
-
-        if manager_status.get('wazuh-authd') != 'running':
-            # wazuh-authd is not running
-            raise WazuhError(1726)
+        Agent._check_authd()
 
         # Delete agent
         try:
@@ -668,6 +867,76 @@ class Agent:
         except Exception as e:
             raise WazuhInternalError(1757, extra_message=str(e))
 
+    @staticmethod
+    def remove_agents(agent_list: list, purge: bool = False) -> dict:
+        """Delete several agents with as few requests to authd as possible.
+
+        Authd drops all the keys of a request at once and its writer thread removes the agents databases in batches.
+
+        Parameters
+        ----------
+        agent_list : list
+            List of agent IDs.
+        purge : bool
+            Remove keys from store.
+
+        Raises
+        ------
+        WazuhError(1726)
+            Authd is not running.
+        WazuhInternalError(1757)
+            Unhandled exception.
+
+        Returns
+        -------
+        dict
+            Error received by agent ID, for the agents that could not be deleted.
+        """
+        Agent._check_authd()
+
+        agent_list = [str(agent_id).zfill(3) for agent_id in agent_list]
+        failed = {}
+        for i in range(0, len(agent_list), AUTHD_REMOVE_CHUNK_SIZE):
+            chunk = agent_list[i:i + AUTHD_REMOVE_CHUNK_SIZE]
+            msg = {"function": "remove", "arguments": {"ids": chunk, "purge": purge}}
+
+            try:
+                authd_socket = WazuhSocketJSON(common.AUTHD_SOCKET)
+                try:
+                    authd_socket.send(msg)
+                    data = authd_socket.receive()
+                finally:
+                    authd_socket.close()
+            except WazuhException as e:
+                failed.update({agent_id: e for agent_id in chunk})
+                continue
+            except Exception as e:
+                raise WazuhInternalError(1757, extra_message=str(e))
+
+            for item in data.get('failed', []):
+                failed[item['id']] = WazuhException(item['error'], item['message'], cmd_error=True)
+
+        return failed
+
+    @staticmethod
+    def _check_authd():
+        """Check that wazuh-authd is running.
+
+        Raises
+        ------
+        WazuhError(1726)
+            Authd is not running.
+        """
+        try:
+            manager_status = get_manager_status(cache=True)
+        except WazuhInternalError as e:
+            # wazuh-authd is not running due to a problem with /proc availability
+            raise WazuhError(1726, extra_message=str(e))
+
+        if manager_status.get('wazuh-authd') != 'running':
+            # wazuh-authd is not running
+            raise WazuhError(1726)
+
     def _remove_authd(self, purge: bool = False) -> dict:
         """Delete the agent.
 
@@ -927,17 +1196,47 @@ class Agent:
         str
             Confirmation message with agent and group IDs.
         """
-        if replace_list is None:
-            replace_list = []
-
         # Get agent's group
         try:
-            agent_groups = set(Agent.get_agent_groups(agent_id))
+            agent_groups = Agent.get_agent_groups(agent_id)
         except Exception as e:
             raise WazuhInternalError(2007, extra_message=str(e))
 
+        Agent.check_group_assignment(group_id, agent_groups, replace=replace, replace_list=replace_list)
+
+        # Update group
+        Agent.set_agent_group_relationship(agent_id, group_id, override=replace)
+
+        return f"Agent {agent_id} assigned to {group_id}"
+
+    @staticmethod
+    def check_group_assignment(group_id: str, agent_groups: list, replace: bool = False, replace_list: list = None):
+        """Check whether a group can be assigned to an agent, given its current groups.
+
+        Parameters
+        ----------
+        group_id : str
+            Name of the group.
+        agent_groups : list
+            Current groups of the agent.
+        replace : bool
+            Whether to append new group to current agent's group or replace it.
+        replace_list : list
+            List of group names that can be replaced.
+
+        Raises
+        ------
+        WazuhError(1751)
+            The agent already belongs to the group.
+        WazuhError(1752)
+            Could not force single group for the agent.
+        WazuhError(1737)
+            Maximum number of groups reached.
+        """
+        agent_groups = set(agent_groups)
+
         if replace:
-            if not agent_groups.issubset(set(replace_list)):
+            if not agent_groups.issubset(set(replace_list or [])):
                 raise WazuhError(1752)
         else:
             # Check if the group already belongs to the agent
@@ -948,10 +1247,37 @@ class Agent:
         if len(agent_groups) >= common.MAX_GROUPS_PER_MULTIGROUP:
             raise WazuhError(1737)
 
-        # Update group
-        Agent.set_agent_group_relationship(agent_id, group_id, override=replace)
+    @staticmethod
+    def check_group_unassignment(group_id: str, agent_groups: set) -> set:
+        """Check whether a group can be unassigned from an agent, given its current groups.
 
-        return f"Agent {agent_id} assigned to {group_id}"
+        Parameters
+        ----------
+        group_id : str
+            Name of the group.
+        agent_groups : set
+            Current groups of the agent.
+
+        Raises
+        ------
+        WazuhError(1734)
+            The agent does not belong to the group.
+        WazuhError(1745)
+            Agent only belongs to 'default' and it cannot be unassigned from this group.
+
+        Returns
+        -------
+        set
+            Groups of the agent after the unassignment. Agents left without groups are reassigned to 'default'.
+        """
+        if group_id not in agent_groups:
+            raise WazuhError(1734)
+        elif len(agent_groups) == 1:
+            if group_id == 'default':
+                raise WazuhError(1745)
+            return {'default'}
+
+        return agent_groups - {group_id}
 
     @staticmethod
     def check_if_delete_agent(id: str, seconds: int) -> bool:
@@ -1069,6 +1395,97 @@ class Agent:
         finally:
             wdb.close()
 
+    @staticmethod
+    def get_agents_groups(agent_list: list) -> dict:
+        """Return the groups of a list of agents with a single query.
+
+        Parameters
+        ----------
+        agent_list : list
+            Agent IDs.
+
+        Returns
+        -------
+        dict
+            List of group IDs of each agent, by agent ID.
+        """
+        if not agent_list:
+            return {}
+
+        with WazuhDBQueryAgents(limit=None, select=['group'], filters={'rbac_ids': list(agent_list)},
+                                rbac_negate=False, count=False) as db_query:
+            data = db_query.run()
+
+        return {item['id']: item.get('group', []) for item in data['items']}
+
+    @staticmethod
+    def set_agents_groups_relationship(agents_groups: dict, remove: bool = False, override: bool = False) -> dict:
+        """Set the relationship between several agents and their groups.
+
+        The agents are packed into as few `set-agent-groups` commands as the wazuh-db socket size allows. If a command
+        fails, the groups of its agents are read back to find out which of them were not updated.
+
+        Parameters
+        ----------
+        agents_groups : dict
+            List of group IDs to set, by agent ID.
+        remove : bool
+            Set the relationships with the remove mode.
+        override : bool
+            Set the relationships with the override mode. This option only works if remove is False. If both override
+            and remove are False, the mode used is append.
+
+        Returns
+        -------
+        dict
+            Groups that could not be set and the error received, by agent ID.
+        """
+        if not agents_groups:
+            return {}
+
+        if remove:
+            mode = 'remove'
+        else:
+            mode = 'append' if not override else 'override'
+
+        command_prefix = f'global set-agent-groups {{"mode":"{mode}","sync_status":"syncreq","data":['
+        command_suffix = ']}'
+        max_items_size = common.MAX_QUERY_FILTERS_RESERVED_SIZE - len(command_prefix) - len(command_suffix)
+
+        batches = [[]]
+        batch_size = 0
+        for agent_id, groups in agents_groups.items():
+            item = dumps({'id': int(agent_id), 'groups': groups}, separators=(',', ':'))
+            if batches[-1] and batch_size + len(item) + 1 > max_items_size:
+                batches.append([])
+                batch_size = 0
+            batches[-1].append((agent_id, item))
+            batch_size += len(item) + 1
+
+        failed = {}
+        wdb = WazuhDBConnection()
+        try:
+            for batch in filter(None, batches):
+                try:
+                    wdb.send(command_prefix + ','.join(item for _, item in batch) + command_suffix, raw=True)
+                except WazuhError as e:
+                    current_groups = Agent.get_agents_groups([agent_id for agent_id, _ in batch])
+                    for agent_id, _ in batch:
+                        groups = agents_groups[agent_id]
+                        agent_groups = current_groups.get(agent_id, [])
+                        if remove:
+                            failed_groups = [group for group in groups if group in agent_groups]
+                        elif override and agent_groups != groups:
+                            failed_groups = groups
+                        else:
+                            failed_groups = [group for group in groups if group not in agent_groups]
+                        if failed_groups:
+                            failed[agent_id] = (failed_groups, e)
+        finally:
+            wdb.close()
+
+        return failed
+
     @staticmethod
     def unset_single_group_agent(agent_id: str, group_id: str, force: bool = False) -> str:
         """Unset the agent group. If agent has multigroups, it will preserve all previous groups except the last one.
@@ -1110,16 +1527,10 @@ class Agent:
 
         # Get agent's group
         group_list = set(Agent.get_agent_groups(agent_id))
-        set_default = False
 
         # Check agent belongs to group group_id
-        if group_id not in group_list:
-            raise WazuhError(1734)
-        elif len(group_list) == 1:
-            if group_id == 'default':
-                raise WazuhError(1745)
-            else:
-                set_default = True
+        Agent.check_group_unassignment(group_id, group_list)
+        set_default = len(group_list) == 1
 
         # Update group file
         Agent.set_agent_group_relationship(agent_id, group_id, remove=True)
@@ -1267,6 +1678,41 @@ def send_restart_command(agent_id: str = '', agent_version: str = '', wq: WazuhQ
     return ret_msg
 
 
+def send_restart_commands(agents: list, wq: WazuhQueue, rate_limit: int = WazuhQueue.BULK_RATE_LIMIT) \
+        -> Iterator[Tuple[str, Union[str, WazuhException]]]:
+    """Send restart command to several agents.
+
+    The agents are grouped by the restart message their version understands, so each message is built only once.
+
+    Parameters
+    ----------
+    agents : list
+        Agents where the restart command will be sent to, as dictionaries with their `id` and `version`.
+    wq : WazuhQueue
+        WazuhQueue used for the active response messages.
+    rate_limit : int
+        Maximum number of messages sent per second.
+
+    Yields
+    ------
+    tuple
+        Agent ID and the message generated by Wazuh, or the exception raised when sending the command.
+    """
+    legacy_version = WazuhVersion(common.AR_LEGACY_VERSION)
+    json_by_version = {}
+    buckets = {WazuhQueue.RESTART_AGENTS_JSON: [], WazuhQueue.RESTART_AGENTS: []}
+    for agent in agents:
+        version = agent['version']
+        if version not in json_by_version:
+            json_by_version[version] = WazuhVersion(version) >= legacy_version
+        buckets[WazuhQueue.RESTART_AGENTS_JSON if json_by_version[version] else WazuhQueue.RESTART_AGENTS].append(
+            agent['id'])
+
+    for msg, agent_ids in buckets.items():
+        if agent_ids:
+            yield from wq.send_msg_to_agents(msg, agent_ids, rate_limit=rate_limit)
+
+
 @common.context_cached('system_agents')
 def get_agents_info() -> set:
     """Get all agent IDs in the system.
@@ -1390,100 +1836,149 @@ def get_rbac_filters(system_resources: set = None, permitted_resources: list = N
     return {'filters': filters, 'rbac_negate': negate}
 
 
-def create_upgrade_tasks(eligible_agents: list, chunk_size: int, command: str, **kwargs) -> list:
-    """Recursive function used to create the agents upgrade tasks.
+class UpgradeOrchestrator:
+    """Send the commands of an upgrade operation through a single connection to the upgrade socket.
 
-    If a task manager communication error is in the response (error with code 4), the chunk size used is split in half.
+    The requests are pipelined over the connection, with at most `max_in_flight` of them waiting for their response.
+    The number of agents of each request is sized from the bytes per agent measured in the previous responses, so the
+    response of the task manager fits in its socket buffer. The agents of a request rejected because of a task manager
+    communication error (error with code 4) are sent again with a smaller chunk size.
 
-    Parameters
-    ----------
-    eligible_agents : list
-        List of eligible agents.
-    chunk_size : int
-        Number of agents to be sent to the upgrade socket at the same time.
-    command : str
-        Upgrade command. Values: 'upgrade', 'upgrade_custom', 'upgrade_result'.
-    **kwargs
-        Upgrade procedure extra parameters.
-
-    Returns
-    -------
-    list
-        Upgrade tasks results.
+    Only one request is sent until the results of the first response have been consumed. Errors affecting the whole
+    request come from its parameters, which every request shares, so a caller raising on them stops the operation
+    before any other chunk reaches the upgrade module.
     """
-    result = []
-    agents_chunks = [eligible_agents[x:x + chunk_size] for x in range(0, len(eligible_agents), chunk_size)]
-    for chunk in agents_chunks:
-        response = core_upgrade_agents(command=command, agents_chunk=chunk, wpk_repo=kwargs.get('wpk_repo'),
-                                       version=kwargs.get('version'), force=kwargs.get('force'),
-                                       use_http=kwargs.get('use_http'), file_path=kwargs.get('file_path'),
-                                       installer=kwargs.get('installer'), get_result=kwargs.get('get_result'))
 
-        # In case of task manager communication error, try to create the upgrade tasks again with a smaller chunk size
-        # If the used chunk size is 1, return the response with the task manager communication error
-        if any(item['error'] == 4 for item in response['data']) and chunk_size != 1:
-            return create_upgrade_tasks(eligible_agents, chunk_size // 2, command, **kwargs)
+    def __init__(self, command: str, chunk_size: int, max_in_flight: int = UPGRADE_MAX_IN_FLIGHT,
+                 response_budget: int = UPGRADE_RESPONSE_BUDGET, **kwargs):
+        """Class constructor.
 
-        result.append(response)
+        Parameters
+        ----------
+        command : str
+            Upgrade command. Values: 'upgrade', 'upgrade_custom', 'upgrade_result'.
+        chunk_size : int
+            Maximum number of agents to be sent to the upgrade socket in a single request.
+        max_in_flight : int
+            Maximum number of requests waiting for their response.
+        response_budget : int
+            Maximum size, in bytes, expected for the response to a single request.
+        **kwargs
+            Upgrade procedure extra parameters.
+        """
+        self.command = command
+        self.chunk_size = chunk_size
+        self.max_in_flight = max_in_flight
+        self.response_budget = response_budget
+        self.get_result = kwargs.get('get_result')
+        self.parameters = {
+            'version': unify_wazuh_upgrade_version_format(kwargs.get('version')),
+            'force_upgrade': kwargs.get('force'),
+            'use_http': kwargs.get('use_http'),
+            'wpk_repo': kwargs.get('wpk_repo'),
+            'file_path': kwargs.get('file_path'),
+            'installer': kwargs.get('installer')
+        }
+        self.bytes_per_agent = None
 
-    return result
+    def next_chunk_size(self) -> int:
+        """Get the number of agents for the next request.
 
+        Returns
+        -------
+        int
+            Number of agents.
+        """
+        if self.bytes_per_agent:
+            return max(1, min(self.chunk_size, int(self.response_budget // self.bytes_per_agent)))
+        return self.chunk_size
+
+    def create_message(self, agents_chunk: list) -> bytes:
+        """Create the message sent to the upgrade socket for a chunk of agents.
+
+        Parameters
+        ----------
+        agents_chunk : list
+            List of agents ID's.
+
+        Returns
+        -------
+        bytes
+            Encoded message.
+        """
+        parameters = {'agents': agents_chunk} if self.get_result else {'agents': agents_chunk, **self.parameters}
+        msg = create_wazuh_socket_message(origin={'module': 'api'}, command=self.command,
+                                          parameters={k: v for k, v in parameters.items() if v is not None})
+
+        return dumps(msg).encode()
 
-def core_upgrade_agents(agents_chunk: list, command: str = 'upgrade_result', wpk_repo: str = None, version: str = None,
-                        force: bool = False, use_http: bool = False, file_path: str = None, installer: str = None,
-                        get_result: bool = False) -> dict:
-    """Send command to upgrade module / task module.
+    def run(self, agent_list: list) -> Iterator[dict]:
+        """Send the upgrade command for a list of agents.
+
+        Parameters
+        ----------
+        agent_list : list
+            List of agents ID's.
+
+        Yields
+        ------
+        dict
+            Result of the command for each agent, as returned by the upgrade socket.
+        """
+        if not agent_list:
+            return
+
+        pending = deque(agent_list)
+        in_flight = deque()
+        max_in_flight = 1
+
+        with WazuhSocket(common.UPGRADE_SOCKET) as upgrade_socket:
+            while pending or in_flight:
+                while pending and len(in_flight) < max_in_flight:
+                    chunk = [pending.popleft() for _ in range(min(self.next_chunk_size(), len(pending)))]
+                    upgrade_socket.send(self.create_message(chunk))
+                    in_flight.append(chunk)
+
+                chunk = in_flight.popleft()
+                response = upgrade_socket.receive()
+                data = loads(response.decode())
+
+                # In case of task manager communication error, send the agents again in smaller chunks
+                # If the chunk has a single agent, return the response with the task manager communication error
+                if len(chunk) > 1 and any(item['error'] == 4 for item in data['data']):
+                    self.chunk_size = min(self.chunk_size, max(1, len(chunk) // 2))
+                    pending.extendleft(reversed(chunk))
+                    continue
+
+                # Keep the largest size seen, as responses with errors are shorter than successful ones
+                self.bytes_per_agent = max(self.bytes_per_agent or 0, len(response) / len(chunk))
+
+                for agent_info in data['data']:
+                    agent_info.update((k, get_utc_strptime(v, "%Y/%m/%d %H:%M:%S").strftime(DATE_FORMAT))
+                                      for k, v in agent_info.items() if k in {'create_time', 'update_time'})
+                    yield agent_info
+
+                # The caller accepted the first results, so the next chunks can be pipelined
+                max_in_flight = self.max_in_flight
+
+
+def create_upgrade_tasks(eligible_agents: list, chunk_size: int, command: str, **kwargs) -> Iterator[dict]:
+    """Create the agents upgrade tasks, or get their results, through a single connection to the upgrade socket.
 
     Parameters
     ----------
-    agents_chunk : list
-        List of agents ID's.
+    eligible_agents : list
+        List of eligible agents.
+    chunk_size : int
+        Maximum number of agents to be sent to the upgrade socket at the same time.
     command : str
-        Command sent to the socket. Default: 'upgrade_result'
-    wpk_repo : str
-        URL for WPK download.
-    version : str
-        Version to upgrade to.
-    force : bool
-        force the update even if it is a downgrade.
-    use_http : bool
-        False for HTTPS protocol, True for HTTP protocol.
-    file_path : str
-        Path to the installation file.
-    installer : str
-        Selected installer.
-    get_result : bool
-        Get the result of an update (True -> Task module), Create new upgrade task (False -> Upgrade module)
+        Upgrade command. Values: 'upgrade', 'upgrade_custom', 'upgrade_result'.
+    **kwargs
+        Upgrade procedure extra parameters.
 
     Returns
     -------
-    dict
-        Message received from the socket (Task module or Upgrade module)
+    Iterator[dict]
+        Upgrade task result of each agent.
     """
-    msg = create_wazuh_socket_message(origin={'module': 'api'},
-                                      command=command,
-                                      parameters={
-                                          'agents': agents_chunk,
-                                          'version': unify_wazuh_upgrade_version_format(version),
-                                          'force_upgrade': force,
-                                          'use_http': use_http,
-                                          'wpk_repo': wpk_repo,
-                                          'file_path': file_path,
-                                          'installer': installer
-                                      } if not get_result else {'agents': agents_chunk})
-
-    msg['parameters'] = {k: v for k, v in msg['parameters'].items() if v is not None}
-
-    # Send upgrading command
-    s = WazuhSocket(common.UPGRADE_SOCKET)
-    s.send(dumps(msg).encode())
-
-    # Receive upgrade information from socket
-    data = loads(s.receive().decode())
-    s.close()
-
-    [agent_info.update((k, get_utc_strptime(v, "%Y/%m/%d %H:%M:%S").strftime(DATE_FORMAT))
-                       for k, v in agent_info.items() if k in {'create_time', 'update_time'})
-     for agent_info in data['data']]
-
-    return data
+    return UpgradeOrchestrator(command=command, chunk_size=chunk_size, **kwargs).run(eligible_agents)
@@ -16,7 +16,7 @@ from typing import Tuple, Dict, Callable
 from uuid import uuid4
 
 from wazuh.core import cluster as metadata, common, exception, utils
-from wazuh.core.agent import Agent
+from wazuh.core.agent import Agent, agents_summary_cache
 from wazuh.core.cluster import server, cluster, common as c_common
 from wazuh.core.cluster.dapi import dapi
 from wazuh.core.cluster.utils import context_tag
@@ -631,6 +631,8 @@ class MasterHandler(server.AbstractServerHandler, c_common.WazuhCommon):
         data = await self.get_chunks_in_task_id(task_id, b'syn_m_a_err')
         result = await self.update_chunks_wdb(data, 'agent-info', logger, b'syn_m_a_err',
                                               self.cluster_items['intervals']['master']['timeout_agent_info'])
+        # Keep the agents summary served by this node up to date without reloading it from wazuh-db.
+        agents_summary_cache.update_agents_info(data['chunks'])
 
         # Send result to worker.
         response = await self.send_request(command=b'syn_m_a_e', data=json.dumps(result).encode())
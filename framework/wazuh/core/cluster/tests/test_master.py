@@ -868,8 +868,10 @@ def test_master_handler_end_receiving_integrity_checksums(end_receiving_file_moc
 @freeze_time('1970-01-01')
 @patch('wazuh.core.cluster.common.Handler.send_request', return_value='some_data')
 @patch('wazuh.core.cluster.common.Handler.update_chunks_wdb', return_value={'updated_chunks': 1})
-@patch('wazuh.core.cluster.common.Handler.get_chunks_in_task_id', return_value='chunks')
-async def test_master_handler_sync_wazuh_db_info(get_chunks_mock, update_chunks_mock, send_request_mock):
+@patch('wazuh.core.cluster.common.Handler.get_chunks_in_task_id', return_value={'chunks': ['chunk']})
+@patch('wazuh.core.cluster.master.agents_summary_cache')
+async def test_master_handler_sync_wazuh_db_info(summary_cache_mock, get_chunks_mock, update_chunks_mock,
+                                                 send_request_mock):
     """Check that the wazuh-db data reception task is created and chunks are obtained and updated in DB."""
     class LoggerMock:
         """Auxiliary class."""
@@ -887,7 +889,8 @@ async def test_master_handler_sync_wazuh_db_info(get_chunks_mock, update_chunks_
 
     assert await master_handler.sync_wazuh_db_info(task_id=b'17', info_type='agent-groups') == 'some_data'
     get_chunks_mock.assert_called_once_with(b'17', b'syn_m_a_err')
-    update_chunks_mock.assert_called_once_with('chunks', 'agent-info', logger, b'syn_m_a_err', 0)
+    update_chunks_mock.assert_called_once_with({'chunks': ['chunk']}, 'agent-info', logger, b'syn_m_a_err', 0)
+    summary_cache_mock.update_agents_info.assert_called_once_with(['chunk'])
     send_request_mock.assert_called_once_with(command=b'syn_m_a_e', data=b'{"updated_chunks": 1}')
     assert logger._info == ['Starting.', 'Finished in 0.000s. Updated 1 chunks.']
     assert master_handler.sync_agent_info_status == {'n_synced_chunks': 1,
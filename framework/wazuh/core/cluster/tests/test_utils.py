@@ -12,6 +12,7 @@ with patch('wazuh.core.common.getgrnam'):
                 sys.modules['wazuh.rbac.orm'] = MagicMock()
 
                 from wazuh.core.cluster import utils
+                from wazuh.core.configuration import clear_configuration_cache
                 from wazuh import WazuhError, WazuhException, WazuhInternalError
                 from wazuh.core.results import WazuhResult
 
@@ -37,6 +38,7 @@ def test_read_cluster_config():
         with pytest.raises(WazuhError, match='.* 3006 .*'):
             utils.read_cluster_config()
 
+    clear_configuration_cache()
     with patch('wazuh.core.configuration.load_wazuh_xml', return_value=SystemExit):
         with pytest.raises(SystemExit) as pytest_wrapped_e:
             utils.read_cluster_config(from_import=True)
@@ -9,11 +9,13 @@ import re
 import subprocess
 import sys
 import tempfile
+import threading
 from configparser import RawConfigParser, NoOptionError
+from copy import deepcopy
 from io import StringIO
 from os import remove, path as os_path
 from types import MappingProxyType
-from typing import Union
+from typing import Callable, Union
 
 from defusedxml.ElementTree import tostring
 from defusedxml.minidom import parseString
@@ -113,6 +115,111 @@ CONF_SECTIONS = MappingProxyType({
 
 GETCONFIG_COMMAND = "getconfig"
 
+# Parsed configuration files, by (file path, parser name). Each entry is validated against the file status before use
+_configuration_cache = {}
+_configuration_cache_lock = threading.Lock()
+
+
+def _get_cached_file(file_path: str, parser: Callable) -> Union[dict, list, RawConfigParser]:
+    """Get the parsed content of a configuration file, parsing it only if it changed since the last call.
+
+    Parsed files are shared by every caller in the process, so they must not be modified. If the file status cannot be
+    read, the file is parsed without being cached.
+
+    Parameters
+    ----------
+    file_path : str
+        Path of the configuration file.
+    parser : Callable
+        Function that receives the file path and returns its parsed content.
+
+    Returns
+    -------
+    dict, list or RawConfigParser
+        Parsed content of the file.
+    """
+    try:
+        file_stat = os.stat(file_path)
+    except OSError:
+        return parser(file_path)
+
+    key = (file_path, parser.__name__)
+    version = (file_stat.st_ino, file_stat.st_mtime_ns, file_stat.st_size)
+    with _configuration_cache_lock:
+        cached = _configuration_cache.get(key)
+        if cached is None or cached[0] != version:
+            cached = (version, parser(file_path))
+            _configuration_cache[key] = cached
+
+    return cached[1]
+
+
+def clear_configuration_cache(file_path: str = None):
+    """Discard the parsed content of a configuration file or of all of them.
+
+    Parameters
+    ----------
+    file_path : str
+        Path of the configuration file to discard. If None, the whole cache is cleared.
+    """
+    with _configuration_cache_lock:
+        for key in [key for key in _configuration_cache if file_path is None or key[0] == file_path]:
+            del _configuration_cache[key]
+
+
+def _load_ossec_conf(file_path: str) -> dict:
+    """Read and parse an ossec.conf file.
+
+    Parameters
+    ----------
+    file_path : str
+        Path of the file.
+
+    Returns
+    -------
+    dict
+        ossec.conf as dictionary.
+    """
+    return _ossecconf2json(load_wazuh_xml(file_path))
+
+
+def _load_agent_conf(file_path: str) -> list:
+    """Read and parse an agent.conf file.
+
+    Parameters
+    ----------
+    file_path : str
+        Path of the file.
+
+    Returns
+    -------
+    list
+        agent.conf as list of configuration blocks.
+    """
+    return _agentconf2json(load_wazuh_xml(file_path))
+
+
+def _load_internal_options(file_path: str) -> RawConfigParser:
+    """Read and parse an internal options file.
+
+    Parameters
+    ----------
+    file_path : str
+        Path of the file.
+
+    Returns
+    -------
+    RawConfigParser
+        Options of the file, under the 'root' section.
+    """
+    with open(file_path) as f:
+        str_config = StringIO('[root]\n' + f.read())
+
+    config = RawConfigParser()
+    config.read_file(str_config)
+
+    return config
+
 
 def _insert(json_dst: dict, section_name: str, option: str, value: str):
     """Insert element (option:value) in a section (json_dst) called section_name.
@@ -615,11 +722,8 @@ def get_ossec_conf(section: str = None, field: str = None, conf_file: str = comm
         ossec.conf (manager) as dictionary.
     """
     try:
-        # Read XML
-        xml_data = load_wazuh_xml(conf_file)
-
-        # Parse XML to JSON
-        data = _ossecconf2json(xml_data)
+        # Read XML and parse it to JSON
+        data = _get_cached_file(conf_file, _load_ossec_conf)
     except Exception as e:
         if not from_import:
             raise WazuhError(1101, extra_message=str(e))
@@ -629,7 +733,7 @@ def get_ossec_conf(section: str = None, field: str = None, conf_file: str = comm
 
     if section:
         try:
-            data = {section: data[section]}
+            data = {section: deepcopy(data[section])}
         except KeyError as e:
             if section not in CONF_SECTIONS.keys():
                 raise WazuhError(1102, extra_message=e.args[0])
@@ -645,7 +749,7 @@ def get_ossec_conf(section: str = None, field: str = None, conf_file: str = comm
         except KeyError:
             raise WazuhError(1103)
 
-    return data
+    return data if section else deepcopy(data)
 
 
 def get_agent_conf(group_id: str = None, offset: int = 0, limit: int = common.DATABASE_LIMIT,
@@ -694,14 +798,12 @@ def get_agent_conf(group_id: str = None, offset: int = 0, limit: int = common.DA
                 return data
         # Parse XML to JSON
         else:
-            # Read XML
-            xml_data = load_wazuh_xml(agent_conf)
-
-            data = _agentconf2json(xml_data)
+            data = _get_cached_file(agent_conf, _load_agent_conf)
     except Exception as e:
         raise WazuhError(1101, str(e))
 
-    return {'total_affected_items': len(data), 'affected_items': cut_array(data, offset=offset, limit=limit)}
+    return {'total_affected_items': len(data),
+            'affected_items': deepcopy(cut_array(data, offset=offset, limit=limit))}
 
 
 def get_agent_conf_multigroup(multigroup_id: str = None, offset: int = 0, limit: int = common.DATABASE_LIMIT,
@@ -744,15 +846,12 @@ def get_agent_conf_multigroup(multigroup_id: str = None, offset: int = 0, limit:
         raise WazuhError(1006, extra_message=os_path.join("WAZUH_PATH", "var", "multigroups", agent_conf))
 
     try:
-        # Read XML
-        xml_data = load_wazuh_xml(agent_conf)
-
-        # Parse XML to JSON
-        data = _agentconf2json(xml_data)
+        # Read XML and parse it to JSON
+        data = _get_cached_file(agent_conf, _load_agent_conf)
     except Exception:
         raise WazuhError(1101)
 
-    return {'totalItems': len(data), 'items': cut_array(data, offset=offset, limit=limit)}
+    return {'totalItems': len(data), 'items': deepcopy(cut_array(data, offset=offset, limit=limit))}
 
 
 def get_file_conf(filename: str, group_id: str = None, type_conf: str = None, return_format: str = None) -> dict:
@@ -843,40 +942,20 @@ def parse_internal_options(high_name: str, low_name: str) -> str:
     str
         Value of the internal_options.conf option.
     """
-
-    def get_config(config_path: str) -> dict:
-        """Read configuration given by its path.
-
-        Parameters
-        ----------
-        config_path : str
-            Configuration path.
-
-        Returns
-        -------
-        dict
-            Configuration as a dictionary.
-        """
-        with open(config_path) as f:
-            str_config = StringIO('[root]\n' + f.read())
-
-        config = RawConfigParser()
-        config.read_file(str_config)
-
-        return config
-
     if not os_path.exists(common.INTERNAL_OPTIONS_CONF):
         raise WazuhInternalError(1107)
 
+    option = f'{high_name}.{low_name}'
+
     # Check if the option exists at local internal options
     if os_path.exists(common.LOCAL_INTERNAL_OPTIONS_CONF):
         try:
-            return get_config(common.LOCAL_INTERNAL_OPTIONS_CONF).get('root', f'{high_name}.{low_name}')
+            return _get_cached_file(common.LOCAL_INTERNAL_OPTIONS_CONF, _load_internal_options).get('root', option)
         except NoOptionError:
             pass
 
     try:
-        return get_config(common.INTERNAL_OPTIONS_CONF).get('root', f'{high_name}.{low_name}')
+        return _get_cached_file(common.INTERNAL_OPTIONS_CONF, _load_internal_options).get('root', option)
     except NoOptionError as e:
         raise WazuhInternalError(1108, e.args[0])
 
@@ -1014,6 +1093,7 @@ def upload_group_configuration(group_id: str, file_content: str) -> str:
             new_conf_path = os_path.join(common.SHARED_PATH, group_id, "agent.conf")
             safe_move(tmp_file_path, new_conf_path, ownership=(common.wazuh_uid(), common.wazuh_gid()),
                       permissions=0o660)
+            clear_configuration_cache(new_conf_path)
         except Exception as e:
             raise WazuhInternalError(1016, extra_message=str(e))
 
@@ -1248,3 +1328,5 @@ def write_ossec_conf(new_conf: str):
             f.writelines(new_conf)
     except Exception:
         raise WazuhError(1126)
+    finally:
+        clear_configuration_cache(common.OSSEC_CONF)
@@ -2,10 +2,11 @@
 # Created by Wazuh, Inc. <info@wazuh.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GP
 
-import copy
+import os
+import threading
 from abc import ABC
+from collections import defaultdict
 from datetime import datetime
-from functools import lru_cache
 from typing import Union
 
 from wazuh.core import common
@@ -36,6 +37,18 @@ DEFAULT_PK = 'id'
 MAIN_TABLES_PKS = {table: DEFAULT_PK for table in
                    {'technique', 'mitigation', 'tactic', 'group', 'software', 'reference'}} | {'metadata': 'key'}
 
+# Relationships between MITRE items, named <source>_<targets>
+RELATION_NAMES = ('tactic_techniques', 'technique_tactics', 'mitigation_techniques', 'technique_mitigations',
+                  'group_techniques', 'technique_groups', 'software_techniques', 'technique_software',
+                  'group_software', 'software_groups')
+# Relationships stored in the 'use' table by (source_type, target_type)
+USE_RELATIONS = {('group', 'technique'): ('group_techniques', 'technique_groups'),
+                 ('software', 'technique'): ('software_techniques', 'technique_software'),
+                 ('group', 'software'): ('group_software', 'software_groups')}
+
+# MITRE database, used to detect changes in the in-memory catalog
+MITRE_DB_PATH = os.path.join(common.DATABASE_PATH, 'mitre.db')
+
 
 class WazuhDBQueryMitre(WazuhDBQuery):
 
@@ -88,10 +101,28 @@ class WazuhDBQueryMitre(WazuhDBQuery):
                               backend=WazuhDBBackend(query_format='mitre', request_slice=request_slice))
 
         self.relation_fields = set()  # This variable contains valid fields not included in the database (relations)
+        self.relations = None  # Precomputed relationships, loaded from the database when not set
 
     def _filter_status(self, status_filter):
         pass
 
+    def _add_relations(self, relations: dict):
+        """Add the items related to each MITRE resource. Resources without relationships do not add anything.
+
+        Parameters
+        ----------
+        relations : dict
+            Relationships between MITRE items, as returned by `load_mitre_relations`.
+        """
+        pass
+
+    def _execute_data_query(self):
+        """Run the data query and add the items related to each resource."""
+        super()._execute_data_query()
+
+        if self.relation_fields:
+            self._add_relations(self.relations if self.relations is not None else load_mitre_relations())
+
     def _move_external_id_mitre_resource(self, mitre_resource: dict):
         """Extract the dictionary with external id, source and url from references and move it to the external level of
         the MITRE resource.
@@ -400,26 +431,17 @@ class WazuhDBQueryMitreMitigations(WazuhDBQueryMitre):
     def _filter_status(self, status_filter):
         pass
 
-    def _execute_data_query(self):
-        """Add the techniques and references related to each mitigation."""
-        super()._execute_data_query()
-
-        with WazuhDBQueryMitreRelationalMitigate() as mitre_relational_query:
-            techniques = mitre_relational_query.run()
-
-        with WazuhDBQueryMitreReferences(limit=None, filters={'type': 'mitigation'},
-                                         select=SELECT_FIELDS_REFERENCES) as mitre_references_query:
-            references = mitre_references_query.run()
-
-        references_no_id = copy.deepcopy(references)
-        for row in references_no_id['items']:
-            row.pop('id')
+    def _add_relations(self, relations: dict):
+        """Add the techniques and references related to each mitigation.
 
+        Parameters
+        ----------
+        relations : dict
+            Relationships between MITRE items, as returned by `load_mitre_relations`.
+        """
         for mitigation in self._data:
-            mitigation['techniques'] = techniques.get(mitigation['id'], list())
-            mitigation['references'] = [row_no_id for row, row_no_id in
-                                        zip(references['items'], references_no_id['items']) if
-                                        row['id'] == mitigation['id']]
+            mitigation['techniques'] = list(relations['mitigation_techniques'].get(mitigation['id'], []))
+            mitigation['references'] = get_item_references(relations, mitigation['id'])
             self._move_external_id_mitre_resource(mitigation)
 
 
@@ -538,26 +560,17 @@ class WazuhDBQueryMitreTactics(WazuhDBQueryMitre):
     def _filter_status(self, status_filter):
         pass
 
-    def _execute_data_query(self):
-        """Add the techniques and references related to each tactic."""
-        super()._execute_data_query()
-
-        with WazuhDBQueryMitreRelationalPhase() as mitre_relational_query:
-            techniques = mitre_relational_query.run()
-
-        with WazuhDBQueryMitreReferences(limit=None, filters={'type': 'tactic'},
-                                         select=SELECT_FIELDS_REFERENCES) as mitre_references_query:
-            references = mitre_references_query.run()
-
-        references_no_id = copy.deepcopy(references)
-        for row in references_no_id['items']:
-            row.pop('id')
+    def _add_relations(self, relations: dict):
+        """Add the techniques and references related to each tactic.
 
+        Parameters
+        ----------
+        relations : dict
+            Relationships between MITRE items, as returned by `load_mitre_relations`.
+        """
         for tactic in self._data:
-            tactic['techniques'] = techniques.get(tactic['id'], list())
-            tactic['references'] = [row_no_id for row, row_no_id in
-                                    zip(references['items'], references_no_id['items']) if
-                                    row['id'] == tactic['id']]
+            tactic['techniques'] = list(relations['tactic_techniques'].get(tactic['id'], []))
+            tactic['references'] = get_item_references(relations, tactic['id'])
             self._move_external_id_mitre_resource(tactic)
 
 
@@ -624,47 +637,20 @@ class WazuhDBQueryMitreTechniques(WazuhDBQueryMitre):
     def _filter_status(self, status_filter):
         pass
 
-    def _execute_data_query(self):
-        """Add the tactics, mitigations, software, groups and references related to each technique."""
-        super()._execute_data_query()
-
-        technique_ids = set()
-        for technique in self._data:
-            technique_ids.add(technique['id'])
-
-        with WazuhDBQueryMitreRelationalPhase(dict_key='tech_id') as mitre_relational_query:
-            tactics = mitre_relational_query.run()
-
-        with WazuhDBQueryMitreRelationalMitigate(dict_key='target_id') as mitre_relational_query:
-            mitigations = mitre_relational_query.run()
-
-        with WazuhDBQueryMitreRelationalUse(filters={'target_type': 'technique', 'source_type': 'software'},
-                                            dict_key='target_id',
-                                            select=['source_id', 'target_id']) as mitre_relational_query:
-            software = mitre_relational_query.run()
-
-        with WazuhDBQueryMitreRelationalUse(filters={'target_type': 'technique', 'source_type': 'group'},
-                                            dict_key='target_id', select=['source_id', 'target_id'],
-                                            request_slice=RELATIONAL_REQUEST_SLICE_TECHNIQUE_GROUPS) \
-                as mitre_relational_query:
-            groups = mitre_relational_query.run()
-
-        with WazuhDBQueryMitreReferences(limit=None, filters={'type': 'technique'},
-                                         select=SELECT_FIELDS_REFERENCES) as mitre_references_query:
-            references = mitre_references_query.run()
-
-        references_no_id = copy.deepcopy(references)
-        for row in references_no_id['items']:
-            row.pop('id')
+    def _add_relations(self, relations: dict):
+        """Add the tactics, mitigations, software, groups and references related to each technique.
 
+        Parameters
+        ----------
+        relations : dict
+            Relationships between MITRE items, as returned by `load_mitre_relations`.
+        """
         for technique in self._data:
-            technique['tactics'] = tactics.get(technique['id'], list())
-            technique['mitigations'] = mitigations.get(technique['id'], list())
-            technique['software'] = software.get(technique['id'], list())
-            technique['groups'] = groups.get(technique['id'], list())
-            technique['references'] = [row_no_id for row, row_no_id in
-                                       zip(references['items'], references_no_id['items']) if
-                                       row['id'] == technique['id']]
+            technique['tactics'] = list(relations['technique_tactics'].get(technique['id'], []))
+            technique['mitigations'] = list(relations['technique_mitigations'].get(technique['id'], []))
+            technique['software'] = list(relations['technique_software'].get(technique['id'], []))
+            technique['groups'] = list(relations['technique_groups'].get(technique['id'], []))
+            technique['references'] = get_item_references(relations, technique['id'])
             self._move_external_id_mitre_resource(technique)
 
 
@@ -730,38 +716,18 @@ class WazuhDBQueryMitreGroups(WazuhDBQueryMitre):
     def _filter_status(self, status_filter):
         pass
 
-    def _execute_data_query(self):
-        """Add the software, techniques and references related to each group."""
-        super()._execute_data_query()
-
-        group_ids = set()
-        for group in self._data:
-            group_ids.add(group['id'])
-
-        with WazuhDBQueryMitreRelationalUse(filters={'target_type': 'software', 'source_type': 'group'},
-                                            select=['source_id', 'target_id']) as mitre_relational_query:
-            software = mitre_relational_query.run()
-
-        with WazuhDBQueryMitreRelationalUse(filters={'target_type': 'technique', 'source_type': 'group'},
-                                            select=['source_id', 'target_id'],
-                                            request_slice=RELATIONAL_REQUEST_SLICE_TECHNIQUE_GROUPS) \
-                as mitre_relational_query:
-            techniques = mitre_relational_query.run()
-
-        with WazuhDBQueryMitreReferences(limit=None, filters={'type': 'group'},
-                                         select=SELECT_FIELDS_REFERENCES) as mitre_references_query:
-            references = mitre_references_query.run()
-
-        references_no_id = copy.deepcopy(references)
-        for row in references_no_id['items']:
-            row.pop('id')
+    def _add_relations(self, relations: dict):
+        """Add the software, techniques and references related to each group.
 
+        Parameters
+        ----------
+        relations : dict
+            Relationships between MITRE items, as returned by `load_mitre_relations`.
+        """
         for group in self._data:
-            group['software'] = software.get(group['id'], list())
-            group['techniques'] = techniques.get(group['id'], list())
-            group['references'] = [row_no_id for row, row_no_id in
-                                   zip(references['items'], references_no_id['items']) if
-                                   row['id'] == group['id']]
+            group['software'] = list(relations['group_software'].get(group['id'], []))
+            group['techniques'] = list(relations['group_techniques'].get(group['id'], []))
+            group['references'] = get_item_references(relations, group['id'])
             self._move_external_id_mitre_resource(group)
 
 
@@ -826,41 +792,204 @@ class WazuhDBQueryMitreSoftware(WazuhDBQueryMitre):
     def _filter_status(self, status_filter):
         pass
 
-    def _execute_data_query(self):
-        """Add the groups, techniques and references related to each software."""
-        super()._execute_data_query()
+    def _add_relations(self, relations: dict):
+        """Add the groups, techniques and references related to each software.
 
-        software_ids = set()
-        for group in self._data:
-            software_ids.add(group['id'])
+        Parameters
+        ----------
+        relations : dict
+            Relationships between MITRE items, as returned by `load_mitre_relations`.
+        """
+        for software in self._data:
+            software['groups'] = list(relations['software_groups'].get(software['id'], []))
+            software['techniques'] = list(relations['software_techniques'].get(software['id'], []))
+            software['references'] = get_item_references(relations, software['id'])
+            self._move_external_id_mitre_resource(software)
 
-        with WazuhDBQueryMitreRelationalUse(filters={'target_type': 'software', 'source_type': 'group'},
-                                            dict_key='target_id',
-                                            select=['source_id', 'target_id']) as mitre_relational_query:
-            groups = mitre_relational_query.run()
 
-        with WazuhDBQueryMitreRelationalUse(filters={'target_type': 'technique', 'source_type': 'software'},
-                                            select=['source_id', 'target_id']) as mitre_relational_query:
-            techniques = mitre_relational_query.run()
+# Resources loaded in the MITRE catalog
+MITRE_RESOURCES = (WazuhDBQueryMitreMitigations, WazuhDBQueryMitreReferences, WazuhDBQueryMitreTactics,
+                   WazuhDBQueryMitreTechniques, WazuhDBQueryMitreGroups, WazuhDBQueryMitreSoftware)
 
-        with WazuhDBQueryMitreReferences(limit=None, filters={'type': 'software'},
-                                         select=SELECT_FIELDS_REFERENCES) as mitre_references_query:
-            references = mitre_references_query.run()
 
-        references_no_id = copy.deepcopy(references)
-        for row in references_no_id['items']:
-            row.pop('id')
+def _get_table_rows(table: str, fields: list, default_sort_field: str,
+                    request_slice: int = DEFAULT_REQUEST_SLICE) -> list:
+    """Get every row of a MITRE table.
 
-        for software in self._data:
-            software['groups'] = groups.get(software['id'], list())
-            software['techniques'] = techniques.get(software['id'], list())
-            software['references'] = [row_no_id for row, row_no_id in
-                                      zip(references['items'], references_no_id['items']) if
-                                      row['id'] == software['id']]
-            self._move_external_id_mitre_resource(software)
+    Parameters
+    ----------
+    table : str
+        Name of the table.
+    fields : list
+        Fields to return.
+    default_sort_field : str
+        Field to sort the rows by.
+    request_slice : int
+        Max limit used in the WazuhDBBacked backend object.
+
+    Returns
+    -------
+    list
+        Rows of the table.
+    """
+    with WazuhDBQueryMitre(table=table, fields={field: field for field in fields}, min_select_fields=set(fields),
+                           default_sort_field=default_sort_field, limit=None,
+                           request_slice=request_slice) as db_query:
+        return db_query.run()['items']
+
+
+def load_mitre_relations() -> dict:
+    """Load the relationships between MITRE items running a single query per relational table.
+
+    Returns
+    -------
+    dict
+        Adjacency maps named `<source>_<targets>` (e.g. `technique_tactics`), which map each item ID to the sorted list
+        of related IDs. The `references` and `platforms` maps contain the references (without ID) and the platforms of
+        each item.
+    """
+    relations = {name: defaultdict(list) for name in RELATION_NAMES}
+
+    for row in _get_table_rows('phase', ['tactic_id', 'tech_id'], 'tactic_id'):
+        relations['tactic_techniques'][row['tactic_id']].append(row['tech_id'])
+        relations['technique_tactics'][row['tech_id']].append(row['tactic_id'])
+
+    for row in _get_table_rows('mitigate', ['source_id', 'target_id'], 'source_id'):
+        relations['mitigation_techniques'][row['source_id']].append(row['target_id'])
+        relations['technique_mitigations'][row['target_id']].append(row['source_id'])
+
+    for row in _get_table_rows('use', ['source_id', 'source_type', 'target_id', 'target_type'], 'source_id',
+                               request_slice=RELATIONAL_REQUEST_SLICE_TECHNIQUE_GROUPS):
+        try:
+            source_relation, target_relation = USE_RELATIONS[(row['source_type'], row['target_type'])]
+        except KeyError:
+            continue
+        relations[source_relation][row['source_id']].append(row['target_id'])
+        relations[target_relation][row['target_id']].append(row['source_id'])
+
+    relations = {name: {item_id: sorted(related_ids) for item_id, related_ids in adjacency.items()}
+                 for name, adjacency in relations.items()}
+
+    relations['references'] = defaultdict(list)
+    with WazuhDBQueryMitreReferences(limit=None, select=SELECT_FIELDS_REFERENCES) as mitre_references_query:
+        for row in mitre_references_query.run()['items']:
+            relations['references'][row.pop('id')].append(row)
+
+    relations['platforms'] = defaultdict(list)
+    for row in _get_table_rows('platform', ['id', 'platform'], 'id'):
+        relations['platforms'][row['id']].append(row['platform'])
+
+    relations['references'] = dict(relations['references'])
+    relations['platforms'] = dict(relations['platforms'])
+
+    return relations
+
+
+def get_item_references(relations: dict, item_id: str) -> list:
+    """Get a copy of the references of a MITRE item, so it can be modified without changing the relationships.
+
+    Parameters
+    ----------
+    relations : dict
+        Relationships between MITRE items, as returned by `load_mitre_relations`.
+    item_id : str
+        ID of the MITRE item.
+
+    Returns
+    -------
+    list
+        References of the item.
+    """
+    return [dict(reference) for reference in relations['references'].get(item_id, [])]
+
+
+class MitreCatalog:
+    """In-memory copy of the MITRE database.
+
+    Every resource is loaded once with its relationships already joined. The catalog is loaded again when the
+    modification time of the MITRE database changes.
+    """
+
+    def __init__(self, db_path: str = MITRE_DB_PATH):
+        """Class constructor.
+
+        Parameters
+        ----------
+        db_path : str
+            Path of the MITRE database, used to detect changes.
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Empty the catalog, so it is loaded again the next time it is used."""
+        self._loaded = False
+        self._db_mtime = None
+        self.resources = {}
+        self.relations = {}
+
+    def _get_db_mtime(self) -> Union[int, None]:
+        """Get the modification time of the MITRE database.
+
+        Returns
+        -------
+        int or None
+            Modification time in nanoseconds or None if the database could not be found.
+        """
+        try:
+            return os.stat(self.db_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self):
+        """Load every MITRE resource. The current content is only replaced once everything has been loaded."""
+        relations = load_mitre_relations()
+        resources = {}
+
+        for mitre_class in MITRE_RESOURCES:
+            db_query = mitre_class(limit=None)
+            db_query.relations = relations
+            info = {'allowed_fields': set(db_query.fields.keys()).union(db_query.relation_fields).union(
+                db_query.extra_fields), 'min_select_fields': set(db_query.min_select_fields)}
+            data = db_query.run()
+            resources[mitre_class] = (info, data)
+
+        self.resources = resources
+        self.relations = relations
+
+    def refresh(self):
+        """Load the catalog if it is empty or the MITRE database has changed since it was loaded."""
+        db_mtime = self._get_db_mtime()
+        if self._loaded and db_mtime == self._db_mtime:
+            return
+
+        with self._lock:
+            if not self._loaded or db_mtime != self._db_mtime:
+                self._load()
+                self._db_mtime = db_mtime
+                self._loaded = True
+
+    def get_items(self, mitre_class: callable) -> tuple:
+        """Get the items of a MITRE resource.
+
+        Parameters
+        ----------
+        mitre_class : callable
+            WazuhDBQueryMitre class of the resource.
+
+        Returns
+        -------
+        tuple
+            Dictionary with the allowed and minimum select fields, and dictionary with the items.
+        """
+        self.refresh()
+        return self.resources[mitre_class]
+
+
+mitre_catalog = MitreCatalog()
 
 
-@lru_cache(maxsize=None)
 def get_mitre_items(mitre_class: callable) -> tuple:
     """This function loads the MITRE data in order to speed up the use of the Framework function.
     It also provides information about the min_select_fields for the select parameter and the
@@ -876,14 +1005,7 @@ def get_mitre_items(mitre_class: callable) -> tuple:
     tuple
         Tuple containing a dictionary with fields information, and a dictionary with the items obtained.
     """
-    info = {}
-    db_query = mitre_class(limit=None)
-    info['allowed_fields'] = \
-        set(db_query.fields.keys()).union(set(db_query.relation_fields)).union(db_query.extra_fields)
-    info['min_select_fields'] = set(db_query.min_select_fields)
-    data = db_query.run()
-
-    return info, data
+    return mitre_catalog.get_items(mitre_class)
 
 
 def get_results_with_select(mitre_class: callable, filters: str, select: list, offset: int, limit: int, sort_by: dict,
@@ -2,9 +2,13 @@
 # Created by Wazuh, Inc. <info@wazuh.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GP
 
+import threading
+import time
+from collections import Counter, defaultdict
 from json import dumps, loads
 
 from wazuh.core import common
+from wazuh.core.agent import WazuhDBQueryAgents
 from wazuh.core.exception import WazuhInternalError
 from wazuh.core.utils import WazuhDBQuery, WazuhDBBackend, get_date_from_timestamp
 from wazuh.core.wazuh_socket import WazuhSocket
@@ -13,6 +17,12 @@ tasks_fields = {'task_id': 'task_id', 'agent_id': 'agent_id', 'node': 'node', 'm
                 'command': 'command', 'create_time': 'create_time', 'last_update_time': 'last_update_time',
                 'status': 'status', 'error_message': 'error_message'}
 
+# Statuses of the agent upgrade tasks, as stored by the task manager
+UPGRADE_TASK_STATUSES = ('Pending', 'In progress', 'Done', 'Failed', 'Cancelled', 'Timeout', 'Legacy')
+
+# Seconds between full reloads of the upgrade progress, which also drop the tasks deleted by the task manager
+UPGRADE_PROGRESS_RELOAD_INTERVAL = 300
+
 
 class WazuhDBQueryTask(WazuhDBQuery):
 
@@ -126,3 +136,168 @@ def send_to_tasks_socket(command: dict) -> str:
     s.close()
 
     return data
+
+
+class UpgradeProgress:
+    """In-memory counts of the agent upgrade tasks by status, node and agent version.
+
+    The tasks are loaded from wazuh-db once. Afterwards, only the tasks created or updated since the previous refresh
+    are read, and the counts are updated with the status changes of those tasks. Every `reload_interval` seconds the
+    tasks are loaded again from scratch.
+    """
+
+    def __init__(self, reload_interval: int = UPGRADE_PROGRESS_RELOAD_INTERVAL):
+        """Class constructor.
+
+        Parameters
+        ----------
+        reload_interval : int
+            Seconds between full reloads of the tasks.
+        """
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        """Discard all the tracked tasks."""
+        self._tasks = {}
+        self._status = Counter()
+        self._nodes = defaultdict(Counter)
+        self._agent_versions = defaultdict(Counter)
+        self._last_task_id = 0
+        self._last_update_time = 0
+        self._last_reload = None
+
+    @staticmethod
+    def _load_changes(last_task_id: int, since: int) -> list:
+        """Read the upgrade tasks created after a task ID or updated since a timestamp.
+
+        Parameters
+        ----------
+        last_task_id : int
+            Highest task ID already read.
+        since : int
+            Timestamp of the last update already read.
+
+        Returns
+        -------
+        list
+            Tasks with their ID, agent ID, node, status and last update time.
+        """
+        backend = WazuhDBBackend(query_format='task')
+        try:
+            return backend.execute("SELECT task_id, agent_id, node, status, last_update_time FROM tasks "
+                                   "WHERE module = 'upgrade_module' AND command IN ('upgrade', 'upgrade_custom') "
+                                   "AND (task_id > :last_task_id OR last_update_time >= :since)",
+                                   {'last_task_id': last_task_id, 'since': since})
+        finally:
+            backend.close_connection()
+
+    @staticmethod
+    def _load_versions(agent_list: list) -> dict:
+        """Read the version reported by a list of agents.
+
+        Parameters
+        ----------
+        agent_list : list
+            List of agent IDs.
+
+        Returns
+        -------
+        dict
+            Agent version by agent ID.
+        """
+        with WazuhDBQueryAgents(limit=None, select=['version'], filters={'rbac_ids': agent_list},
+                                rbac_negate=False, count=False) as db_query:
+            data = db_query.run()
+
+        return {item['id']: item.get('version', 'unknown') for item in data['items']}
+
+    def apply(self, task_id: int, node: str, version: str, status: str) -> bool:
+        """Update the counts with the status of a task.
+
+        Parameters
+        ----------
+        task_id : int
+            Task ID.
+        node : str
+            Node where the task was created.
+        version : str
+            Version of the agent.
+        status : str
+            Current status of the task.
+
+        Returns
+        -------
+        bool
+            Whether the counts changed.
+        """
+        previous = self._tasks.get(task_id)
+        current = (node, version, status)
+        if previous == current:
+            return False
+
+        if previous:
+            self._status[previous[2]] -= 1
+            self._nodes[previous[0]][previous[2]] -= 1
+            self._agent_versions[previous[1]][previous[2]] -= 1
+
+        self._tasks[task_id] = current
+        self._status[status] += 1
+        self._nodes[node][status] += 1
+        self._agent_versions[version][status] += 1
+
+        return True
+
+    def refresh(self) -> bool:
+        """Read the tasks changed since the previous refresh and update the counts.
+
+        Returns
+        -------
+        bool
+            Whether the counts changed.
+        """
+        with self._lock:
+            if self._last_reload is None or time.monotonic() - self._last_reload > self.reload_interval:
+                self._reset()
+                self._last_reload = time.monotonic()
+
+            tasks = self._load_changes(self._last_task_id, self._last_update_time)
+
+            # The version of the agents changes once they are upgraded, so it is read again for every changed task
+            changed_agents = {str(task['agent_id']).zfill(3) for task in tasks}
+            versions = self._load_versions(list(changed_agents)) if changed_agents else {}
+
+            changed = False
+            for task in tasks:
+                agent_id = str(task['agent_id']).zfill(3)
+                changed |= self.apply(task['task_id'], task['node'], versions.get(agent_id, 'unknown'),
+                                      task['status'])
+                self._last_task_id = max(self._last_task_id, task['task_id'])
+                self._last_update_time = max(self._last_update_time, task.get('last_update_time') or 0)
+
+            return changed
+
+    def summary(self) -> dict:
+        """Get the counts of the upgrade tasks.
+
+        Returns
+        -------
+        dict
+            Total number of tasks and number of tasks by status, by status and node and by status and agent version.
+        """
+
+        def status_counts(counter: Counter) -> dict:
+            return {status: counter[status] for status in UPGRADE_TASK_STATUSES}
+
+        with self._lock:
+            return {'total': len(self._tasks),
+                    'status': status_counts(self._status),
+                    'nodes': {node: status_counts(counter) for node, counter in sorted(self._nodes.items())
+                              if sum(counter.values())},
+                    'versions': {version: status_counts(counter)
+                                 for version, counter in sorted(self._agent_versions.items())
+                                 if sum(counter.values())}}
+
+
+upgrade_progress = UpgradeProgress()
@@ -3,11 +3,12 @@
 # Created by Wazuh, Inc. <info@wazuh.com>.
 # This program is a free software; you can redistribute it and/or modify it under the terms of GPLv2
 
+import json
 import os
 import sqlite3
 import sys
 from copy import copy
-from unittest.mock import patch, mock_open, call
+from unittest.mock import patch, mock_open, call, MagicMock
 
 import pytest
 
@@ -431,6 +432,69 @@ def test_WazuhDBQueryMultigroups_get_total_items(mock_socket_conn, send_mock):
     assert 'GROUP BY a.id' in query_multigroups.query, 'Query returned does not match the expected one'
 
 
+@patch('wazuh.core.wdb.WazuhDBConnection._send', side_effect=send_msg_to_wdb)
+@patch('socket.socket.connect')
+def test_AgentsSummaryCache_get_agents(mock_socket_conn, send_mock):
+    """Check that the agents summary is loaded once from wazuh-db and reloaded when it expires or is invalidated."""
+    summary_cache = AgentsSummaryCache(ttl=10)
+    with patch('wazuh.core.agent.time.monotonic', return_value=100):
+        agents = summary_cache.get_agents()
+        assert '000' not in agents
+        assert agents['001'] == {'status': 'active', 'group_config_status': 'synced', 'os.name': 'Ubuntu',
+                                 'os.platform': 'ubuntu', 'os.version': '18.04.1 LTS', 'version': 'Wazuh v4.2.0',
+                                 'node_name': 'node01'}
+        load_calls = send_mock.call_count
+        summary_cache.get_agents()
+        assert send_mock.call_count == load_calls
+
+    with patch('wazuh.core.agent.time.monotonic', return_value=111):
+        summary_cache.get_agents()
+        assert send_mock.call_count == 2 * load_calls
+
+        summary_cache.invalidate()
+        summary_cache.get_agents()
+        assert send_mock.call_count == 3 * load_calls
+
+
+@patch('wazuh.core.wdb.WazuhDBConnection._send', side_effect=send_msg_to_wdb)
+@patch('socket.socket.connect')
+def test_AgentsSummaryCache_update_agents_info(mock_socket_conn, send_mock):
+    """Check that agent-info chunks update the cached agents and that invalid chunks invalidate the summary."""
+    summary_cache = AgentsSummaryCache()
+    # Nothing is updated until the summary is loaded
+    summary_cache.update_agents_info(['[{"id": 1, "connection_status": "disconnected"}]'])
+    assert summary_cache._agents == {}
+
+    summary_cache.get_agents()
+    summary_cache.update_agents_info(['[{"id": 1, "connection_status": "disconnected", "version": "Wazuh v4.0.0"}, '
+                                      '{"id": 999, "connection_status": "active"}]'])
+    assert summary_cache._agents['001']['status'] == 'disconnected'
+    assert summary_cache._agents['001']['version'] == 'Wazuh v4.0.0'
+    assert '999' not in summary_cache._agents
+    assert summary_cache.get_status_summary(['001'])['connection']['disconnected'] == 1
+
+    summary_cache.update_agents_info(['not a json'])
+    assert summary_cache._last_update is None
+
+
+@patch('wazuh.core.wdb.WazuhDBConnection._send', side_effect=send_msg_to_wdb)
+@patch('socket.socket.connect')
+def test_AgentsSummaryCache_summaries(mock_socket_conn, send_mock):
+    """Check the summaries computed from the cached agents."""
+    summary_cache = AgentsSummaryCache()
+    assert summary_cache.get_status_summary([]) == {
+        'connection': {'active': 0, 'disconnected': 0, 'never_connected': 0, 'pending': 0, 'total': 0},
+        'configuration': {'synced': 0, 'not_synced': 0, 'total': 0}}
+    send_mock.assert_not_called()
+
+    assert summary_cache.get_status_summary(['001', '002', '005']) == {
+        'connection': {'active': 2, 'disconnected': 1, 'never_connected': 0, 'pending': 0, 'total': 3},
+        'configuration': {'synced': 2, 'not_synced': 1, 'total': 3}}
+    assert summary_cache.get_distinct_values('os.platform', ['001', '002', '005']) == ['ubuntu']
+    assert summary_cache.get_distinct(['status'], ['001', '002', '005']) == [{'status': 'active', 'count': 2},
+                                                                           {'status': 'disconnected', 'count': 1}]
+
+
 @pytest.mark.parametrize('id, ip, name, key', [
     ('1', '127.0.0.1', 'test_agent', 'b3650e11eba2f27er4d160c69de533ee7eed6016fga85ba2455d53a90927747D'),
 ])
@@ -653,6 +717,33 @@ def test_agent_remove_authd(mock_wazuh_socket):
     mock_wazuh_socket.return_value.close.assert_called_once()
 
 
+@patch('wazuh.core.agent.AUTHD_REMOVE_CHUNK_SIZE', new=2)
+@patch('wazuh.core.agent.get_manager_status', return_value={'wazuh-authd': 'running'})
+@patch('wazuh.core.agent.WazuhSocketJSON')
+def test_agent_remove_agents(mock_wazuh_socket, mock_status):
+    """Tests if method remove_agents() sends the agents to authd in chunks and returns the ones that failed."""
+    mock_wazuh_socket.return_value.receive.side_effect = [
+        {'removed': ['001'], 'failed': [{'id': '002', 'error': 9011, 'message': 'Agent ID not found'}]},
+        {'removed': ['003'], 'failed': []}
+    ]
+
+    failed = Agent.remove_agents(['001', '2', '003'], purge=True)
+
+    assert [c.args[0] for c in mock_wazuh_socket.return_value.send.call_args_list] == [
+        {"function": "remove", "arguments": {"ids": ['001', '002'], "purge": True}},
+        {"function": "remove", "arguments": {"ids": ['003'], "purge": True}}]
+    assert mock_wazuh_socket.return_value.close.call_count == 2
+    assert list(failed) == ['002']
+    assert failed['002'].code == 9011
+
+
+@patch('wazuh.core.agent.get_manager_status', return_value={'wazuh-authd': 'stopped'})
+def test_agent_remove_agents_ko(mock_status):
+    """Tests if method remove_agents() raises expected exception"""
+    with pytest.raises(WazuhError, match='.* 1726 .*'):
+        Agent.remove_agents(['001'])
+
+
 @pytest.mark.parametrize("authd_status", [
     'running',
     'stopped'
@@ -1112,6 +1203,87 @@ def test_agent_set_agent_group_relationship(socket_connect_mock, send_mock, remo
                                                                   'relationship'
 
 
+@patch('wazuh.core.agent.WazuhDBQueryAgents')
+def test_agent_get_agents_groups(query_mock):
+    """Test if get_agents_groups() reads the groups of all the agents with a single query."""
+    query_mock.return_value.__enter__.return_value.run.return_value = {
+        'items': [{'id': '001', 'group': ['default', 'group1']}, {'id': '002'}]}
+
+    assert Agent.get_agents_groups(['001', '002']) == {'001': ['default', 'group1'], '002': []}
+    query_mock.assert_called_once_with(limit=None, select=['group'], filters={'rbac_ids': ['001', '002']},
+                                       rbac_negate=False, count=False)
+    assert Agent.get_agents_groups([]) == {}
+    query_mock.assert_called_once()
+
+
+@pytest.mark.parametrize('remove, override, expected_mode', [
+    (False, False, 'append'),
+    (True, False, 'remove'),
+    (False, True, 'override')
+])
+@patch('wazuh.core.agent.common.MAX_QUERY_FILTERS_RESERVED_SIZE', 200)
+@patch('wazuh.core.agent.WazuhDBConnection.send')
+@patch('socket.socket.connect')
+def test_agent_set_agents_groups_relationship(socket_connect_mock, send_mock, remove, override, expected_mode):
+    """Test if set_agents_groups_relationship() packs the agents into size-bounded set-agent-groups commands."""
+    agents_groups = {str(i).zfill(3): ['group1'] for i in range(1, 11)}
+
+    assert Agent.set_agents_groups_relationship(agents_groups, remove=remove, override=override) == {}
+
+    sent_agents = []
+    for call in send_mock.call_args_list:
+        command = call.args[0]
+        assert len(command) <= 200
+        assert command.startswith('global set-agent-groups ')
+        payload = json.loads(command.split(' ', 2)[2])
+        assert payload['mode'] == expected_mode
+        assert payload['sync_status'] == 'syncreq'
+        sent_agents.extend(item['id'] for item in payload['data'])
+    assert send_mock.call_count > 1
+    assert sent_agents == list(range(1, 11))
+
+
+@pytest.mark.parametrize('remove, override, current_groups, expected_failed', [
+    (False, False, {'001': ['default', 'group1'], '002': ['default']}, {'002': ['group1']}),
+    (False, True, {'001': ['group1'], '002': ['default', 'group1']}, {'002': ['group1']}),
+    (True, False, {'001': ['default'], '002': ['default', 'group1']}, {'002': ['group1']}),
+])
+@patch('wazuh.core.agent.Agent.get_agents_groups')
+@patch('wazuh.core.agent.WazuhDBConnection.send', side_effect=WazuhError(2003))
+@patch('socket.socket.connect')
+def test_agent_set_agents_groups_relationship_ko(socket_connect_mock, send_mock, get_groups_mock, remove, override,
+                                                 current_groups, expected_failed):
+    """Test if set_agents_groups_relationship() finds out which agents were not updated when a command fails."""
+    get_groups_mock.return_value = current_groups
+
+    failed = Agent.set_agents_groups_relationship({'001': ['group1'], '002': ['group1']}, remove=remove,
+                                                  override=override)
+
+    get_groups_mock.assert_called_once_with(['001', '002'])
+    assert {agent_id: groups for agent_id, (groups, _) in failed.items()} == expected_failed
+    assert all(error.code == 2003 for _, error in failed.values())
+
+
+@pytest.mark.parametrize('group_id, agent_groups, expected_groups', [
+    ('group1', {'default', 'group1'}, {'default'}),
+    ('default', {'default', 'group1'}, {'group1'}),
+    ('group1', {'group1'}, {'default'}),
+])
+def test_agent_check_group_unassignment(group_id, agent_groups, expected_groups):
+    """Test if check_group_unassignment() returns the groups the agent would have after the unassignment."""
+    assert Agent.check_group_unassignment(group_id, agent_groups) == expected_groups
+
+
+@pytest.mark.parametrize('group_id, agent_groups, expected_code', [
+    ('group1', {'default'}, 1734),
+    ('default', {'default'}, 1745),
+])
+def test_agent_check_group_unassignment_ko(group_id, agent_groups, expected_code):
+    """Test if check_group_unassignment() raises expected exceptions."""
+    with pytest.raises(WazuhError, match=f'.* {expected_code} .*'):
+        Agent.check_group_unassignment(group_id, agent_groups)
+
+
 @patch('socket.socket.connect', side_effect=PermissionError)
 def test_agent_set_agent_group_relationship_ko(socket_connect_mock):
     """Test if set_agent_group_relationship() raises expected exception."""
@@ -1261,6 +1433,22 @@ def test_send_restart_command(wq_mock, wq_send_msg, agents_list, versions_list):
             wq_send_msg.assert_called_with(expected_msg, agent_id)
 
 
+def test_send_restart_commands():
+    """Test that send_restart_commands sends each restart message once per group of agents."""
+    mock_wq = MagicMock()
+    mock_wq.send_msg_to_agents.side_effect = lambda msg, agent_list, **kwargs: (
+        (agent_id, msg) for agent_id in agent_list)
+    agents = [{'id': '001', 'version': 'Wazuh v4.2.0'}, {'id': '002', 'version': 'Wazuh v4.0.0'},
+              {'id': '003', 'version': 'Wazuh v4.2.0'}]
+
+    result = dict(send_restart_commands(agents, mock_wq, rate_limit=10))
+
+    assert result == {'001': WazuhQueue.RESTART_AGENTS_JSON, '002': WazuhQueue.RESTART_AGENTS,
+                      '003': WazuhQueue.RESTART_AGENTS_JSON}
+    assert mock_wq.send_msg_to_agents.call_count == 2
+    mock_wq.send_msg_to_agents.assert_any_call(WazuhQueue.RESTART_AGENTS_JSON, ['001', '003'], rate_limit=10)
+
+
 def test_get_agents_info():
     """Test that get_agents_info() returns expected agent IDs"""
     reset_context_cache()
@@ -1346,46 +1534,82 @@ def test_get_rbac_filters(system_resources, permitted_resources, filters, expect
     assert result == expected_result
 
 
-@pytest.mark.parametrize('eligible_agents, expected_calls, task_manager_error', [
-    ([1, 2, 3, 4],
-     [
-         call(command='test', agents_chunk=[1, 2, 3, 4], wpk_repo=None, version=None, force=None, use_http=None,
-              file_path=None, installer=None, get_result=None)
-     ],
-     False),
-    ([i for i in range(16)],
-     [
-         call(command='test', agents_chunk=[i for i in range(10)], wpk_repo=None, version=None, force=None,
-              use_http=None, file_path=None, installer=None, get_result=None),
-         call(command='test', agents_chunk=[i for i in range(10, 16)], wpk_repo=None, version=None, force=None,
-              use_http=None, file_path=None, installer=None, get_result=None)
-     ],
-     False),
-    ([i for i in range(13)],
-     [
-         call(command='test', agents_chunk=[i for i in range(5)], wpk_repo=None, version=None, force=None,
-              use_http=None, file_path=None, installer=None, get_result=None),
-         call(command='test', agents_chunk=[i for i in range(5, 10)], wpk_repo=None, version=None, force=None,
-              use_http=None, file_path=None, installer=None, get_result=None),
-         call(command='test', agents_chunk=[i for i in range(10, 13)], wpk_repo=None, version=None, force=None,
-              use_http=None, file_path=None, installer=None, get_result=None)
-     ],
-     True)
-])
-@patch('wazuh.core.agent.core_upgrade_agents')
-def test_create_upgrade_tasks(mock_upgrade, eligible_agents, expected_calls, task_manager_error):
-    """Test that the create_upgrade_tasks function and its recursive behaviour work properly.
+class FakeUpgradeSocket:
+    """Upgrade socket that answers the pipelined requests in order."""
+
+    def __init__(self, max_agents=None):
+        self.requests = []
+        self.answered = 0
+        self.max_in_flight = 0
+        self.max_agents = max_agents
+
+    def send(self, msg):
+        self.requests.append(json.loads(msg.decode())['parameters']['agents'])
+        self.max_in_flight = max(self.max_in_flight, len(self.requests) - self.answered)
+
+    def receive(self):
+        agents = self.requests[self.answered]
+        self.answered += 1
+        if self.max_agents and len(agents) > self.max_agents:
+            data = [{'error': 4, 'message': 'Task manager error', 'agent': agent} for agent in agents]
+        else:
+            data = [{'error': 0, 'message': 'Success', 'agent': agent, 'task_id': agent,
+                     'create_time': '2022/01/01 00:00:00'} for agent in agents]
+        return json.dumps({'error': 0, 'data': data, 'message': 'Success'}).encode()
+
+
+@pytest.mark.parametrize('max_agents', [None, 3])
+@patch('wazuh.core.agent.WazuhSocket')
+def test_upgrade_orchestrator_run(mock_socket, max_agents):
+    """Test that the upgrade orchestrator pipelines the chunks through a single connection.
 
     Parameters
     ----------
-    eligible_agents : list
-        List of eligible agents used in the create_upgrade_tasks function.
-    expected_calls : list
-        List of calls expected for the core_upgrade_agents function.
-    task_manager_error : bool
-        Boolean variable that indicates whether the mocked function returns a task communication error or not.
+    max_agents : int
+        Maximum number of agents per request accepted before returning a task manager communication error.
     """
-    mock_upgrade.side_effect = [{'data': [{'error': 0 if not task_manager_error else 4}]},
-                                {'data': [{'error': 0}]}, {'data': [{'error': 0}]}, {'data': [{'error': 0}]}]
-    create_upgrade_tasks(eligible_agents=eligible_agents, chunk_size=10, command='test')
-    mock_upgrade.assert_has_calls(expected_calls, any_order=False)
+    upgrade_socket = FakeUpgradeSocket(max_agents=max_agents)
+    mock_socket.return_value.__enter__.return_value = upgrade_socket
+    orchestrator = UpgradeOrchestrator(command='upgrade', chunk_size=5, max_in_flight=2, version='4.4.0')
+
+    results = list(orchestrator.run(list(range(16))))
+
+    mock_socket.assert_called_once_with(common.UPGRADE_SOCKET)
+    assert upgrade_socket.max_in_flight == 2
+    assert sorted(result['agent'] for result in results) == list(range(16))
+    assert all(result['error'] == 0 for result in results)
+    assert results[0]['create_time'] == '2022-01-01T00:00:00Z'
+    if max_agents:
+        assert orchestrator.chunk_size == 2
+        assert all(len(agents) <= 2 for agents in upgrade_socket.requests[4:])
+    else:
+        assert upgrade_socket.requests == [list(range(5)), list(range(5, 10)), list(range(10, 15)), [15]]
+
+
+@patch('wazuh.core.agent.WazuhSocket')
+def test_upgrade_orchestrator_run_first_response(mock_socket):
+    """Test that no other chunk is sent until the results of the first response have been consumed."""
+    upgrade_socket = FakeUpgradeSocket()
+    mock_socket.return_value.__enter__.return_value = upgrade_socket
+    orchestrator = UpgradeOrchestrator(command='upgrade', chunk_size=5, max_in_flight=4, version='4.4.0')
+
+    results = orchestrator.run(list(range(20)))
+    assert next(results)['agent'] == 0
+    assert upgrade_socket.requests == [list(range(5))]
+
+    # A caller raising on the first response stops the operation
+    results.close()
+    assert upgrade_socket.requests == [list(range(5))]
+
+
+def test_upgrade_orchestrator_chunk_size():
+    """Test that the chunk size is adapted to the bytes per agent measured in the responses."""
+    orchestrator = UpgradeOrchestrator(command='upgrade_result', chunk_size=100, response_budget=1000, get_result=True)
+    assert orchestrator.next_chunk_size() == 100
+
+    orchestrator.bytes_per_agent = 30
+    assert orchestrator.next_chunk_size() == 33
+
+    orchestrator.bytes_per_agent = 5000
+    assert orchestrator.next_chunk_size() == 1
+    assert json.loads(orchestrator.create_message([1, 2]))['parameters'] == {'agents': [1, 2]}
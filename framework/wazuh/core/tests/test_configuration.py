@@ -139,6 +139,7 @@ def test_rootkit_trojans2json():
 
 
 def test_get_ossec_conf():
+    configuration.clear_configuration_cache()
     with patch('wazuh.core.configuration.load_wazuh_xml', return_value=Exception):
         with pytest.raises(WazuhError, match=".* 1101 .*"):
             configuration.get_ossec_conf()
@@ -252,6 +253,41 @@ def test_get_file_conf():
                                         return_format='xml')
 
 
+def test_get_cached_file(tmpdir):
+    """Check that configuration files are only parsed again when they change or the cache is cleared."""
+    conf_file = tmpdir.join('ossec.conf')
+    conf_file.write('<ossec_config></ossec_config>')
+    parser = MagicMock(__name__='parser', side_effect=lambda path: {'path': path})
+
+    assert configuration._get_cached_file(str(conf_file), parser) == {'path': str(conf_file)}
+    configuration._get_cached_file(str(conf_file), parser)
+    parser.assert_called_once_with(str(conf_file))
+
+    conf_file.write('<ossec_config><cluster></cluster></ossec_config>')
+    configuration._get_cached_file(str(conf_file), parser)
+    assert parser.call_count == 2
+
+    configuration.clear_configuration_cache(str(conf_file))
+    configuration._get_cached_file(str(conf_file), parser)
+    assert parser.call_count == 3
+
+    # Files whose status cannot be read are parsed without being cached
+    configuration._get_cached_file(str(tmpdir.join('noexists.conf')), parser)
+    configuration._get_cached_file(str(tmpdir.join('noexists.conf')), parser)
+    assert parser.call_count == 5
+
+
+def test_get_ossec_conf_cached(tmpdir):
+    """Check that the parsed ossec.conf is reused and that returned sections can be modified safely."""
+    conf_file = tmpdir.join('ossec.conf')
+    conf_file.write('<ossec_config><cluster><name>wazuh</name></cluster></ossec_config>')
+
+    with patch('wazuh.core.configuration.load_wazuh_xml', wraps=configuration.load_wazuh_xml) as load_mock:
+        configuration.get_ossec_conf(section='cluster', conf_file=str(conf_file))['cluster']['name'] = 'modified'
+        assert configuration.get_ossec_conf(conf_file=str(conf_file))['cluster']['name'] == 'wazuh'
+        load_mock.assert_called_once_with(str(conf_file))
+
+
 def test_parse_internal_options():
     with patch('wazuh.core.common.INTERNAL_OPTIONS_CONF',
                new=os.path.join(parent_directory, tmp_path, 'configuration/noexists.conf')):
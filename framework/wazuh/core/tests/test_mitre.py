@@ -69,3 +69,43 @@ def test_get_mitre_items(mock_wdb, mitre_wdb_query_class):
         db_query_to_compare.relation_fields).union(db_query_to_compare.extra_fields)
     assert isinstance(info['min_select_fields'], set) and info[
         'min_select_fields'] == db_query_to_compare.min_select_fields
+
+
+@patch('wazuh.core.utils.WazuhDBConnection', return_value=InitWDBSocketMock(sql_schema_file='schema_mitre_test.sql'))
+def test_load_mitre_relations(mock_wdb):
+    """Check that the relationships are loaded in both directions."""
+    technique_id = 'attack-pattern--b63a34e8-0a61-4c97-a23b-bf8a2ed812e2'
+    relations = load_mitre_relations()
+
+    assert set(RELATION_NAMES) | {'references', 'platforms'} == set(relations)
+    assert relations['technique_tactics'][technique_id]
+    for tactic_id in relations['technique_tactics'][technique_id]:
+        assert technique_id in relations['tactic_techniques'][tactic_id]
+    assert relations['platforms'][technique_id] == ['Linux', 'macOS']
+    assert all('id' not in reference for reference in relations['references'][technique_id])
+
+    # The references are copied, so the relationships are not modified through the items
+    references = get_item_references(relations, technique_id)
+    references[0].pop('url')
+    assert all('url' in reference for reference in relations['references'][technique_id])
+
+
+@patch('wazuh.core.utils.WazuhDBConnection', return_value=InitWDBSocketMock(sql_schema_file='schema_mitre_test.sql'))
+def test_MitreCatalog(mock_wdb):
+    """Check that the catalog loads the MITRE items and it is only loaded again when the database changes."""
+    technique_id = 'attack-pattern--b63a34e8-0a61-4c97-a23b-bf8a2ed812e2'
+    catalog = MitreCatalog()
+
+    with patch.object(catalog, '_get_db_mtime', return_value=1):
+        info, data = catalog.get_items(WazuhDBQueryMitreTechniques)
+        technique = next(item for item in data['items'] if item['id'] == technique_id)
+        assert technique['tactics'] == catalog.relations['technique_tactics'][technique_id]
+        assert 'tactics' in info['allowed_fields']
+
+        with patch.object(catalog, '_load') as load_mock:
+            catalog.refresh()
+            load_mock.assert_not_called()
+
+    with patch.object(catalog, '_get_db_mtime', return_value=2), patch.object(catalog, '_load') as load_mock:
+        catalog.refresh()
+        load_mock.assert_called_once()
@@ -105,3 +105,47 @@ def test_wazuh_db_query_task__process_filter(field_name, field_filter, q_filter)
             assert wdbq_task.request[field_filter] == q_filter['value']
         else:
             mock_sup_proc.assert_called()
+
+
+def test_upgrade_progress_refresh():
+    """Check that UpgradeProgress only reads the changed tasks and updates its counts incrementally."""
+    progress = UpgradeProgress()
+    changes = [
+        [{'task_id': 1, 'agent_id': 1, 'node': 'master', 'status': 'Pending', 'last_update_time': None},
+         {'task_id': 2, 'agent_id': 2, 'node': 'worker1', 'status': 'In progress', 'last_update_time': 10}],
+        [{'task_id': 2, 'agent_id': 2, 'node': 'worker1', 'status': 'Done', 'last_update_time': 20}],
+        []
+    ]
+    versions = [{'001': 'Wazuh v4.3.0', '002': 'Wazuh v4.3.0'}, {'002': 'Wazuh v4.4.0'}]
+
+    with patch.object(UpgradeProgress, '_load_changes', side_effect=changes) as mock_changes, \
+            patch.object(UpgradeProgress, '_load_versions', side_effect=versions) as mock_versions:
+        assert progress.refresh()
+        assert progress.refresh()
+        assert not progress.refresh()
+
+    assert [c.args for c in mock_changes.call_args_list] == [(0, 0), (2, 10), (2, 20)]
+    assert mock_versions.call_count == 2
+    summary = progress.summary()
+    assert summary['total'] == 2
+    assert summary['status']['Pending'] == 1 and summary['status']['Done'] == 1
+    assert summary['status']['In progress'] == 0
+    assert summary['nodes']['worker1']['Done'] == 1
+    assert summary['versions'] == {
+        'Wazuh v4.3.0': {status: int(status == 'Pending') for status in UPGRADE_TASK_STATUSES},
+        'Wazuh v4.4.0': {status: int(status == 'Done') for status in UPGRADE_TASK_STATUSES}}
+
+
+def test_upgrade_progress_reload():
+    """Check that UpgradeProgress reloads all the tasks once the reload interval expires."""
+    progress = UpgradeProgress(reload_interval=0)
+    task = {'task_id': 1, 'agent_id': 1, 'node': 'master', 'status': 'Pending', 'last_update_time': 5}
+
+    with patch.object(UpgradeProgress, '_load_changes', side_effect=[[task], []]) as mock_changes, \
+            patch.object(UpgradeProgress, '_load_versions', return_value={'001': 'Wazuh v4.3.0'}), \
+            patch('wazuh.core.task.time.monotonic', side_effect=[0, 1, 2]):
+        progress.refresh()
+        progress.refresh()
+
+    assert mock_changes.call_args.args == (0, 0)
+    assert progress.summary()['total'] == 0
@@ -175,3 +175,46 @@ def test_WazuhQueue_send_msg_to_agent_ko(mock_send, mock_conn, msg, agent_id, ms
         queue.send_msg_to_agent(msg, agent_id, msg_type)
 
     mock_conn.assert_called_once_with('test_path')
+
+
+@pytest.mark.parametrize('msg, msg_type', [
+    ('test_msg', 'ar-message'),
+    ('force_reconnect', None),
+    ('restart-ossec0', None)
+])
+@patch('wazuh.core.wazuh_queue.socket.socket.connect')
+@patch('wazuh.core.wazuh_queue.WazuhQueue._send')
+def test_WazuhQueue_send_msg_to_agents(mock_send, mock_conn, msg, msg_type):
+    """Test that WazuhQueue.send_msg_to_agents sends the same messages as send_msg_to_agent.
+
+    Parameters
+    ----------
+    msg : str
+        Message sent to the agents.
+    msg_type : str
+        String indicating the message type.
+    """
+    agent_list = ['000', '001', '1000']
+    queue = WazuhQueue('test_path')
+
+    results = list(queue.send_msg_to_agents(msg, agent_list, msg_type))
+    bulk_msgs = [c.args[0] for c in mock_send.call_args_list]
+    mock_send.reset_mock()
+    expected = [(agent_id, queue.send_msg_to_agent(msg, agent_id, msg_type)) for agent_id in agent_list]
+
+    assert results == expected
+    assert bulk_msgs == [c.args[0] for c in mock_send.call_args_list]
+
+
+@patch('wazuh.core.wazuh_queue.socket.socket.connect')
+@patch('wazuh.core.wazuh_queue.WazuhQueue._send', side_effect=[None, WazuhException(1011), None])
+@patch('wazuh.core.wazuh_queue.time.sleep')
+def test_WazuhQueue_send_msg_to_agents_ko(mock_sleep, mock_send, mock_conn):
+    """Test that WazuhQueue.send_msg_to_agents reports failed sends and paces the messages."""
+    queue = WazuhQueue('test_path')
+
+    results = list(queue.send_msg_to_agents('force_reconnect', ['001', '002', '003'], rate_limit=2))
+
+    assert [agent_id for agent_id, _ in results] == ['001', '002', '003']
+    assert isinstance(results[1][1], WazuhException) and results[1][1].code == 1014
+    mock_sleep.assert_called_once()
@@ -4,9 +4,11 @@
 
 import json
 import socket
+import time
+from typing import Iterator, Tuple, Union
 
 from wazuh.core.common import origin_module
-from wazuh.core.exception import WazuhInternalError, WazuhError
+from wazuh.core.exception import WazuhInternalError, WazuhError, WazuhException
 from wazuh.core.wazuh_socket import create_wazuh_socket_message
 
 
@@ -55,6 +57,9 @@ class WazuhQueue:
     OS_MAXSTR = 6144  # OS_SIZE_6144
     MAX_MSG_SIZE = OS_MAXSTR + 256
 
+    # Maximum number of messages per second sent by send_msg_to_agents
+    BULK_RATE_LIMIT = 1000
+
     def __init__(self, path):
         self.path = path
         self._connect()
@@ -84,23 +89,9 @@ class WazuhQueue:
     def close(self):
         self.socket.close()
 
-    def send_msg_to_agent(self, msg: str = '', agent_id: str = '', msg_type: str = '') -> str:
-        """Send message to agent.
-
-        Active-response
-          Agents: /var/ossec/queue/alerts/ar
-            - Existing command:
-              - (msg_to_agent) [] NNS 001 restart-ossec0 arg1 arg2 arg3
-              - (msg_to_agent) [] ANN (null) restart-ossec0 arg1 arg2 arg3
-            - Custom command:
-              - (msg_to_agent) [] NNS 001 !test.sh arg1 arg2 arg3
-              - (msg_to_agent) [] ANN (null) !test.sh arg1 arg2 arg3
-          Agents with version >= 4.2.0:
-            - Existing and custom commands:
-              - (msg_to_agent) [] NNS 001 {JSON message}
-          Manager: /var/ossec/queue/alerts/execq
-            - Existing or custom command:
-              - {JSON message}
+    @staticmethod
+    def _build_msg(msg: str = '', agent_id: str = '', msg_type: str = '') -> Tuple[str, str]:
+        """Build the socket message sent to an agent and the message returned to the caller.
 
         Parameters
         ----------
@@ -115,13 +106,11 @@ class WazuhQueue:
         ------
         WazuhInternalError(1012)
             If the message was invalid to queue.
-        WazuhError(1014)
-            If there was an error communicating with socket.
 
         Returns
         -------
-        str
-            Message confirming the message has been sent.
+        tuple
+            Message for the socket and message confirming it has been sent.
         """
         # Variables to check if msg is a non active-response message or a restart message
         msg_is_no_ar = msg in [WazuhQueue.HC_SK_RESTART, WazuhQueue.HC_FORCE_RECONNECT]
@@ -156,6 +145,49 @@ class WazuhQueue:
             else:  # msg == WazuhQueue.RESTART_AGENTS or msg == WazuhQueue.RESTART_AGENTS_JSON
                 ret_msg = "Restarting agent" if agent_id else "Restarting all agents"
 
+        return socket_msg, ret_msg
+
+    def send_msg_to_agent(self, msg: str = '', agent_id: str = '', msg_type: str = '') -> str:
+        """Send message to agent.
+
+        Active-response
+          Agents: /var/ossec/queue/alerts/ar
+            - Existing command:
+              - (msg_to_agent) [] NNS 001 restart-ossec0 arg1 arg2 arg3
+              - (msg_to_agent) [] ANN (null) restart-ossec0 arg1 arg2 arg3
+            - Custom command:
+              - (msg_to_agent) [] NNS 001 !test.sh arg1 arg2 arg3
+              - (msg_to_agent) [] ANN (null) !test.sh arg1 arg2 arg3
+          Agents with version >= 4.2.0:
+            - Existing and custom commands:
+              - (msg_to_agent) [] NNS 001 {JSON message}
+          Manager: /var/ossec/queue/alerts/execq
+            - Existing or custom command:
+              - {JSON message}
+
+        Parameters
+        ----------
+        msg : str
+            Message to be sent to the agent.
+        agent_id : str
+            ID of the agent we want to send the message to.
+        msg_type : str
+            Message type.
+
+        Raises
+        ------
+        WazuhInternalError(1012)
+            If the message was invalid to queue.
+        WazuhError(1014)
+            If there was an error communicating with socket.
+
+        Returns
+        -------
+        str
+            Message confirming the message has been sent.
+        """
+        socket_msg, ret_msg = self._build_msg(msg, agent_id, msg_type)
+
         try:
             # Send message
             self._send(socket_msg.encode())
@@ -164,5 +196,61 @@ class WazuhQueue:
 
         return ret_msg
 
+    def send_msg_to_agents(self, msg: str = '', agent_list: list = None, msg_type: str = '',
+                           rate_limit: int = BULK_RATE_LIMIT) -> Iterator[Tuple[str, Union[str, WazuhException]]]:
+        """Send the same message to several agents.
+
+        The socket message is built once and only the agent ID changes between sends. The sends are paced to
+        `rate_limit` messages per second so that the queue of remoted is not flooded.
+
+        Parameters
+        ----------
+        msg : str
+            Message to be sent to the agents.
+        agent_list : list
+            IDs of the agents we want to send the message to.
+        msg_type : str
+            Message type.
+        rate_limit : int
+            Maximum number of messages sent per second. No limit is applied if it is 0 or None.
+
+        Raises
+        ------
+        WazuhInternalError(1012)
+            If the message was invalid to queue.
+
+        Yields
+        ------
+        tuple
+            Agent ID and the message confirming the message has been sent, or the WazuhError(1014) raised when sending
+            it.
+        """
+        # Use a placeholder ID to split the message around the agent ID
+        placeholder = '\0'
+        template, ret_msg = self._build_msg(msg, placeholder, msg_type)
+        prefix, suffix = (part.encode() for part in template.split(placeholder, 1))
+
+        window_start = time.monotonic()
+        window_sent = 0
+        for agent_id in agent_list or []:
+            if rate_limit and window_sent >= rate_limit:
+                elapsed = time.monotonic() - window_start
+                if elapsed < 1:
+                    time.sleep(1 - elapsed)
+                window_start = time.monotonic()
+                window_sent = 0
+
+            if agent_id == '000':
+                socket_msg = self._build_msg(msg, agent_id, msg_type)[0].encode()
+            else:
+                socket_msg = prefix + agent_id.encode() + suffix
+
+            try:
+                self._send(socket_msg)
+                yield agent_id, ret_msg
+            except WazuhException:
+                yield agent_id, WazuhError(1014, extra_message=f": WazuhQueue socket with path {self.path}")
+            window_sent += 1
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close()
@@ -5,8 +5,8 @@
 import logging
 
 from wazuh.core.common import DATABASE_LIMIT
-from wazuh.core.results import AffectedItemsWazuhResult
-from wazuh.core.task import WazuhDBQueryTask
+from wazuh.core.results import AffectedItemsWazuhResult, WazuhResult
+from wazuh.core.task import WazuhDBQueryTask, upgrade_progress
 from wazuh.rbac.decorators import expose_resources
 
 logger = logging.getLogger('wazuh')
@@ -58,3 +58,19 @@ def get_task_status(filters: dict = None, select: list = None, search: dict = No
     result.total_affected_items = data['totalItems']
 
     return result
+
+
+@expose_resources(actions=["task:status"], resources=["*:*:*"], post_proc_func=None)
+def get_upgrade_summary() -> WazuhResult:
+    """Count the agent upgrade tasks by status, by node and by agent version.
+
+    Only the tasks changed since the previous call are read from the tasks database.
+
+    Returns
+    -------
+    WazuhResult
+        Upgrade tasks counts.
+    """
+    upgrade_progress.refresh()
+
+    return WazuhResult({'data': upgrade_progress.summary()})
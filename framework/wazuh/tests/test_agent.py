@@ -25,12 +25,13 @@ with patch('wazuh.core.common.wazuh_uid'):
 
         from wazuh.agent import add_agent, assign_agents_to_group, create_group, delete_agents, delete_groups, \
             get_agent_conf, get_agent_config, get_agent_groups, get_agents, get_agents_in_group, \
-            get_agents_keys, get_agents_summary_os, get_agents_summary_status, get_agents_sync_group, \
+            get_agents_keys, get_agents_summary_distinct, get_agents_summary_os, get_agents_summary_status, \
+            get_agents_sync_group, \
             get_distinct_agents, get_file_conf, get_full_overview, get_group_files, get_outdated_agents, \
             get_upgrade_result, remove_agent_from_group, remove_agent_from_groups, remove_agents_from_group, \
             restart_agents, upgrade_agents, upload_group_file, restart_agents_by_node, reconnect_agents, \
             ERROR_CODES_UPGRADE_SOCKET_BAD_REQUEST, ERROR_CODES_UPGRADE_SOCKET
-        from wazuh.core.agent import Agent
+        from wazuh.core.agent import Agent, AgentsSummaryCache
         from wazuh import WazuhError, WazuhException, WazuhInternalError
         from wazuh.core.results import WazuhResult, AffectedItemsWazuhResult
         from wazuh.core.tests.test_agent import InitAgent
@@ -189,12 +190,39 @@ def test_agent_get_agents_summary_os(connect_mock, send_mock):
     assert summary.affected_items == ['ubuntu'], f"Expected ['ubuntu'] OS but received '{summary['items']} instead."
 
 
+@pytest.mark.parametrize('fields, expected_items', [
+    (['node_name'], [{'node_name': 'node01', 'count': 3}, {'node_name': 'unknown', 'count': 2}]),
+    (['version'], [{'version': 'Wazuh v3.6.2', 'count': 1}, {'version': 'Wazuh v3.8.2', 'count': 2},
+                   {'version': 'unknown', 'count': 2}]),
+    (['os.name', 'os.platform'], [{'os': {'name': 'Ubuntu', 'platform': 'ubuntu'}, 'count': 3},
+                                  {'os': {'name': 'unknown', 'platform': 'unknown'}, 'count': 2}])
+])
+@patch('wazuh.core.wdb.WazuhDBConnection._send', side_effect=send_msg_to_wdb)
+@patch('socket.socket.connect')
+def test_agent_get_agents_summary_distinct(socket_mock, send_mock, fields, expected_items):
+    """Test `get_agents_summary_distinct` function from agent module.
+
+    Parameters
+    ----------
+    fields : list
+        List of fields to group by.
+    expected_items : list
+        List of expected items.
+    """
+    with patch('wazuh.agent.agents_summary_cache', new=AgentsSummaryCache()):
+        result = get_agents_summary_distinct(agent_list=short_agent_list, fields=fields)
+
+    assert isinstance(result, AffectedItemsWazuhResult), 'The returned object is not an "AffectedItemsWazuhResult".'
+    assert result.affected_items == expected_items
+
+
 @pytest.mark.parametrize('agent_list, expected_items, error_code', [
     (['001', '002'], ['001', '002'], None),
     (['000'], [], 1703),
     (['001', '500'], ['001'], 1701)
 ])
-@patch('wazuh.core.agent.Agent.reconnect')
+@patch('wazuh.agent.WazuhQueue.send_msg_to_agents',
+       side_effect=lambda msg, agent_list, **kwargs: ((agent_id, 'Reconnecting agent') for agent_id in agent_list))
 @patch('wazuh.agent.get_agents_info', return_value=short_agent_list)
 @patch('wazuh.core.wdb.WazuhDBConnection._send', side_effect=send_msg_to_wdb)
 @patch('socket.socket.connect')
@@ -224,7 +252,8 @@ def test_agent_reconnect_agents(socket_mock, send_mock, agents_info_mock, reconn
     (['000'], [], 1703),
     (['001', '500'], ['001'], 1701)
 ])
-@patch('wazuh.agent.send_restart_command')
+@patch('wazuh.agent.send_restart_commands',
+       side_effect=lambda agents, wq: ((agent['id'], 'Restarting agent') for agent in agents))
 @patch('wazuh.agent.get_agents_info', return_value=set(short_agent_list))
 @patch('wazuh.core.wdb.WazuhDBConnection._send', side_effect=send_msg_to_wdb)
 @patch('socket.socket.connect')
@@ -249,11 +278,26 @@ def test_agent_restart_agents(socket_mock, send_mock, agents_info_mock, send_res
         assert code == error_code, f'"{error_code}" code was expected but "{code}" was received.'
 
 
+@patch('wazuh.agent.get_agents_info', return_value=set(short_agent_list))
+@patch('wazuh.core.wdb.WazuhDBConnection._send', side_effect=send_msg_to_wdb)
+@patch('socket.socket.connect')
+def test_agent_restart_agents_send_failed(socket_mock, send_mock, agents_info_mock):
+    """Test that `restart_agents` reports the agents whose restart command could not be sent."""
+    with patch('wazuh.agent.send_restart_commands', return_value=iter([('001', 'Restarting agent'),
+                                                                      ('002', WazuhError(1014))])) as send_restart:
+        result = restart_agents(['001', '002'])
+
+    send_restart.assert_called_once()
+    assert result.affected_items == ['001']
+    assert next(iter(result.failed_items)).code == 1014
+
+
 @pytest.mark.parametrize('agent_list, expected_items, error_code', [
     (['000', '001', '002'], ['001', '002'], 1703),
     (['001', '500'], ['001'], 1701)
 ])
-@patch('wazuh.agent.send_restart_command')
+@patch('wazuh.agent.send_restart_commands',
+       side_effect=lambda agents, wq: ((agent['id'], 'Restarting agent') for agent in agents))
 @patch('wazuh.agent.get_agents_info', return_value=set(short_agent_list))
 @patch('wazuh.core.wdb.WazuhDBConnection._send', side_effect=send_msg_to_wdb)
 @patch('socket.socket.connect')
@@ -391,7 +435,7 @@ def test_agent_get_agents_keys(socket_mock, send_mock, agent_list, expected_item
     (['001', '500'], {'status': 'all', 'older_than': '1s'}, None, 1701, ['001']),
     (['001', '002'], {'status': 'all', 'older_than': '1s'}, None, WazuhError(1726), None),
 ])
-@patch('wazuh.agent.Agent.remove')
+@patch('wazuh.agent.Agent.remove_agents', return_value={})
 @patch('wazuh.core.common.CLIENT_KEYS', new=os.path.join(test_agent_path, 'client.keys'))
 @patch('wazuh.core.wdb.WazuhDBConnection._send', side_effect=send_msg_to_wdb)
 @patch('socket.socket.connect')
@@ -423,6 +467,21 @@ def test_agent_delete_agents(socket_mock, send_mock, mock_remove, agent_list, fi
             delete_agents(agent_list, filters=filters, q=q)
 
 
+@patch('wazuh.agent.Agent.remove_agents', return_value={'002': WazuhException(9011, 'Agent ID not found',
+                                                                              cmd_error=True)})
+@patch('wazuh.core.common.CLIENT_KEYS', new=os.path.join(test_agent_path, 'client.keys'))
+@patch('wazuh.core.wdb.WazuhDBConnection._send', side_effect=send_msg_to_wdb)
+@patch('socket.socket.connect')
+def test_agent_delete_agents_bulk(socket_mock, send_mock, mock_remove):
+    """Test that `delete_agents` removes all the agents with a single call and reports the ones that failed."""
+    result = delete_agents(['001', '002', '005'], purge=True, filters={'status': 'all', 'older_than': '1s'})
+
+    mock_remove.assert_called_once_with(['001', '002', '005'], purge=True)
+    assert result.affected_items == ['001', '005']
+    assert next(iter(result.failed_items)).code == 9011
+    assert result.failed_items[next(iter(result.failed_items))] == {'002'}
+
+
 @pytest.mark.parametrize('name, agent_id, key, force', [
     ('agent-1', '011', 'b3650e11eba2f27er4d160c69de533ee7eed601636a85ba2455d53a90927747f', None),
     ('agent-1', '012', 'b3650e11eba2f27er4d160c69de533ee7eed601636a85ba2455d53a90927747f', {'enabled': True}),
@@ -697,12 +756,13 @@ def test_agent_delete_groups_other_exceptions(mock_get_groups, group_list, expec
     (['group-1'], ['001'], 0),
     (['group-1'], ['001', '002', '003', '100'], 1)
 ])
-@patch('wazuh.agent.Agent.add_group_to_agent')
+@patch('wazuh.agent.Agent.set_agents_groups_relationship', return_value={})
+@patch('wazuh.agent.Agent.get_agents_groups', return_value={})
 @patch('wazuh.core.wdb.WazuhDBConnection._send', side_effect=send_msg_to_wdb)
 @patch('wazuh.core.agent.Agent.group_exists', return_value=True)
 @patch('socket.socket.connect')
-def test_assign_agents_to_group(socket_mock, group_exists_mock, send_mock, add_group_mock, group_list, agent_list,
-                                num_failed):
+def test_assign_agents_to_group(socket_mock, group_exists_mock, send_mock, get_groups_mock, set_groups_mock,
+                                group_list, agent_list, num_failed):
     """Test `assign_agents_to_group` function from agent module. Does not check its raised exceptions.
 
     Parameters
@@ -721,24 +781,45 @@ def test_assign_agents_to_group(socket_mock, group_exists_mock, send_mock, add_g
     # Check affected items
     assert result.total_affected_items == len(result.affected_items)
     assert set(result.affected_items).difference(set(agent_list)) == set()
-    # Check if the number of affected items matches the number of times `add_group_to_agent` was called
+    # Check that all the affected items were assigned with a single call
     # `agent_list` must only have those agent IDs without exceptions at this level
-    assert len(result.affected_items) == add_group_mock.call_count
+    set_groups_mock.assert_called_once()
+    assert sorted(set_groups_mock.call_args.args[0]) == result.affected_items
     # Check failed items
     assert result.total_failed_items == num_failed
 
 
+@patch('wazuh.agent.Agent.set_agents_groups_relationship')
+@patch('wazuh.agent.Agent.get_agents_groups')
+@patch('wazuh.core.wdb.WazuhDBConnection._send', side_effect=send_msg_to_wdb)
+@patch('wazuh.core.agent.Agent.group_exists', return_value=True)
+@patch('socket.socket.connect')
+def test_assign_agents_to_group_bulk(socket_mock, group_exists_mock, send_mock, get_groups_mock, set_groups_mock):
+    """Test that `assign_agents_to_group` validates all the agents in memory and reports the failures of the batch."""
+    get_groups_mock.return_value = {'001': ['default'], '002': ['default', 'group-1'], '003': ['default']}
+    set_groups_mock.return_value = {'003': (['group-1'], WazuhError(2003))}
+
+    result = assign_agents_to_group(['group-1'], ['001', '002', '003'])
+
+    get_groups_mock.assert_called_once_with({'001', '002', '003'})
+    set_groups_mock.assert_called_once_with({'001': ['group-1'], '003': ['group-1']}, override=False)
+    assert result.affected_items == ['001']
+    assert result.failed_items == {WazuhError(1751): {'002'}, WazuhError(2003): {'003'}}
+
+
 @pytest.mark.parametrize('group_list, agent_list, expected_error, catch_exception', [
     (['none-1'], ['001'], WazuhResourceNotFound(1710), True),
     (['group-1'], ['100'], WazuhResourceNotFound(1701), False),
     (['default'], ['000'], WazuhError(1703), False)
 ])
 @patch('wazuh.agent.Agent.group_exists')
-@patch('wazuh.agent.Agent.add_group_to_agent')
+@patch('wazuh.agent.Agent.set_agents_groups_relationship', return_value={})
+@patch('wazuh.agent.Agent.get_agents_groups', return_value={})
 @patch('wazuh.core.wdb.WazuhDBConnection._send', side_effect=send_msg_to_wdb)
 @patch('socket.socket.connect')
-def test_agent_assign_agents_to_group_exceptions(socket_mock, send_mock, mock_add_group, mock_group_exists, group_list,
-                                                 agent_list, expected_error, catch_exception):
+def test_agent_assign_agents_to_group_exceptions(socket_mock, send_mock, mock_get_groups, mock_set_groups,
+                                                 mock_group_exists, group_list, agent_list, expected_error,
+                                                 catch_exception):
     """Test `assign_agents_to_group` function from agent module raises the expected exceptions when using invalid groups.
 
     Parameters
@@ -757,11 +838,7 @@ def test_agent_assign_agents_to_group_exceptions(socket_mock, send_mock, mock_ad
     def group_exists(group_id):
         return group_id != 'none-1'
 
-    def add_group_to_agent(group_id, agent_id, replace=False, replace_list=None):
-        return f"Agent {agent_id} assigned to {group_id}"
-
     mock_group_exists.side_effect = group_exists
-    mock_add_group.side_effect = add_group_to_agent
     try:
         result = assign_agents_to_group(group_list, agent_list)
         assert not catch_exception
@@ -835,10 +912,12 @@ def test_agent_remove_agent_from_group_exceptions(group_mock, agents_info_mock,
 @pytest.mark.parametrize('group_list, agent_list', [
     (['group-1'], ['001'])
 ])
-@patch('wazuh.core.agent.Agent.unset_single_group_agent')
+@patch('wazuh.agent.Agent.set_agents_groups_relationship', return_value={})
+@patch('wazuh.agent.Agent.get_agent_groups', return_value=['default', 'group-1'])
 @patch('wazuh.agent.get_agents_info', return_value=short_agent_list)
 @patch('wazuh.agent.get_groups', return_value={'group-1'})
-def test_agent_remove_agent_from_groups(mock_get_groups, mock_get_agents, mock_unset, group_list, agent_list):
+def test_agent_remove_agent_from_groups(mock_get_groups, mock_get_agents, mock_agent_groups, mock_set_groups,
+                                        group_list, agent_list):
     """Test `remove_agent_from_groups` function from agent module.
 
     Parameters
@@ -848,9 +927,8 @@ def test_agent_remove_agent_from_groups(mock_get_groups, mock_get_agents, mock_u
     agent_list : List of str
         List of agent ID's.
     """
-    expected_msg = f"Agent '{group_list[0]}' removed from '{group_list[0]}'"
-    mock_unset.return_value = expected_msg
     result = remove_agent_from_groups(agent_list=agent_list, group_list=group_list)
+    mock_set_groups.assert_called_once_with({agent_list[0]: group_list}, remove=True)
     # Check typing
     assert isinstance(result, AffectedItemsWazuhResult), 'The returned object is not an "AffectedItemsWazuhResult".'
     assert isinstance(result.affected_items, list)
@@ -866,11 +944,12 @@ def test_agent_remove_agent_from_groups(mock_get_groups, mock_get_agents, mock_u
     (['any-group'], ['000'], WazuhError(1703), True),
     (['any-group'], ['005'], WazuhResourceNotFound(1710), False),
 ])
-@patch('wazuh.core.agent.Agent.unset_single_group_agent')
+@patch('wazuh.agent.Agent.set_agents_groups_relationship', return_value={})
+@patch('wazuh.agent.Agent.get_agent_groups', return_value=['default'])
 @patch('wazuh.agent.get_agents_info', return_value=short_agent_list)
 @patch('wazuh.agent.get_groups', return_value={'group-1'})
-def test_agent_remove_agent_from_groups_exceptions(mock_get_groups, mock_get_agents, mock_unset, group_list, agent_list,
-                                                   expected_error, catch_exception):
+def test_agent_remove_agent_from_groups_exceptions(mock_get_groups, mock_get_agents, mock_agent_groups, mock_set_groups,
+                                                   group_list, agent_list, expected_error, catch_exception):
     """Test `remove_agent_from_groups` function from agent module raises the expected errors when using invalid group
     or agent lists.
 
@@ -886,8 +965,6 @@ def test_agent_remove_agent_from_groups_exceptions(mock_get_groups, mock_get_age
         True if the exception will be raised by the function and must be caught. False if the function must return an
         `AffectedItemsWazuhResult` containing the exceptions in its 'failed_items'.
     """
-    expected_msg = f"Agent '{group_list[0]}' removed from '{group_list[0]}'"
-    mock_unset.return_value = expected_msg
     try:
         result = remove_agent_from_groups(group_list=group_list, agent_list=agent_list)
         assert not catch_exception, \
@@ -917,10 +994,12 @@ def test_agent_remove_agent_from_groups_exceptions(mock_get_groups, mock_get_age
 @pytest.mark.parametrize('group_list, agent_list', [
     (['group-1'], ['001'])
 ])
-@patch('wazuh.core.agent.Agent.unset_single_group_agent')
+@patch('wazuh.agent.Agent.set_agents_groups_relationship', return_value={})
+@patch('wazuh.agent.Agent.get_agents_groups', return_value={'001': ['default', 'group-1']})
 @patch('wazuh.agent.get_agents_info', return_value=short_agent_list)
 @patch('wazuh.agent.get_groups', return_value={'group-1'})
-def test_agent_remove_agents_from_group(mock_get_groups, mock_get_agents, mock_unset, group_list, agent_list):
+def test_agent_remove_agents_from_group(mock_get_groups, mock_get_agents, mock_agents_groups, mock_set_groups,
+                                        group_list, agent_list):
     """Test `remove_agents_from_group` function from agent module.
 
     Parameters
@@ -930,9 +1009,8 @@ def test_agent_remove_agents_from_group(mock_get_groups, mock_get_agents, mock_u
     agent_list : List of str
         List of agent ID's.
     """
-    expected_msg = f"Agent '{group_list[0]}' removed from '{group_list[0]}'"
-    mock_unset.return_value = expected_msg
     result = remove_agents_from_group(agent_list=agent_list, group_list=group_list)
+    mock_set_groups.assert_called_once_with({agent_id: group_list for agent_id in agent_list}, remove=True)
     # Check typing
     assert isinstance(result, AffectedItemsWazuhResult), 'The returned object is not an "AffectedItemsWazuhResult".'
     assert isinstance(result.affected_items, list)
@@ -1097,9 +1175,8 @@ def test_agent_upgrade_agents(mock_socket, mock_wdb, mock_client_keys, agent_set
     raise_error : bool
         Boolean variable used to indicate that the
     """
-    with patch('wazuh.core.agent.core_upgrade_agents') as core_upgrade_agents_mock:
-        core_upgrade_agents_mock.return_value = result_from_socket
-
+    with patch('wazuh.core.agent.UpgradeOrchestrator.run',
+               side_effect=lambda agents: iter(result_from_socket.get('data', []))):
         if raise_error:
             # Upgrade expecting a Wazuh Exception
             for error in expected_errors_and_items.keys():
@@ -1210,9 +1287,8 @@ def test_agent_get_upgrade_result(mock_socket, mock_wdb, mock_client_keys, agent
     raise_error : bool
         Boolean variable used to indicate that the
     """
-    with patch('wazuh.core.agent.core_upgrade_agents') as core_upgrade_agents_mock:
-        core_upgrade_agents_mock.return_value = result_from_socket
-
+    with patch('wazuh.core.agent.UpgradeOrchestrator.run',
+               side_effect=lambda agents: iter(result_from_socket.get('data', []))):
         if raise_error:
             # Get upgrade result expecting a Wazuh Exception
             for error in expected_errors_and_items.keys():
@@ -1412,7 +1488,7 @@ def test_agent_upload_group_file(mock_upload, group_list):
     (full_agent_list, ['group-1'], True, None)
 ])
 @patch('wazuh.core.common.SHARED_PATH', new=test_shared_path)
-@patch('wazuh.agent.get_distinct_agents')
+@patch('wazuh.agent.get_agents_summary_distinct')
 @patch('wazuh.agent.get_agent_groups')
 @patch('wazuh.agent.get_agents_summary_status')
 @patch('wazuh.agent.get_agents')
@@ -1435,8 +1511,8 @@ def test_agent_get_full_overview(socket_mock, send_mock, get_mock, summary_mock,
     """
     expected_fields = ['nodes', 'groups', 'agent_os', 'agent_status', 'agent_version', 'last_registered_agent']
 
-    def mocked_get_distinct_agents(fields, q):
-        return get_distinct_agents(agent_list=agent_list, fields=fields, q=q)
+    def mocked_get_agents_summary_distinct(fields):
+        return get_agents_summary_distinct(agent_list=agent_list, fields=fields)
 
     def mocked_get_agent_groups():
         return get_agent_groups(group_list=group_list)
@@ -1450,7 +1526,7 @@ def test_agent_get_full_overview(socket_mock, send_mock, get_mock, summary_mock,
         else:
             return get_agents(agent_list=agent_list, limit=limit, sort=sort, q=q)
 
-    distinct_mock.side_effect = mocked_get_distinct_agents
+    distinct_mock.side_effect = mocked_get_agents_summary_distinct
     group_mock.side_effect = mocked_get_agent_groups
     summary_mock.side_effect = mocked_get_agents_summary_status
     get_mock.side_effect = mocked_get_agents
@@ -30,7 +30,7 @@ test_data_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data
 @pytest.fixture(scope='module')
 def mitre_db():
     """Get fake MITRE database cursor."""
-    core_mitre.get_mitre_items.cache_clear()
+    core_mitre.mitre_catalog.clear()
     return get_fake_database_data('schema_mitre_test.sql').cursor()
 
 
@@ -284,3 +284,14 @@ def test_get_task_status_offset_limit(mock_wdb, offset, limit):
         assert len(result.affected_items) == limit
     except AssertionError:
         assert len(result.affected_items) <= 6
+
+
+@patch('wazuh.task.upgrade_progress')
+def test_get_upgrade_summary(mock_progress):
+    """Verify that get_upgrade_summary refreshes the upgrade progress and returns its summary."""
+    mock_progress.summary.return_value = {'total': 0}
+
+    result = task.get_upgrade_summary()
+
+    mock_progress.refresh.assert_called_once()
+    assert result['data'] == {'total': 0}
@@ -0,0 +1,756 @@
+#!/usr/bin/env python3
+# Copyright (C) 2015, Wazuh Inc.
+# Created by Wazuh, Inc. <info@wazuh.com>.
+# This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
+
+"""Long-running dispatcher for the Shuffle, Slack, PagerDuty and VirusTotal integrations.
+
+When the dispatcher is running, the integration scripts invoked by integratord hand every alert over to it through a
+local UNIX socket instead of delivering it themselves. The dispatcher keeps one keep-alive HTTP session per
+destination, batches alerts when the target supports it, rate limits the requests, retries failed deliveries with
+exponential backoff and spools the alerts it could not deliver so they are replayed later.
+
+Run it in the background with:
+    /var/ossec/integrations/dispatcher [--debug]
+"""
+
+import argparse
+import json
+import logging
+import os
+import queue
+import signal
+import socket
+import socketserver
+import sqlite3
+import sys
+import threading
+import time
+from functools import lru_cache
+from importlib.machinery import SourceFileLoader
+from importlib.util import module_from_spec, spec_from_loader
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ModuleNotFoundError as e:
+    print("No module 'requests' found. Install: pip install requests")
+    sys.exit(1)
+
+# Global vars
+pwd = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+INTEGRATIONS_DIR = os.path.dirname(os.path.realpath(__file__))
+
+# Set paths
+LOG_FILE = f'{pwd}/logs/integrations.log'
+DISPATCHER_SOCKET = f'{pwd}/queue/sockets/integrations'
+SPOOL_DIR = f'{pwd}/queue/integrations'
+
+PAGERDUTY_URL = 'https://events.pagerduty.com/generic/2010-04-15/create_event.json'
+VIRUSTOTAL_URL = 'https://www.virustotal.com/vtapi/v2/file/report'
+
+QUEUE_SIZE = 10000
+BATCH_WAIT = 0.5
+MAX_RETRIES = 5
+BACKOFF_BASE = 1
+BACKOFF_MAX = 60
+SPOOL_INTERVAL = 60
+REQUEST_TIMEOUT = 30
+FORWARD_TIMEOUT = 5
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+logger = logging.getLogger('wazuh-integrations-dispatcher')
+
+
+@lru_cache(maxsize=None)
+def load_integration(name):
+    """Import an integration script, whether it was installed with the .py extension or not.
+
+    Parameters
+    ----------
+    name : str
+        Name of the integration script.
+
+    Returns
+    -------
+    module
+        The integration module.
+    """
+    for path in (os.path.join(INTEGRATIONS_DIR, f'{name}.py'), os.path.join(INTEGRATIONS_DIR, name)):
+        if os.path.isfile(path):
+            loader = SourceFileLoader(f'wazuh_integration_{name}', path)
+            module = module_from_spec(spec_from_loader(loader.name, loader))
+            loader.exec_module(module)
+            return module
+    raise ModuleNotFoundError(f"Integration '{name}' not found in {INTEGRATIONS_DIR}")
+
+
+def forward_alert(integration, alert, api_key='', hook_url='', socket_path=DISPATCHER_SOCKET):
+    """Hand an alert over to the dispatcher.
+
+    Parameters
+    ----------
+    integration : str
+        Name of the integration that must deliver the alert.
+    alert : dict
+        The alert to deliver.
+    api_key : str
+        API key of the integration.
+    hook_url : str
+        URL the alert must be delivered to.
+    socket_path : str
+        Path of the dispatcher socket.
+
+    Returns
+    -------
+    bool
+        True if the dispatcher took the alert, False if it is not running and the caller must deliver it itself.
+    """
+    if not os.path.exists(socket_path):
+        return False
+
+    record = json.dumps({'integration': integration, 'api_key': api_key, 'hook_url': hook_url, 'alert': alert})
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(FORWARD_TIMEOUT)
+            sock.connect(socket_path)
+            sock.sendall(f'{record}\n'.encode())
+    except OSError:
+        return False
+
+    return True
+
+
+def is_running(socket_path=DISPATCHER_SOCKET):
+    """Check whether a dispatcher is listening on the socket."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(FORWARD_TIMEOUT)
+            sock.connect(socket_path)
+    except OSError:
+        return False
+    return True
+
+
+class DeliveryError(Exception):
+    """Error delivering alerts to an integration target.
+
+    Parameters
+    ----------
+    message : str
+        Description of the error.
+    retryable : bool
+        Whether the delivery may succeed if it is tried again.
+    retry_after : float
+        Seconds the target asked to wait before trying again, if any.
+    """
+    def __init__(self, message, retryable=True, retry_after=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """Token bucket limiting how many requests are sent per second.
+
+    Parameters
+    ----------
+    rate : float
+        Requests allowed per second.
+    burst : int
+        Requests that may be sent at once after an idle period.
+    """
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = self.capacity
+        self.timestamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, sleeping until one is available.
+
+        Returns
+        -------
+        float
+            Seconds waited.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.timestamp) * self.rate)
+            self.timestamp = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class Target:
+    """Destination of the alerts of an integration.
+
+    Subclasses set the name of the integration, how many alerts fit in a single request and the rate allowed by the
+    service, and build the payload of the requests.
+
+    Parameters
+    ----------
+    api_key : str
+        API key of the integration.
+    hook_url : str
+        URL the alerts are delivered to.
+    """
+    name = None
+    batch_size = 1
+    rate = 10
+    burst = 10
+    verify = True
+
+    def __init__(self, api_key='', hook_url=''):
+        self.api_key = api_key
+        self.hook_url = hook_url
+        self.session = requests.Session()
+        self.session.verify = self.verify
+        self.session.headers.update({'content-type': 'application/json', 'Accept-Charset': 'UTF-8'})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def generate_payload(self, alert):
+        """Build the payload delivering a single alert. Return an empty value to skip the alert."""
+        raise NotImplementedError
+
+    def build_requests(self, alerts):
+        """Group the alerts into requests.
+
+        Parameters
+        ----------
+        alerts : list of dict
+            Alerts to deliver, at most `batch_size`.
+
+        Returns
+        -------
+        list of tuple
+            (alerts, payload) pairs with the alerts delivered by each request.
+        """
+        return [([alert], payload) for alert in alerts if (payload := self.generate_payload(alert))]
+
+    def needs_request(self, payload):
+        """Whether delivering the payload sends a request to the service, so it counts for the rate limit."""
+        return True
+
+    def deliver(self, alerts, payload):
+        """Send a request to the target.
+
+        Raises
+        ------
+        DeliveryError
+            If the target rejected the request.
+        requests.RequestException
+            If the request could not be sent.
+        """
+        self.check_response(self.session.post(self.hook_url, data=payload, timeout=REQUEST_TIMEOUT))
+
+    @staticmethod
+    def check_response(response):
+        """Raise a DeliveryError if the response reports an error."""
+        if response.status_code < 400:
+            return
+
+        retry_after = response.headers.get('Retry-After', '')
+        raise DeliveryError(f'HTTP {response.status_code} {response.reason}',
+                            retryable=response.status_code in RETRYABLE_STATUS_CODES,
+                            retry_after=float(retry_after) if retry_after.isdigit() else None)
+
+    def close(self):
+        self.session.close()
+
+
+class ShuffleTarget(Target):
+    name = 'shuffle'
+    verify = False
+
+    def generate_payload(self, alert):
+        return load_integration('shuffle').generate_msg(alert)
+
+
+class SlackTarget(Target):
+    """Slack webhooks take up to 20 alerts per message as attachments, one message per second."""
+    name = 'slack'
+    batch_size = 20
+    rate = 1
+    burst = 1
+
+    def build_requests(self, alerts):
+        slack = load_integration('slack')
+        attachments = [attachment for alert in alerts
+                       for attachment in json.loads(slack.generate_msg(alert))['attachments']]
+        return [(alerts, json.dumps({'attachments': attachments}))] if attachments else []
+
+
+class PagerDutyTarget(Target):
+    name = 'pagerduty'
+    rate = 2
+    burst = 5
+
+    def __init__(self, api_key='', hook_url=''):
+        super().__init__(api_key, hook_url or PAGERDUTY_URL)
+
+    def generate_payload(self, alert):
+        rule = alert.get('rule', {})
+        description = rule.get('description', 'N/A')
+        return json.dumps({'service_key': self.api_key,
+                           'incident_key': f"Alert: {alert.get('timestamp')} / Rule: {rule.get('id')}",
+                           'event_type': 'trigger',
+                           'description': f'Wazuh Alert: {description}',
+                           'client': 'Wazuh',
+                           'client_url': 'http://127.0.0.1:5601/app/wazuh',
+                           'details': {'location': alert.get('location'), 'Rule': rule.get('id'),
+                                       'Description': description, 'Log': alert.get('full_log', '')}})
+
+
+class VirusTotalTarget(Target):
+    """Query the VirusTotal public API (4 requests per minute) and send the verdicts to analysisd.
+
+    Reports are shared with the virustotal script through its hash cache, and the alerts of a batch about the same
+    hash are answered with a single lookup.
+    """
+    name = 'virustotal'
+    batch_size = 50
+    rate = 4 / 60
+    burst = 4
+
+    def __init__(self, api_key='', hook_url=''):
+        super().__init__(api_key, hook_url or VIRUSTOTAL_URL)
+        self.session.headers.update({'Accept-Encoding': 'gzip, deflate',
+                                     'User-Agent': 'gzip,  Python library-client-VirusTotal'})
+        self.sock = None
+        try:
+            self.cache = load_integration('virustotal').HashCache()
+        except sqlite3.Error as e:
+            logger.warning(f'VirusTotal cache not available: {e}')
+            self.cache = None
+
+    def build_requests(self, alerts):
+        alerts_by_hash = {}
+        for alert in alerts:
+            md5 = alert.get('syscheck', {}).get('md5_after')
+            if md5:
+                alerts_by_hash.setdefault(md5, []).append(alert)
+        return [(hash_alerts, md5) for md5, hash_alerts in alerts_by_hash.items()]
+
+    def needs_request(self, payload):
+        try:
+            return self.cache is None or self.cache.get(payload) is None
+        except sqlite3.Error:
+            return True
+
+    def query(self, md5):
+        response = self.session.get(self.hook_url, params={'apikey': self.api_key, 'resource': md5},
+                                    timeout=REQUEST_TIMEOUT)
+        if response.status_code == 204:
+            raise DeliveryError('Public API request rate limit reached', retry_after=60)
+        if response.status_code == 403:
+            self.send_event({'virustotal': {'error': 403, 'description': 'Error: Check credentials'},
+                             'integration': 'virustotal'})
+        self.check_response(response)
+        return response.json()
+
+    def deliver(self, alerts, payload):
+        virustotal = load_integration('virustotal')
+        try:
+            data = self.cache.lookup(payload, self.query) if self.cache else self.query(payload)
+        except sqlite3.Error as e:
+            logger.warning(f'Error using the VirusTotal cache: {e}')
+            data = self.query(payload)
+
+        for alert in alerts:
+            self.send_event(virustotal.generate_alert(alert, data), alert.get('agent'))
+
+    def send_event(self, msg, agent=None):
+        virustotal = load_integration('virustotal')
+        event = virustotal.format_event(msg, agent).encode()
+        try:
+            if not self.sock:
+                self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                self.sock.connect(virustotal.socket_addr)
+            self.sock.send(event)
+        except OSError as e:
+            self.close_socket()
+            raise DeliveryError(f'Error sending event to analysisd: {e}')
+
+    def close_socket(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    def close(self):
+        self.close_socket()
+        if self.cache:
+            self.cache.close()
+        super().close()
+
+
+TARGETS = {target.name: target for target in (ShuffleTarget, SlackTarget, PagerDutyTarget, VirusTotalTarget)}
+
+
+class Spool:
+    """Local storage of the alerts that could not be delivered.
+
+    Alerts are appended as JSON lines to a file per integration. Loading them renames the files first, so alerts
+    spooled meanwhile go to a new file.
+
+    Parameters
+    ----------
+    directory : str
+        Directory where the spool files are stored.
+    """
+    suffix = '.spool'
+    replay_suffix = '.replay'
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        os.makedirs(directory, mode=0o750, exist_ok=True)
+
+    def store(self, records):
+        """Append records to the spool.
+
+        Parameters
+        ----------
+        records : iterable of dict
+            Records with the integration, api_key, hook_url and alert fields.
+        """
+        lines = {}
+        for record in records:
+            lines.setdefault(record['integration'], []).append(json.dumps(record))
+
+        with self.lock:
+            for integration, integration_lines in lines.items():
+                path = os.path.join(self.directory, f'{integration}{self.suffix}')
+                with open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o640), 'a') as spool_file:
+                    spool_file.write('\n'.join(integration_lines) + '\n')
+
+    def load(self):
+        """Take the spooled records out of the spool.
+
+        Yields
+        ------
+        dict
+            Spooled record.
+        """
+        with self.lock:
+            for filename in os.listdir(self.directory):
+                if filename.endswith(self.suffix):
+                    path = os.path.join(self.directory, filename)
+                    os.replace(path, path[:-len(self.suffix)] + self.replay_suffix)
+            replay_files = [os.path.join(self.directory, filename) for filename in os.listdir(self.directory)
+                            if filename.endswith(self.replay_suffix)]
+
+        for path in replay_files:
+            with open(path) as replay_file:
+                for line in replay_file:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        logger.warning(f'Discarding corrupted spool entry in {path}')
+            os.remove(path)
+
+
+class Channel(threading.Thread):
+    """Worker delivering the alerts of a single integration target.
+
+    Parameters
+    ----------
+    target : Target
+        Destination of the alerts.
+    spool : Spool
+        Where the alerts that could not be delivered are stored.
+    queue_size : int
+        Maximum number of alerts waiting to be delivered.
+    max_retries : int
+        Maximum number of retries of a failed request.
+    backoff_base : float
+        Seconds waited before the first retry. The wait doubles on every retry.
+    backoff_max : float
+        Maximum seconds waited between retries.
+    """
+    def __init__(self, target, spool, queue_size=QUEUE_SIZE, max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE,
+                 backoff_max=BACKOFF_MAX):
+        super().__init__(name=f'{target.name}-channel', daemon=True)
+        self.target = target
+        self.spool = spool
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.limiter = RateLimiter(target.rate, target.burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stopped = threading.Event()
+        self.delivered = 0
+        self.spooled = 0
+
+    def put(self, alert):
+        """Queue an alert to be delivered. Return False if the queue is full."""
+        try:
+            self.queue.put_nowait(alert)
+        except queue.Full:
+            return False
+        return True
+
+    def record(self, alert):
+        return {'integration': self.target.name, 'api_key': self.target.api_key, 'hook_url': self.target.hook_url,
+                'alert': alert}
+
+    def next_batch(self):
+        """Wait for the next alerts, gathering up to the batch size of the target for a short while."""
+        try:
+            batch = [self.queue.get(timeout=BATCH_WAIT)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + BATCH_WAIT
+        while len(batch) < self.target.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.queue.get_nowait() if remaining <= 0 else self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while not self.stopped.is_set():
+            batch = self.next_batch()
+            if batch:
+                self.process(batch)
+
+        pending = []
+        while True:
+            try:
+                pending.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        self.store(pending)
+
+    def process(self, alerts):
+        try:
+            target_requests = self.target.build_requests(alerts)
+        except Exception as e:
+            logger.error(f'{self.target.name}: discarding {len(alerts)} alert(s) that could not be processed: {e}')
+            return
+
+        for request_alerts, payload in target_requests:
+            if not self.deliver(request_alerts, payload):
+                self.store(request_alerts)
+
+    def deliver(self, alerts, payload):
+        """Send a request, retrying it with exponential backoff.
+
+        Returns
+        -------
+        bool
+            False if the alerts must be spooled.
+        """
+        for attempt in range(self.max_retries + 1):
+            if self.target.needs_request(payload):
+                self.limiter.acquire()
+            try:
+                self.target.deliver(alerts, payload)
+                self.delivered += len(alerts)
+                return True
+            except DeliveryError as e:
+                error = e
+            except requests.RequestException as e:
+                error = DeliveryError(str(e))
+
+            if not error.retryable:
+                logger.error(f'{self.target.name}: discarding {len(alerts)} alert(s): {error}')
+                return True
+            if attempt == self.max_retries:
+                break
+
+            delay = error.retry_after or min(self.backoff_base * 2 ** attempt, self.backoff_max)
+            logger.warning(f'{self.target.name}: {error}. Retrying in {delay} seconds')
+            if self.stopped.wait(delay):
+                break
+
+        logger.error(f'{self.target.name}: {len(alerts)} alert(s) could not be delivered: {error}')
+        return False
+
+    def store(self, alerts):
+        if alerts:
+            self.spool.store(self.record(alert) for alert in alerts)
+            self.spooled += len(alerts)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.target.close()
+
+
+class Dispatcher:
+    """Route alerts to a channel per integration, API key and hook URL.
+
+    Parameters
+    ----------
+    spool : Spool
+        Where the alerts that could not be delivered are stored.
+    channel_kwargs : dict
+        Arguments of the channels.
+    """
+    def __init__(self, spool, **channel_kwargs):
+        self.spool = spool
+        self.channel_kwargs = channel_kwargs
+        self.channels = {}
+        self.lock = threading.Lock()
+
+    def get_channel(self, integration, api_key, hook_url):
+        key = (integration, api_key, hook_url)
+        with self.lock:
+            if key not in self.channels:
+                channel = Channel(TARGETS[integration](api_key, hook_url), self.spool, **self.channel_kwargs)
+                channel.start()
+                self.channels[key] = channel
+            return self.channels[key]
+
+    def submit(self, record):
+        """Queue a record received from an integration script.
+
+        Parameters
+        ----------
+        record : dict
+            Record with the integration, api_key, hook_url and alert fields.
+
+        Raises
+        ------
+        ValueError
+            If the integration is not supported or the record has no alert.
+        """
+        integration = record.get('integration')
+        if integration not in TARGETS:
+            raise ValueError(f"Unsupported integration '{integration}'")
+        if not isinstance(record.get('alert'), dict):
+            raise ValueError('Missing alert')
+
+        channel = self.get_channel(integration, record.get('api_key') or '', record.get('hook_url') or '')
+        if not channel.put(record['alert']):
+            channel.store([record['alert']])
+
+    def replay(self):
+        """Queue the spooled records again."""
+        replayed = 0
+        for record in self.spool.load():
+            try:
+                self.submit(record)
+                replayed += 1
+            except ValueError as e:
+                logger.warning(f'Discarding spooled record: {e}')
+        if replayed:
+            logger.info(f'Replaying {replayed} spooled alert(s)')
+
+    def replay_loop(self, stop_event, interval=SPOOL_INTERVAL):
+        """Replay the spool at start and every `interval` seconds until `stop_event` is set."""
+        while True:
+            try:
+                self.replay()
+            except OSError as e:
+                logger.error(f'Error replaying the spool: {e}')
+            if stop_event.wait(interval):
+                break
+
+    def stop(self):
+        """Stop the channels, spooling the alerts that were not delivered yet."""
+        with self.lock:
+            channels = list(self.channels.values())
+        for channel in channels:
+            channel.stopped.set()
+        for channel in channels:
+            channel.stop()
+
+
+class AlertHandler(socketserver.StreamRequestHandler):
+    """Read JSON records, one per line, from an integration script connection."""
+    def handle(self):
+        for line in self.rfile:
+            try:
+                self.server.dispatcher.submit(json.loads(line))
+            except (ValueError, AttributeError) as e:
+                logger.warning(f'Discarding invalid record: {e}')
+
+
+class DispatcherServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, dispatcher):
+        self.dispatcher = dispatcher
+        super().__init__(socket_path, AlertHandler)
+        os.chmod(socket_path, 0o660)
+
+
+def get_script_arguments(args):
+    parser = argparse.ArgumentParser(description='Wazuh integrations dispatcher.')
+    parser.add_argument('--socket', default=DISPATCHER_SOCKET, help='Path of the socket alerts are received from.')
+    parser.add_argument('--spool', default=SPOOL_DIR, help='Directory where undelivered alerts are stored.')
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE,
+                        help='Maximum number of alerts queued per integration before spooling them.')
+    parser.add_argument('--max-retries', type=int, default=MAX_RETRIES,
+                        help='Maximum number of retries of a failed request.')
+    parser.add_argument('--spool-interval', type=int, default=SPOOL_INTERVAL,
+                        help='Seconds between attempts to deliver the spooled alerts.')
+    parser.add_argument('--forward', nargs=4, metavar=('INTEGRATION', 'ALERT_FILE', 'API_KEY', 'HOOK_URL'),
+                        help='Hand an alert file over to the running dispatcher and exit.')
+    parser.add_argument('--debug', action='store_true', help='Enable debug logging.')
+    return parser.parse_args(args)
+
+
+def forward_alert_file(integration, alert_file_location, api_key, hook_url, socket_path):
+    """Forward an alert file to the dispatcher. Return the exit code of the script."""
+    try:
+        with open(alert_file_location, errors='ignore') as alert_file:
+            alert = json.load(alert_file)
+    except (OSError, ValueError) as e:
+        print(f'Error reading the alert file: {e}')
+        return 3
+
+    return 0 if forward_alert(integration, alert, api_key, hook_url, socket_path) else 1
+
+
+def main(args):
+    options = get_script_arguments(args[1:])
+
+    if options.forward:
+        sys.exit(forward_alert_file(*options.forward, options.socket))
+
+    logging.basicConfig(filename=LOG_FILE, level=logging.DEBUG if options.debug else logging.INFO,
+                        format='%(asctime)s %(name)s: %(levelname)s: %(message)s')
+
+    if is_running(options.socket):
+        logger.error(f'The dispatcher is already running on {options.socket}')
+        sys.exit(1)
+    if os.path.exists(options.socket):
+        os.remove(options.socket)
+
+    dispatcher = Dispatcher(Spool(options.spool), queue_size=options.queue_size, max_retries=options.max_retries)
+    server = DispatcherServer(options.socket, dispatcher)
+
+    def shutdown(signum, frame):
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    replay_stop = threading.Event()
+    threading.Thread(target=dispatcher.replay_loop, args=(replay_stop, options.spool_interval), daemon=True).start()
+
+    logger.info(f'Dispatcher listening on {options.socket}')
+    try:
+        server.serve_forever()
+    finally:
+        replay_stop.set()
+        server.server_close()
+        os.remove(options.socket)
+        dispatcher.stop()
+        logger.info('Dispatcher stopped')
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -26,6 +26,8 @@ except ModuleNotFoundError as e:
     print("No module 'requests' found. Install: pip install requests")
     sys.exit(1)
 
+from dispatcher import forward_alert
+
 # ADD THIS TO ossec.conf configuration:
 #  <integration>
 #      <name>shuffle</name>
@@ -107,6 +109,10 @@ def process_args(args):
     debug("# Processing alert")
     debug(json_alert)
 
+    if forward_alert('shuffle', json_alert, hook_url=webhook):
+        debug("# Alert forwarded to the integrations dispatcher")
+        return
+
     debug("# Generating message")
     msg: str = generate_msg(json_alert)
 
@@ -0,0 +1,183 @@
+# Copyright (C) 2015, Wazuh Inc.
+# Created by Wazuh, Inc. <info@wazuh.com>.
+# This program is free software; you can redistribute
+# it and/or modify it under the terms of GPLv2
+
+"""Unit tests for dispatcher.py integration."""
+
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+import dispatcher  # noqa: E402
+
+alert_template = {'timestamp': '2022-01-01T00:00:00+0000',
+                  'rule': {'level': 5, 'description': 'alert description', 'id': '1002', 'firedtimes': 1},
+                  'agent': {'id': '001', 'name': 'agent-1'},
+                  'id': 'alert_id', 'full_log': 'full log.', 'location': 'wazuh-X'}
+
+
+def response(status_code, headers=None):
+    res = requests.Response()
+    res.status_code = status_code
+    res.headers.update(headers or {})
+    return res
+
+
+@pytest.fixture
+def spool(tmp_path):
+    return dispatcher.Spool(str(tmp_path / 'spool'))
+
+
+def test_rate_limiter():
+    """Test that the rate limiter lets the burst through and then waits for new tokens."""
+    limiter = dispatcher.RateLimiter(rate=10, burst=2)
+    with patch('dispatcher.time.sleep') as sleep:
+        assert limiter.acquire() == 0
+        assert limiter.acquire() == 0
+        assert limiter.acquire() == pytest.approx(0.1, abs=0.01)
+        sleep.assert_called_once()
+
+
+def test_slack_target_batches_alerts():
+    """Test that Slack alerts are delivered as attachments of a single message."""
+    target = dispatcher.SlackTarget(hook_url='https://hooks.slack.com/services/XXX')
+    alerts = [dict(alert_template, id=str(i)) for i in range(3)]
+
+    target_requests = target.build_requests(alerts)
+
+    assert len(target_requests) == 1
+    request_alerts, payload = target_requests[0]
+    assert request_alerts == alerts
+    assert [attachment['ts'] for attachment in json.loads(payload)['attachments']] == ['0', '1', '2']
+
+
+def test_shuffle_target_skips_filtered_rules():
+    """Test that alerts filtered by the Shuffle integration are not delivered."""
+    target = dispatcher.ShuffleTarget(hook_url='http://localhost:3001/api/v1/hooks/hook')
+    skipped = dict(alert_template, rule=dict(alert_template['rule'], id='5710'))
+
+    target_requests = target.build_requests([alert_template, skipped])
+
+    assert [request_alerts for request_alerts, _ in target_requests] == [[alert_template]]
+    assert target.session.verify is False
+
+
+def test_pagerduty_target_payload():
+    """Test the PagerDuty payload and its default URL."""
+    target = dispatcher.PagerDutyTarget(api_key='key')
+
+    payload = json.loads(target.generate_payload(alert_template))
+
+    assert target.hook_url == dispatcher.PAGERDUTY_URL
+    assert payload['service_key'] == 'key'
+    assert payload['details']['Rule'] == '1002'
+
+
+@pytest.mark.parametrize('responses, delivered, spooled', [
+    ([response(200)], 1, 0),
+    ([response(503), response(429, {'Retry-After': '2'}), response(200)], 1, 0),
+    ([requests.ConnectionError('refused')] * 3, 0, 1),
+    ([response(400)], 0, 0),
+])
+def test_channel_deliver(spool, responses, delivered, spooled):
+    """Test that deliveries are retried with backoff, spooling or discarding the alerts that fail."""
+    target = dispatcher.ShuffleTarget(hook_url='http://localhost/hook')
+    channel = dispatcher.Channel(target, spool, max_retries=2, backoff_base=0)
+
+    with patch.object(target.session, 'post', side_effect=responses) as post, \
+            patch.object(channel.stopped, 'wait', return_value=False) as wait:
+        channel.process([alert_template])
+
+    assert post.call_count == len(responses)
+    assert channel.delivered == delivered
+    assert channel.spooled == spooled
+    if len(responses) > 1 and isinstance(responses[1], requests.Response):
+        assert [c.args[0] for c in wait.call_args_list] == [0, 2.0]
+    assert len(list(spool.load())) == spooled
+
+
+def test_spool_store_and_load(spool):
+    """Test that spooled records are loaded once and new ones go to a new file."""
+    records = [{'integration': 'slack', 'api_key': '', 'hook_url': 'url', 'alert': {'id': str(i)}} for i in range(3)]
+    spool.store(records[:2])
+
+    loaded = spool.load()
+    assert next(loaded) == records[0]
+    spool.store(records[2:])
+    assert list(loaded) == [records[1]]
+    assert list(spool.load()) == [records[2]]
+    assert list(spool.load()) == []
+
+
+def test_dispatcher_submit(spool):
+    """Test that records are routed per target and spooled when the queue is full."""
+    d = dispatcher.Dispatcher(spool, queue_size=1)
+    record = {'integration': 'slack', 'hook_url': 'url', 'alert': alert_template}
+
+    with patch('dispatcher.Channel.start'):
+        d.submit(record)
+        d.submit(record)
+        d.submit(dict(record, hook_url='other'))
+        with pytest.raises(ValueError):
+            d.submit(dict(record, integration='unknown'))
+
+    assert len(d.channels) == 2
+    assert [r['alert'] for r in spool.load()] == [alert_template]
+
+
+def test_forward_alert(tmp_path, spool):
+    """Test that alerts forwarded through the socket reach the dispatcher."""
+    socket_path = str(tmp_path / 'integrations')
+    assert not dispatcher.forward_alert('slack', alert_template, socket_path=socket_path)
+
+    d = MagicMock()
+    server = dispatcher.DispatcherServer(socket_path, d)
+    thread = threading.Thread(target=server.handle_request)
+    thread.start()
+    try:
+        assert dispatcher.forward_alert('slack', alert_template, hook_url='url', socket_path=socket_path)
+        thread.join(5)
+        for _ in range(50):
+            if d.submit.called:
+                break
+            time.sleep(0.1)
+    finally:
+        server.server_close()
+
+    d.submit.assert_called_once_with({'integration': 'slack', 'api_key': '', 'hook_url': 'url',
+                                      'alert': alert_template})
+
+
+def test_virustotal_target_deliver(tmp_path):
+    """Test that VirusTotal lookups are coalesced and cached and verdicts are sent to analysisd."""
+    target = dispatcher.VirusTotalTarget(api_key='key')
+    target.cache = dispatcher.load_integration('virustotal').HashCache(str(tmp_path / 'virustotal.db'))
+    alert = dict(alert_template, syscheck={'path': '/bin/ls', 'md5_after': 'md5', 'sha1_after': 'sha1'})
+    vt_response = response(200)
+    vt_response._content = json.dumps({'response_code': 0}).encode()
+
+    with patch.object(target.session, 'get', return_value=vt_response) as get, \
+            patch('dispatcher.socket.socket') as sock:
+        target_requests = target.build_requests([alert, alert_template, alert])
+        assert target_requests == [([alert, alert], 'md5')]
+        assert target.needs_request('md5')
+        for _ in range(2):
+            target.deliver(*target_requests[0])
+        assert not target.needs_request('md5')
+
+    get.assert_called_once()
+    assert get.call_args.kwargs['params'] == {'apikey': 'key', 'resource': 'md5'}
+    sock.assert_called_once_with(socket.AF_UNIX, socket.SOCK_DGRAM)
+    assert sock.return_value.send.call_count == 4
+    event = sock.return_value.send.call_args.args[0].decode()
+    assert event.startswith('1:[001] (agent-1) any->virustotal:')
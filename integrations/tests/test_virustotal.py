@@ -0,0 +1,65 @@
+# Copyright (C) 2015, Wazuh Inc.
+# Created by Wazuh, Inc. <info@wazuh.com>.
+# This program is free software; you can redistribute
+# it and/or modify it under the terms of GPLv2
+
+"""Unit tests for the virustotal integration."""
+
+import os
+import sys
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from dispatcher import load_integration  # noqa: E402
+
+virustotal = load_integration('virustotal')
+
+report_template = {'response_code': 1, 'sha1': 'sha1', 'scan_date': 'date', 'permalink': 'link', 'positives': 0,
+                   'total': 60}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = virustotal.HashCache(str(tmp_path / 'virustotal.db'))
+    yield cache
+    cache.close()
+
+
+@pytest.mark.parametrize('report, ttl', [
+    ({'response_code': 0}, virustotal.UNKNOWN_TTL),
+    (report_template, virustotal.CLEAN_TTL),
+    (dict(report_template, positives=3), virustotal.MALICIOUS_TTL),
+])
+def test_hash_cache_ttl(cache, report, ttl):
+    """Test that reports, including those of unknown hashes, are cached until their verdict expires."""
+    with patch('time.time', return_value=1000):
+        cache.put('md5', report)
+        assert cache.get('md5') == report
+    with patch('time.time', return_value=1000 + ttl + 1):
+        assert cache.get('md5') is None
+
+
+def test_hash_cache_lookup(cache):
+    """Test that only the first lookup of a hash queries the API."""
+    query = MagicMock(return_value=report_template)
+
+    assert cache.lookup('md5', query) == report_template
+    assert cache.lookup('md5', query) == report_template
+    query.assert_called_once_with('md5')
+
+
+def test_hash_cache_coalescing(cache):
+    """Test that a lookup in progress is waited for and released if it fails."""
+    assert cache.claim('md5')
+    assert not cache.claim('md5')
+
+    with patch('time.sleep', side_effect=lambda _: cache.put('md5', report_template)) as sleep:
+        assert cache.lookup('md5', MagicMock(side_effect=AssertionError)) == report_template
+    sleep.assert_called_once()
+
+    with pytest.raises(ValueError):
+        cache.lookup('other', MagicMock(side_effect=ValueError))
+    assert cache.claim('other')
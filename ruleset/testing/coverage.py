@@ -6,7 +6,9 @@
 # License (version 2) as published by the FSF - Free Software
 # Foundation
 
+from __future__ import division
 import argparse
+import json
 import re
 import errno
 from os import path as Path
@@ -126,3 +128,294 @@ def get_parent_decoder_names(decoders_path):
                         inside_decoder = False
 
     return decoder_set
+
+
+COMMENT_PATTERN = re.compile(r'<!--.*?-->', re.DOTALL)
+RULE_GROUP_PATTERN = re.compile(r'<group\s+name="([^"]*)"\s*>|<rule\s([^>]*)>(.*?)</rule>', re.DOTALL)
+RULE_ID_PATTERN = re.compile(r'\bid="(\d+)"')
+DECODER_PATTERN = re.compile(r'<decoder\s+name="([^"]+)"([^>]*)>(.*?)</decoder>', re.DOTALL)
+USE_OWN_NAME_PATTERN = re.compile(r'<use_own_name>\s*true\s*</use_own_name>')
+RULE_OPTIONS = ('if_sid', 'if_matched_sid', 'if_group', 'if_matched_group', 'decoded_as', 'group')
+# Decoders built into analysisd (see src/analysisd/rules.h), they can be used by rules without an XML definition
+BUILTIN_DECODERS = {'rootcheck', 'hostinfo_new', 'hostinfo_modified', 'syscheck_integrity_changed',
+                    'syscheck_new_entry', 'syscheck_deleted', 'syscheck_registry_key_modified',
+                    'syscheck_registry_key_added', 'syscheck_registry_key_deleted', 'syscheck_registry_value_modified',
+                    'syscheck_registry_value_added', 'syscheck_registry_value_deleted', 'syscollector', 'ciscat',
+                    'windows_eventchannel', 'sca'}
+
+
+def split_values(text):
+    """
+    Split a comma or space separated list of values.
+
+    Parameters
+    ----------
+    text : str
+        Text to split.
+
+    Returns
+    -------
+    list
+        Values found, without empty ones.
+    """
+    return [value for value in re.split(r'[,\s]+', text.strip()) if value]
+
+
+def read_xml_files(path):
+    """
+    Read the content of every file of a directory, without XML comments.
+
+    Parameters
+    ----------
+    path : str
+        Path of the directory.
+
+    Returns
+    -------
+    dict
+        Content of each file, by file name.
+
+    Raises
+    ------
+    FileNotFoundError
+        If path doesn't exists.
+
+    NotADirectoryError
+        If path is not a directory.
+    """
+    check_dir(path)
+
+    contents = {}
+    for filename in sorted(listdir(path)):
+        file_path = Path.join(path, filename)
+        if Path.isfile(file_path):
+            with open(file_path, 'r') as xml_file:
+                contents[filename] = re.sub(COMMENT_PATTERN, '', xml_file.read())
+
+    return contents
+
+
+def get_rules(rules_path):
+    """
+    Get the rules found on given directory path with the options that decide when they are evaluated.
+
+    Parameters
+    ----------
+    rules_path : str
+        Path of the directory with rule files.
+
+    Returns
+    -------
+    dict
+        Rules by id. Each rule has its file, its groups (including the ones of the enclosing group block) and the
+        lists of if_sid, if_matched_sid, if_group, if_matched_group and decoded_as values.
+    """
+    rules = {}
+
+    for filename, content in read_xml_files(rules_path).items():
+        block_groups = []
+        for match in re.finditer(RULE_GROUP_PATTERN, content):
+            if match.group(1) is not None:
+                block_groups = split_values(match.group(1))
+                continue
+
+            rule_id = re.search(RULE_ID_PATTERN, match.group(2))
+            if not rule_id:
+                continue
+
+            rule = {'file': filename}
+            for option in RULE_OPTIONS:
+                rule[option] = []
+                for value in re.findall(r'<{0}>(.*?)</{0}>'.format(option), match.group(3), re.DOTALL):
+                    rule[option].extend(split_values(value))
+            rule['groups'] = sorted(set(block_groups + rule.pop('group')))
+            rules[rule_id.group(1)] = rule
+
+    return rules
+
+
+def get_decoders(decoders_path):
+    """
+    Get the decoders found on given directory path.
+
+    Parameters
+    ----------
+    decoders_path : str
+        Path of the directory with decoder files.
+
+    Returns
+    -------
+    dict
+        Dictionary with the parent decoders (set of names) and the child decoders (list of dictionaries with
+        their name, parent, file and use_own_name attribute).
+    """
+    parents = set()
+    children = []
+
+    for filename, content in read_xml_files(decoders_path).items():
+        for name, _, body in re.findall(DECODER_PATTERN, content):
+            parent = re.search(r'<parent>(.*?)</parent>', body, re.DOTALL)
+            if not parent:
+                parents.add(name)
+                continue
+            child = {'name': name, 'parent': parent.group(1).strip(), 'file': filename,
+                     'use_own_name': bool(re.search(USE_OWN_NAME_PATTERN, body))}
+            if child not in children:
+                children.append(child)
+
+    return {'parents': parents, 'children': children}
+
+
+def get_unreachable_rules(rules, decoders):
+    """
+    Get the rules that can never be evaluated because every rule, group or decoder they depend on does not exist or
+    is unreachable too.
+
+    Parameters
+    ----------
+    rules : dict
+        Rules, as returned by get_rules.
+    decoders : dict
+        Decoders, as returned by get_decoders.
+
+    Returns
+    -------
+    dict
+        Reason why each unreachable rule can't be evaluated, by rule id.
+    """
+    decoder_names = decoders['parents'] | BUILTIN_DECODERS | \
+        {child['name'] for child in decoders['children'] if child['use_own_name']}
+    unreachable = {}
+
+    for rule_id, rule in rules.items():
+        missing = [decoder for decoder in rule['decoded_as'] if decoder not in decoder_names]
+        if missing and len(missing) == len(rule['decoded_as']):
+            unreachable[rule_id] = 'decoded_as unknown decoder: ' + ', '.join(missing)
+
+    # Rules evaluated after each rule or group
+    children_by_rule = {}
+    children_by_group = {}
+    for rule_id, rule in rules.items():
+        for parent in rule['if_sid'] + rule['if_matched_sid']:
+            children_by_rule.setdefault(parent, []).append(rule_id)
+        for group in rule['if_group'] + rule['if_matched_group']:
+            children_by_group.setdefault(group, []).append(rule_id)
+
+    # A rule is reachable if it has no parents or any of its parent rules or groups is reachable
+    pending = [rule_id for rule_id, rule in rules.items() if rule_id not in unreachable and
+               not (rule['if_sid'] or rule['if_matched_sid'] or rule['if_group'] or rule['if_matched_group'])]
+    reachable = set(pending)
+    reached_groups = set()
+    while pending:
+        rule_id = pending.pop()
+        children = list(children_by_rule.get(rule_id, []))
+        for group in set(rules[rule_id]['groups']) - reached_groups:
+            reached_groups.add(group)
+            children.extend(children_by_group.get(group, []))
+        for child in children:
+            if child not in reachable and child not in unreachable:
+                reachable.add(child)
+                pending.append(child)
+
+    for rule_id, rule in rules.items():
+        if rule_id in reachable or rule_id in unreachable:
+            continue
+        reasons = []
+        unknown_rules = [parent for parent in rule['if_sid'] + rule['if_matched_sid'] if parent not in rules]
+        if unknown_rules:
+            reasons.append('unknown parent rules: ' + ', '.join(unknown_rules))
+        known_groups = {group for other in rules.values() for group in other['groups']}
+        unknown_groups = [group for group in rule['if_group'] + rule['if_matched_group'] if group not in known_groups]
+        if unknown_groups:
+            reasons.append('unknown parent groups: ' + ', '.join(unknown_groups))
+        unreachable[rule_id] = '; '.join(reasons) or 'all parents are unreachable'
+
+    return unreachable
+
+
+def get_coverage_report(rules_path, decoders_path, fired_rules, fired_decoders):
+    """
+    Build a coverage report comparing the rules and decoders that fired during a test run with the ruleset.
+
+    Parameters
+    ----------
+    rules_path : str
+        Path of the directory with rule files.
+    decoders_path : str
+        Path of the directory with decoder files.
+    fired_rules : set
+        Ids of the rules that matched at least one test log, including the parent rules matched before the rule
+        that generated the alert.
+    fired_decoders : set
+        Names of the decoders (and parent decoders) that decoded at least one test log.
+
+    Returns
+    -------
+    dict
+        Coverage report.
+    """
+    rules = get_rules(rules_path)
+    decoders = get_decoders(decoders_path)
+    unreachable = get_unreachable_rules(rules, decoders)
+
+    fired_rules = set(fired_rules) & set(rules)
+    uncovered_rules = sorted(set(rules) - fired_rules - set(unreachable), key=int)
+
+    # Rules whose parents fired but they did not: the branch of the parent that is never tested
+    chains = []
+    for rule_id in uncovered_rules:
+        parents = rules[rule_id]['if_sid'] + rules[rule_id]['if_matched_sid']
+        fired_parents = [parent for parent in parents if parent in fired_rules]
+        if fired_parents:
+            chains.append({'rule': rule_id,
+                           'file': rules[rule_id]['file'],
+                           'if_sid': rules[rule_id]['if_sid'],
+                           'if_matched_sid': rules[rule_id]['if_matched_sid'],
+                           'fired_parents': fired_parents})
+
+    # Children without their own name are reported with their parent name, so they are only known to be uncovered
+    # when their parent never fired
+    uncovered_children = [child for child in decoders['children']
+                          if (child['name'] if child['use_own_name'] else child['parent']) not in fired_decoders]
+    fired_parents = decoders['parents'] & set(fired_decoders)
+
+    return {
+        'rules': {
+            'total': len(rules),
+            'fired': len(fired_rules),
+            'coverage': round(len(fired_rules) / len(rules), 4) if rules else 0,
+            'uncovered': [{'id': rule_id, 'file': rules[rule_id]['file']} for rule_id in uncovered_rules],
+            'unreachable': [{'id': rule_id, 'file': rules[rule_id]['file'], 'reason': unreachable[rule_id]}
+                            for rule_id in sorted(unreachable, key=int)],
+            'uncovered_chains': chains
+        },
+        'decoders': {
+            'total': len(decoders['parents']),
+            'fired': len(fired_parents),
+            'coverage': round(len(fired_parents) / len(decoders['parents']), 4) if decoders['parents'] else 0,
+            'uncovered': sorted(decoders['parents'] - fired_parents),
+            'uncovered_children': uncovered_children
+        }
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ruleset coverage of a runtests.py execution.')
+    parser.add_argument('--results', '-r', required=True, dest='results',
+                        help='JSON report written by runtests.py --json')
+    parser.add_argument('--rules', default='/var/ossec/ruleset/rules/', dest='rules_path',
+                        help='Directory with rule files (default: /var/ossec/ruleset/rules/)')
+    parser.add_argument('--decoders', default='/var/ossec/ruleset/decoders/', dest='decoders_path',
+                        help='Directory with decoder files (default: /var/ossec/ruleset/decoders/)')
+    parser.add_argument('--output', '-o', dest='output', help='File to write the coverage report to (default: stdout)')
+    args = parser.parse_args()
+
+    with open(args.results) as results_file:
+        fired = json.load(results_file)['fired']
+
+    report = get_coverage_report(args.rules_path, args.decoders_path, fired['rules'], fired['decoders'])
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
@@ -9,7 +9,14 @@
 from __future__ import division
 from collections import OrderedDict
 import xml.etree.ElementTree as ET
-import ConfigParser
+try:
+    import ConfigParser
+except ImportError:
+    import configparser as ConfigParser
+try:
+    import Queue as queue
+except ImportError:
+    import queue
 import subprocess
 import os
 import sys
@@ -17,10 +24,16 @@ import shutil
 import argparse
 import re
 import signal
+import json
+import threading
+import time
 
 from coverage import get_rule_ids
 from coverage import get_parent_decoder_names
+from coverage import get_coverage_report
 
+# Rules shown as matched in the rules debugging trace of wazuh-logtest, including the parents of the alerting rule
+MATCHED_RULE_PATTERN = re.compile(r"\*Rule (\d+) matched")
 
 
 class MultiOrderedDict(OrderedDict):
@@ -31,11 +44,50 @@ class MultiOrderedDict(OrderedDict):
             super(MultiOrderedDict, self).__setitem__(key, value)
 
 
+def test_file_parser():
+    # Repeated options are joined, so a test can send several events to the same session
+    if sys.version_info[0] >= 3:
+        return ConfigParser.RawConfigParser(dict_type=MultiOrderedDict, strict=False)
+    return ConfigParser.RawConfigParser(dict_type=MultiOrderedDict)
+
+
+def list_test_files(test_path, selective_test=False, geoip=False):
+    test_files = []
+    for a_ini_file in os.listdir(test_path):
+        a_ini_file = os.path.join(test_path, a_ini_file)
+        if a_ini_file.endswith(".ini"):
+            if selective_test and not a_ini_file.endswith(selective_test):
+                continue
+            if geoip is False and a_ini_file.endswith("geoip.ini"):
+                continue
+            test_files.append(a_ini_file)
+    return test_files
+
+
+def load_test_cases(ini_file):
+    tGroup = test_file_parser()
+    tGroup.read([ini_file])
+    for t in tGroup.sections():
+        rule = tGroup.get(t, "rule")
+        alert = tGroup.get(t, "alert")
+        decoder = tGroup.get(t, "decoder")
+        for (name, value) in tGroup.items(t):
+            if name.startswith("log "):
+                yield {"file": ini_file,
+                       "section": t,
+                       "name": name,
+                       "log": value,
+                       "rule": rule,
+                       "alert": alert,
+                       "decoder": decoder,
+                       "negate": name.endswith("fail")}
+
+
 def getWazuhInfo(wazuh_home):
     wazuh_control = os.path.join(wazuh_home, "bin", "wazuh-control")
     wazuh_env_vars = {}
     try:
-        proc = subprocess.Popen([wazuh_control, "info"], stdout=subprocess.PIPE)
+        proc = subprocess.Popen([wazuh_control, "info"], stdout=subprocess.PIPE, universal_newlines=True)
         (stdout, stderr) = proc.communicate()
     except Exception as e:
         print("Seems like there is no Wazuh installation.")
@@ -141,6 +193,18 @@ def gather_failed_test_data(std_out, alert, rule, decoder, section, line_name):
     return failed_test
 
 
+def failure_summary(failed_test):
+    if failed_test["actual_decoder"] == "":
+        return "Log was unable to be decoded"
+    elif failed_test["actual_decoder"] != failed_test["expected_decoder"]:
+        return "Log decoded by unexpected decoder. Expected: " + failed_test["expected_decoder"] + ". Got: " + failed_test["actual_decoder"]
+    elif failed_test["actual_rule"] != failed_test["expected_rule"]:
+        return "Hit a different rule. Expected: " + failed_test["expected_rule"] + ". Got: " + failed_test["actual_rule"]
+    elif failed_test["actual_level"] != failed_test["expected_level"]:
+        return "Unexpected alert level. Expected: " + failed_test["expected_level"] + ". Got: " + failed_test["actual_level"]
+    return "Log matched a test that should fail"
+
+
 class OssecTester(object):
 
     def __init__(self, bdir):
@@ -151,18 +215,25 @@ class OssecTester(object):
         self._test_path = "./tests"
         self._execution_data = {}
         self._failed_tests = []
+        self._results = []
         self.tested_rules = set()
         self.tested_decoders = set()
+        self.fired_rules = set()
+        self.fired_decoders = set()
 
     def buildCmd(self, rule, alert, decoder):
         cmd = ['%s/wazuh-logtest' % (self._ossec_path), ]
         cmd += ['-U', "%s:%s:%s" % (rule, alert, decoder)]
+        # Show the rules debugging trace to record every rule matched
+        cmd += ['-v']
         return cmd
 
-    def runTest(self, log, rule, alert, decoder, section, name, negate=False):
+    def runTest(self, log, rule, alert, decoder, section, name, negate=False, ini_file=""):
         test_status = "failed"
+        failed_test = None
         self.tested_rules.add(rule)
         self.tested_decoders.add(decoder)
+        start = time.time()
         p = subprocess.Popen(
             self.buildCmd(rule, alert, decoder),
             stdout=subprocess.PIPE,
@@ -171,6 +242,7 @@ class OssecTester(object):
             shell=False,
             universal_newlines=True)
         std_out = p.communicate(log)[0]
+        self.fired_rules.update(MATCHED_RULE_PATTERN.findall(std_out))
         if (p.returncode != 0 and not negate) or (p.returncode == 0 and negate):
             self._error = True
             print("")
@@ -182,7 +254,9 @@ class OssecTester(object):
             print("        Section   = %s" % (section))
             print("        line name = %s" % (name))
             print(" ")
-            self._failed_tests.append(gather_failed_test_data(std_out, alert, rule, decoder, section, name))
+            failed_test = gather_failed_test_data(std_out, alert, rule, decoder, section, name)
+            self._failed_tests.append(failed_test)
+            self.add_fired(failed_test["actual_rule"], failed_test["actual_decoder"])
         elif self._debug:
             print("Exit code= %s" % (p.returncode))
             print(std_out)
@@ -190,39 +264,75 @@ class OssecTester(object):
             sys.stdout.write(".")
             test_status = "passed"
             sys.stdout.flush()
+        if test_status == "passed" and not negate:
+            self.add_fired(rule, decoder)
+        self.add_result({"file": ini_file, "section": section, "name": name, "rule": rule, "alert": alert,
+                         "decoder": decoder, "negate": negate}, test_status, time.time() - start, failed_test)
         return test_status
 
+    def add_fired(self, rule, *decoders):
+        if rule:
+            self.fired_rules.add(rule)
+        self.fired_decoders.update(decoder for decoder in decoders if decoder)
+
+    def add_result(self, case, status, elapsed, failed_test=None):
+        result = {"file": case["file"],
+                  "section": case["section"],
+                  "name": case["name"],
+                  "negate": case["negate"],
+                  "expected_rule": case["rule"],
+                  "expected_level": case["alert"],
+                  "expected_decoder": case["decoder"],
+                  "status": status,
+                  "time": round(elapsed, 6)}
+        if failed_test:
+            result.update({key: failed_test[key] for key in
+                           ("actual_rule", "actual_level", "actual_decoder", "description")})
+            result["summary"] = failure_summary(failed_test)
+        self._results.append(result)
+
     def run(self, selective_test=False, geoip=False):
-        for a_ini_file in os.listdir(self._test_path):
-            a_ini_file = os.path.join(self._test_path, a_ini_file)
-            if a_ini_file.endswith(".ini"):
-                if selective_test and not a_ini_file.endswith(selective_test):
-                    continue
-                if geoip is False and a_ini_file.endswith("geoip.ini"):
-                    continue
-                self._execution_data[a_ini_file] = {"passed": 0, "failed": 0}
-                print("- [ File = %s ] ---------" % (a_ini_file))
-                tGroup = ConfigParser.RawConfigParser(dict_type=MultiOrderedDict)
-                tGroup.read([a_ini_file])
-                tSections = tGroup.sections()
-                for t in tSections:
-                    rule = tGroup.get(t, "rule")
-                    alert = tGroup.get(t, "alert")
-                    decoder = tGroup.get(t, "decoder")
-                    for (name, value) in tGroup.items(t):
-                        if name.startswith("log "):
-                            if self._debug:
-                                print("-" * 60)
-                            if name.endswith("pass"):
-                                neg = False
-                            elif name.endswith("fail"):
-                                neg = True
-                            else:
-                                neg = False
-                            self._execution_data[a_ini_file][self.runTest(value, rule, alert, decoder, t, name, negate=neg)] += 1
-                print("\n\n")
+        for a_ini_file in list_test_files(self._test_path, selective_test, geoip):
+            self._execution_data[a_ini_file] = {"passed": 0, "failed": 0}
+            print("- [ File = %s ] ---------" % (a_ini_file))
+            for case in load_test_cases(a_ini_file):
+                if self._debug:
+                    print("-" * 60)
+                self._execution_data[a_ini_file][self.runTest(case["log"], case["rule"], case["alert"],
+                                                              case["decoder"], case["section"], case["name"],
+                                                              negate=case["negate"], ini_file=a_ini_file)] += 1
+            print("\n\n")
         return self._error
 
+    def write_json_report(self, path):
+        with open(path, "w") as report:
+            json.dump({"files": self._execution_data,
+                       "tests": self._results,
+                       "fired": {"rules": sorted(self.fired_rules), "decoders": sorted(self.fired_decoders)}},
+                      report, indent=2)
+
+    def write_junit_report(self, path):
+        testsuites = ET.Element("testsuites")
+        for ini_file in sorted(self._execution_data):
+            results = [result for result in self._results if result["file"] == ini_file]
+            testsuite = ET.SubElement(testsuites, "testsuite", {
+                "name": ini_file,
+                "tests": str(len(results)),
+                "failures": str(self._execution_data[ini_file]["failed"]),
+                "time": "%.6f" % sum(result["time"] for result in results)})
+            for result in results:
+                testcase = ET.SubElement(testsuite, "testcase", {
+                    "classname": ini_file,
+                    "name": "%s: %s" % (result["section"], result["name"]),
+                    "time": "%.6f" % result["time"]})
+                if result["status"] == "failed":
+                    failure = ET.SubElement(testcase, "failure", {"message": result.get("summary", "")})
+                    failure.text = "Expected rule %s, level %s, decoder %s. Got rule %s, level %s, decoder %s." % (
+                        result["expected_rule"], result["expected_level"], result["expected_decoder"],
+                        result.get("actual_rule", ""), result.get("actual_level", ""),
+                        result.get("actual_decoder", ""))
+        ET.ElementTree(testsuites).write(path, encoding="utf-8", xml_declaration=True)
+
     def print_results(self):
         template = "|{: ^25}|{: ^10}|{: ^10}|{: ^10}|"
         print(template.format("File", "Passed", "Failed", "Status"))
@@ -231,21 +341,16 @@ class OssecTester(object):
         for test_name in self._execution_data:
             passed_count = self._execution_data[test_name]["passed"]
             failed_count = self._execution_data[test_name]["failed"]
-            status = u'\u274c'.encode('utf-8') if (failed_count > 0) else u'\u2705'.encode('utf-8')
+            status = u'\u274c' if (failed_count > 0) else u'\u2705'
+            if sys.version_info[0] < 3:
+                status = status.encode('utf-8')
             print(template.format(test_name, passed_count, failed_count, status))
 
         if len(self._failed_tests):
             template = "|{: <10} |{: ^25}|{: ^25}|"
             print("\n\nFailing tests summary:")
             for failed_test in self._failed_tests:
-                if failed_test["actual_decoder"] == "":
-                    summary = "Log was unable to be decoded"
-                elif failed_test["actual_decoder"] != failed_test["expected_decoder"]:
-                    summary = "Log decoded by unexpected decoder. Expected: " + failed_test["expected_decoder"] + ". Got: " + failed_test["actual_decoder"]
-                elif failed_test["actual_rule"] != failed_test["expected_rule"]:
-                    summary = "Hit a different rule. Expected: " + failed_test["expected_rule"] + ". Got: " + failed_test["actual_rule"]
-                elif failed_test["actual_level"] != failed_test["expected_level"]:
-                    summary["summary"] = "Unexpected alert level. Expected: " + failed_test["expected_level"] + ". Got: " + failed_test["actual_level"]
+                summary = failure_summary(failed_test)
 
                 print("----------------------------------------")
                 print("Failed test: " + failed_test["line_name"])
@@ -257,6 +362,150 @@ class OssecTester(object):
                 print(template.format("Level", failed_test["expected_level"], failed_test["actual_level"]))
 
 
+def import_logtest_client(wazuh_home):
+    # wazuh-logtest client installed with the framework, it must run with the embedded Python interpreter
+    sys.path.insert(0, os.path.join(wazuh_home, "framework"))
+    from scripts.wazuh_logtest import WazuhLogtest
+    return WazuhLogtest
+
+
+class ParallelOssecTester(OssecTester):
+    """
+    Run the tests through the logtest socket instead of spawning one wazuh-logtest process per log.
+
+    Each worker keeps its own logtest session and takes whole test files from a shared queue. Tests with several
+    events, tests that must fail and tests failing in the shared session run in a new session, so the state left by
+    previous events (e.g. frequency rules) never changes their result.
+    """
+
+    def __init__(self, bdir, logtest_client, jobs=4, location="stdin"):
+        super(ParallelOssecTester, self).__init__(bdir)
+        self._logtest_client = logtest_client
+        self._jobs = jobs
+        self._location = location
+        self._lock = threading.Lock()
+
+    def processEvents(self, logtest, events, token=None):
+        """
+        Send the events to logtest and get the result of the last one.
+
+        :param logtest: WazuhLogtest instance.
+        :param events: Events to process.
+        :param token: Session token, a new session is created if it is not set.
+        :return: Dictionary with the actual rule, level, decoder and description, and the rules matched by any of the
+                 events, and the session token.
+        """
+        actual = {"actual_rule": "", "actual_level": "", "actual_decoder": "", "actual_parent_decoder": "",
+                  "description": "", "matched_rules": set()}
+        reply = None
+        for event in events:
+            try:
+                reply = logtest.process_log(event, token, {"rules_debug": True})
+            except (ValueError, ConnectionError) as e:
+                actual["description"] = "wazuh-logtest error: %s" % (str(e) or type(e).__name__)
+                return actual, token
+            token = reply["token"]
+            actual["matched_rules"].update(MATCHED_RULE_PATTERN.findall("\n".join(reply.get("rules_debug", []))))
+
+        if reply is None:
+            return actual, token
+
+        output = reply["output"]
+        if output.get("decoder"):
+            actual["actual_decoder"] = output["decoder"].get("name", "")
+            actual["actual_parent_decoder"] = output["decoder"].get("parent", "")
+        if "rule" in output:
+            actual["actual_rule"] = output["rule"]["id"]
+            actual["actual_level"] = str(output["rule"]["level"])
+            actual["description"] = output["rule"].get("description", "")
+        return actual, token
+
+    def processInNewSession(self, events):
+        logtest = self._logtest_client(location=self._location)
+        try:
+            return self.processEvents(logtest, events)[0]
+        finally:
+            logtest.remove_last_session()
+
+    def runCase(self, logtest, token, case):
+        """
+        Run a test case.
+
+        :param logtest: WazuhLogtest instance of the worker.
+        :param token: Session token of the worker.
+        :param case: Test case, as returned by load_test_cases.
+        :return: Tuple with the test status and the session token of the worker.
+        """
+        expected = (case["rule"], case["alert"], case["decoder"])
+        events = [event for event in case["log"].splitlines() if event]
+        start = time.time()
+
+        if case["negate"] or len(events) != 1:
+            actual = self.processInNewSession(events)
+        else:
+            actual, token = self.processEvents(logtest, events, token)
+            if (actual["actual_rule"], actual["actual_level"], actual["actual_decoder"]) != expected:
+                actual = self.processInNewSession(events)
+
+        matched = (actual["actual_rule"], actual["actual_level"], actual["actual_decoder"]) == expected
+        test_status = "passed" if matched != case["negate"] else "failed"
+        elapsed = time.time() - start
+
+        failed_test = None
+        if test_status == "failed":
+            failed_test = {"expected_level": case["alert"],
+                           "expected_rule": case["rule"],
+                           "expected_decoder": case["decoder"],
+                           "section": case["section"],
+                           "line_name": case["name"]}
+            failed_test.update((key, value) for key, value in actual.items() if key != "matched_rules")
+
+        with self._lock:
+            self.tested_rules.add(case["rule"])
+            self.tested_decoders.add(case["decoder"])
+            self.add_fired(actual["actual_rule"], actual["actual_decoder"], actual["actual_parent_decoder"])
+            self.fired_rules.update(actual["matched_rules"])
+            self._execution_data[case["file"]][test_status] += 1
+            self.add_result(case, test_status, elapsed, failed_test)
+            if failed_test:
+                self._error = True
+                self._failed_tests.append(failed_test)
+            sys.stdout.write("." if test_status == "passed" else "F")
+            sys.stdout.flush()
+
+        return test_status, token
+
+    def worker(self, test_files):
+        logtest = self._logtest_client(location=self._location)
+        token = None
+        try:
+            while True:
+                try:
+                    ini_file = test_files.get_nowait()
+                except queue.Empty:
+                    break
+                for case in load_test_cases(ini_file):
+                    token = self.runCase(logtest, token, case)[1]
+        finally:
+            logtest.remove_last_session()
+
+    def run(self, selective_test=False, geoip=False):
+        test_files = queue.Queue()
+        for a_ini_file in list_test_files(self._test_path, selective_test, geoip):
+            self._execution_data[a_ini_file] = {"passed": 0, "failed": 0}
+            test_files.put(a_ini_file)
+
+        workers = [threading.Thread(target=self.worker, args=(test_files,))
+                   for _ in range(max(1, min(self._jobs, test_files.qsize())))]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        print("\n\n")
+
+        return self._error
+
+
 def cleanup(*args):
     cleanDR()
     sys.exit(0)
@@ -272,6 +521,16 @@ if __name__ == "__main__":
                         help='Use -t or --testfile to pass the ini file to test')
     parser.add_argument('--skip-windows-eventchannel', '-s', action='store_false', dest='windows_tests',
                         help='Use -s or --skip-windows-eventchannel to avoid modifying windows event channel rules for testing.')
+    parser.add_argument('--jobs', '-j', action='store', type=int, default=0, dest='jobs',
+                        help='Use -j or --jobs to run the tests through the logtest socket with N parallel sessions. '
+                             'Requires the Python interpreter embedded in the Wazuh installation')
+    parser.add_argument('--json', action='store', type=str, dest='json_report',
+                        help='Use --json to write the results of every test to a JSON file')
+    parser.add_argument('--junit', action='store', type=str, dest='junit_report',
+                        help='Use --junit to write the results of every test to a JUnit XML file')
+    parser.add_argument('--coverage', action='store', type=str, dest='coverage_report',
+                        help='Use --coverage to write the rules and decoders that fired, and the ones that did not, '
+                             'to a JSON file')
     args = parser.parse_args()
     selective_test = False
     if args.testfile:
@@ -290,7 +549,10 @@ if __name__ == "__main__":
         enable_win_eventlog_tests()
 
     provisionDR()
-    OT = OssecTester(args.wazuh_home)
+    if args.jobs > 0:
+        OT = ParallelOssecTester(args.wazuh_home, import_logtest_client(args.wazuh_home), jobs=args.jobs)
+    else:
+        OT = OssecTester(args.wazuh_home)
     error = OT.run(selective_test, args.geoip)
 
     cleanDR()
@@ -300,15 +562,28 @@ if __name__ == "__main__":
     rules = get_rule_ids("/var/ossec/ruleset/rules/")
     decoders = get_parent_decoder_names("/var/ossec/ruleset/decoders/")
 
-    template = "|{: ^10}|{: ^10}|{: ^10}|{: ^10}|"
-    print(template.format("Component", "Tested", "Total", "Coverage"))
-    print(template.format("--------", "--------", "--------", "--------"))
-    template = "|{: ^10}|{: ^10}|{: ^10}|{: ^10.2%}|"
-    print(template.format("Rules", len(OT.tested_rules), len(rules), len(OT.tested_rules)/len(rules)))
-    print(template.format("Decoders", len(OT.tested_decoders), len(decoders), len(OT.tested_decoders)/len(decoders)))
+    fired_rules = OT.fired_rules & rules
+    fired_decoders = OT.fired_decoders & decoders
+
+    template = "|{: ^10}|{: ^10}|{: ^10}|{: ^10}|{: ^10}|"
+    print(template.format("Component", "Tested", "Fired", "Total", "Coverage"))
+    print(template.format("--------", "--------", "--------", "--------", "--------"))
+    template = "|{: ^10}|{: ^10}|{: ^10}|{: ^10}|{: ^10.2%}|"
+    print(template.format("Rules", len(OT.tested_rules), len(fired_rules), len(rules), len(fired_rules)/len(rules)))
+    print(template.format("Decoders", len(OT.tested_decoders), len(fired_decoders), len(decoders),
+                          len(fired_decoders)/len(decoders)))
     print("\n")
 
     OT.print_results()
 
+    if args.json_report:
+        OT.write_json_report(args.json_report)
+    if args.junit_report:
+        OT.write_junit_report(args.junit_report)
+    if args.coverage_report:
+        with open(args.coverage_report, "w") as report:
+            json.dump(get_coverage_report("/var/ossec/ruleset/rules/", "/var/ossec/ruleset/decoders/",
+                                          OT.fired_rules, OT.fired_decoders), report, indent=2)
+
     if error:
         sys.exit(1)
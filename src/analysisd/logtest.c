@@ -104,11 +104,13 @@ void * w_logtest_clients_handler(w_logtest_connection_t * connection) {
     int client;
     char msg_received[OS_MAXSTR];
     int size_msg_received;
+    int served;
     char * str_response;
 
     while (FOREVER()) {
 
         str_response = NULL;
+        served = 0;
 
         /* Wait for client */
         w_mutex_lock(&connection->mutex);
@@ -125,13 +127,35 @@ void * w_logtest_clients_handler(w_logtest_connection_t * connection) {
         }
         w_mutex_unlock(&connection->mutex);
 
-        switch (size_msg_received = OS_RecvSecureTCP(client, msg_received, OS_MAXSTR-1), size_msg_received) {
+        /* Limit the time an idle client holds this thread */
+        if (OS_SetRecvTimeout(client, W_LOGTEST_CONN_IDLE_TIMEOUT, 0) < 0) {
+            mdebug1("OS_SetRecvTimeout failed with error '%s'", strerror(errno));
+        }
+
+        /* Serve requests until the client closes the connection, so a client can send several requests on it.
+         * The connection is closed after a number of requests to let the clients waiting in the queue be served */
+        while (served < W_LOGTEST_CONN_MAX_REQUESTS
+               && (size_msg_received = OS_RecvSecureTCP(client, msg_received, OS_MAXSTR-1), size_msg_received > 0)) {
+            if (str_response = w_logtest_process_request(msg_received, connection), str_response) {
+                OS_SendSecureTCP(client, strlen(str_response), str_response);
+            }
+            os_free(str_response);
+            served++;
+        }
+
+        switch (size_msg_received) {
         case -1:
-            mdebug1(LOGTEST_ERROR_RECV_MSG_ERRNO, strerror(errno));
+            /* An idle client is disconnected once it has been served */
+            if (!served || (errno != EAGAIN && errno != EWOULDBLOCK)) {
+                mdebug1(LOGTEST_ERROR_RECV_MSG_ERRNO, strerror(errno));
+            }
             break;
 
         case 0:
-            mdebug1(LOGTEST_ERROR_RECV_MSG_EMPTY_TO);
+            /* The client closed the connection after its requests */
+            if (!served) {
+                mdebug1(LOGTEST_ERROR_RECV_MSG_EMPTY_TO);
+            }
             break;
 
         case OS_SOCKTERR:
@@ -140,11 +164,6 @@ void * w_logtest_clients_handler(w_logtest_connection_t * connection) {
                 OS_SendSecureTCP(client, strlen(str_response), str_response);
             }
             break;
-
-        default:
-            if (str_response = w_logtest_process_request(msg_received, connection), str_response) {
-                OS_SendSecureTCP(client, strlen(str_response), str_response);
-            }
         }
 
         os_free(str_response);
@@ -61,6 +61,10 @@
 #define W_LOGTEST_TOKEN_LENGH                 8   ///< Lenght of token
 #define W_LOGTEST_ERROR_JSON_PARSE_NSTR      20   ///< Number of characters to show in parsing error
 
+/* Limits of a client connection, so a client cannot hold a handler thread while others wait */
+#define W_LOGTEST_CONN_MAX_REQUESTS          64   ///< Maximum number of requests served per connection
+#define W_LOGTEST_CONN_IDLE_TIMEOUT           2   ///< Seconds to wait for the next request of a connection
+
 /* Return codes for responses */
 #define W_LOGTEST_RCODE_ERROR_INPUT          -2   ///< Return code: Input error, malformed json, input field missing
 #define W_LOGTEST_RCODE_ERROR_PROCESS        -1   ///< Return code: Processing with error
@@ -147,7 +151,8 @@ int w_logtest_init_parameters();
 /**
  * @brief Main function of Wazuh Logtest module
  *
- * Listen and treat connections with clients
+ * Listen and treat connections with clients. Each connection is served until the client closes it, sends
+ * W_LOGTEST_CONN_MAX_REQUESTS requests or stays idle for W_LOGTEST_CONN_IDLE_TIMEOUT seconds
  *
  */
 void *w_logtest_clients_handler();
@@ -62,6 +62,9 @@ static char* local_dispatch(const char *input);
 // Remove an agent
 static cJSON* local_remove(const char *id, int purge);
 
+// Remove a list of agents
+static cJSON* local_remove_list(const cJSON *ids, int purge);
+
 // Get agent data
 static cJSON* local_get(const char *id);
 
@@ -290,14 +293,18 @@ char* local_dispatch(const char *input) {
                 goto fail;
             }
 
-            if (item = cJSON_GetObjectItem(arguments, "id"), !item) {
-                ierror = ENOID;
-                goto fail;
-            }
-
             purge = cJSON_IsTrue(cJSON_GetObjectItem(arguments, "purge"));
 
-            response = local_remove(item->valuestring, purge);
+            if (item = cJSON_GetObjectItem(arguments, "ids"), cJSON_IsArray(item)) {
+                response = local_remove_list(item, purge);
+            } else {
+                if (item = cJSON_GetObjectItem(arguments, "id"), !item) {
+                    ierror = ENOID;
+                    goto fail;
+                }
+
+                response = local_remove(item->valuestring, purge);
+            }
         } else if (!strcmp(function->valuestring, "get")) {
             cJSON *item;
 
@@ -472,6 +479,54 @@ cJSON* local_remove(const char *id, int purge) {
     return response;
 }
 
+// Remove a list of agents
+cJSON* local_remove_list(const cJSON *ids, int purge) {
+    int index;
+    cJSON *item = NULL;
+    cJSON *response = NULL;
+    cJSON *data = NULL;
+    cJSON *removed = NULL;
+    cJSON *failed = NULL;
+
+    mdebug2("local_remove_list(%d agents, purge=%d)", cJSON_GetArraySize(ids), purge);
+
+    response = cJSON_CreateObject();
+    cJSON_AddNumberToObject(response, "error", 0);
+    data = cJSON_AddObjectToObject(response, "data");
+    removed = cJSON_AddArrayToObject(data, "removed");
+    failed = cJSON_AddArrayToObject(data, "failed");
+
+    w_mutex_lock(&mutex_keys);
+
+    cJSON_ArrayForEach(item, ids) {
+        if (!cJSON_IsString(item) || (index = OS_IsAllowedID(&keys, item->valuestring)) < 0) {
+            cJSON *failed_item = cJSON_CreateObject();
+
+            mdebug1("Error %d: %s.", ERRORS[ENOAGENT].code, ERRORS[ENOAGENT].message);
+            cJSON_AddStringToObject(failed_item, "id", cJSON_IsString(item) ? item->valuestring : "");
+            cJSON_AddNumberToObject(failed_item, "error", ERRORS[ENOAGENT].code);
+            cJSON_AddStringToObject(failed_item, "message", ERRORS[ENOAGENT].message);
+            cJSON_AddItemToArray(failed, failed_item);
+            continue;
+        }
+
+        minfo("Agent '%s' (%s) deleted (requested locally)", item->valuestring, keys.keyentries[index]->name);
+        /* Add pending key to write */
+        add_remove(keys.keyentries[index]);
+        OS_DeleteKey(&keys, item->valuestring, purge);
+        cJSON_AddItemToArray(removed, cJSON_CreateString(item->valuestring));
+    }
+
+    /* Wake the writer up once for the whole list */
+    if (cJSON_GetArraySize(removed) > 0) {
+        write_pending = 1;
+        w_cond_signal(&cond_pending);
+    }
+
+    w_mutex_unlock(&mutex_keys);
+    return response;
+}
+
 // Get agent data
 cJSON* local_get(const char *id) {
     int index;
@@ -47,6 +47,9 @@ static void* run_remote_server(void *arg);
 /* Thread for writing keystore onto disk */
 static void* run_writer(void *arg);
 
+/* Remove the databases of a batch of agents */
+static void remove_agents_db(const char *agent_ids, int *wdb_sock);
+
 /* Signal handler */
 static void handler(int signum);
 
@@ -920,8 +923,8 @@ void* run_writer(__attribute__((unused)) void *arg) {
     struct keynode *copy_remove;
     struct keynode *cur;
     struct keynode *next;
-    char wdbquery[OS_SIZE_128];
-    char wdboutput[128];
+    char remove_ids[OS_SIZE_4096];
+    size_t remove_len;
     int wdb_sock = -1;
 
     authd_sigblock();
@@ -935,6 +938,9 @@ void* run_writer(__attribute__((unused)) void *arg) {
         int inserted_agents = 0;
         int removed_agents = 0;
 
+        remove_ids[0] = '\0';
+        remove_len = 0;
+
         w_mutex_lock(&mutex_keys);
 
         while (!write_pending && running) {
@@ -1042,11 +1048,13 @@ void* run_writer(__attribute__((unused)) void *arg) {
             gettime(&t1);
             mdebug2("[Writer] wdb_remove_agent(): %d µs.", (int)(1000000. * (double)time_diff(&t0, &t1)));
 
-            snprintf(wdbquery, OS_SIZE_128, "wazuhdb remove %s", cur->id);
-            gettime(&t0);
-            wdbc_query_ex(&wdb_sock, wdbquery, wdboutput, sizeof(wdboutput));
-            gettime(&t1);
-            mdebug2("[Writer] wdbc_query_ex(): %d µs.", (int)(1000000. * (double)time_diff(&t0, &t1)));
+            /* Agent databases are removed in batches with a single query */
+            if (remove_len + strlen(cur->id) + 2 > sizeof(remove_ids)) {
+                remove_agents_db(remove_ids, &wdb_sock);
+                remove_len = 0;
+            }
+
+            remove_len += snprintf(remove_ids + remove_len, sizeof(remove_ids) - remove_len, " %s", cur->id);
 
             os_free(cur->id);
             os_free(cur->name);
@@ -1058,6 +1066,10 @@ void* run_writer(__attribute__((unused)) void *arg) {
             removed_agents++;
         }
 
+        if (remove_len > 0) {
+            remove_agents_db(remove_ids, &wdb_sock);
+        }
+
         gettime(&global_t1);
         mdebug2("[Writer] Inserted agents: %d", inserted_agents);
         mdebug2("[Writer] Removed agents: %d", removed_agents);
@@ -1067,6 +1079,23 @@ void* run_writer(__attribute__((unused)) void *arg) {
     return NULL;
 }
 
+/* Remove the databases of a batch of agents. agent_ids is a list of IDs, each one preceded by a space */
+void remove_agents_db(const char *agent_ids, int *wdb_sock) {
+    char wdbquery[OS_SIZE_4096 + 16];
+    char *wdboutput;
+    struct timespec t0, t1;
+
+    os_malloc(OS_MAXSTR, wdboutput);
+    snprintf(wdbquery, sizeof(wdbquery), "wazuhdb remove%s", agent_ids);
+
+    gettime(&t0);
+    wdbc_query_ex(wdb_sock, wdbquery, wdboutput, OS_MAXSTR);
+    gettime(&t1);
+    mdebug2("[Writer] wdbc_query_ex(): %d µs.", (int)(1000000. * (double)time_diff(&t0, &t1)));
+
+    os_free(wdboutput);
+}
+
 /* To avoid hp-ux requirement of strsignal */
 #ifdef __hpux
 char* strsignal(int sig)
@@ -555,6 +555,10 @@ int __wrap_OS_SendSecureTCP(int sock, uint32_t size, const void * msg) {
     return mock_type(int);
 }
 
+int __wrap_OS_SetRecvTimeout(int socket, long seconds, long useconds) {
+    return mock_type(int);
+}
+
 /* tests */
 
 /* w_logtest_init_parameters */
@@ -697,6 +701,8 @@ void test_w_logtest_init_unlink_fail(void **state)
 
     will_return(__wrap_pthread_mutex_unlock, 0);
 
+    will_return(__wrap_OS_SetRecvTimeout, 0);
+
     will_return(__wrap_OS_RecvSecureTCP, 0);
 
     expect_string(__wrap__mdebug1, formatted_msg, "(7314): Failure to receive message: empty or reception timeout");
@@ -751,6 +757,8 @@ void test_w_logtest_init_done(void **state)
 
     will_return(__wrap_pthread_mutex_unlock, 0);
 
+    will_return(__wrap_OS_SetRecvTimeout, 0);
+
     will_return(__wrap_OS_RecvSecureTCP, 0);
 
     expect_string(__wrap__mdebug1, formatted_msg, "(7314): Failure to receive message: empty or reception timeout");
@@ -4573,6 +4581,8 @@ void test_w_logtest_clients_handler_recv_error(void ** state)
 
     will_return(__wrap_pthread_mutex_unlock, 0);
 
+    will_return(__wrap_OS_SetRecvTimeout, 0);
+
     will_return(__wrap_OS_RecvSecureTCP, -1);
     errno = ENOTCONN;
     snprintf(expected_str, OS_SIZE_1024, "(7302): Failure to receive message: Errno: %s", strerror(ENOTCONN));
@@ -4599,6 +4609,39 @@ void test_w_logtest_clients_handler_recv_msg_empty(void ** state)
 
     will_return(__wrap_pthread_mutex_unlock, 0);
 
+    will_return(__wrap_OS_SetRecvTimeout, 0);
+
+    will_return(__wrap_OS_RecvSecureTCP, 0);
+
+    expect_string(__wrap__mdebug1, formatted_msg, "(7314): Failure to receive message: empty or reception timeout");
+
+    will_return(__wrap_close, 0);
+    will_return(__wrap_FOREVER, 0);
+
+
+    assert_null(w_logtest_clients_handler(&conection));
+
+}
+
+void test_w_logtest_clients_handler_set_timeout_error(void ** state)
+{
+    w_logtest_connection_t conection = {0};
+    char expected_str[OS_SIZE_1024];
+
+    will_return(__wrap_FOREVER, 1);
+
+    will_return(__wrap_pthread_mutex_lock, 0);
+
+    will_return(__wrap_accept, 5);
+
+    will_return(__wrap_pthread_mutex_unlock, 0);
+
+    will_return(__wrap_OS_SetRecvTimeout, -1);
+    errno = EBADF;
+    snprintf(expected_str, OS_SIZE_1024, "OS_SetRecvTimeout failed with error '%s'", strerror(EBADF));
+
+    expect_string(__wrap__mdebug1, formatted_msg, expected_str);
+
     will_return(__wrap_OS_RecvSecureTCP, 0);
 
     expect_string(__wrap__mdebug1, formatted_msg, "(7314): Failure to receive message: empty or reception timeout");
@@ -4623,6 +4666,8 @@ void test_w_logtest_clients_handler_recv_msg_oversize(void ** state)
 
     will_return(__wrap_pthread_mutex_unlock, 0);
 
+    will_return(__wrap_OS_SetRecvTimeout, 0);
+
     will_return(__wrap_OS_RecvSecureTCP, -6);
 
     expect_string(__wrap__mdebug1, formatted_msg, "(7315): Failure to receive message: size is bigger than expected");
@@ -4658,6 +4703,7 @@ void test_w_logtest_clients_handler_ok(void ** state)
     will_return(__wrap_pthread_mutex_lock, 0);
     will_return(__wrap_accept, 5);
     will_return(__wrap_pthread_mutex_unlock, 0);
+    will_return(__wrap_OS_SetRecvTimeout, 0);
     will_return(__wrap_OS_RecvSecureTCP, 100);
 
     /* w_logtest_process_request */
@@ -4749,6 +4795,9 @@ void test_w_logtest_clients_handler_ok(void ** state)
 
     will_return(__wrap_OS_SendSecureTCP, 0);
 
+    /* The client closes the connection */
+    will_return(__wrap_OS_RecvSecureTCP, 0);
+
     will_return(__wrap_close, 0);
     will_return(__wrap_FOREVER, 0);
 
@@ -6687,6 +6736,7 @@ int main(void)
         cmocka_unit_test(test_w_logtest_clients_handler_error_acept_close_socket),
         cmocka_unit_test(test_w_logtest_clients_handler_recv_error),
         cmocka_unit_test(test_w_logtest_clients_handler_recv_msg_empty),
+        cmocka_unit_test(test_w_logtest_clients_handler_set_timeout_error),
         cmocka_unit_test(test_w_logtest_clients_handler_recv_msg_oversize),
         cmocka_unit_test(test_w_logtest_clients_handler_ok),
         // w_logtest_process_request_log_processing
@@ -147,6 +147,11 @@ void test_wm_agent_upgrade_listen_messages_upgrade_command(void **state)
     expect_string(__wrap_OS_SendSecureTCP, msg, response);
     will_return(__wrap_OS_SendSecureTCP, 0);
 
+    expect_value(__wrap_OS_RecvSecureTCP, sock, peer);
+    expect_value(__wrap_OS_RecvSecureTCP, size, OS_MAXSTR);
+    will_return(__wrap_OS_RecvSecureTCP, input);
+    will_return(__wrap_OS_RecvSecureTCP, 0);
+
     wm_agent_upgrade_listen_messages(config);
 }
 
@@ -248,6 +253,11 @@ void test_wm_agent_upgrade_listen_messages_upgrade_custom_command(void **state)
     expect_string(__wrap_OS_SendSecureTCP, msg, response);
     will_return(__wrap_OS_SendSecureTCP, 0);
 
+    expect_value(__wrap_OS_RecvSecureTCP, sock, peer);
+    expect_value(__wrap_OS_RecvSecureTCP, size, OS_MAXSTR);
+    will_return(__wrap_OS_RecvSecureTCP, input);
+    will_return(__wrap_OS_RecvSecureTCP, 0);
+
     wm_agent_upgrade_listen_messages(config);
 }
 
@@ -351,6 +361,11 @@ void test_wm_agent_upgrade_listen_messages_agent_update_status_command(void **st
     expect_string(__wrap_OS_SendSecureTCP, msg, response);
     will_return(__wrap_OS_SendSecureTCP, 0);
 
+    expect_value(__wrap_OS_RecvSecureTCP, sock, peer);
+    expect_value(__wrap_OS_RecvSecureTCP, size, OS_MAXSTR);
+    will_return(__wrap_OS_RecvSecureTCP, input);
+    will_return(__wrap_OS_RecvSecureTCP, 0);
+
     wm_agent_upgrade_listen_messages(config);
 }
 
@@ -456,6 +471,11 @@ void test_wm_agent_upgrade_listen_messages_upgrade_result_command(void **state)
     expect_string(__wrap_OS_SendSecureTCP, msg, response);
     will_return(__wrap_OS_SendSecureTCP, 0);
 
+    expect_value(__wrap_OS_RecvSecureTCP, sock, peer);
+    expect_value(__wrap_OS_RecvSecureTCP, size, OS_MAXSTR);
+    will_return(__wrap_OS_RecvSecureTCP, input);
+    will_return(__wrap_OS_RecvSecureTCP, 0);
+
     wm_agent_upgrade_listen_messages(config);
 }
 
@@ -515,6 +535,11 @@ void test_wm_agent_upgrade_listen_messages_parse_error(void **state)
     expect_string(__wrap_OS_SendSecureTCP, msg, response);
     will_return(__wrap_OS_SendSecureTCP, 0);
 
+    expect_value(__wrap_OS_RecvSecureTCP, sock, peer);
+    expect_value(__wrap_OS_RecvSecureTCP, size, OS_MAXSTR);
+    will_return(__wrap_OS_RecvSecureTCP, input);
+    will_return(__wrap_OS_RecvSecureTCP, 0);
+
     wm_agent_upgrade_listen_messages(config);
 }
 
@@ -569,6 +594,11 @@ void test_wm_agent_upgrade_listen_messages_parse_error_with_message(void **state
     expect_string(__wrap_OS_SendSecureTCP, msg, response);
     will_return(__wrap_OS_SendSecureTCP, 0);
 
+    expect_value(__wrap_OS_RecvSecureTCP, sock, peer);
+    expect_value(__wrap_OS_RecvSecureTCP, size, OS_MAXSTR);
+    will_return(__wrap_OS_RecvSecureTCP, input);
+    will_return(__wrap_OS_RecvSecureTCP, 0);
+
     wm_agent_upgrade_listen_messages(config);
 }
 
@@ -129,22 +129,14 @@ STATIC void wm_agent_upgrade_listen_messages(const wm_manager_configs* manager_c
             continue;
         }
 
-        // Get request string
+        // Serve the requests of the client until it closes the connection
         char *buffer = NULL;
+        int served = 0;
+        int length;
 
         os_calloc(OS_MAXSTR, sizeof(char), buffer);
-        int length;
-        switch (length = OS_RecvSecureTCP(peer, buffer, OS_MAXSTR), length) {
-        case OS_SOCKTERR:
-            mterror(WM_AGENT_UPGRADE_LOGTAG, WM_UPGRADE_SOCKTERR_ERROR);
-            break;
-        case -1:
-            mterror(WM_AGENT_UPGRADE_LOGTAG, WM_UPGRADE_RECV_ERROR, strerror(errno));
-            break;
-        case 0:
-            mtdebug1(WM_AGENT_UPGRADE_LOGTAG, WM_UPGRADE_EMPTY_MESSAGE);
-            break;
-        default:
+
+        while (length = OS_RecvSecureTCP(peer, buffer, OS_MAXSTR), length > 0) {
             /* Correctly received message */
             mtdebug1(WM_AGENT_UPGRADE_LOGTAG, WM_UPGRADE_INCOMMING_MESSAGE, buffer);
 
@@ -197,6 +189,21 @@ STATIC void wm_agent_upgrade_listen_messages(const wm_manager_configs* manager_c
             OS_SendSecureTCP(peer, strlen(message), message);
             os_free(agent_ids);
             os_free(message);
+            served++;
+        }
+
+        switch (length) {
+        case OS_SOCKTERR:
+            mterror(WM_AGENT_UPGRADE_LOGTAG, WM_UPGRADE_SOCKTERR_ERROR);
+            break;
+        case -1:
+            mterror(WM_AGENT_UPGRADE_LOGTAG, WM_UPGRADE_RECV_ERROR, strerror(errno));
+            break;
+        case 0:
+            // The client closes the connection once all of its requests are answered
+            if (!served) {
+                mtdebug1(WM_AGENT_UPGRADE_LOGTAG, WM_UPGRADE_EMPTY_MESSAGE);
+            }
             break;
         }
 
@@ -139,3 +139,7 @@ MITIGATES_j= 'mitigates'
 USES_j= 'uses'
 REVOKED_BY_j= 'revoked-by'
 SUBTECHNIQUE_OF_j= 'subtechnique-of'
+
+### Build
+READ_CHUNK_SIZE = 1024 * 1024
+TMP_SUFFIX = '.tmp'
@@ -18,6 +18,7 @@ import pwd
 import sys
 
 from sqlalchemy import create_engine, Column, DateTime, String, ForeignKey, Boolean
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 
@@ -394,6 +395,10 @@ class Phase(Base):
     tech_id = Column(const.TECH_ID_t, String, ForeignKey(const.TECHNIQUE_ID_fk, ondelete='CASCADE'), primary_key=True)
 
 
+# Tables whose rows are compared by modification time to know whether the database is up to date
+DIFF_TABLES = (Technique, Group, Software, Mitigation, Tactic, Mitigate, Use)
+
+
 def parse_table(function, data_object):
     row = {}
     row[const.ID_t] = data_object[const.ID_t]
@@ -600,136 +605,244 @@ def parse_json_relationships(relationships_json, relationship_table_revoked_by,
         use_rows_list.append(use)
 
 
-def parse_list_phases(session, phase_list):
+def parse_list_phases(tactic_ids, phase_list):
     row = {}
 
     row[const.TECH_ID_t] = phase_list[0]
-    tactic = session.query(Tactic).filter_by(short_name=phase_list[1]).first()
-    row[const.TACTIC_ID_t] = tactic.id
+    row[const.TACTIC_ID_t] = tactic_ids[phase_list[1]]
 
     return row
 
 
-def parse_json(pathfile, session, database):
+class BundleReader:
+    """
+    Incremental reader of a STIX bundle. The objects of the bundle are decoded one by one while the file is read in
+    chunks, so the whole JSON document is never loaded in memory.
+    """
+
+    def __init__(self, json_file, chunk_size=const.READ_CHUNK_SIZE):
+        self.json_file = json_file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """
+        Read the next chunk of the file, discarding the part of the buffer already decoded.
+
+        :return: False if the end of the file was reached, True otherwise.
+        """
+        data = self.json_file.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def _peek(self):
+        """
+        Get the next character that is not a whitespace, without consuming it.
+
+        :return: Next character or an empty string at the end of the file.
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f"Expected '{char}' at position {self.pos} of the bundle")
+        self.pos += 1
+
+    def _decode(self):
+        """
+        Decode the next JSON value, reading more chunks until it is complete.
+
+        :return: Decoded value.
+        """
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number could continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def __iter__(self):
+        """
+        Iterate over the bundle.
+
+        :return: Tuples (key, value) with the top-level fields of the bundle. Each item of the objects list is returned
+        as a separate (objects, item) tuple.
+        """
+        self._expect('{')
+        while self._peek() != '}':
+            if self._peek() == ',':
+                self.pos += 1
+                continue
+            key = self._decode()
+            self._expect(':')
+            if key != const.OBJECT_j:
+                yield key, self._decode()
+                continue
+
+            self._expect('[')
+            while self._peek() != ']':
+                if self._peek() == ',':
+                    self.pos += 1
+                    continue
+                yield key, self._decode()
+            self._expect(']')
+
+
+def parse_json(pathfile):
     """
-    Parse enterprise-attack.json and fill mitre.db's tables.
+    Parse enterprise-attack.json into the rows of each mitre.db table.
 
     :param pathfile: Path directory where enterprise-attack.json file is
-    :param session: SQLAlchemy session
+    :return: Dictionary with the table classes as keys and the list of rows of each table as values.
+    """
+    # Lists
+    phases_table = []
+    techniques = []
+    groups = []
+    mitigations = []
+    softwares = []
+    tactics = []
+    relationship_table_revoked_by = []
+    relationship_table_subtechique_of = []
+    metadata = [{const.KEY_t: const.DB_VERSION_t, const.VALUE_t: const.DB_VERSION_N_t}]
+
+    with open(pathfile) as json_file:
+        for key, data_object in BundleReader(json_file):
+            if key == const.VERSION_j:
+                metadata.append({const.KEY_t: const.MITRE_VERSION_t, const.VALUE_t: data_object})
+                continue
+            elif key != const.OBJECT_j:
+                continue
+
+            if data_object[const.TYPE_j] == const.INTRUSION_SET_j:
+                group = parse_table(Group, data_object)
+                groups.append(group)
+            elif data_object[const.TYPE_j] == const.COURSE_OF_ACTION_j:
+                mitigation = parse_table(Mitigation, data_object)
+                mitigations.append(mitigation)
+            elif data_object[const.TYPE_j] == const.MALWARE_j or \
+                    data_object[const.TYPE_j] == const.TOOL_j:
+                software = parse_table(Software, data_object)
+                softwares.append(software)
+            elif data_object[const.TYPE_j] == const.TACTIC_j:
+                tactic = parse_table(Tactic, data_object)
+                tactics.append(tactic)
+            elif data_object[const.TYPE_j] == const.ATTACK_PATTERN_j:
+                technique = parse_json_techniques(data_object, phases_table)
+                techniques.append(technique)
+            elif data_object[const.TYPE_j] == const.RELATIONSHIP_j:
+                parse_json_relationships(data_object, relationship_table_revoked_by,
+                                         relationship_table_subtechique_of)
+
+    # Resolve the relationships in memory instead of updating each row through the session
+    tactic_ids = {tactic[const.SHORT_NAME_t]: tactic[const.ID_t] for tactic in tactics if const.SHORT_NAME_t in tactic}
+    phase_rows_list = [parse_list_phases(tactic_ids, table) for table in phases_table]
+
+    rows_by_id = {row[const.ID_t]: row for rows in (groups, mitigations, softwares, techniques) for row in rows}
+    for table in relationship_table_revoked_by:
+        if table[0] in rows_by_id:
+            rows_by_id[table[0]][const.REVOKED_BY_t] = table[1]
+
+    for table in relationship_table_subtechique_of:
+        rows_by_id[table[0]][const.SUBTECHNIQUE_OF_t] = table[1]
+
+    # Tables in insertion order
+    return {
+        Metadata: metadata,
+        Technique: techniques,
+        DataSource: data_source_rows_list,
+        DefenseByPasses: defense_bypassed_rows_list,
+        EffectivePermission: effective_permission_rows_list,
+        Impact: impact_rows_list,
+        Permission: permission_req_rows_list,
+        SystemRequirement: requirement_rows_list,
+        Group: groups,
+        Mitigation: mitigations,
+        Software: softwares,
+        Tactic: tactics,
+        Phase: phase_rows_list,
+        Mitigate: mitigate_rows_list,
+        Use: use_rows_list,
+        Aliases: alias_rows_list,
+        Contributors: contributor_rows_list,
+        Platforms: platform_rows_list,
+        References: external_reference_rows_list
+    }
+
+
+def is_up_to_date(database, tables):
+    """
+    Check whether an existing mitre.db already contains the parsed bundle. The MITRE and database versions stored in
+    the metadata table and the modification time of every object must match.
+
     :param database: path to mitre.db
-    :return:
+    :param tables: Rows of each table, as returned by parse_json
+    :return: True if the database does not need to be built again, False otherwise.
     """
-    try:
-        # Lists
-        phases_table = []
-        techniques = []
-        groups = []
-        mitigations = []
-        softwares = []
-        tactics = []
-        relationship_table_revoked_by = []
-        relationship_table_subtechique_of = []
-
-        metadata = Metadata()
-        metadata.key = const.DB_VERSION_t
-        metadata.value = const.DB_VERSION_N_t
-        session.add(metadata)
-
-        with open(pathfile) as json_file:
-            datajson = json.load(json_file)
-            metadata = Metadata()
-            metadata.key = const.MITRE_VERSION_t
-            metadata.value = datajson[const.VERSION_j]
-            session.add(metadata)
-            for data_object in datajson[const.OBJECT_j]:
-                if data_object[const.TYPE_j] == const.INTRUSION_SET_j:
-                    group = parse_table(Group, data_object)
-                    groups.append(group)
-                elif data_object[const.TYPE_j] == const.COURSE_OF_ACTION_j:
-                    mitigation = parse_table(Mitigation, data_object)
-                    mitigations.append(mitigation)
-                elif data_object[const.TYPE_j] == const.MALWARE_j or \
-                        data_object[const.TYPE_j] == const.TOOL_j:
-                    software = parse_table(Software, data_object)
-                    softwares.append(software)
-                elif data_object[const.TYPE_j] == const.TACTIC_j:
-                    tactic = parse_table(Tactic, data_object)
-                    tactics.append(tactic)
-                elif data_object[const.TYPE_j] == const.ATTACK_PATTERN_j:
-                    technique = parse_json_techniques(data_object, phases_table)
-                    techniques.append(technique)
-                elif data_object[const.TYPE_j] == const.RELATIONSHIP_j:
-                    parse_json_relationships(data_object, relationship_table_revoked_by,
-                                             relationship_table_subtechique_of)
-                else:
-                    continue
+    if not os.path.exists(database):
+        return False
 
-        session.bulk_insert_mappings(Technique, techniques)
-        session.bulk_insert_mappings(DataSource, data_source_rows_list)
-        session.bulk_insert_mappings(DefenseByPasses, defense_bypassed_rows_list)
-        session.bulk_insert_mappings(EffectivePermission, effective_permission_rows_list)
-        session.bulk_insert_mappings(Impact, impact_rows_list)
-        session.bulk_insert_mappings(Permission, permission_req_rows_list)
-        session.bulk_insert_mappings(SystemRequirement, requirement_rows_list)
-        session.bulk_insert_mappings(Group, groups)
-        session.bulk_insert_mappings(Mitigation, mitigations)
-        session.bulk_insert_mappings(Software, softwares)
-        session.bulk_insert_mappings(Tactic, tactics)
-        session.commit()
-
-        phase_rows_list = []
-        for table in phases_table:
-            phase = parse_list_phases(session, table)
-            phase_rows_list.append(phase)
-        session.bulk_insert_mappings(Phase, phase_rows_list)
-        session.commit()
-
-        for table in relationship_table_revoked_by:
-            if table[0].startswith(const.INTRUSION_SET_j):
-                groups = session.query(Group).get(table[0])
-                groups.revoked_by = table[1]
+    def normalize(modified_time):
+        return modified_time.replace(tzinfo=None) if modified_time else None
 
-            elif table[0].startswith(const.COURSE_OF_ACTION_j):
-                mitigations = session.query(Mitigation).get(table[0])
-                mitigations.revoked_by = table[1]
+    engine = create_engine('sqlite:///' + database, echo=False)
+    session = sessionmaker(bind=engine)()
+    try:
+        stored_metadata = {row.key: row.value for row in session.query(Metadata)}
+        if stored_metadata != {row[const.KEY_t]: row[const.VALUE_t] for row in tables[Metadata]}:
+            return False
 
-            elif table[0].startswith(const.MALWARE_j) or table[0].startswith(const.TOOL_j):
-                software = session.query(Software).get(table[0])
-                software.revoked_by = table[1]
+        for table in DIFF_TABLES:
+            stored = {row_id: normalize(modified_time) for row_id, modified_time in
+                      session.query(table.id, table.modified_time)}
+            parsed = {row[const.ID_t]: normalize(row.get(const.MODIFIED_t)) for row in tables[table]}
+            if stored != parsed:
+                return False
+    except SQLAlchemyError:
+        return False
+    finally:
+        session.close()
+        engine.dispose()
 
-            elif table[0].startswith(const.ATTACK_PATTERN_j):
-                technique = session.query(Technique).get(table[0])
-                technique.revoked_by = table[1]
+    return True
 
-        for table in relationship_table_subtechique_of:
-            technique = session.query(Technique).get(table[0])
-            technique.subtechnique_of = table[1]
 
-        session.bulk_insert_mappings(Mitigate, mitigate_rows_list)
-        session.bulk_insert_mappings(Use, use_rows_list)
+def build_database(database, tables):
+    """
+    Create mitre.db and fill its tables in a single transaction.
 
-        session.bulk_insert_mappings(Aliases, alias_rows_list)
-        session.bulk_insert_mappings(Contributors, contributor_rows_list)
-        session.bulk_insert_mappings(Platforms, platform_rows_list)
-        session.bulk_insert_mappings(References, external_reference_rows_list)
+    :param database: path to the new mitre.db
+    :param tables: Rows of each table, as returned by parse_json
+    :return:
+    """
+    engine = create_engine('sqlite:///' + database, echo=False)
+    Base.metadata.create_all(engine)
 
+    session = sessionmaker(bind=engine)()
+    try:
+        for table, rows in tables.items():
+            session.bulk_insert_mappings(table, rows)
         session.commit()
-
-    except TypeError as t_e:
-        print(t_e)
-        print("Deleting " + database)
-        os.remove(database)
-        sys.exit(1)
-    except KeyError as k_e:
-        print(k_e)
-        print("Deleting " + database)
-        os.remove(database)
-        sys.exit(1)
-    except NameError as n_e:
-        print(n_e)
-        print("Deleting " + database)
-        os.remove(database)
-        sys.exit(1)
+    finally:
+        session.close()
+        engine.dispose()
 
 
 def find(name, path):
@@ -738,11 +851,14 @@ def find(name, path):
             return os.path.join(root, name)
 
 
-def main(database=None):
+def main(database=None, force=False):
     """
-    Main function that creates the mitre database in a chosen directory. It deletes, creates and fills the mitre tables.
+    Main function that creates the mitre database in a chosen directory. The database is built in a temporary file
+    next to the final one, which is replaced atomically, so readers never see a partially built database. Nothing is
+    done if the existing database already contains the same MITRE version and objects.
 
     :param database: Directory where mitre.db is. Default: /var/ossec/var/db/mitre.db
+    :param force: Build the database even if it is up to date.
     :return:
     """
     if database is None:
@@ -753,28 +869,41 @@ def main(database=None):
 
     pathfile = find('enterprise-attack.json', '../..')
 
-    engine = create_engine('sqlite:///' + database, echo=False)
+    # Parse enterprise-attack.json file:
+    try:
+        tables = parse_json(pathfile)
+    except (TypeError, KeyError, NameError, ValueError) as e:
+        print(e)
+        sys.exit(1)
 
-    # Create a database connection
-    Session = sessionmaker(bind=engine)
-    session = Session()
+    if not force and is_up_to_date(database, tables):
+        print(database + " is up to date")
+        return
 
-    # Delete and create tables
-    Base.metadata.drop_all(engine)
-    Base.metadata.create_all(engine)
+    tmp_database = database + const.TMP_SUFFIX
+    if os.path.exists(tmp_database):
+        os.remove(tmp_database)
 
-    # Parse enterprise-attack.json file:
-    parse_json(pathfile, session, database)
+    try:
+        build_database(tmp_database, tables)
+    except SQLAlchemyError as e:
+        print(e)
+        print("Deleting " + tmp_database)
+        os.remove(tmp_database)
+        sys.exit(1)
 
     # User and group permissions
-    os.chmod(database, 0o660)
+    os.chmod(tmp_database, 0o660)
     uid = pwd.getpwnam("root").pw_uid
     gid = grp.getgrnam("wazuh").gr_gid
-    os.chown(database, uid, gid)
+    os.chown(tmp_database, uid, gid)
+
+    os.replace(tmp_database, database)
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='This script installs mitre.db in a directory.')
     parser.add_argument('--database', '-d', help='-d /your/directory/mitre.db (default: /var/ossec/var/db/mitre.db')
+    parser.add_argument('--force', '-f', action='store_true', help='Build mitre.db even if it is up to date')
     args = parser.parse_args()
-    main(args.database)
+    main(args.database, args.force)
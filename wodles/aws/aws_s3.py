@@ -46,7 +46,11 @@ import gzip
 import zipfile
 import re
 import io
+import shutil
+import tempfile
 import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from os import path
 import operator
 from datetime import datetime
@@ -74,6 +78,13 @@ GUARDDUTY_DEPRECATED_MESSAGE = 'The functionality to process GuardDuty logs stor
                                'in {release}. Consider configuring GuardDuty to store its findings directly in an S3 ' \
                                'bucket instead. Check {url} for more information. '
 DEFAULT_AWS_CONFIG_PATH = path.join(path.expanduser('~'), '.aws', 'config')
+# Size of the chunks read from the S3 objects
+STREAM_CHUNK_SIZE = 64 * 1024
+# Zip files need random access, so they are spooled to disk when bigger than this
+ZIP_SPOOL_MAX_SIZE = 16 * 1024 * 1024
+# The decoded events of a log file are spooled to disk when bigger than this
+EVENTS_SPOOL_MAX_SIZE = 16 * 1024 * 1024
+GZIP_MAGIC_NUMBER = b'\x1f\x8b'
 
 # Enable/disable debug mode
 debug_level = 0
@@ -92,6 +103,204 @@ THROTTLING_EXCEPTION_ERROR_MESSAGE = "The '{name}' request was denied due to req
 # Classes
 ################################################################################
 
+class StreamingBodyIO(io.RawIOBase):
+    """
+    Raw binary stream reading from the body of a S3 object as it is downloaded.
+
+    Parameters
+    ----------
+    body : botocore.response.StreamingBody
+        Body of the object returned by the `get_object` request.
+    """
+
+    def __init__(self, body):
+        super().__init__()
+        self.body = body
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.body.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.body.close()
+        super().close()
+
+
+class ClosingGzipFile(gzip.GzipFile):
+    """GzipFile that also closes the file object it reads from when it is closed."""
+
+    def close(self):
+        fileobj = self.fileobj
+        try:
+            super().close()
+        finally:
+            if fileobj is not None:
+                fileobj.close()
+
+
+class JSONStreamReader:
+    """
+    Decode JSON values from a text stream incrementally.
+
+    Only the data needed to decode the next value is kept in memory, so the size of the stream is not limited as long
+    as each value fits in memory.
+
+    Parameters
+    ----------
+    file : file_object
+        Text stream to read from.
+    data : str
+        Data already read from the stream.
+    chunk_size : int
+        Number of characters to read from the stream each time more data is needed.
+    """
+    whitespace_regex = re.compile(r'\s*')
+    number_chars = '+-.0123456789eE'
+
+    def __init__(self, file, data='', chunk_size=STREAM_CHUNK_SIZE):
+        self.file = file
+        self.buffer = data
+        self.pos = 0
+        self.chunk_size = chunk_size
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _read(self, size):
+        """Append the next chunk of the stream to the buffer, dropping the data already consumed.
+
+        Returns
+        -------
+        bool
+            False if the end of the stream was reached, True otherwise.
+        """
+        if not self.eof:
+            chunk = self.file.read(size)
+            if chunk:
+                self.buffer = self.buffer[self.pos:] + chunk
+                self.pos = 0
+                return True
+            self.eof = True
+        return False
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it or an empty string at the end of the stream."""
+        while True:
+            self.pos = self.whitespace_regex.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._read(self.chunk_size):
+                return ''
+
+    def expect(self, chars):
+        """Consume the next non-whitespace character, which must be one of the given ones.
+
+        Raises
+        ------
+        ValueError
+            If a different character is found.
+        """
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"Expecting one of '{chars}' but found '{char}'")
+        self.pos += 1
+        return char
+
+    def decode(self):
+        """Decode the next JSON value of the stream.
+
+        Raises
+        ------
+        ValueError
+            If the stream doesn't contain a valid JSON value.
+        """
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number is only complete if the character after it cannot continue it. '1.' or '1.5e' decode as
+                # a valid prefix when the rest of the number is in the next chunk
+                is_number = self.buffer[self.pos] in self.number_chars
+                if self.eof or (end < len(self.buffer) and
+                                (not is_number or self.buffer[end] not in self.number_chars)):
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            # Read bigger chunks each time to avoid decoding a long value over and over
+            self._read(size)
+            size *= 2
+
+    def iter_values(self):
+        """Yield every JSON value of the stream."""
+        while self.peek():
+            yield self.decode()
+
+    def iter_field_items(self, field):
+        """Yield the items of the array stored in a field of the JSON object of the stream.
+
+        Parameters
+        ----------
+        field : str
+            Name of the field of the object containing the array.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            return
+        while True:
+            key = self.decode()
+            self.expect(':')
+            if key == field:
+                self.expect('[')
+                if self.peek() == ']':
+                    return
+                while True:
+                    yield self.decode()
+                    if self.expect(',]') == ']':
+                        return
+            self.decode()
+            if self.expect(',}') == '}':
+                return
+
+
+def spool_events(events):
+    """
+    Write events to a temporary file, kept in memory while it is small, and return an iterator reading them back.
+
+    Parameters
+    ----------
+    events : iterable of dict
+        Events to spool. They are consumed completely before returning.
+
+    Returns
+    -------
+    iterator of dict
+        The spooled events. The temporary file is removed once they have been read.
+    """
+    spooled_file = tempfile.SpooledTemporaryFile(max_size=EVENTS_SPOOL_MAX_SIZE, mode='w+', encoding='utf-8')
+    try:
+        for event in events:
+            spooled_file.write(json.dumps(event))
+            spooled_file.write('\n')
+        spooled_file.seek(0)
+    except BaseException:
+        spooled_file.close()
+        raise
+
+    def read_events():
+        with spooled_file:
+            for line in spooled_file:
+                yield json.loads(line)
+
+    return read_events()
+
+
 
 class WazuhIntegration:
     """
@@ -104,11 +313,13 @@ class WazuhIntegration:
     :param region: Region of service
     :param bucket: Bucket name to extract logs from
     :param iam_role_duration: The desired duration of the session that is going to be assumed.
+    :param discard_match: Whether 'all' the discard rules must match to skip an event or just 'any' of them.
     """
 
     def __init__(self, access_key, secret_key, aws_profile, iam_role_arn,
                  service_name=None, region=None, bucket=None, discard_field=None,
-                 discard_regex=None, sts_endpoint=None, service_endpoint=None, iam_role_duration=None):
+                 discard_regex=None, sts_endpoint=None, service_endpoint=None, iam_role_duration=None,
+                 discard_match='any'):
         # SQL queries
         self.sql_find_table_names = """
             SELECT
@@ -120,6 +331,8 @@ class WazuhIntegration:
 
         self.sql_db_optimize = "PRAGMA optimize;"
 
+        self.sql_set_wal_mode = "PRAGMA journal_mode=WAL;"
+
         self.sql_create_metadata_table = """
             CREATE TABLE metadata (
                 key 'text' NOT NULL,
@@ -170,6 +383,8 @@ class WazuhIntegration:
         self.wazuh_queue = '{0}/queue/sockets/queue'.format(self.wazuh_path)
         self.wazuh_wodle = '{0}/wodles/aws'.format(self.wazuh_path)
         self.msg_header = "1:Wazuh-AWS:"
+        # Long-lived connection to analysisd shared by every event sent by this integration
+        self.sender = utils.AnalysisdSender(self.wazuh_queue, header=self.msg_header)
         # GovCloud regions
         self.gov_regions = {'us-gov-east-1', 'us-gov-west-1'}
 
@@ -190,12 +405,13 @@ class WazuhIntegration:
         # db_name is an instance variable of subclass
         self.db_path = "{0}/{1}.db".format(self.wazuh_wodle, self.db_name)
         self.db_connector = sqlite3.connect(self.db_path)
+        # WAL avoids rewriting the whole journal on every commit
+        self.db_connector.execute(self.sql_set_wal_mode)
         self.db_cursor = self.db_connector.cursor()
         if bucket:
             self.bucket = bucket
         self.check_metadata_version()
-        self.discard_field = discard_field
-        self.discard_regex = re.compile(fr'{discard_regex}')
+        self.discard_filter = utils.DiscardFilter.from_arguments(discard_field, discard_regex, discard_match)
         # to fetch logs using this date if no only_logs_after value was provided on the first execution
         self.default_date = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=timezone.utc)
 
@@ -332,13 +548,9 @@ class WazuhIntegration:
         :param dump_json: If json.dumps should be applied to the msg
         """
         try:
-            json_msg = json.dumps(msg, default=str)
+            json_msg = json.dumps(msg, default=str) if dump_json else msg
             debug(json_msg, 3)
-            s = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
-            s.connect(self.wazuh_queue)
-            s.send("{header}{msg}".format(header=self.msg_header,
-                                          msg=json_msg if dump_json else msg).encode())
-            s.close()
+            self.sender.send(json_msg)
         except socket.error as e:
             if e.errno == 111:
                 print("ERROR: Wazuh must be running.")
@@ -419,10 +631,16 @@ class AWSBucket(WazuhIntegration):
         Whether to delete an already processed file from a bucket or not.
     aws_organization_id : str
         The AWS organization ID.
-    discard_field : str
+    discard_field : str or list of str
         Name of the event field to apply the regex value on.
-    discard_regex : str
+    discard_regex : str or list of str
         REGEX value to determine whether an event should be skipped.
+    discard_match : str
+        Whether 'all' the discard rules must match to skip an event or just 'any' of them.
+    workers : int
+        Maximum number of log files downloaded and decompressed at the same time.
+    db_flush_interval : int
+        Number of processed log files to keep in memory before storing them in the database.
 
     Attributes
     ----------
@@ -433,18 +651,18 @@ class AWSBucket(WazuhIntegration):
     def __init__(self, reparse, access_key, secret_key, profile, iam_role_arn,
                  bucket, only_logs_after, skip_on_error, account_alias,
                  prefix, suffix, delete_file, aws_organization_id, region,
-                 discard_field, discard_regex, sts_endpoint, service_endpoint, iam_role_duration=None):
+                 discard_field, discard_regex, sts_endpoint, service_endpoint, iam_role_duration=None, workers=1,
+                 db_flush_interval=1000, discard_match='any'):
         # common SQL queries
-        self.sql_already_processed = """
+        self.sql_find_processed_keys = """
             SELECT
-              count(*)
+              log_key
             FROM
               {table_name}
             WHERE
               bucket_path=:bucket_path AND
               aws_account_id=:aws_account_id AND
-              aws_region=:aws_region AND
-              log_key=:log_name;"""
+              aws_region=:aws_region;"""
 
         self.sql_mark_complete = """
             INSERT INTO {table_name} (
@@ -551,7 +769,8 @@ class AWSBucket(WazuhIntegration):
                                   discard_regex=discard_regex,
                                   sts_endpoint=sts_endpoint,
                                   service_endpoint=service_endpoint,
-                                  iam_role_duration=iam_role_duration
+                                  iam_role_duration=iam_role_duration,
+                                  discard_match=discard_match
                                   )
         self.retain_db_records = 500
         self.reparse = reparse
@@ -568,6 +787,11 @@ class AWSBucket(WazuhIntegration):
         self.check_prefix = False
         self.date_format = "%Y/%m/%d"
         self.db_date_format = "%Y%m%d"
+        self.workers = workers
+        self.db_flush_interval = db_flush_interval
+        # Keys already processed by prefix and log files pending to be marked as processed in the database
+        self.processed_keys = {}
+        self.pending_marks = []
 
     def _same_prefix(self, match_start: int or None, aws_account_id: str, aws_region: str) -> bool:
         """
@@ -613,13 +837,38 @@ class AWSBucket(WazuhIntegration):
             # if DB is empty for a region
             return None
 
+    def get_processed_keys(self, aws_account_id, aws_region, **kwargs):
+        """
+        Get the keys of the log files already processed for an account and region.
+
+        They are loaded from the database with a single query the first time and kept updated in memory afterwards.
+
+        Parameters
+        ----------
+        aws_account_id : str
+            AWS account ID.
+        aws_region : str
+            AWS region.
+        kwargs : dict
+            Additional values used by the `sql_find_processed_keys` query.
+
+        Returns
+        -------
+        set
+            Keys of the processed log files.
+        """
+        scope = (aws_account_id, aws_region, *kwargs.values())
+        if scope not in self.processed_keys:
+            cursor = self.db_connector.execute(self.sql_find_processed_keys.format(table_name=self.db_table_name), {
+                'bucket_path': self.bucket_path,
+                'aws_account_id': aws_account_id,
+                'aws_region': aws_region,
+                **kwargs})
+            self.processed_keys[scope] = {row[0] for row in cursor}
+        return self.processed_keys[scope]
+
     def already_processed(self, downloaded_file, aws_account_id, aws_region):
-        cursor = self.db_connector.execute(self.sql_already_processed.format(table_name=self.db_table_name), {
-            'bucket_path': self.bucket_path,
-            'aws_account_id': aws_account_id,
-            'aws_region': aws_region,
-            'log_name': downloaded_file})
-        return cursor.fetchone()[0] > 0
+        return downloaded_file in self.get_processed_keys(aws_account_id, aws_region)
 
     def get_creation_date(self, log_key):
         raise NotImplementedError
@@ -627,15 +876,47 @@ class AWSBucket(WazuhIntegration):
     def mark_complete(self, aws_account_id, aws_region, log_file):
         if not self.reparse:
             try:
-                self.db_connector.execute(self.sql_mark_complete.format(table_name=self.db_table_name), {
+                self.add_pending_mark({
                     'bucket_path': self.bucket_path,
                     'aws_account_id': aws_account_id,
                     'aws_region': aws_region,
                     'log_key': log_file['Key'],
                     'created_date': self.get_creation_date(log_file)})
+                self.get_processed_keys(aws_account_id, aws_region).add(log_file['Key'])
             except Exception as e:
                 debug("+++ Error marking log {} as completed: {}".format(log_file['Key'], e), 2)
 
+    def add_pending_mark(self, mark):
+        """
+        Buffer a log file to be marked as processed, storing the buffer in the database once it is full.
+
+        Parameters
+        ----------
+        mark : dict
+            Values used by the `sql_mark_complete` query.
+        """
+        self.pending_marks.append(mark)
+        if len(self.pending_marks) >= self.db_flush_interval:
+            self.flush_marks()
+
+    def flush_marks(self):
+        """Store the log files pending to be marked as processed in the database using a single transaction."""
+        if not self.pending_marks:
+            return
+        sql_mark_complete = self.sql_mark_complete.format(table_name=self.db_table_name)
+        try:
+            with self.db_connector:
+                self.db_connector.executemany(sql_mark_complete, self.pending_marks)
+        except sqlite3.Error:
+            # Insert them one by one so a single failing log file doesn't discard the rest
+            for mark in self.pending_marks:
+                try:
+                    self.db_connector.execute(sql_mark_complete, mark)
+                except Exception as e:
+                    debug("+++ Error marking log {} as completed: {}".format(mark['log_key'], e), 2)
+            self.db_connector.commit()
+        self.pending_marks.clear()
+
     def db_count_region(self, aws_account_id, aws_region):
         """Counts the number of rows in DB for a region
         :param aws_account_id: AWS account ID
@@ -653,6 +934,7 @@ class AWSBucket(WazuhIntegration):
 
     def db_maintenance(self, aws_account_id=None, aws_region=None):
         debug("+++ DB Maintenance", 1)
+        self.flush_marks()
         try:
             if self.db_count_region(aws_account_id, aws_region) > self.retain_db_records:
                 self.db_connector.execute(self.sql_db_maintenance.format(table_name=self.db_table_name), {
@@ -836,49 +1118,55 @@ class AWSBucket(WazuhIntegration):
 
         return event
 
-    def _decompress_gzip(self, raw_object: io.BytesIO):
+    def _decompress_gzip(self, raw_object: io.BufferedReader):
         """
-        Method that decompress gzip compressed data.
+        Method that decompress gzip compressed data as it is read.
+
+        Only the gzip header is checked here. Errors in the compressed data are raised while reading the returned
+        object.
 
         Parameters
         ----------
-        raw_object : io.BytesIO
-            Buffer with the gzip compressed object.
+        raw_object : io.BufferedReader
+            Stream with the gzip compressed object.
 
         Returns
         -------
         file_object
             Decompressed object.
         """
-        try:
-            gzip_file = gzip.open(filename=raw_object, mode='rt')
-            # Ensure that the file is not corrupted by reading from it
-            gzip_file.read()
-            gzip_file.seek(0)
-            return gzip_file
-        except (gzip.BadGzipFile, zlib.error, TypeError):
-            print(f'ERROR: invalid gzip file received.')
-            if not self.skip_on_error:
-                sys.exit(8)
+        if raw_object.peek(len(GZIP_MAGIC_NUMBER))[:len(GZIP_MAGIC_NUMBER)] == GZIP_MAGIC_NUMBER:
+            return io.TextIOWrapper(ClosingGzipFile(fileobj=raw_object, mode='rb'))
 
-    def _decompress_zip(self, raw_object: io.BytesIO):
+        raw_object.close()
+        print(f'ERROR: invalid gzip file received.')
+        if not self.skip_on_error:
+            sys.exit(8)
+
+    def _decompress_zip(self, raw_object: io.BufferedReader):
         """
         Method that decompress zip compressed data.
 
+        Zip files can't be read sequentially, so the object is spooled to a temporary file first.
+
         Parameters
         ----------
-        raw_object : io.BytesIO
-            Buffer with the zip compressed object.
+        raw_object : io.BufferedReader
+            Stream with the zip compressed object.
 
         Returns
         -------
         file_object
             Decompressed object.
         """
+        spooled_file = tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_MAX_SIZE)
+        with raw_object:
+            shutil.copyfileobj(raw_object, spooled_file, STREAM_CHUNK_SIZE)
         try:
-            zipfile_object = zipfile.ZipFile(raw_object, compression=zipfile.ZIP_DEFLATED)
+            zipfile_object = zipfile.ZipFile(spooled_file, compression=zipfile.ZIP_DEFLATED)
             return io.TextIOWrapper(zipfile_object.open(zipfile_object.namelist()[0]))
         except zipfile.BadZipFile:
+            spooled_file.close()
             print('ERROR: invalid zip file received.')
         if not self.skip_on_error:
             sys.exit(8)
@@ -887,17 +1175,21 @@ class AWSBucket(WazuhIntegration):
         """
         Method that returns a file stored in a bucket decompressing it if necessary.
 
+        The object is read from S3 as the returned file is consumed, so it is never loaded in memory as a whole.
+
         Parameters
         ----------
         log_key : str
             Name of the file that should be returned.
         """
-        raw_object = io.BytesIO(self.client.get_object(Bucket=self.bucket, Key=log_key)['Body'].read())
+        raw_object = io.BufferedReader(StreamingBodyIO(self.client.get_object(Bucket=self.bucket, Key=log_key)['Body']),
+                                       buffer_size=STREAM_CHUNK_SIZE)
         if log_key[-3:] == '.gz':
             return self._decompress_gzip(raw_object)
         elif log_key[-4:] == '.zip':
             return self._decompress_zip(raw_object)
         elif log_key[-7:] == '.snappy':
+            raw_object.close()
             print(f"ERROR: couldn't decompress the {log_key} file, snappy compression is not supported.")
             if not self.skip_on_error:
                 sys.exit(8)
@@ -910,8 +1202,9 @@ class AWSBucket(WazuhIntegration):
         * A JSON with an unique field "Records" which is an array of jsons. The filename has .json extension. (Cloudtrail)
         * Multiple JSONs stored in the same line and with no separation. The filename has no extension. (GuardDuty, IAM, Macie, Inspector)
         * TSV format. The filename has no extension. Has multiple lines. (VPC)
+        The events are yielded as they are read from the file so it doesn't need to be loaded in memory.
         :param log_key: name of the log file
-        :return: list of events in json format.
+        :return: iterable of events in json format.
         """
         raise NotImplementedError
 
@@ -932,17 +1225,64 @@ class AWSBucket(WazuhIntegration):
                 sys.exit(error_code)
 
         try:
-            return self.load_information_from_file(log_key=log_key)
-        except (TypeError, IOError, zipfile.BadZipfile, zipfile.LargeZipFile) as e:
+            events = self.load_information_from_file(log_key=log_key)
+            # Decode the whole file before any of its events is sent, so a file that is corrupt partway through is
+            # either skipped or processed again in the next execution, but never sent partially. The decoded events
+            # are spooled to disk so big files don't need to fit in memory
+            return spool_events(events) if events is not None else None
+        except (TypeError, IOError, EOFError, zlib.error, zipfile.BadZipfile, zipfile.LargeZipFile) as e:
             exception_handler("Failed to decompress file {}: {}".format(log_key, e), 8)
         except (ValueError, csv.Error) as e:
             exception_handler("Failed to parse file {}: {}".format(log_key, e), 9)
         except Exception as e:
             exception_handler("Unkown error reading/parsing file {}: {}".format(log_key, e), 1)
 
+    def iter_log_files(self, aws_account_id, bucket_files):
+        """
+        Get the events of the given log files, downloading and decompressing up to `workers` of them at the same time.
+
+        The log files are yielded in the same order they were received, so their events are sent and they are marked
+        as processed in key order, as the markers used to resume the next execution expect.
+
+        Parameters
+        ----------
+        aws_account_id : str
+            AWS account ID the log files belong to.
+        bucket_files : list of dict
+            Objects returned by `list_objects_v2` to be processed.
+
+        Yields
+        ------
+        tuple
+            Each object along with an iterator of the events loaded from it.
+        """
+        if self.workers <= 1:
+            for bucket_file in bucket_files:
+                yield bucket_file, self.get_log_file(aws_account_id, bucket_file['Key'])
+            return
+
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                for bucket_file in bucket_files:
+                    pending.append((bucket_file, executor.submit(self.get_log_file, aws_account_id,
+                                                                 bucket_file['Key'])))
+                    # Limit the number of decoded files waiting to be sent
+                    if len(pending) >= 2 * self.workers:
+                        bucket_file, future = pending.popleft()
+                        yield bucket_file, future.result()
+
+                while pending:
+                    bucket_file, future = pending.popleft()
+                    yield bucket_file, future.result()
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
     def iter_bucket(self, account_id, regions):
         self.init_db(self.sql_create_table.format(table_name=self.db_table_name))
         self.iter_regions_and_accounts(account_id, regions)
+        self.flush_marks()
         self.db_connector.commit()
         self.db_connector.execute(self.sql_db_optimize)
         self.db_connector.close()
@@ -969,35 +1309,10 @@ class AWSBucket(WazuhIntegration):
         self.send_msg(event_msg)
 
     def iter_events(self, event_list, log_key, aws_account_id):
-        def _check_recursive(json_item=None, nested_field: str = '', regex: str = ''):
-            field_list = nested_field.split('.', 1)
-            try:
-                expression_to_evaluate = json_item[field_list[0]]
-            except TypeError:
-                if isinstance(json_item, list):
-                    return any(_check_recursive(i, field_list[0], regex=regex) for i in json_item)
-                return False
-            except KeyError:
-                return False
-            if len(field_list) == 1:
-                def check_regex(exp):
-                    try:
-                        return re.match(regex, exp) is not None
-                    except TypeError:
-                        return isinstance(exp, list) and any(check_regex(ex) for ex in exp)
-
-                return check_regex(expression_to_evaluate)
-            return _check_recursive(expression_to_evaluate, field_list[1], regex=regex)
-
-        def _event_should_be_skipped(event_):
-            return self.discard_field and self.discard_regex \
-                   and _check_recursive(event_, nested_field=self.discard_field, regex=self.discard_regex)
-
         if event_list is not None:
             for event in event_list:
-                if _event_should_be_skipped(event):
-                    debug(f'+++ The "{self.discard_regex.pattern}" regex found a match in the "{self.discard_field}" '
-                          f'field. The event will be skipped.', 2)
+                if self.discard_filter.matches(event):
+                    debug(f'+++ The {self.discard_filter} discard rules found a match. The event will be skipped.', 2)
                     continue
                 # Parse out all the values of 'None'
                 event_msg = self.get_alert_msg(aws_account_id, log_key, event)
@@ -1015,6 +1330,7 @@ class AWSBucket(WazuhIntegration):
                     debug(f"+++ No logs to process in bucket: {aws_account_id}/{aws_region}", 1)
                     return
 
+                new_files = []
                 for bucket_file in bucket_files['Contents']:
                     if not bucket_file['Key']:
                         continue
@@ -1039,14 +1355,17 @@ class AWSBucket(WazuhIntegration):
                             continue
 
                     debug(f"++ Found new log: {bucket_file['Key']}", 2)
-                    # Get the log file from S3 and decompress it
-                    log_json = self.get_log_file(aws_account_id, bucket_file['Key'])
+                    new_files.append(bucket_file)
+
+                # Get the log files from S3 and decompress them
+                for bucket_file, log_json in self.iter_log_files(aws_account_id, new_files):
                     self.iter_events(log_json, bucket_file['Key'], aws_account_id)
                     # Remove file from S3 Bucket
                     if self.delete_file:
                         debug(f"+++ Remove file from S3 Bucket:{bucket_file['Key']}", 2)
                         self.client.delete_object(Bucket=self.bucket, Key=bucket_file['Key'])
                     self.mark_complete(aws_account_id, aws_region, bucket_file)
+                self.flush_marks()
 
                 if bucket_files['IsTruncated']:
                     new_s3_args = self.build_s3_filter_args(aws_account_id, aws_region, True)
@@ -1163,9 +1482,8 @@ class AWSLogsBucket(AWSBucket):
 
     def load_information_from_file(self, log_key):
         with self.decompress_file(log_key=log_key) as f:
-            json_file = json.load(f)
-            return None if self.field_to_load not in json_file else [dict(x, source=self.service.lower()) for x in
-                                                                     json_file[self.field_to_load]]
+            for event in JSONStreamReader(f).iter_field_items(self.field_to_load):
+                yield dict(event, source=self.service.lower())
 
 
 class AWSCloudTrailBucket(AWSLogsBucket):
@@ -1426,6 +1744,7 @@ class AWSConfigBucket(AWSLogsBucket):
                 debug("+++ No logs to process in bucket: {}/{}".format(aws_account_id, aws_region), 1)
                 return
 
+            new_files = []
             for bucket_file in bucket_files['Contents']:
                 if not bucket_file['Key']:
                     continue
@@ -1443,14 +1762,17 @@ class AWSConfigBucket(AWSLogsBucket):
                         continue
 
                 debug("++ Found new log: {0}".format(bucket_file['Key']), 2)
-                # Get the log file from S3 and decompress it
-                log_json = self.get_log_file(aws_account_id, bucket_file['Key'])
+                new_files.append(bucket_file)
+
+            # Get the log files from S3 and decompress them
+            for bucket_file, log_json in self.iter_log_files(aws_account_id, new_files):
                 self.iter_events(log_json, bucket_file['Key'], aws_account_id)
                 # Remove file from S3 Bucket
                 if self.delete_file:
                     debug("+++ Remove file from S3 Bucket:{0}".format(bucket_file['Key']), 2)
                     self.client.delete_object(Bucket=self.bucket, Key=bucket_file['Key'])
                 self.mark_complete(aws_account_id, aws_region, bucket_file)
+            self.flush_marks()
             # Iterate if there are more logs
             while bucket_files['IsTruncated']:
                 new_s3_args = self.build_s3_filter_args(aws_account_id, aws_region, date, True)
@@ -1461,6 +1783,7 @@ class AWSConfigBucket(AWSLogsBucket):
                     debug("+++ No logs to process in bucket: {}/{}".format(aws_account_id, aws_region), 1)
                     return
 
+                new_files = []
                 for bucket_file in bucket_files['Contents']:
                     if not bucket_file['Key']:
                         continue
@@ -1477,14 +1800,17 @@ class AWSConfigBucket(AWSLogsBucket):
                             debug("++ Skipping previously processed file: {file}".format(file=bucket_file['Key']), 1)
                             continue
                     debug("++ Found new log: {0}".format(bucket_file['Key']), 2)
-                    # Get the log file from S3 and decompress it
-                    log_json = self.get_log_file(aws_account_id, bucket_file['Key'])
+                    new_files.append(bucket_file)
+
+                # Get the log files from S3 and decompress them
+                for bucket_file, log_json in self.iter_log_files(aws_account_id, new_files):
                     self.iter_events(log_json, bucket_file['Key'], aws_account_id)
                     # Remove file from S3 Bucket
                     if self.delete_file:
                         debug("+++ Remove file from S3 Bucket:{0}".format(bucket_file['Key']), 2)
                         self.client.delete_object(Bucket=self.bucket, Key=bucket_file['Key'])
                     self.mark_complete(aws_account_id, aws_region, bucket_file)
+                self.flush_marks()
 
         except botocore.exceptions.ClientError as err:
             debug(f'ERROR: The "iter_files_in_bucket" request failed: {err}', 1)
@@ -1589,17 +1915,16 @@ class AWSVPCFlowBucket(AWSLogsBucket):
         self.secret_key = kwargs['secret_key']
         self.profile_name = kwargs['profile']
         # SQL queries for VPC must be after constructor call
-        self.sql_already_processed = """
+        self.sql_find_processed_keys = """
             SELECT
-                count(*)
+                log_key
             FROM
                 {table_name}
             WHERE
                 bucket_path=:bucket_path AND
                 aws_account_id=:aws_account_id AND
                 aws_region=:aws_region AND
-                flow_log_id=:flow_log_id AND
-                log_key=:log_key;"""
+                flow_log_id=:flow_log_id;"""
 
         self.sql_mark_complete = """
             INSERT INTO {table_name} (
@@ -1696,7 +2021,6 @@ class AWSVPCFlowBucket(AWSLogsBucket):
                 "version", "account_id", "interface_id", "srcaddr", "dstaddr", "srcport", "dstport", "protocol",
                 "packets", "bytes", "start", "end", "action", "log_status")
             unix_fields = ('start', 'end')
-            result = []
 
             tsv_file = csv.DictReader(f, fieldnames=fieldnames, delimiter=' ')
 
@@ -1706,9 +2030,7 @@ class AWSVPCFlowBucket(AWSLogsBucket):
                     if key in unix_fields and value not in unix_fields:
                         row[key] = datetime.utcfromtimestamp(int(value)).strftime('%Y-%m-%dT%H:%M:%SZ')
 
-                result.append(dict(row, source='vpc'))
-
-            return result
+                yield dict(row, source='vpc')
 
     def get_ec2_client(self, access_key, secret_key, region, profile_name=None):
         conn_args = {}
@@ -1737,13 +2059,7 @@ class AWSVPCFlowBucket(AWSLogsBucket):
         return flow_logs_ids
 
     def already_processed(self, downloaded_file, aws_account_id, aws_region, flow_log_id):
-        cursor = self.db_connector.execute(self.sql_already_processed.format(table_name=self.db_table_name), {
-            'bucket_path': self.bucket_path,
-            'aws_account_id': aws_account_id,
-            'aws_region': aws_region,
-            'flow_log_id': flow_log_id,
-            'log_key': downloaded_file})
-        return cursor.fetchone()[0] > 0
+        return downloaded_file in self.get_processed_keys(aws_account_id, aws_region, flow_log_id=flow_log_id)
 
     def get_days_since_today(self, date):
         date = datetime.strptime(date, "%Y%m%d")
@@ -1825,6 +2141,7 @@ class AWSVPCFlowBucket(AWSLogsBucket):
 
     def db_maintenance(self, aws_account_id=None, aws_region=None, flow_log_id=None):
         debug("+++ DB Maintenance", 1)
+        self.flush_marks()
         try:
             if self.db_count_region(aws_account_id, aws_region, flow_log_id) > self.retain_db_records:
                 self.db_connector.execute(self.sql_db_maintenance.format(table_name=self.db_table_name), {
@@ -1887,6 +2204,7 @@ class AWSVPCFlowBucket(AWSLogsBucket):
                       1)
                 return
 
+            new_files = []
             for bucket_file in bucket_files['Contents']:
                 if not bucket_file['Key']:
                     continue
@@ -1904,14 +2222,17 @@ class AWSVPCFlowBucket(AWSLogsBucket):
                         continue
 
                 debug("++ Found new log: {0}".format(bucket_file['Key']), 2)
-                # Get the log file from S3 and decompress it
-                log_json = self.get_log_file(aws_account_id, bucket_file['Key'])
+                new_files.append(bucket_file)
+
+            # Get the log files from S3 and decompress them
+            for bucket_file, log_json in self.iter_log_files(aws_account_id, new_files):
                 self.iter_events(log_json, bucket_file['Key'], aws_account_id)
                 # Remove file from S3 Bucket
                 if self.delete_file:
                     debug("+++ Remove file from S3 Bucket:{0}".format(bucket_file['Key']), 2)
                     self.client.delete_object(Bucket=self.bucket, Key=bucket_file['Key'])
                 self.mark_complete(aws_account_id, aws_region, bucket_file, flow_log_id)
+            self.flush_marks()
             # Iterate if there are more logs
             while bucket_files['IsTruncated']:
                 new_s3_args = self.build_s3_filter_args(aws_account_id, aws_region, date, flow_log_id, True)
@@ -1924,6 +2245,7 @@ class AWSVPCFlowBucket(AWSLogsBucket):
                                                                                               aws_region), 1)
                     return
 
+                new_files = []
                 for bucket_file in bucket_files['Contents']:
                     if not bucket_file['Key']:
                         continue
@@ -1940,14 +2262,17 @@ class AWSVPCFlowBucket(AWSLogsBucket):
                             debug("++ Skipping previously processed file: {file}".format(file=bucket_file['Key']), 1)
                             continue
                     debug("++ Found new log: {0}".format(bucket_file['Key']), 2)
-                    # Get the log file from S3 and decompress it
-                    log_json = self.get_log_file(aws_account_id, bucket_file['Key'])
+                    new_files.append(bucket_file)
+
+                # Get the log files from S3 and decompress them
+                for bucket_file, log_json in self.iter_log_files(aws_account_id, new_files):
                     self.iter_events(log_json, bucket_file['Key'], aws_account_id)
                     # Remove file from S3 Bucket
                     if self.delete_file:
                         debug("+++ Remove file from S3 Bucket:{0}".format(bucket_file['Key']), 2)
                         self.client.delete_object(Bucket=self.bucket, Key=bucket_file['Key'])
                     self.mark_complete(aws_account_id, aws_region, bucket_file, flow_log_id)
+                self.flush_marks()
 
         except botocore.exceptions.ClientError as err:
             debug(f'ERROR: The "iter_files_in_bucket" request failed: {err}', 1)
@@ -1969,13 +2294,14 @@ class AWSVPCFlowBucket(AWSLogsBucket):
                     2)
         else:
             try:
-                self.db_connector.execute(self.sql_mark_complete.format(table_name=self.db_table_name), {
+                self.add_pending_mark({
                     'bucket_path': self.bucket_path,
                     'aws_account_id': aws_account_id,
                     'aws_region': aws_region,
                     'flow_log_id': flow_log_id,
                     'log_key': log_file['Key'],
                     'created_date': self.get_creation_date(log_file)})
+                self.get_processed_keys(aws_account_id, aws_region, flow_log_id=flow_log_id).add(log_file['Key'])
             except Exception as e:
                 debug("+++ Error marking log {} as completed: {}".format(log_file['Key'], e), 2)
 
@@ -2000,15 +2326,14 @@ class AWSCustomBucket(AWSBucket):
         self.macie_location_pattern = re.compile(r'"lat":(-?0+\d+\.\d+),"lon":(-?0+\d+\.\d+)')
         self.check_prefix = True
         # SQL queries for custom buckets
-        self.sql_already_processed = """
+        self.sql_find_processed_keys = """
             SELECT
-                count(*)
+                log_key
             FROM
                 {table_name}
             WHERE
                 bucket_path=:bucket_path AND
-                aws_account_id=:aws_account_id AND
-                log_key=:log_key;"""
+                aws_account_id=:aws_account_id;"""
 
         self.sql_mark_complete = """
             INSERT INTO {table_name} (
@@ -2085,34 +2410,35 @@ class AWSCustomBucket(AWSBucket):
                 aws_account_id=:aws_account_id;"""
 
     def load_information_from_file(self, log_key):
-        def json_event_generator(data):
-            while data:
+        def json_event_generator(reader):
+            while reader.peek():
                 try:
-                    json_data, json_index = decoder.raw_decode(data)
+                    json_data = reader.decode()
                 except ValueError as err:
                     # Handle undefined values for lat and lon fields in Macie logs
+                    data = reader.buffer[reader.pos:]
                     match = self.macie_location_pattern.search(data)
                     if not match or not match.group(1) or not match.group(2):
                         raise err
                     lat = float(match.group(1))
                     lon = float(match.group(2))
                     new_pattern = f'"lat":{lat},"lon":{lon}'
-                    data = re.sub(self.macie_location_pattern, new_pattern, data)
-                    json_data, json_index = decoder.raw_decode(data)
-                data = data[json_index:]
+                    reader.buffer, reader.pos = re.sub(self.macie_location_pattern, new_pattern, data), 0
+                    json_data = reader.decode()
                 yield json_data
 
         with self.decompress_file(log_key=log_key) as f:
             if f.read(1) == '{':
-                decoder = json.JSONDecoder()
-                return [dict(event['detail'], source=event['source'].replace('aws.', '')) for event in
-                        json_event_generator('{' + f.read()) if 'detail' in event]
+                for event in json_event_generator(JSONStreamReader(f, data='{')):
+                    if 'detail' in event:
+                        yield dict(event['detail'], source=event['source'].replace('aws.', ''))
             else:
                 fieldnames = (
                     "version", "account_id", "interface_id", "srcaddr", "dstaddr", "srcport", "dstport", "protocol",
                     "packets", "bytes", "start", "end", "action", "log_status")
                 tsv_file = csv.DictReader(f, fieldnames=fieldnames, delimiter=' ')
-                return [dict(x, source='vpc') for x in tsv_file]
+                for x in tsv_file:
+                    yield dict(x, source='vpc')
 
     def get_creation_date(self, log_file):
         # The Amazon S3 object name follows the pattern DeliveryStreamName-DeliveryStreamVersion-YYYY-MM-DD-HH-MM-SS-RandomString
@@ -2177,12 +2503,8 @@ class AWSCustomBucket(AWSBucket):
         self.iter_files_in_bucket()
         self.db_maintenance()
 
-    def already_processed(self, downloaded_file, aws_account_id, aws_region):
-        cursor = self.db_connector.execute(self.sql_already_processed.format(table_name=self.db_table_name), {
-            'bucket_path': self.bucket_path,
-            'aws_account_id': self.aws_account_id,
-            'log_key': downloaded_file})
-        return cursor.fetchone()[0] > 0
+    def get_processed_keys(self, aws_account_id, aws_region, **kwargs):
+        return AWSBucket.get_processed_keys(self, self.aws_account_id, None)
 
     def mark_complete(self, aws_account_id, aws_region, log_file):
         AWSBucket.mark_complete(self, self.aws_account_id, aws_region, log_file)
@@ -2203,6 +2525,7 @@ class AWSCustomBucket(AWSBucket):
 
     def db_maintenance(self, aws_account_id=None, **kwargs):
         debug("+++ DB Maintenance", 1)
+        self.flush_marks()
         try:
             if self.db_count_custom(aws_account_id) > self.retain_db_records:
                 self.db_connector.execute(self.sql_db_maintenance.format(table_name=self.db_table_name), {
@@ -2284,14 +2607,11 @@ class AWSGuardDutyBucket(AWSCustomBucket):
     def load_information_from_file(self, log_key):
         if log_key.endswith('.jsonl.gz'):
             with self.decompress_file(log_key=log_key) as f:
-                json_list = list(f)
-                result = []
-                for json_item in json_list:
+                for json_item in f:
                     x = json.loads(json_item)
-                    result.append(dict(x, source=x['service']['serviceName']))
-                return result
+                    yield dict(x, source=x['service']['serviceName'])
         else:
-            return AWSCustomBucket.load_information_from_file(self, log_key)
+            yield from AWSCustomBucket.load_information_from_file(self, log_key)
 
 
 class CiscoUmbrella(AWSCustomBucket):
@@ -2333,8 +2653,8 @@ class CiscoUmbrella(AWSCustomBucket):
             csv_file = csv.DictReader(f, fieldnames=fieldnames, delimiter=',')
 
             # remove None values in csv_file
-            return [dict({k: v for k, v in row.items() if v is not None},
-                         source='cisco_umbrella') for row in csv_file]
+            for row in csv_file:
+                yield dict({k: v for k, v in row.items() if v is not None}, source='cisco_umbrella')
 
     def marker_only_logs_after(self, aws_region, aws_account_id):
         return '{init}{only_logs_after}'.format(
@@ -2366,10 +2686,9 @@ class AWSWAFBucket(AWSCustomBucket):
                 data = data[json_index:]
                 yield json_data
 
-        content = []
         decoder = json.JSONDecoder()
         with self.decompress_file(log_key=log_key) as f:
-            for line in f.readlines():
+            for line in f:
                 try:
                     for event in json_event_generator(line.rstrip()):
                         event['source'] = 'waf'
@@ -2384,15 +2703,13 @@ class AWSWAFBucket(AWSCustomBucket):
                             print(f"ERROR: the {log_key} file doesn't have the expected structure.")
                             if not self.skip_on_error:
                                 sys.exit(9)
-                        content.append(event)
+                        yield event
 
                 except json.JSONDecodeError:
                     print("ERROR: Events from {} file could not be loaded.".format(log_key.split('/')[-1]))
                     if not self.skip_on_error:
                         sys.exit(9)
 
-        return json.loads(json.dumps(content))
-
 
 class AWSLBBucket(AWSCustomBucket):
     """Class that has common methods unique to the load balancers."""
@@ -2434,7 +2751,6 @@ class AWSALBBucket(AWSLBBucket):
                 "request_creation_time", "action_executed", "redirect_url", "error_reason", "target_port_list",
                 "target_status_code_list", "classification", "classification_reason")
             tsv_file = csv.DictReader(f, fieldnames=fieldnames, delimiter=' ')
-            tsv_file = [dict(x, source='alb') for x in tsv_file]
 
             fields_to_process_map = {
                 "client_port": "client_ip",
@@ -2443,6 +2759,7 @@ class AWSALBBucket(AWSLBBucket):
             }
 
             for log_entry in tsv_file:
+                log_entry = dict(log_entry, source='alb')
                 for field_to_process, ip_field in fields_to_process_map.items():
                     try:
                         port, ip = "", ""
@@ -2453,8 +2770,7 @@ class AWSALBBucket(AWSLBBucket):
                     except (ValueError, IndexError):
                         debug(f"Unable to process correctly ABL log entry, for field {field_to_process}.", msg_level=1)
                         debug(f"Log Entry: {log_entry}", msg_level=2)
-
-            return tsv_file
+                yield log_entry
 
 
 class AWSCLBBucket(AWSLBBucket):
@@ -2472,7 +2788,8 @@ class AWSCLBBucket(AWSLBBucket):
                 "request", "user_agent", "ssl_cipher", "ssl_protocol")
             tsv_file = csv.DictReader(f, fieldnames=fieldnames, delimiter=' ')
 
-            return [dict(x, source='clb') for x in tsv_file]
+            for x in tsv_file:
+                yield dict(x, source='clb')
 
 
 class AWSNLBBucket(AWSLBBucket):
@@ -2491,10 +2808,9 @@ class AWSNLBBucket(AWSLBBucket):
                 "alpn_fe_protocol", "alpn_client_preference_list")
             tsv_file = csv.DictReader(f, fieldnames=fieldnames, delimiter=' ')
 
-            tsv_file = [dict(x, source='nlb') for x in tsv_file]
-
             # Split ip_addr:port field into ip_addr and port fields
             for log_entry in tsv_file:
+                log_entry = dict(log_entry, source='nlb')
                 try:
                     log_entry['client_ip'], log_entry['client_port'] = log_entry['client_port'].split(':')
                     log_entry['destination_ip'], log_entry['destination_port'] = \
@@ -2502,8 +2818,7 @@ class AWSNLBBucket(AWSLBBucket):
                 except ValueError:
                     log_entry['client_ip'] = log_entry['client_port']
                     log_entry['destination_ip'] = log_entry['destination_port']
-
-            return tsv_file
+                yield log_entry
 
 
 class AWSServerAccess(AWSCustomBucket):
@@ -2546,6 +2861,7 @@ class AWSServerAccess(AWSCustomBucket):
                     debug(f"+++ No logs to process in bucket: {aws_account_id}/{aws_region}", 1)
                     return
 
+                new_files = []
                 for bucket_file in bucket_files['Contents']:
                     if not bucket_file['Key']:
                         continue
@@ -2578,14 +2894,17 @@ class AWSServerAccess(AWSCustomBucket):
                             continue
 
                     debug(f"++ Found new log: {bucket_file['Key']}", 2)
-                    # Get the log file from S3 and decompress it
-                    log_json = self.get_log_file(aws_account_id, bucket_file['Key'])
+                    new_files.append(bucket_file)
+
+                # Get the log files from S3 and decompress them
+                for bucket_file, log_json in self.iter_log_files(aws_account_id, new_files):
                     self.iter_events(log_json, bucket_file['Key'], aws_account_id)
                     # Remove file from S3 Bucket
                     if self.delete_file:
                         debug(f"+++ Remove file from S3 Bucket:{bucket_file['Key']}", 2)
                         self.client.delete_object(Bucket=self.bucket, Key=bucket_file['Key'])
                     self.mark_complete(aws_account_id, aws_region, bucket_file)
+                self.flush_marks()
 
                 if bucket_files['IsTruncated']:
                     new_s3_args = self.build_s3_filter_args(aws_account_id, aws_region, True)
@@ -2692,12 +3011,10 @@ class AWSServerAccess(AWSCustomBucket):
                 "request_uri", "http_status", "error_code", "bytes_sent", "object_sent", "total_time",
                 "turn_around_time", "referer", "user_agent", "version_id", "host_id", "signature_version",
                 "cipher_suite", "authentication_type", "host_header", "tls_version")
-            result = list()
             for line in f:
                 json_list = dict(zip(fieldnames, parse_line(line)))
                 json_list["source"] = 's3_server_access'
-                result.append(json_list)
-            return result
+                yield json_list
 
 
 class AWSService(WazuhIntegration):
@@ -2952,6 +3269,10 @@ class AWSCloudWatchLogs(AWSService):
         String containing a list of log group names separated by a comma
     remove_log_streams : bool
         Indicate if log streams should be removed after being fetched
+    workers : int
+        Number of log streams of the same log group processed concurrently
+    db_flush_interval : int
+        Number of processed log streams whose values are saved in the DB in a single transaction
     db_table_name : str
         Name of the table to be created on aws_service.db
     only_logs_after_millis : int
@@ -2977,7 +3298,7 @@ class AWSCloudWatchLogs(AWSService):
     def __init__(self, reparse, access_key, secret_key, aws_profile,
                  iam_role_arn, only_logs_after, region, aws_log_groups,
                  remove_log_streams, discard_field=None, discard_regex=None, sts_endpoint=None, service_endpoint=None,
-                 iam_role_duration=None):
+                 iam_role_duration=None, workers=1, db_flush_interval=100):
 
         self.sql_cloudwatch_create_table = """
             CREATE TABLE {table_name} (
@@ -3057,6 +3378,8 @@ class AWSCloudWatchLogs(AWSService):
         self.db_table_name = 'cloudwatch_logs'
         self.log_group_list = [group for group in aws_log_groups.split(",") if group != ""] if aws_log_groups else []
         self.remove_log_streams = remove_log_streams
+        self.workers = workers
+        self.db_flush_interval = db_flush_interval
         self.only_logs_after_millis = int(datetime.strptime(only_logs_after, '%Y%m%d').replace(
             tzinfo=timezone.utc).timestamp() * 1000) if only_logs_after else None
         self.default_date_millis = int(self.default_date.timestamp() * 1000)
@@ -3070,6 +3393,10 @@ class AWSCloudWatchLogs(AWSService):
         Logs with a timestamp lesser that start_time and greater than end_time will be fetched using the
         `get_alerts_within_range` function.
 
+        The log streams of a log group are processed by up to `workers` threads. The values resulting of each log
+        stream are saved in the DB in batches of `db_flush_interval` log streams by the main thread. The values of the
+        log streams already processed are also saved if the execution is aborted, so their logs are not sent again.
+
         The log streams will be removed after fetching them if `remove_log_streams` value is True.
 
         The database will be purged to remove unnecessary records at the end of each log group iteration.
@@ -3081,49 +3408,132 @@ class AWSCloudWatchLogs(AWSService):
 
         try:
             for log_group in self.log_group_list:
-                for log_stream in self.get_log_streams(log_group=log_group):
-                    debug('Getting data from DB for log stream "{}" in log group "{}"'.format(log_stream, log_group), 1)
-                    db_values = self.get_data_from_db(log_group=log_group, log_stream=log_stream)
-                    debug('Token: "{}", start_time: "{}", '
-                          'end_time: "{}"'.format(db_values['token'] if db_values else None,
-                                                  db_values['start_time'] if db_values else None,
-                                                  db_values['end_time'] if db_values else None), 2)
-                    result_before = None
-                    start_time = self.only_logs_after_millis if self.only_logs_after_millis else self.default_date_millis
-                    end_time = None
-                    token = None
-
-                    if db_values:
-                        if self.reparse:
-                            result_before = self.get_alerts_within_range(log_group=log_group, log_stream=log_stream,
-                                                                         token=None, start_time=start_time,
-                                                                         end_time=None)
+                pending_values = []
+                try:
+                    for log_stream, db_values in self.iter_log_streams(log_group=log_group,
+                                                                       log_streams=self.get_log_streams(log_group)):
+                        pending_values.append((log_stream, db_values))
+                        if len(pending_values) >= self.db_flush_interval:
+                            self.save_log_streams_data_db(log_group=log_group, log_streams_values=pending_values)
+                            pending_values = []
+                finally:
+                    self.save_log_streams_data_db(log_group=log_group, log_streams_values=pending_values)
 
-                        elif db_values['start_time'] and db_values['start_time'] > start_time:
-                            result_before = self.get_alerts_within_range(log_group=log_group, log_stream=log_stream,
-                                                                         token=None, start_time=start_time,
-                                                                         end_time=db_values['start_time'])
+                self.purge_db(log_group=log_group)
+        finally:
+            debug("committing changes and closing the DB", 1)
+            self.close_db()
 
-                        if db_values['end_time']:
-                            if not self.only_logs_after_millis or db_values['end_time'] > self.only_logs_after_millis:
-                                start_time = db_values['end_time'] + 1
-                                token = db_values['token']
+    def iter_log_streams(self, log_group, log_streams):
+        """Fetch the logs of every given log stream and yield the values to be stored in the DB for each of them.
 
-                    result_after = self.get_alerts_within_range(log_group=log_group, log_stream=log_stream, token=token,
-                                                                start_time=start_time, end_time=end_time)
+        The stored values of every log stream are read from the DB before fetching any log. If `workers` is greater
+        than one, the log streams are processed concurrently and the results are yielded as soon as each one of them
+        is completed, so the DB is only accessed by the calling thread. If processing a log stream fails, the log
+        streams not started yet are cancelled and the ones already completed are yielded before raising the error.
+
+        Parameters
+        ----------
+        log_group : str
+            Name of the log group where the log streams are stored
+        log_streams : list of str
+            Name of the log streams to process
+
+        Yields
+        ------
+        tuple of (str, dict)
+            The name of the log stream and a dict containing the token, start_time and end_time to store in the DB.
+        """
+        log_streams_values = []
+        for log_stream in log_streams:
+            debug('Getting data from DB for log stream "{}" in log group "{}"'.format(log_stream, log_group), 1)
+            db_values = self.get_data_from_db(log_group=log_group, log_stream=log_stream)
+            debug('Token: "{}", start_time: "{}", '
+                  'end_time: "{}"'.format(db_values['token'] if db_values else None,
+                                          db_values['start_time'] if db_values else None,
+                                          db_values['end_time'] if db_values else None), 2)
+            log_streams_values.append((log_stream, db_values))
+
+        if self.workers <= 1:
+            for log_stream, db_values in log_streams_values:
+                yield log_stream, self.process_log_stream(log_group=log_group, log_stream=log_stream,
+                                                          db_values=db_values)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self.process_log_stream, log_group, log_stream, db_values): log_stream
+                       for log_stream, db_values in log_streams_values}
+            pending = set(futures)
+            try:
+                for future in as_completed(futures):
+                    pending.discard(future)
+                    if future.exception() is not None:
+                        break
+                    yield futures[future], future.result()
+                else:
+                    return
 
-                    db_values = self.update_values(values=db_values, result_before=result_before,
-                                                   result_after=result_after)
+                # Yield the log streams completed by the other workers before raising the error
+                for other in pending:
+                    other.cancel()
+                for other in wait(pending).done:
+                    if not other.cancelled() and other.exception() is None:
+                        yield futures[other], other.result()
+                future.result()
+            finally:
+                # Do not start pending log streams if the iteration is aborted
+                for future in futures:
+                    future.cancel()
 
-                    self.save_data_db(log_group=log_group, log_stream=log_stream, values=db_values)
+    def process_log_stream(self, log_group, log_stream, db_values):
+        """Send the logs of a log stream not processed yet to analysisd and compute the values to store in the DB.
 
-                    if self.remove_log_streams:
-                        self.remove_aws_log_stream(log_group=log_group, log_stream=log_stream)
+        This method does not access the DB, so it can be run concurrently for different log streams.
 
-                self.purge_db(log_group=log_group)
-        finally:
-            debug("committing changes and closing the DB", 1)
-            self.close_db()
+        Parameters
+        ----------
+        log_group : str
+            Name of the log group where the log stream is stored
+        log_stream : str
+            Name of the log stream to get its logs
+        db_values : dict
+            A dict containing the token, start_time and end_time stored in the DB for the log stream. None if the log
+            stream was never processed before.
+
+        Returns
+        -------
+        A dict containing the token, start_time and end_time values to store in the DB.
+        """
+        result_before = None
+        start_time = self.only_logs_after_millis if self.only_logs_after_millis else self.default_date_millis
+        end_time = None
+        token = None
+
+        if db_values:
+            if self.reparse:
+                result_before = self.get_alerts_within_range(log_group=log_group, log_stream=log_stream,
+                                                             token=None, start_time=start_time,
+                                                             end_time=None)
+
+            elif db_values['start_time'] and db_values['start_time'] > start_time:
+                result_before = self.get_alerts_within_range(log_group=log_group, log_stream=log_stream,
+                                                             token=None, start_time=start_time,
+                                                             end_time=db_values['start_time'])
+
+            if db_values['end_time']:
+                if not self.only_logs_after_millis or db_values['end_time'] > self.only_logs_after_millis:
+                    start_time = db_values['end_time'] + 1
+                    token = db_values['token']
+
+        result_after = self.get_alerts_within_range(log_group=log_group, log_stream=log_stream, token=token,
+                                                    start_time=start_time, end_time=end_time)
+
+        db_values = self.update_values(values=db_values, result_before=result_before, result_after=result_after)
+
+        if self.remove_log_streams:
+            self.remove_aws_log_stream(log_group=log_group, log_stream=log_stream)
+
+        return db_values
 
     def remove_aws_log_stream(self, log_group, log_stream):
         """Remove a log stream from a log group in AWS Cloudwatch Logs.
@@ -3337,6 +3747,22 @@ class AWSCloudWatchLogs(AWSService):
                 'start_time': values['start_time'],
                 'end_time': values['end_time']})
 
+    def save_log_streams_data_db(self, log_group, log_streams_values):
+        """Save the values of several log streams of the same log group in the DB using a single transaction.
+
+        Parameters
+        ----------
+        log_group : str
+            Name of the log group
+        log_streams_values : list of tuple of (str, dict)
+            Name of each log stream and the dict containing its token, start_time and end_time.
+        """
+        if not log_streams_values:
+            return
+        with self.db_connector:
+            for log_stream, values in log_streams_values:
+                self.save_data_db(log_group=log_group, log_stream=log_stream, values=values)
+
     def get_log_streams(self, log_group):
         """Get the list of log streams stored in the specified log group.
 
@@ -3492,6 +3918,61 @@ def arg_valid_iam_role_duration(arg_string):
     return int(arg_string)
 
 
+def arg_valid_workers(arg_string):
+    """Checks if the number of workers specified is a valid parameter.
+
+    Parameters
+    ----------
+    arg_string: str
+        The desired number of workers.
+
+    Returns
+    -------
+    int
+        The number of workers.
+
+    Raises
+    ------
+    argparse.ArgumentTypeError
+        If the value provided is not a positive integer.
+    """
+    try:
+        workers = int(arg_string)
+    except ValueError:
+        workers = 0
+    if workers < 1:
+        raise argparse.ArgumentTypeError(f"Invalid number of workers: '{arg_string}'. It must be a positive integer.")
+    return workers
+
+
+def arg_valid_db_flush_interval(arg_string):
+    """Checks if the DB flush interval specified is a valid parameter.
+
+    Parameters
+    ----------
+    arg_string : str
+        The desired number of processed items between DB commits.
+
+    Returns
+    -------
+    int
+        The number of processed items between DB commits.
+
+    Raises
+    ------
+    argparse.ArgumentTypeError
+        If the value provided is not a positive integer.
+    """
+    try:
+        interval = int(arg_string)
+    except ValueError:
+        interval = 0
+    if interval < 1:
+        raise argparse.ArgumentTypeError(f"Invalid DB flush interval: '{arg_string}'. "
+                                         "It must be a positive integer.")
+    return interval
+
+
 def get_aws_config_params() -> configparser.RawConfigParser:
     """Read and retrieve parameters from aws config file
 
@@ -3558,11 +4039,14 @@ def get_script_arguments():
                         default='')
     parser.add_argument('-P', '--remove-log-streams', action='store_true', dest='deleteLogStreams',
                         help='Remove processed log streams from the log group', default=False)
-    parser.add_argument('-df', '--discard-field', type=str, dest='discard_field', default=None,
+    parser.add_argument('-df', '--discard-field', type=str, dest='discard_field', default=None, action='append',
                         help='The name of the event field where the discard_regex should be applied to determine if '
-                             'an event should be skipped.', )
-    parser.add_argument('-dr', '--discard-regex', type=str, dest='discard_regex', default=None,
+                             'an event should be skipped. Can be used several times, once per discard_regex.', )
+    parser.add_argument('-dr', '--discard-regex', type=str, dest='discard_regex', default=None, action='append',
                         help='REGEX value to be applied to determine whether an event should be skipped.', )
+    parser.add_argument('-dm', '--discard-match', type=str, dest='discard_match', default='any',
+                        choices=['any', 'all'],
+                        help='Skip events matching any of the discard rules or only those matching all of them.', )
     parser.add_argument('-st', '--sts_endpoint', type=str, dest='sts_endpoint', default=None,
                         help='URL for the VPC endpoint to use to obtain the STS token.')
     parser.add_argument('-se', '--service_endpoint', type=str, dest='service_endpoint', default=None,
@@ -3571,6 +4055,14 @@ def get_script_arguments():
                         default=None,
                         help='The duration, in seconds, of the role session. Value can range from 900s to the max'
                              ' session duration set for the role.')
+    parser.add_argument('-w', '--workers', type=arg_valid_workers, dest='workers', default=1,
+                        help='Number of log files to download and decompress concurrently when reading from a bucket, or '
+                             'number of log streams to process concurrently when reading from CloudWatch Logs.')
+    parser.add_argument('--db_flush_interval', type=arg_valid_db_flush_interval, dest='db_flush_interval',
+                        default=None,
+                        help='Number of processed log files, or CloudWatch Logs log streams, whose state is saved in '
+                             'the database at once. Lower values lose less progress if the execution is interrupted. '
+                             'Default: 1000 for buckets and 100 for CloudWatch Logs.')
     parsed_args = parser.parse_args()
 
     if parsed_args.iam_role_duration is not None and parsed_args.iam_role_arn is None:
@@ -3618,6 +4110,9 @@ def main(argv):
                 bucket_type = AWSServerAccess
             else:
                 raise Exception("Invalid type of bucket")
+            bucket_kwargs = {}
+            if options.db_flush_interval:
+                bucket_kwargs['db_flush_interval'] = options.db_flush_interval
             bucket = bucket_type(reparse=options.reparse, access_key=options.access_key,
                                  secret_key=options.secret_key,
                                  profile=options.aws_profile,
@@ -3635,16 +4130,23 @@ def main(argv):
                                  discard_regex=options.discard_regex,
                                  sts_endpoint=options.sts_endpoint,
                                  service_endpoint=options.service_endpoint,
-                                 iam_role_duration=options.iam_role_duration
+                                 iam_role_duration=options.iam_role_duration,
+                                 workers=options.workers,
+                                 discard_match=options.discard_match,
+                                 **bucket_kwargs
                                  )
             # check if bucket is empty or credentials are wrong
             bucket.check_bucket()
             bucket.iter_bucket(options.aws_account_id, options.regions)
         elif options.service:
+            service_kwargs = {}
             if options.service.lower() == 'inspector':
                 service_type = AWSInspector
             elif options.service.lower() == 'cloudwatchlogs':
                 service_type = AWSCloudWatchLogs
+                service_kwargs = {'workers': options.workers}
+                if options.db_flush_interval:
+                    service_kwargs['db_flush_interval'] = options.db_flush_interval
             else:
                 raise Exception("Invalid type of service")
 
@@ -3676,7 +4178,8 @@ def main(argv):
                                        discard_regex=options.discard_regex,
                                        sts_endpoint=options.sts_endpoint,
                                        service_endpoint=options.service_endpoint,
-                                       iam_role_duration=options.iam_role_duration
+                                       iam_role_duration=options.iam_role_duration,
+                                       **service_kwargs
                                        )
                 service.get_alerts()
 
@@ -4,6 +4,7 @@
 # Created by Wazuh, Inc. <info@wazuh.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 
+import gzip
 import io
 import os
 import sys
@@ -12,6 +13,7 @@ from sqlite3 import connect
 from unittest.mock import patch, MagicMock
 import pytest
 from datetime import datetime
+from functools import partial
 
 # mock AWS libraries
 sys.modules['boto3'] = MagicMock()
@@ -178,8 +180,45 @@ def test_db_maintenance(class_, sql_file, db_name):
         assert(last_log_key_before == last_log_key_after)
 
 
+def test_mark_complete_batched():
+    """
+    Checks that processed log files are looked up in memory and stored in the DB in batches.
+    """
+    with patch('aws_s3.AWSCloudTrailBucket.get_client'), \
+        patch('sqlite3.connect', side_effect=get_fake_s3_db('schema_cloudtrail_test.sql')), \
+        patch(f'aws_s3.utils.find_wazuh_path', return_value=wazuh_installation_path), \
+        patch(f'aws_s3.utils.get_wazuh_version', return_value=wazuh_version):
+        ins = aws_s3.AWSCloudTrailBucket(**{'reparse': False, 'access_key': None, 'secret_key': None,
+                                            'profile': None, 'iam_role_arn': None, 'bucket': 'test-bucket',
+                                            'only_logs_after': '19700101', 'skip_on_error': True,
+                                            'account_alias': None, 'prefix': '',
+                                            'delete_file': False, 'aws_organization_id': None,
+                                            'region': None, 'suffix': '', 'discard_field': None,
+                                            'discard_regex': None, 'sts_endpoint': None, 'service_endpoint': None,
+                                            'db_flush_interval': 3})
+        account_id, region = '123456789', 'us-east-1'
+        sql_count = 'SELECT COUNT(*) FROM cloudtrail;'
+        records_before = ins.db_connector.execute(sql_count).fetchone()[0]
+        processed_key = ins.db_connector.execute('SELECT log_key FROM cloudtrail LIMIT 1;').fetchone()[0]
+        new_keys = [f'AWSLogs/{account_id}/CloudTrail/{region}/2023/01/01/{account_id}_CloudTrail-{region}_'
+                    f'20230101T00{i:02}Z_aaaa.json.gz' for i in range(4)]
+
+        assert ins.already_processed(processed_key, account_id, region)
+        assert not ins.already_processed(new_keys[0], account_id, region)
+
+        for key in new_keys:
+            ins.mark_complete(account_id, region, {'Key': key})
+            assert ins.already_processed(key, account_id, region)
+
+        # Only full batches are stored until the marks are flushed
+        assert ins.db_connector.execute(sql_count).fetchone()[0] == records_before + 3
+        ins.flush_marks()
+        assert ins.db_connector.execute(sql_count).fetchone()[0] == records_before + 4
+        assert ins.pending_marks == []
+
+
 @pytest.mark.parametrize('log_key, decompression_function', [
-    ('test.gz', 'gzip.open'),
+    ('test.gz', 'aws_s3.ClosingGzipFile'),
     ('test.zip', 'zipfile.ZipFile'),
 ])
 def test_decompress_file_gz(log_key: str, decompression_function: str,
@@ -197,11 +236,10 @@ def test_decompress_file_gz(log_key: str, decompression_function: str,
     aws_bucket : aws_s3.AWSBucket
         Instance of the AWSBucket class.
     """
-    with patch(decompression_function) as mock_decompression, \
-         patch('io.BytesIO') as mock_io:
+    aws_bucket.client.get_object.return_value.__getitem__.return_value = io.BytesIO(b'\x1f\x8b')
+    with patch(decompression_function) as mock_decompression:
         aws_bucket.decompress_file(log_key)
         mock_decompression.assert_called_once()
-        mock_io.assert_called_once()
 
 
 @pytest.mark.parametrize('log_key', ['test.snappy'])
@@ -218,8 +256,7 @@ def test_decompress_file_snappy_skip(log_key: str, aws_bucket: aws_s3.AWSBucket)
         Instance of the AWSBucket class.
     """
     aws_bucket.skip_on_error = True
-    with patch('io.BytesIO'):
-        aws_bucket.decompress_file(log_key)
+    aws_bucket.decompress_file(log_key)
 
 
 @pytest.mark.parametrize('log_key, skip_on_error, expected_exception', [
@@ -243,11 +280,223 @@ def test_decompress_snappy_ko(log_key: str, skip_on_error: bool, expected_except
         Instance of the AWSBucket class.
     """
     aws_bucket.skip_on_error = skip_on_error
-    with patch('io.BytesIO'), pytest.raises(expected_exception) as e:
+    with pytest.raises(expected_exception) as e:
         aws_bucket.decompress_file(log_key)
     assert e.value.code == 8
 
 
+@pytest.mark.parametrize('chunk_size', [1, 7, 4096])
+def test_json_stream_reader_iter_field_items(chunk_size: int):
+    """
+    Test that the JSONStreamReader class yields the items of the requested array regardless of the chunk size used
+    to read the stream.
+
+    Parameters
+    ----------
+    chunk_size : int
+        Number of characters read from the stream each time.
+    """
+    records = [{'eventID': i, 'values': [1.5, 'a,b]', {'c': None}]} for i in range(5)]
+    data = json.dumps({'version': 12345, 'metadata': {'Records': []}, 'Records': records, 'other': True})
+    reader = aws_s3.JSONStreamReader(io.StringIO(data), chunk_size=chunk_size)
+    assert list(reader.iter_field_items('Records')) == records
+    assert list(aws_s3.JSONStreamReader(io.StringIO(data)).iter_field_items('missing')) == []
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 4, 5, 7, 4096])
+@pytest.mark.parametrize('data', ['{"Records":[1.5e3,"s"]}', '{"Records":[-12.25E-2,0,1e+10,3.75]}',
+                                  '{"Records":[10, 2.5, -0.0]}'])
+def test_json_stream_reader_numbers(data: str, chunk_size: int):
+    """
+    Test that the JSONStreamReader class doesn't return a number before it has been read completely.
+
+    Parameters
+    ----------
+    data : str
+        Content of the stream.
+    chunk_size : int
+        Number of characters read from the stream each time.
+    """
+    reader = aws_s3.JSONStreamReader(io.StringIO(data), chunk_size=chunk_size)
+    assert list(reader.iter_field_items('Records')) == json.loads(data)['Records']
+    assert aws_s3.JSONStreamReader(io.StringIO('12.5'), chunk_size=chunk_size).decode() == 12.5
+
+
+@pytest.mark.parametrize('data', ['{"a": 1} {"b": 2}\n{"c": 3}', '[1, 2'])
+def test_json_stream_reader_iter_values(data: str):
+    """
+    Test that the JSONStreamReader class yields every concatenated JSON value and fails with invalid streams.
+
+    Parameters
+    ----------
+    data : str
+        Content of the stream.
+    """
+    reader = aws_s3.JSONStreamReader(io.StringIO(data), chunk_size=3)
+    if data.startswith('['):
+        with pytest.raises(ValueError):
+            list(reader.iter_values())
+    else:
+        assert list(reader.iter_values()) == [{'a': 1}, {'b': 2}, {'c': 3}]
+
+
+def test_decompress_file_streaming(aws_bucket: aws_s3.AWSBucket):
+    """
+    Test that the decompress_file method returns a file object reading the gzip object as it is downloaded.
+
+    Parameters
+    ----------
+    aws_bucket : aws_s3.AWSBucket
+        Instance of the AWSBucket class.
+    """
+    lines = [f'{os.urandom(32).hex()}\n' for _ in range(10000)]
+    body = io.BytesIO(gzip.compress(''.join(lines).encode()))
+    aws_bucket.client.get_object.return_value.__getitem__.return_value = body
+    with aws_bucket.decompress_file('test.gz') as f:
+        assert f.readline() == lines[0]
+        assert body.tell() < len(body.getvalue())
+        assert f.read() == ''.join(lines[1:])
+    assert body.closed
+
+
+@pytest.mark.parametrize('discard_field, discard_regex, discard_match, expected_sent', [
+    (None, None, 'any', ['a', 'b', 'c']),
+    ('data.tags', '^noisy', 'any', ['a', 'c']),
+    (['data.tags', 'name'], ['^noisy', '^c'], 'any', ['a']),
+    (['data.tags', 'name'], ['^noisy', '^c'], 'all', ['a', 'b', 'c']),
+    (['data.tags', 'name'], ['^noisy', '^b'], 'all', ['a', 'c']),
+])
+def test_iter_events_discard(discard_field, discard_regex, discard_match, expected_sent, aws_bucket):
+    """
+    Test that the iter_events method skips the events matching the discard rules.
+
+    Parameters
+    ----------
+    discard_field : str or list of str
+        Fields to apply the regexes on.
+    discard_regex : str or list of str
+        Regexes used to discard events.
+    discard_match : str
+        Whether all the rules or any of them must match.
+    expected_sent : list of str
+        Names of the events expected to be sent.
+    aws_bucket : aws_s3.AWSBucket
+        Instance of the AWSBucket class.
+    """
+    events = [{'name': 'a', 'data': [{'tags': ['useful']}]},
+              {'name': 'b', 'data': [{'tags': 'other'}, {'tags': ['x', 'noisy-tag']}]},
+              {'name': 'c', 'data': {'tags': 1}}]
+    aws_bucket.discard_filter = aws_s3.utils.DiscardFilter.from_arguments(discard_field, discard_regex,
+                                                                           discard_match)
+    with patch.object(aws_bucket, 'get_alert_msg', side_effect=lambda _, __, event: event), \
+         patch.object(aws_bucket, 'send_event') as mock_send_event:
+        aws_bucket.iter_events(events, 'log_key', '123456789012')
+    assert [c.args[0]['name'] for c in mock_send_event.call_args_list] == expected_sent
+
+
+@pytest.mark.parametrize('workers', [1, 2, 4])
+def test_iter_log_files(workers: int, aws_bucket: aws_s3.AWSBucket):
+    """
+    Test that the iter_log_files method returns the events of every file in the same order they were listed,
+    regardless of the number of workers used to download them.
+
+    Parameters
+    ----------
+    workers : int
+        Number of log files to download concurrently.
+    aws_bucket : aws_s3.AWSBucket
+        Instance of the AWSBucket class.
+    """
+    bucket_files = [{'Key': f'log_{i}.json'} for i in range(10)]
+    aws_bucket.workers = workers
+    with patch.object(aws_bucket, 'get_log_file', side_effect=lambda _, key: [key]) as mock_get_log_file:
+        result = list(aws_bucket.iter_log_files('123456789012', bucket_files))
+
+    assert result == [(bucket_file, [bucket_file['Key']]) for bucket_file in bucket_files]
+    assert mock_get_log_file.call_count == len(bucket_files)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+@pytest.mark.parametrize('skip_on_error', [True, False])
+def test_iter_log_files_truncated(skip_on_error: bool, workers: int, aws_bucket: aws_s3.AWSBucket):
+    """
+    Test that no event of a log file truncated partway through is sent.
+
+    Parameters
+    ----------
+    skip_on_error : bool
+        If the AWSBucket.skip_on_error is set to True or False.
+    workers : int
+        Number of log files to download concurrently.
+    aws_bucket : aws_s3.AWSBucket
+        Instance of the AWSBucket class.
+    """
+    records = [{'eventID': i, 'data': os.urandom(64).hex()} for i in range(2000)]
+    compressed = gzip.compress(json.dumps({'Records': records}).encode())
+    aws_bucket.client.get_object.return_value.__getitem__.return_value = io.BytesIO(compressed[:len(compressed) // 2])
+    aws_bucket.skip_on_error = skip_on_error
+    aws_bucket.workers = workers
+    aws_bucket.field_to_load = 'Records'
+    aws_bucket.service = 'CloudTrail'
+
+    with patch.object(aws_bucket, 'load_information_from_file',
+                      partial(aws_s3.AWSLogsBucket.load_information_from_file, aws_bucket)), \
+         patch.object(aws_bucket, 'send_event') as mock_send_event, \
+         patch.object(aws_bucket, 'send_msg') as mock_send_msg:
+        if skip_on_error:
+            for bucket_file, log_json in aws_bucket.iter_log_files('123456789012', [{'Key': 'log.json.gz'}]):
+                assert log_json is None
+                aws_bucket.iter_events(log_json, bucket_file['Key'], '123456789012')
+            mock_send_msg.assert_called_once()
+        else:
+            with pytest.raises(SystemExit) as e:
+                for bucket_file, log_json in aws_bucket.iter_log_files('123456789012', [{'Key': 'log.json.gz'}]):
+                    aws_bucket.iter_events(log_json, bucket_file['Key'], '123456789012')
+            assert e.value.code == 8
+    mock_send_event.assert_not_called()
+
+
+def test_spool_events():
+    """
+    Test that the spool_events function returns the same events, spooling them to disk when they are too big.
+    """
+    events = [{'eventID': i, 'data': os.urandom(64).hex(), 'nested': {'values': [1.5, None, True]}}
+              for i in range(100)]
+    with patch('aws_s3.EVENTS_SPOOL_MAX_SIZE', 1024), \
+         patch('aws_s3.tempfile.SpooledTemporaryFile', wraps=aws_s3.tempfile.SpooledTemporaryFile) as mock_spool:
+        spooled_events = aws_s3.spool_events(iter(events))
+    assert list(spooled_events) == events
+    mock_spool.assert_called_once_with(max_size=1024, mode='w+', encoding='utf-8')
+
+
+def test_spool_events_ko():
+    """
+    Test that the spool_events function consumes every event before returning, so decoding errors are raised before
+    any event is read back.
+    """
+    def events():
+        yield {'eventID': 1}
+        raise ValueError('Truncated file')
+
+    with pytest.raises(ValueError):
+        aws_s3.spool_events(events())
+
+
+def test_iter_log_files_ko(aws_bucket: aws_s3.AWSBucket):
+    """
+    Test that the iter_log_files method propagates the exit of a worker failing to process a file.
+
+    Parameters
+    ----------
+    aws_bucket : aws_s3.AWSBucket
+        Instance of the AWSBucket class.
+    """
+    aws_bucket.workers = 2
+    with patch.object(aws_bucket, 'get_log_file', side_effect=SystemExit(8)), pytest.raises(SystemExit) as e:
+        list(aws_bucket.iter_log_files('123456789012', [{'Key': 'log.gz'}]))
+    assert e.value.code == 8
+
+
 def test_decompress_file_ko(bad_compressed_file, aws_bucket: aws_s3.AWSBucket):
     """
     Test that the decompress_file method exits with exit code 8 when
@@ -258,9 +507,9 @@ def test_decompress_file_ko(bad_compressed_file, aws_bucket: aws_s3.AWSBucket):
     bad_compressed_file : NamedTemporaryFile
         Corrupted zip or gzip file.
     """
-    with patch(
-            'io.BytesIO', return_value=io.TextIOWrapper(bad_compressed_file)),\
-         pytest.raises(SystemExit) as e:
+    bad_compressed_file.seek(0)
+    aws_bucket.client.get_object.return_value.__getitem__.return_value = bad_compressed_file
+    with pytest.raises(SystemExit) as e:
         aws_bucket.decompress_file(bad_compressed_file.name)
     assert e.value.code == 8
 
@@ -288,7 +537,7 @@ def test_aws_waf_load_information_from_file(log_file: str, aws_waf_bucket: aws_s
     aws_waf_bucket.skip_on_error = skip_on_error
     with open(log_file, 'rb') as f:
         aws_waf_bucket.client.get_object.return_value.__getitem__.return_value = f
-        aws_waf_bucket.load_information_from_file(log_file)
+        list(aws_waf_bucket.load_information_from_file(log_file))
 
 
 @pytest.mark.parametrize('log_file, skip_on_error, expected_exception', [
@@ -318,7 +567,7 @@ def test_aws_waf_load_information_from_file_ko(
     with open(log_file, 'rb') as f, \
          pytest.raises(expected_exception):
         aws_waf_bucket.client.get_object.return_value.__getitem__.return_value = f
-        aws_waf_bucket.load_information_from_file(log_file)
+        list(aws_waf_bucket.load_information_from_file(log_file))
 
 
 @pytest.mark.parametrize('date, expected_date', [
@@ -370,3 +619,101 @@ def test_custom_get_creation_date(log_file: dict, expected_date: int, aws_custom
         Instance of the AWSCustomBucket class.
     """
     assert aws_custom_bucket.get_creation_date(log_file) == expected_date
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_cloudwatch_get_alerts(workers):
+    """
+    Test that AWSCloudWatchLogs's get_alerts method processes every log stream and stores their values in the DB.
+
+    Parameters
+    ----------
+    workers : int
+        Number of log streams processed concurrently.
+    """
+    log_streams = [f'stream-{i}' for i in range(5)]
+    db = connect(':memory:')
+    with patch('aws_s3.AWSCloudWatchLogs.get_client'), \
+         patch('aws_s3.AWSCloudWatchLogs.get_sts_client'), \
+         patch('sqlite3.connect', return_value=db), \
+         patch('utils.get_wazuh_version', return_value=wazuh_version):
+        cloudwatch = aws_s3.AWSCloudWatchLogs(reparse=False, access_key=None, secret_key=None, aws_profile=None,
+                                              iam_role_arn=None, only_logs_after='20220101', region='us-east-1',
+                                              aws_log_groups='group', remove_log_streams=False, workers=workers,
+                                              db_flush_interval=2)
+
+    def process_log_stream(log_group, log_stream, db_values):
+        assert db_values is None
+        return {'token': f'token-{log_stream}', 'start_time': 1, 'end_time': int(log_stream[-1])}
+
+    with patch.object(cloudwatch, 'get_log_streams', return_value=log_streams), \
+         patch.object(cloudwatch, 'process_log_stream', side_effect=process_log_stream) as mock_process, \
+         patch.object(cloudwatch, 'purge_db'), \
+         patch.object(cloudwatch, 'close_db'):
+        cloudwatch.get_alerts()
+
+    assert mock_process.call_count == len(log_streams)
+    rows = db.execute('SELECT aws_log_stream, next_token, end_time FROM cloudwatch_logs '
+                      'ORDER BY aws_log_stream').fetchall()
+    assert rows == [(stream, f'token-{stream}', i) for i, stream in enumerate(log_streams)]
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_cloudwatch_get_alerts_ko(workers):
+    """
+    Test that AWSCloudWatchLogs's get_alerts method stores the values of the log streams already processed when
+    processing a log stream fails.
+
+    Parameters
+    ----------
+    workers : int
+        Number of log streams processed concurrently.
+    """
+    log_streams = [f'stream-{i}' for i in range(5)]
+    db = connect(':memory:')
+    with patch('aws_s3.AWSCloudWatchLogs.get_client'), \
+         patch('aws_s3.AWSCloudWatchLogs.get_sts_client'), \
+         patch('sqlite3.connect', return_value=db), \
+         patch('utils.get_wazuh_version', return_value=wazuh_version):
+        cloudwatch = aws_s3.AWSCloudWatchLogs(reparse=False, access_key=None, secret_key=None, aws_profile=None,
+                                              iam_role_arn=None, only_logs_after='20220101', region='us-east-1',
+                                              aws_log_groups='group', remove_log_streams=False, workers=workers,
+                                              db_flush_interval=10)
+    processed = []
+
+    def process_log_stream(log_group, log_stream, db_values):
+        if log_stream == 'stream-2':
+            sys.exit(16)
+        processed.append(log_stream)
+        return {'token': f'token-{log_stream}', 'start_time': 1, 'end_time': int(log_stream[-1])}
+
+    with patch.object(cloudwatch, 'get_log_streams', return_value=log_streams), \
+         patch.object(cloudwatch, 'process_log_stream', side_effect=process_log_stream), \
+         patch.object(cloudwatch, 'purge_db'), \
+         patch.object(cloudwatch, 'close_db'):
+        with pytest.raises(SystemExit) as e:
+            cloudwatch.get_alerts()
+
+    assert e.value.code == 16
+    assert {'stream-0', 'stream-1'}.issubset(processed)
+    rows = db.execute('SELECT aws_log_stream, next_token FROM cloudwatch_logs ORDER BY aws_log_stream').fetchall()
+    assert rows == [(stream, f'token-{stream}') for stream in sorted(processed)]
+
+
+@pytest.mark.parametrize('arg_string, expected', [('1', 1), ('250', 250), ('0', None), ('-5', None), ('a', None)])
+def test_arg_valid_db_flush_interval(arg_string: str, expected: int):
+    """
+    Test that the arg_valid_db_flush_interval function only accepts positive integers.
+
+    Parameters
+    ----------
+    arg_string : str
+        Value passed to the --db_flush_interval argument.
+    expected : int
+        Value expected to be returned, or None if it must be rejected.
+    """
+    if expected is None:
+        with pytest.raises(aws_s3.argparse.ArgumentTypeError):
+            aws_s3.arg_valid_db_flush_interval(arg_string)
+    else:
+        assert aws_s3.arg_valid_db_flush_interval(arg_string) == expected
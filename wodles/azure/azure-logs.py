@@ -18,12 +18,16 @@
 ################################################################################################
 import logging
 import sys
-from argparse import ArgumentParser
+from argparse import ArgumentParser, ArgumentTypeError
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from hashlib import md5
 from json import dumps, loads, JSONDecodeError
 from os.path import abspath, dirname
-from socket import socket, AF_UNIX, SOCK_DGRAM, error as socket_error
+from re import error as re_error
+from socket import error as socket_error
+from tempfile import SpooledTemporaryFile
 
 from azure.common import AzureException, AzureHttpError
 from azure.storage.blob import BlockBlobService
@@ -35,7 +39,7 @@ from requests import get, post, HTTPError, RequestException
 import orm
 
 sys.path.insert(0, dirname(dirname(abspath(__file__))))
-from utils import ANALYSISD
+from utils import ANALYSISD, AnalysisdSender, DiscardFilter
 
 
 # URLs
@@ -44,9 +48,20 @@ URL_ANALYTICS = 'https://api.loganalytics.io'
 URL_GRAPH = 'https://graph.microsoft.com'
 
 SOCKET_HEADER = '1:Azure:'
+SOCKET_BATCH_SIZE = 100
+
+# Long-lived connection to analysisd shared by every event sent during the execution. Events are sent in batches, and
+# the pending ones are flushed before storing the processed dates
+analysisd = AnalysisdSender(ANALYSISD, header=SOCKET_HEADER, batch_size=SOCKET_BATCH_SIZE)
+
+# Rules to skip events before sending them, set from the script arguments
+discard_filter = DiscardFilter([])
 
 DATETIME_MASK = '%Y-%m-%dT%H:%M:%S.%fZ'
 
+# Blobs bigger than this are downloaded to disk instead of memory
+BLOB_SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
 # Logger parameters
 LOGGING_MSG_FORMAT = '%(asctime)s azure: %(levelname)s: %(message)s'
 LOGGING_DATE_FORMAT = '%Y/%m/%d %I:%M:%S'
@@ -139,11 +154,20 @@ def get_script_arguments():
     parser.add_argument("--storage_time_offset", metavar="time", type=str, required=False,
                         help="Time range for the request.")
     parser.add_argument('-p', '--prefix', dest='prefix', help='The relative path to the logs', type=str, required=False)
+    parser.add_argument("--storage_workers", metavar="workers", type=arg_valid_workers, required=False, default=1,
+                        help="Number of blobs to download concurrently.")
 
 
     # General parameters #
     parser.add_argument('--reparse', action='store_true', dest='reparse',
                         help='Parse the log, even if its been parsed before', default=False)
+    parser.add_argument('--discard_field', metavar='field', type=str, required=False, action='append',
+                        help='Event field where the discard_regex is applied to determine if an event should be '
+                             'skipped. Nested fields are separated by dots. Can be used several times.')
+    parser.add_argument('--discard_regex', metavar='regex', type=str, required=False, action='append',
+                        help='Regex applied to the discard_field to determine if an event should be skipped.')
+    parser.add_argument('--discard_match', type=str, required=False, choices=['any', 'all'], default='any',
+                        help='Skip events matching any of the discard rules or only those matching all of them.')
     parser.add_argument('-d', '--debug', action='store', type=int, dest='debug_level', default=0,
                         help='Specify debug level. Admits values from 0 to 2.')
 
@@ -171,6 +195,33 @@ def arg_valid_blob_extension(arg_string):
     return arg_string.replace('"', '').replace("*", "") if arg_string else arg_string
 
 
+def arg_valid_workers(arg_string):
+    """Check if the number of workers specified is a valid parameter.
+
+    Parameters
+    ----------
+    arg_string : str
+        The desired number of blobs downloaded concurrently.
+
+    Returns
+    -------
+    int
+        The number of blobs downloaded concurrently.
+
+    Raises
+    ------
+    ArgumentTypeError
+        If the value provided is not a positive integer.
+    """
+    try:
+        workers = int(arg_string)
+    except ValueError:
+        workers = 0
+    if workers < 1:
+        raise ArgumentTypeError(f"Invalid number of workers: '{arg_string}'. It must be a positive integer.")
+    return workers
+
+
 def read_auth_file(auth_path: str, fields: tuple):
     """Read the authentication file. Its contents must be in 'field = value' format.
 
@@ -249,7 +300,8 @@ def update_row_object(table: orm.Base, md5_hash: str, new_min: str, new_max: str
             sys.exit(1)
 
 
-def create_new_row(table: orm.Base, md5_hash: str, query: str, offset: str) -> orm.Base:
+def create_new_row(table: orm.Base, md5_hash: str, query: str, offset: str, min_date: str = None,
+                   max_date: str = None) -> orm.Base:
     """Create a new row object for the given table, insert it into the database and return it.
 
     Parameters
@@ -262,6 +314,10 @@ def create_new_row(table: orm.Base, md5_hash: str, query: str, offset: str) -> o
         The query value before applying the md5 transformation.
     offset : str
         Value used to determine the desired datetime.
+    min_date : str
+        Initial value for the lowest date processed. The desired datetime is used if not provided.
+    max_date : str
+        Initial value for the highest date processed. The desired datetime is used if not provided.
 
     Returns
     -------
@@ -272,9 +328,11 @@ def create_new_row(table: orm.Base, md5_hash: str, query: str, offset: str) -> o
     desired_datetime = offset_to_datetime(offset) if offset else datetime.utcnow().replace(hour=0, minute=0,
                                                                                            second=0, microsecond=0)
     desired_str = desired_datetime.strftime(DATETIME_MASK)
-    item = table(md5=md5_hash, query=query, min_processed_date=desired_str, max_processed_date=desired_str)
+    min_date = min_date or desired_str
+    max_date = max_date or desired_str
+    item = table(md5=md5_hash, query=query, min_processed_date=min_date, max_processed_date=max_date)
     logging.debug(f"Attempting to insert row object into {table.__tablename__} with md5='{md5_hash}', "
-                  f"min_date='{desired_str}', max_date='{desired_str}'")
+                  f"min_date='{min_date}', max_date='{max_date}'")
     try:
         orm.add_row(row=item)
     except orm.AzureORMError as e:
@@ -402,6 +460,7 @@ def get_log_analytics_events(url: str, body: dict, headers: dict, md5_hash: str)
                 time_position = get_time_position(columns)
                 if time_position is not None:
                     iter_log_analytics_events(columns, rows)
+                    flush_messages()
                     update_row_object(table=orm.LogAnalytics, md5_hash=md5_hash, new_min=rows[0][time_position],
                                       new_max=rows[len(rows) - 1][time_position], query=args.la_query)
                 else:
@@ -456,6 +515,8 @@ def iter_log_analytics_events(columns: list, rows: list):
         event = {}
         for c in range(0, len(columns)):
             event[columns[c]['name']] = row[c]
+        if event_should_be_discarded(event):
+            continue
         logging.info("Log Analytics: Sending event by socket.")
         send_message(dumps(event))
 
@@ -547,7 +608,10 @@ def build_graph_url(offset: str, md5_hash: str):
 
 
 def get_graph_events(url: str, headers: dict, md5_hash: str):
-    """Request the data using the specified url and process the values in the response.
+    """Request the data using the specified url and process the values in the response, following the
+    '@odata.nextLink' of every page until the last one.
+
+    The dates of the processed values are stored in the database once per page, after sending its events.
 
     Parameters
     ----------
@@ -563,35 +627,48 @@ def get_graph_events(url: str, headers: dict, md5_hash: str):
     HTTPError
         If the response for the request is not 200 OK.
     """
-    response = get(url=url, headers=headers)
+    while True:
+        response = get(url=url, headers=headers)
+
+        if response.status_code == 200:
+            response_json = response.json()
+            values_json = response_json.get('value')
+            min_date = max_date = None
+            for value in values_json:
+                try:
+                    date = value["activityDateTime"]
+                except KeyError:
+                    date = value["createdDateTime"]
+                parsed_date = parse(date, fuzzy=True)
+                if min_date is None or parsed_date < min_date[0]:
+                    min_date = (parsed_date, date)
+                if max_date is None or parsed_date > max_date[0]:
+                    max_date = (parsed_date, date)
+                value["azure_tag"] = "azure-ad-graph"
+                if args.graph_tag:
+                    value['azure_aad_tag'] = args.graph_tag
+                if event_should_be_discarded(value):
+                    continue
+                json_result = dumps(value)
+                logging.info("Graph: Sending event by socket.")
+                send_message(json_result)
 
-    if response.status_code == 200:
-        response_json = response.json()
-        values_json = response_json.get('value')
-        for value in values_json:
-            try:
-                date = value["activityDateTime"]
-            except KeyError:
-                date = value["createdDateTime"]
-            update_row_object(table=orm.Graph, md5_hash=md5_hash, new_min=date, new_max=date, query=args.graph_query)
-            value["azure_tag"] = "azure-ad-graph"
-            if args.graph_tag:
-                value['azure_aad_tag'] = args.graph_tag
-            json_result = dumps(value)
-            logging.info("Graph: Sending event by socket.")
-            send_message(json_result)
-
-        if len(values_json) == 0:
-            logging.info("Graph: There are no new results")
-        next_url = response_json.get('@odata.nextLink')
-
-        if next_url:
-            get_graph_events(url=next_url, headers=headers, md5_hash=md5_hash)
-    elif response.status_code == 400:
-        logging.error(f"Bad Request for url: {response.url}")
-        logging.error(f"Ensure the URL is valid and there is data available for the specified datetime.")
-    else:
-        response.raise_for_status()
+            if len(values_json) == 0:
+                logging.info("Graph: There are no new results")
+            else:
+                flush_messages()
+                update_row_object(table=orm.Graph, md5_hash=md5_hash, new_min=min_date[1], new_max=max_date[1],
+                                  query=args.graph_query)
+            url = response_json.get('@odata.nextLink')
+            if not url:
+                return
+        elif response.status_code == 400:
+            logging.error(f"Bad Request for url: {response.url}")
+            logging.error(f"Ensure the URL is valid and there is data available for the specified datetime.")
+            return
+        else:
+            response.raise_for_status()
+            return
 
 
 # STORAGE
@@ -644,13 +721,22 @@ def start_storage():
     logging.info("Storage: Authenticated.")
 
     # Get the blobs
+    account_md5_hash = md5(name.encode()).hexdigest()
     for container in containers:
-        md5_hash = md5(name.encode()).hexdigest()
+        # Each container keeps its own processed dates
+        md5_hash = md5(f"{name}/{container}".encode()).hexdigest()
         offset = args.storage_time_offset
         try:
             item = orm.get_row(orm.Storage, md5=md5_hash)
             if item is None:
-                item = create_new_row(table=orm.Storage, query=name, md5_hash=md5_hash, offset=offset)
+                # Previous releases stored the dates of every container of the account in the same row
+                account_item = orm.get_row(orm.Storage, md5=account_md5_hash)
+                if account_item is not None:
+                    item = create_new_row(table=orm.Storage, query=container, md5_hash=md5_hash, offset=offset,
+                                          min_date=account_item.min_processed_date,
+                                          max_date=account_item.max_processed_date)
+                else:
+                    item = create_new_row(table=orm.Storage, query=container, md5_hash=md5_hash, offset=offset)
         except orm.AzureORMError as e:
             logging.error(f"Error trying to obtain row object from '{orm.Storage.__tablename__}' using md5='{md5}': {e}")
             sys.exit(1)
@@ -659,16 +745,20 @@ def start_storage():
         max_datetime = parse(item.max_processed_date, fuzzy=True)
         desired_datetime = offset_to_datetime(offset) if offset else max_datetime
         get_blobs(container_name=container, prefix=args.prefix, blob_service=block_blob_service, md5_hash=md5_hash,
-                  min_datetime=min_datetime, max_datetime=max_datetime, desired_datetime=desired_datetime)
+                  min_datetime=min_datetime, max_datetime=max_datetime, desired_datetime=desired_datetime,
+                  workers=args.storage_workers)
     logging.info("Storage: End")
 
 
 def get_blobs(
     container_name: str, blob_service: BlockBlobService, md5_hash: str, min_datetime: datetime, max_datetime: datetime,
-    desired_datetime: datetime, next_marker: str = None, prefix: str = None
+    desired_datetime: datetime, next_marker: str = None, prefix: str = None, workers: int = 1
 ):
     """Get the blobs from a container and send their content.
 
+    The blobs of each page are downloaded by up to `workers` threads, but their content is sent and their last modified
+    time stored in the database in the same order as they are listed.
+
     Parameters
     ----------
     container_name : str
@@ -687,23 +777,26 @@ def get_blobs(
         Token used as a marker to continue from previous iteration.
     prefix : str, optional
         Prefix value to search blobs that match with it.
+    workers : int
+        Number of blobs downloaded concurrently.
 
     Raises
     ------
     AzureException
         If it was not possible to list the blobs for the given container.
     """
-    try:
-        # Get the blob list
-        logging.info("Storage: Getting blobs.")
-        blobs = blob_service.list_blobs(container_name, prefix=prefix, marker=next_marker)
-    except AzureException as e:
-        logging.error(f"Storage: Error getting blobs from '{container_name}': '{e}'.")
-        raise e
-    else:
+    while True:
+        try:
+            # Get the blob list
+            logging.info("Storage: Getting blobs.")
+            blobs = blob_service.list_blobs(container_name, prefix=prefix, marker=next_marker)
+        except AzureException as e:
+            logging.error(f"Storage: Error getting blobs from '{container_name}': '{e}'.")
+            raise e
 
         logging.info(f"Storage: The search starts from the date: {desired_datetime} for blobs in "
                      f"container: '{container_name}' and prefix: '/{prefix if prefix is not None else ''}'")
+        new_blobs = []
         for blob in blobs:
             # Skip the blob if nested under prefix but prefix is not setted
             if prefix is None and len(blob.name.split("/")) > 1:
@@ -717,57 +810,153 @@ def get_blobs(
             if not args.reparse and (last_modified < desired_datetime or (
                     min_datetime <= last_modified <= max_datetime)):
                 continue
+            new_blobs.append(blob)
 
-            # Get the blob data
-            try:
-                data = blob_service.get_blob_to_text(container_name, blob.name)
-            except (ValueError, AzureException, AzureHttpError) as e:
-                logging.error(f"Storage: Error reading the blob data: '{e}'.")
+        for blob, data in iter_blobs_data(container_name=container_name, blob_service=blob_service, blobs=new_blobs,
+                                          workers=workers):
+            # Skip the blob if it could not be downloaded
+            if data is None:
                 continue
-            else:
-                # Process the data as a JSON
-                if args.json_file:
-                    try:
-                        content_list = loads(data.content)
-                        records = content_list["records"]
-                    except (JSONDecodeError, TypeError) as e:
-                        logging.error(f"Storage: Error reading the contents of the blob: '{e}'.")
-                        continue
-                    except KeyError as e:
-                        logging.error(f"Storage: No records found in the blob's contents: '{e}'.")
-                        continue
-                    else:
-                        for log_record in records:
-                            # Add azure tags
-                            log_record['azure_tag'] = 'azure-storage'
-                            if args.storage_tag:
-                                log_record['azure_storage_tag'] = args.storage_tag
-                            logging.info("Storage: Sending event by socket.")
-                            send_message(dumps(log_record))
-                # Process the data as plain text
-                else:
-                    for line in [s for s in str(data.content).splitlines() if s]:
-                        if args.json_inline:
-                            msg = '{"azure_tag": "azure-storage"'
-                            if args.storage_tag:
-                                msg = f'{msg}, "azure_storage_tag": "{args.storage_tag}"'
-                            msg = f'{msg}, {line[1:]}'
-                        else:
-                            msg = "azure_tag: azure-storage."
-                            if args.storage_tag:
-                                msg = f'{msg} azure_storage_tag: {args.storage_tag}.'
-                            msg = f'{msg} {line}'
-                        logging.info("Storage: Sending event by socket.")
-                        send_message(msg)
+            with data:
+                if not send_blob_data(data):
+                    continue
+            flush_messages()
+            last_modified = blob.properties.last_modified
             update_row_object(table=orm.Storage, md5_hash=md5_hash, query=container_name,
                               new_min=last_modified.strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
                               new_max=last_modified.strftime('%Y-%m-%dT%H:%M:%S.%fZ'))
 
         # Continue until no marker is returned
-        if blobs.next_marker:
-            get_blobs(container_name=container_name, blob_service=blob_service, next_marker=blobs.next_marker,
-                      min_datetime=min_datetime, max_datetime=max_datetime, desired_datetime=desired_datetime,
-                      md5_hash=md5_hash)
+        next_marker = blobs.next_marker
+        if not next_marker:
+            break
+
+
+def download_blob(container_name: str, blob_service: BlockBlobService, blob_name: str):
+    """Download the content of a blob into a temporary file, kept in memory unless it is too big.
+
+    Parameters
+    ----------
+    container_name : str
+        Name of container where the blob is stored.
+    blob_service : BlockBlobService
+        Client used to obtain the blob.
+    blob_name : str
+        Name of the blob to download.
+
+    Returns
+    -------
+    SpooledTemporaryFile or None
+        The content of the blob, positioned at its beginning, or None if it could not be downloaded.
+    """
+    data = SpooledTemporaryFile(max_size=BLOB_SPOOL_MAX_SIZE)
+    try:
+        blob_service.get_blob_to_stream(container_name, blob_name, data)
+    except (ValueError, AzureException, AzureHttpError) as e:
+        logging.error(f"Storage: Error reading the blob data: '{e}'.")
+        data.close()
+        return None
+    except BaseException:
+        data.close()
+        raise
+    data.seek(0)
+    return data
+
+
+def iter_blobs_data(container_name: str, blob_service: BlockBlobService, blobs: list, workers: int = 1):
+    """Download the given blobs and yield their contents in the same order.
+
+    When using several workers, at most twice as many blobs as workers are downloaded ahead of the one being yielded.
+
+    Parameters
+    ----------
+    container_name : str
+        Name of container where the blobs are stored.
+    blob_service : BlockBlobService
+        Client used to obtain the blobs.
+    blobs : list
+        Blobs to download.
+    workers : int
+        Number of blobs downloaded concurrently.
+
+    Yields
+    ------
+    tuple
+        Each blob and its content as returned by `download_blob`. The caller must close the content.
+    """
+    if workers <= 1:
+        for blob in blobs:
+            yield blob, download_blob(container_name, blob_service, blob.name)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        try:
+            for blob in blobs:
+                pending.append((blob, executor.submit(download_blob, container_name, blob_service, blob.name)))
+                if len(pending) >= 2 * workers:
+                    blob, future = pending.popleft()
+                    yield blob, future.result()
+            while pending:
+                blob, future = pending.popleft()
+                yield blob, future.result()
+        finally:
+            # Discard the blobs already downloaded if the iteration is aborted
+            for _, future in pending:
+                if not future.cancel() and future.exception() is None and future.result() is not None:
+                    future.result().close()
+
+
+def send_blob_data(data) -> bool:
+    """Send the events contained in the downloaded data of a blob, reading it line by line unless it is a JSON file.
+
+    Parameters
+    ----------
+    data : SpooledTemporaryFile
+        The content of the blob.
+
+    Returns
+    -------
+    bool
+        True if the content of the blob could be read, False otherwise.
+    """
+    # Process the data as a JSON
+    if args.json_file:
+        try:
+            content_list = loads(data.read())
+            records = content_list["records"]
+        except (JSONDecodeError, TypeError, UnicodeDecodeError) as e:
+            logging.error(f"Storage: Error reading the contents of the blob: '{e}'.")
+            return False
+        except KeyError as e:
+            logging.error(f"Storage: No records found in the blob's contents: '{e}'.")
+            return False
+        for log_record in records:
+            # Add azure tags
+            log_record['azure_tag'] = 'azure-storage'
+            if args.storage_tag:
+                log_record['azure_storage_tag'] = args.storage_tag
+            if event_should_be_discarded(log_record):
+                continue
+            logging.info("Storage: Sending event by socket.")
+            send_message(dumps(log_record))
+    # Process the data as plain text
+    else:
+        for raw_line in data:
+            for line in [s for s in raw_line.decode(errors='replace').splitlines() if s]:
+                if args.json_inline:
+                    msg = '{"azure_tag": "azure-storage"'
+                    if args.storage_tag:
+                        msg = f'{msg}, "azure_storage_tag": "{args.storage_tag}"'
+                    msg = f'{msg}, {line[1:]}'
+                else:
+                    msg = "azure_tag: azure-storage."
+                    if args.storage_tag:
+                        msg = f'{msg} azure_storage_tag: {args.storage_tag}.'
+                    msg = f'{msg} {line}'
+                logging.info("Storage: Sending event by socket.")
+                send_message(msg)
+    return True
 
 
 def get_token(client_id: str, secret: str, domain: str, scope: str):
@@ -816,29 +1005,67 @@ def get_token(client_id: str, secret: str, domain: str, scope: str):
     sys.exit(1)
 
 
+def event_should_be_discarded(event: dict) -> bool:
+    """Check whether an event matches the discard rules and should not be sent.
+
+    Parameters
+    ----------
+    event : dict
+        The event to check.
+
+    Returns
+    -------
+    bool
+        True if the event should be skipped, False otherwise.
+    """
+    if discard_filter.matches(event):
+        logging.debug(f"The {discard_filter} discard rules found a match. The event will be skipped.")
+        return True
+    return False
+
+
 def send_message(message: str):
     """Send a message with a header to the analysisd queue.
 
+    The message is buffered and sent along with the rest of its batch. See `flush_messages`.
+
     Parameters
     ----------
     message : str
         The message body to send to analysisd.
     """
-    s = socket(AF_UNIX, SOCK_DGRAM)
     try:
-        s.connect(ANALYSISD)
-        s.send(f'{SOCKET_HEADER}{message}'.encode(errors='replace'))
+        analysisd.send(message)
     except socket_error as e:
-        if e.errno == 111:
-            logging.error("ERROR: Wazuh must be running.")
-            sys.exit(1)
-        elif e.errno == 90:
-            logging.error("ERROR: Message too long to send to Wazuh.  Skipping message...")
-        else:
-            logging.error(f"ERROR: Error sending message to wazuh: {e}")
-            sys.exit(1)
-    finally:
-        s.close()
+        handle_socket_error(e)
+
+
+def flush_messages():
+    """Send the messages pending in the analysisd connection buffer."""
+    while True:
+        try:
+            analysisd.flush()
+            return
+        except socket_error as e:
+            handle_socket_error(e)
+
+
+def handle_socket_error(error: socket_error):
+    """Log an error sending messages to analysisd and exit unless only an oversized message was discarded.
+
+    Parameters
+    ----------
+    error : socket_error
+        The exception raised by the analysisd connection.
+    """
+    if error.errno == 111:
+        logging.error("ERROR: Wazuh must be running.")
+        sys.exit(1)
+    elif error.errno == 90:
+        logging.error("ERROR: Message too long to send to Wazuh.  Skipping message...")
+    else:
+        logging.error(f"ERROR: Error sending message to wazuh: {error}")
+        sys.exit(1)
 
 
 def offset_to_datetime(offset: str):
@@ -874,6 +1101,12 @@ if __name__ == "__main__":
     args = get_script_arguments()
     set_logger()
 
+    try:
+        discard_filter = DiscardFilter.from_arguments(args.discard_field, args.discard_regex, args.discard_match)
+    except (ValueError, re_error) as e:
+        logging.error(f"Invalid discard rules: {e}")
+        sys.exit(1)
+
     if not orm.check_database_integrity():
         sys.exit(1)
 
@@ -886,3 +1119,5 @@ if __name__ == "__main__":
     else:
         logging.error("No valid API was specified. Please use 'graph', 'log_analytics' or 'storage'.")
         sys.exit(1)
+    flush_messages()
+    analysisd.close()
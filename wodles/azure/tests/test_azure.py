@@ -6,7 +6,7 @@ import socket
 import sys
 from datetime import datetime
 from hashlib import md5
-from unittest.mock import call, patch, MagicMock
+from unittest.mock import ANY, call, patch, MagicMock
 
 import pytest
 import pytz
@@ -401,6 +401,18 @@ def test_iter_log_analytics_events(mock_send):
     mock_send.assert_has_calls(expected_calls)
 
 
+@patch('azure-logs.send_message')
+def test_iter_log_analytics_events_discarded(mock_send):
+    """Test iter_log_analytics_events doesn't send the events matching the discard rules."""
+    azure.args = MagicMock(la_tag=None)
+    columns = [{'type': 'string', 'name': 'Category'}]
+    rows = [['Audit'], ['Noisy'], ['Other']]
+    with patch('azure-logs.discard_filter', azure.DiscardFilter([('Category', '^Noisy$')])):
+        azure.iter_log_analytics_events(columns=columns, rows=rows)
+    sent = [json.loads(c.args[0])['Category'] for c in mock_send.call_args_list]
+    assert sent == ['Audit', 'Other']
+
+
 @pytest.mark.parametrize('auth_path, graph_id, key, offset, query', [
     (None, "client", "secret", "1d", "query"),
     ("/var/ossec/", None, None, "", ""),
@@ -510,8 +522,8 @@ def test_build_graph_url_ko(mock_get, mock_logging):
 @patch('azure-logs.update_row_object')
 @patch('azure-logs.get')
 def test_get_graph_events(mock_get, mock_update, mock_send):
-    """Test get_graph_events recursively request the data using the specified url and process the values present in the
-    response."""
+    """Test get_graph_events follows the nextLink of every page and process the values present in the response, storing
+    the processed dates once per page."""
     def load_events(path):
         with open(os.path.join(TEST_DATA_PATH, path)) as f:
             return json.loads(f.read())
@@ -534,10 +546,39 @@ def test_get_graph_events(mock_get, mock_update, mock_send):
     headers = "headers"
     azure.get_graph_events(url=url, headers=headers, md5_hash="")
     mock_get.assert_called_with(url=url, headers=headers)
-    assert mock_update.call_count == num_events
+    mock_update.assert_called_once()
     assert mock_send.call_count == num_events
 
 
+@patch('azure-logs.flush_messages')
+@patch('azure-logs.send_message')
+@patch('azure-logs.update_row_object')
+@patch('azure-logs.get')
+def test_get_graph_events_pages(mock_get, mock_update, mock_send, mock_flush):
+    """Test get_graph_events stores the oldest and newest dates of each page after sending its events."""
+    azure.args = MagicMock(graph_query="test_query", graph_tag=None)
+    num_pages = 1500
+    pages = []
+    for i in range(num_pages):
+        page = MagicMock(status_code=200)
+        page.json.return_value = {
+            'value': [{'activityDateTime': f'2022-01-01T00:00:{i % 60:02d}.{j}Z'} for j in (2, 1, 3)],
+            '@odata.nextLink': f'url_{i + 1}' if i < num_pages - 1 else None
+        }
+        pages.append(page)
+    mock_get.side_effect = pages
+
+    azure.get_graph_events(url="url_0", headers="headers", md5_hash="hash")
+
+    assert mock_get.call_count == num_pages
+    assert mock_send.call_count == 3 * num_pages
+    assert mock_flush.call_count == num_pages
+    assert mock_update.call_count == num_pages
+    mock_update.assert_called_with(table=azure.orm.Graph, md5_hash="hash", query="test_query",
+                                   new_min=f'2022-01-01T00:00:{(num_pages - 1) % 60:02d}.1Z',
+                                   new_max=f'2022-01-01T00:00:{(num_pages - 1) % 60:02d}.3Z')
+
+
 @pytest.mark.parametrize('status_code', [400, 500])
 @patch('azure-logs.logging.error')
 @patch('azure-logs.get')
@@ -580,13 +621,34 @@ def test_start_storage(mock_auth, mock_blob, mock_get_row, mock_create, mock_get
     else:
         mock_auth.assert_not_called()
 
-    md5_hash = md5(name.encode()).hexdigest()
+    container = mock_get_blobs.call_args.kwargs['container_name']
+    md5_hash = md5(f"{name}/{container}".encode()).hexdigest()
     mock_blob.assert_called_with(account_name=name, account_key=key)
-    mock_get_row.assert_called_with(azure.orm.Storage, md5=md5_hash)
-    mock_create.assert_called_with(table=azure.orm.Storage, query=name, md5_hash=md5_hash, offset=offset)
+    mock_get_row.assert_any_call(azure.orm.Storage, md5=md5_hash)
+    mock_get_row.assert_called_with(azure.orm.Storage, md5=md5(name.encode()).hexdigest())
+    mock_create.assert_called_with(table=azure.orm.Storage, query=container, md5_hash=md5_hash, offset=offset)
     mock_get_blobs.assert_called_once()
 
 
+@patch('azure-logs.get_blobs')
+@patch('azure-logs.create_new_row')
+@patch('azure-logs.orm.get_row')
+@patch('azure-logs.BlockBlobService')
+def test_start_storage_account_row(mock_blob, mock_get_row, mock_create, mock_get_blobs):
+    """Test start_storage initializes the row of a container with the dates stored for its storage account by previous
+    releases."""
+    azure.args = MagicMock(storage_auth_path=None, account_name="name", account_key="key", container="container",
+                           storage_time_offset=None, storage_workers=4)
+    mock_get_row.side_effect = [None, MagicMock(min_processed_date=PAST_DATE, max_processed_date=PRESENT_DATE)]
+    mock_create.return_value = MagicMock(min_processed_date=PAST_DATE, max_processed_date=PRESENT_DATE)
+    azure.start_storage()
+
+    mock_create.assert_called_once_with(table=azure.orm.Storage, query="container",
+                                        md5_hash=md5("name/container".encode()).hexdigest(), offset=None,
+                                        min_date=PAST_DATE, max_date=PRESENT_DATE)
+    assert mock_get_blobs.call_args.kwargs['workers'] == 4
+
+
 @pytest.mark.parametrize('container_name, exception', [
     ("", None),
     ("", azure.AzureException),
@@ -676,7 +738,7 @@ def test_get_blobs(mock_send, mock_update, blob_date, min_date, max_date, desire
 
     with open(os.path.join(TEST_DATA_PATH, test_file)) as f:
         contents = f.read()
-        blob_service.get_blob_to_text.return_value = MagicMock(content=contents)
+        blob_service.get_blob_to_stream.side_effect = lambda container, blob, stream: stream.write(contents.encode())
 
     container_name = "container"
     marker = "marker"
@@ -686,8 +748,8 @@ def test_get_blobs(mock_send, mock_update, blob_date, min_date, max_date, desire
                     min_datetime=parse(min_date), max_datetime=parse(max_date), desired_datetime=parse(desired_date))
 
     blob_service.list_blobs.assert_called_with(container_name, prefix=None, marker=marker)
-    blob_service.get_blob_to_text.assert_has_calls(
-        [call(container_name, blob.name) for blob in blob_list if extension and extension in blob.name])
+    blob_service.get_blob_to_stream.assert_has_calls(
+        [call(container_name, blob.name, ANY) for blob in blob_list if extension and extension in blob.name])
     if send_events:
         calls = list()
         extension = extension if extension else ""
@@ -727,8 +789,6 @@ def test_get_blobs_only_with_prefix(mock_send, mock_update):
     blob_service_iter_1.__iter__ = MagicMock(return_value=iter(blob_list))
     blob_service = MagicMock()
     blob_service.list_blobs.return_value = blob_service_iter_1
-    blob_service.get_blob_to_text.return_value = MagicMock(content="")
-
     container_name = "container"
     md5_hash = "hash"
 
@@ -738,8 +798,8 @@ def test_get_blobs_only_with_prefix(mock_send, mock_update):
     )
 
     blob_service.list_blobs.assert_called_with(container_name, prefix=prefix, marker=None)
-    blob_service.get_blob_to_text.assert_has_calls(
-        [call(container_name, blob.name) for blob in blob_list if prefix in blob.name]
+    blob_service.get_blob_to_stream.assert_has_calls(
+        [call(container_name, blob.name, ANY) for blob in blob_list if prefix in blob.name]
     )
 
 
@@ -759,7 +819,7 @@ def test_get_blobs_list_blobs_ko(mock_logging):
 @patch('azure-logs.logging.error')
 @patch('azure-logs.update_row_object')
 def test_get_blobs_blob_data_ko(mock_update, mock_logging, exception):
-    """Test get_blobs_list_blobs handles exceptions from 'get_blob_to_text'."""
+    """Test get_blobs_list_blobs handles exceptions from 'get_blob_to_stream'."""
     azure.args = MagicMock(blobs=None, reparse=True)
     num_blobs = 5
     blob_list = [create_mocked_blob(blob_name=f"blob_{i}") for i in range(num_blobs)]
@@ -767,7 +827,7 @@ def test_get_blobs_blob_data_ko(mock_update, mock_logging, exception):
     blob_service_iter.__iter__ = MagicMock(return_value=iter(blob_list))
     blob_service = MagicMock()
     blob_service.list_blobs.return_value = blob_service_iter
-    blob_service.get_blob_to_text.side_effect = exception
+    blob_service.get_blob_to_stream.side_effect = exception
 
     azure.get_blobs(container_name=None, blob_service=blob_service, md5_hash=None,
                     min_datetime=None, max_datetime=None,
@@ -789,7 +849,7 @@ def test_get_blobs_json_ko(mock_update, mock_loads, mock_logging, exception):
     blob_service_iter.__iter__ = MagicMock(return_value=iter(blob_list))
     blob_service = MagicMock()
     blob_service.list_blobs.return_value = blob_service_iter
-    blob_service.get_blob_to_text.return_value = MagicMock(content="invalid")
+    blob_service.get_blob_to_stream.side_effect = lambda container, blob, stream: stream.write(b"invalid")
     mock_loads.side_effect = exception
 
     azure.get_blobs(container_name=None, blob_service=blob_service, md5_hash=None,
@@ -799,6 +859,21 @@ def test_get_blobs_json_ko(mock_update, mock_loads, mock_logging, exception):
     mock_update.assert_not_called()
 
 
+@pytest.mark.parametrize('workers', [1, 2, 4])
+def test_iter_blobs_data(workers):
+    """Test iter_blobs_data yields the content of every blob in the same order they were provided."""
+    blob_list = [create_mocked_blob(blob_name=f"blob_{i}") for i in range(10)]
+    blob_service = MagicMock()
+    blob_service.get_blob_to_stream.side_effect = lambda container, blob, stream: stream.write(blob.encode())
+
+    result = []
+    for blob, data in azure.iter_blobs_data(container_name="container", blob_service=blob_service, blobs=blob_list,
+                                            workers=workers):
+        with data:
+            result.append((blob.name, data.read()))
+    assert result == [(blob.name, blob.name.encode()) for blob in blob_list]
+
+
 @patch('azure-logs.post')
 def test_get_token(mock_post):
     """Test get_token makes the expected token request and returns its value."""
@@ -846,28 +921,22 @@ def test_get_token_ko(mock_post, mock_logging, exception, error_msg, error_codes
     mock_logging.assert_called_once()
 
 
-@patch('azure-logs.socket.close')
-@patch('azure-logs.socket.send')
-@patch('azure-logs.socket.connect')
-def test_send_message(mock_connect, mock_send, mock_close):
-    """Test send_message sends the messages to the Wazuh queue socket."""
+@patch('azure-logs.analysisd')
+def test_send_message(mock_analysisd):
+    """Test send_message sends the messages through the analysisd connection."""
     message = "msg"
     azure.send_message(message)
-    mock_connect.assert_called_with(azure.ANALYSISD)
-    mock_send.assert_called_with(f'{azure.SOCKET_HEADER}{message}'.encode(errors='replace'))
-    mock_close.assert_called_once()
+    mock_analysisd.send.assert_called_once_with(message)
 
 
 @pytest.mark.parametrize('error_code', [111, 90, 1])
 @patch('azure-logs.logging.error')
-@patch('azure-logs.socket.close')
-@patch('azure-logs.socket.send')
-@patch('azure-logs.socket.connect')
-def test_send_message_ko(mock_connect, mock_send, mock_close, mock_logging, error_code):
+@patch('azure-logs.analysisd')
+def test_send_message_ko(mock_analysisd, mock_logging, error_code):
     """Test send_message handle the socket exceptions."""
     s = socket.error()
     s.errno = error_code
-    mock_send.side_effect = s
+    mock_analysisd.send.side_effect = s
 
     if error_code == 90:
         azure.send_message("")
@@ -875,10 +944,19 @@ def test_send_message_ko(mock_connect, mock_send, mock_close, mock_logging, erro
         with pytest.raises(SystemExit) as err:
             azure.send_message("")
         assert err.value.code == 1
-    mock_close.assert_called_once()
     mock_logging.assert_called_once()
 
 
+@patch('azure-logs.analysisd')
+def test_flush_messages(mock_analysisd):
+    """Test flush_messages sends the pending messages, skipping the ones too long to be sent."""
+    s = socket.error()
+    s.errno = 90
+    mock_analysisd.flush.side_effect = [s, None]
+    azure.flush_messages()
+    assert mock_analysisd.flush.call_count == 2
+
+
 @pytest.mark.parametrize('offset, expected_date', [
     ("1d", "2022-12-30T12:00:00.000000Z"),
     ("1h", "2022-12-31T11:00:00.000000Z"),
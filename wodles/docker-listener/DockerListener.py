@@ -7,12 +7,16 @@
 # the Free Software Foundation; either version 2 of the License, or
 # (at your option) any later version.
 
+import argparse
+import errno
 import os
+import queue
 import threading
 import json
 import socket
 import sys
 import time
+from collections import OrderedDict
 
 try:
     import docker
@@ -20,15 +24,25 @@ except:
     sys.stderr.write("'docker' module needs to be installed. Execute 'pip3 install docker' to do it.\n")
     exit(1)
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import utils
+
 class DockerListener:
 
     wait_time = 5
     field_debug_name = "Wodle event"
+    # Maximum number of events waiting to be sent. Reading the events stream blocks while the queue is full
+    queue_size = 10000
+    # Maximum number of queued events sent at once
+    batch_size = 100
+    # Maximum number of containers whose metadata is cached
+    container_cache_size = 1000
 
-    def __init__(self):
+    def __init__(self, enrich_events=False):
         """"
         DockerListener constructor
 
+        :param enrich_events: Whether to add the metadata of the container to its events.
         """
         if sys.platform == "win32":
             sys.stderr.write("This wodle does not work on Windows.\n")
@@ -37,13 +51,25 @@ class DockerListener:
         self.wazuh_path = os.path.abspath(os.path.join(__file__, "..", "..", ".."))
         self.wazuh_queue = os.path.join(self.wazuh_path, "queue", "sockets", "queue")
         self.msg_header = "1:Wazuh-Docker:"
+        # Long-lived connection to analysisd shared by the listening threads
+        self.sender = utils.AnalysisdSender(self.wazuh_queue, header=self.msg_header)
+        # Events read from the Docker events stream, waiting to be sent by the sender thread
+        self.events_queue = queue.Queue(maxsize=self.queue_size)
+        self.sender_thread = None
         # docker variables
         self.client = None
         self.thread1 = None
         self.thread2 = None
+        # Time of the last event read, in nanoseconds, used to resume the events stream after a disconnection
+        self.last_event_time = None
+        self.enrich_events = enrich_events
+        self.container_cache = OrderedDict()
+        self.container_cache_lock = threading.Lock()
 
     def start(self):
         self.send_msg(json.dumps({self.field_debug_name: "Started"}))
+        self.sender_thread = threading.Thread(target=self.send_events, daemon=True)
+        self.sender_thread.start()
         self.thread1 = threading.Thread(target=self.listen)
         self.thread2 = threading.Thread(target=self.listen)
         self.connect(first_time=True)
@@ -90,11 +116,14 @@ class DockerListener:
 
     def listen(self):
         """
-        Listens Docker events
+        Listens Docker events, resuming from the last event read if the stream was interrupted
 
         """
+        since = None
+        if self.last_event_time is not None:
+            since = "{}.{:09d}".format(*divmod(self.last_event_time, 10 ** 9))
         try:
-            for event in self.client.events():
+            for event in self.client.events(since=since):
                 self.process(event)
         except Exception as e:
             raise e
@@ -104,11 +133,109 @@ class DockerListener:
 
     def process(self, event):
         """"
-        Processes a main Docker event
+        Processes a main Docker event, queueing it to be sent
+
+        :param event: Docker event.
+        """
+        event = json.loads(event.decode("utf-8"))
+        event_time = event.get("timeNano") if isinstance(event, dict) else None
+        if event_time is not None:
+            # Skip the events already read before resuming the events stream
+            if self.last_event_time is not None and event_time <= self.last_event_time:
+                return
+            self.last_event_time = event_time
+        self.events_queue.put(event)
+
+    def send_events(self):
+        """
+        Sends the queued events to the Wazuh Queue in batches, waiting for analysisd to be available if needed
+
+        """
+        while True:
+            events = [self.events_queue.get()]
+            try:
+                while len(events) < self.batch_size:
+                    events.append(self.events_queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            json_msgs = []
+            for event in events:
+                if self.enrich_events:
+                    self.enrich(event)
+                json_msg = json.dumps({'integration': 'docker', 'docker': event})
+                print(json_msg)
+                json_msgs.append(json_msg)
+
+            try:
+                self.sender.send_batch(json_msgs)
+            except socket.error as e:
+                self.wait_for_analysisd(e)
+            except Exception as e:
+                sys.stderr.write("Error sending message to wazuh: {}\n".format(e))
+
+    def wait_for_analysisd(self, error):
+        """
+        Retries sending the pending events until analysisd receives them
+
+        :param error: error raised when sending the events.
+        """
+        while error is not None:
+            if error.errno == errno.EMSGSIZE:
+                sys.stderr.write("Message too long to send to Wazuh. Skipping message...\n")
+            else:
+                sys.stderr.write("Error sending message to wazuh: {}. Retrying...\n".format(error))
+                time.sleep(self.wait_time)
+            try:
+                self.sender.flush()
+                error = None
+            except socket.error as e:
+                error = e
+
+    def enrich(self, event):
+        """
+        Adds the metadata of the container to a container event
 
         :param event: Docker event.
         """
-        self.send_msg(event.decode("utf-8"))
+        if event.get("Type") != "container":
+            return
+        container_id = event.get("id") or event.get("Actor", {}).get("ID")
+        if not container_id:
+            return
+        container_info = self.get_container_info(container_id)
+        if container_info:
+            event["container_info"] = container_info
+        if event.get("Action") == "destroy":
+            with self.container_cache_lock:
+                self.container_cache.pop(container_id, None)
+
+    def get_container_info(self, container_id):
+        """
+        Gets the name, image, labels and creation date of a container, inspecting it only if it is not cached
+
+        :param container_id: ID of the container.
+        :return: dict with the container metadata or None if it could not be inspected.
+        """
+        with self.container_cache_lock:
+            if container_id in self.container_cache:
+                self.container_cache.move_to_end(container_id)
+                return self.container_cache[container_id]
+
+        try:
+            attrs = self.client.api.inspect_container(container_id)
+        except Exception:
+            return None
+        container_info = {'name': attrs.get('Name', '').lstrip('/'),
+                          'image': attrs.get('Config', {}).get('Image'),
+                          'labels': attrs.get('Config', {}).get('Labels'),
+                          'created': attrs.get('Created')}
+
+        with self.container_cache_lock:
+            self.container_cache[container_id] = container_info
+            if len(self.container_cache) > self.container_cache_size:
+                self.container_cache.popitem(last=False)
+        return container_info
 
     def format_msg(self, msg):
         """
@@ -128,11 +255,7 @@ class DockerListener:
         try:
             json_msg = json.dumps(self.format_msg(msg))
             print(json_msg)
-            s = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
-            s.connect(self.wazuh_queue)
-            s.send("{header}{msg}".format(header=self.msg_header,
-                                          msg=json_msg).encode())
-            s.close()
+            self.sender.send(json_msg)
         except socket.error as e:
             if e.errno == 111:
                 sys.stderr.write('Wazuh must be running.\n')
@@ -145,6 +268,19 @@ class DockerListener:
             sys.exit(13)
 
 
+def get_script_arguments():
+    """
+    Gets the script arguments
+
+    :return: parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Wazuh wodle for monitoring Docker events")
+    parser.add_argument('-e', '--enrich', action='store_true', dest='enrich_events', default=False,
+                        help='Add the name, image and labels of the container to its events.')
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    dl = DockerListener()
+    arguments = get_script_arguments()
+    dl = DockerListener(enrich_events=arguments.enrich_events)
     dl.start()
@@ -1,3 +1,4 @@
+import errno
 import json
 import os
 import socket
@@ -139,13 +140,126 @@ def test_DockerListener_listen_ko(mock_process, mock_send, mock_connect):
     mock_connect.assert_not_called()
 
 
+def test_DockerListener_process():
+    """Test process function queues the decoded events, skipping the ones already read."""
+    dl = docker_listener.DockerListener()
+    for time_nano in [1, 2, 2, 1, 3]:
+        dl.process(json.dumps({"status": "start", "timeNano": time_nano}).encode())
+    dl.process(b'{"status": "no time"}')
+
+    queued = [dl.events_queue.get_nowait() for _ in range(dl.events_queue.qsize())]
+    assert [event.get("timeNano") for event in queued] == [1, 2, 3, None]
+    assert dl.last_event_time == 3
+
+
+@pytest.mark.parametrize('last_event_time, since', [
+    (None, None),
+    (1632145678123456789, "1632145678.123456789"),
+    (1632145678000000001, "1632145678.000000001")
+])
+@patch('DockerListener.DockerListener.connect')
 @patch('DockerListener.DockerListener.send_msg')
-def test_DockerListener_process(mock_send):
-    """Test process function sends the decoded events to the Wazuh socket."""
-    event = b"test"
+def test_DockerListener_listen_since(mock_send, mock_connect, last_event_time, since):
+    """Test listen resumes the events stream from the last event read."""
     dl = docker_listener.DockerListener()
-    dl.process(event)
-    mock_send.assert_called_with(event.decode("utf-8"))
+    dl.client = MagicMock()
+    dl.client.events.return_value = []
+    dl.last_event_time = last_event_time
+    dl.listen()
+    dl.client.events.assert_called_once_with(since=since)
+
+
+@pytest.mark.parametrize('enrich_events', [False, True])
+@patch('DockerListener.print', create=True)
+def test_DockerListener_send_events(mock_print, enrich_events):
+    """Test send_events sends the queued events in batches, enriching them if required."""
+    class StopSending(BaseException):
+        pass
+
+    dl = docker_listener.DockerListener(enrich_events=enrich_events)
+    dl.batch_size = 2
+    dl.sender = MagicMock()
+    dl.client = MagicMock()
+    dl.client.api.inspect_container.return_value = {'Name': '/test', 'Config': {'Image': 'image', 'Labels': {}},
+                                                    'Created': 'date'}
+    events = [{"Type": "container", "id": "abc", "Action": "start"} for _ in range(3)]
+    for event in events:
+        dl.events_queue.put(event)
+    # Stop after sending the last batch
+    dl.sender.send_batch.side_effect = [None, StopSending]
+
+    with pytest.raises(StopSending):
+        dl.send_events()
+
+    assert dl.sender.send_batch.call_count == 2
+    sent = [msg for c in dl.sender.send_batch.call_args_list for msg in c.args[0]]
+    assert len(sent) == len(events)
+    if enrich_events:
+        assert json.loads(sent[0])["docker"]["container_info"]["name"] == "test"
+        dl.client.api.inspect_container.assert_called_once_with("abc")
+    else:
+        assert "container_info" not in json.loads(sent[0])["docker"]
+        dl.client.api.inspect_container.assert_not_called()
+
+
+@patch('DockerListener.time.sleep')
+@patch('sys.stderr.write')
+def test_DockerListener_wait_for_analysisd(mock_stderr, mock_sleep):
+    """Test wait_for_analysisd retries sending the pending events until analysisd receives them."""
+    dl = docker_listener.DockerListener()
+    dl.sender = MagicMock()
+    refused = socket.error()
+    refused.errno = 111
+    dl.sender.flush.side_effect = [refused, None]
+    dl.wait_for_analysisd(refused)
+    assert dl.sender.flush.call_count == 2
+    assert mock_sleep.call_count == 2
+
+
+@patch('sys.stderr.write')
+@patch('DockerListener.print', create=True)
+@patch('utils.socket.socket')
+def test_DockerListener_send_events_analysisd_down(mock_socket, mock_print, mock_stderr):
+    """Test send_events delivers the whole batch once analysisd is available again."""
+    class StopSending(BaseException):
+        pass
+
+    delivered = []
+    analysisd = {'up': False}
+
+    def connect(_):
+        if not analysisd['up']:
+            raise ConnectionRefusedError(errno.ECONNREFUSED, 'Connection refused')
+
+    mock_socket.return_value.connect.side_effect = connect
+    mock_socket.return_value.send.side_effect = lambda msg: delivered.append(json.loads(msg.decode().split(':', 2)[2]))
+
+    dl = docker_listener.DockerListener()
+    dl.batch_size = 10
+    # Fail at once, so only wait_for_analysisd waits for analysisd to come back
+    dl.sender.max_retries = 0
+    events = [{"Type": "container", "id": f"e{i}", "Action": "start"} for i in range(10)]
+    dl.events_queue = MagicMock()
+    dl.events_queue.get.side_effect = [events[0], StopSending]
+    dl.events_queue.get_nowait.side_effect = events[1:]
+
+    with patch('DockerListener.time.sleep', side_effect=lambda _: analysisd.update(up=True)), \
+            pytest.raises(StopSending):
+        dl.send_events()
+
+    assert [msg['docker']['id'] for msg in delivered] == [event['id'] for event in events]
+    assert dl.sender.pending == 0
+
+
+def test_DockerListener_get_container_info_cache():
+    """Test get_container_info caches the metadata of the most recently used containers."""
+    dl = docker_listener.DockerListener()
+    dl.container_cache_size = 2
+    dl.client = MagicMock()
+    dl.client.api.inspect_container.side_effect = lambda container_id: {'Name': f'/{container_id}'}
+    for container_id in ['a', 'b', 'a', 'c', 'a', 'b']:
+        assert dl.get_container_info(container_id)['name'] == container_id
+    assert [c.args[0] for c in dl.client.api.inspect_container.call_args_list] == ['a', 'b', 'c', 'b']
 
 
 def test_DockerListener_format_msg():
@@ -158,7 +272,7 @@ def test_DockerListener_format_msg():
     assert result.get("docker") == json.loads(msg)
 
 
-@patch('DockerListener.socket.socket')
+@patch('utils.socket.socket')
 def test_DockerListener_send_msg(mock_socket):
     """Test send_msg sends the messages with the expected contents to the Wazuh socket."""
     msg = '{"test": "value"}'
@@ -167,12 +281,14 @@ def test_DockerListener_send_msg(mock_socket):
     mock_socket.return_value = m
     dl = docker_listener.DockerListener()
     dl.send_msg(msg)
+    dl.send_msg(msg)
 
-    mock_socket.assert_called_with(socket.AF_UNIX, socket.SOCK_DGRAM)
-    m.connect.assert_called_with(dl.wazuh_queue)
+    mock_socket.assert_called_once_with(socket.AF_UNIX, socket.SOCK_DGRAM)
+    m.connect.assert_called_once_with(dl.wazuh_queue)
     formatted_msg = json.dumps(dl.format_msg(msg))
     m.send.assert_called_with(f"{dl.msg_header}{formatted_msg}".encode())
-    m.close.assert_called_once()
+    assert dl.sender.sent == 2
+    m.close.assert_not_called()
 
 
 @pytest.mark.parametrize('exception_code, exit_code', [
@@ -182,7 +298,7 @@ def test_DockerListener_send_msg(mock_socket):
 ])
 @patch('sys.stderr.write')
 @patch('DockerListener.json', MagicMock())
-@patch('DockerListener.socket.socket')
+@patch('utils.socket.socket')
 def test_DockerListener_send_msg_ko(mock_socket, mock_stderr, exception_code, exit_code):
     """Test send_message handle the socket exceptions."""
     if exception_code:
@@ -32,27 +32,29 @@ class GCSAccessLogs(WazuhGCloudBucket):
         super().__init__(credentials_file, logger, **kwargs)
         self.db_table_name = "access_logs"
 
-    def load_information_from_file(self, msg: str):
-        """Load the contents of an Access Logs blob and process them.
+    def load_information_from_file(self, file):
+        """Load the contents of an Access Logs blob and process them line by line.
 
         GCS Access Logs blobs will always contain the fieldnames as the first line while the remaining lines store the
         data of the log itself.
 
         Parameters
         ----------
-        msg : str
-            A string with the contents of the blob file.
+        file : Iterable[str]
+            The lines of the blob file, like a file object opened in text mode.
 
-        Returns
-        -------
-        list
-            A list of JSON formatted events.
+        Yields
+        ------
+        dict
+            JSON formatted events.
         """
-        # Clean and split each line in the file
-        lines = msg.replace('"', '').split("\n")
+        # Clean each line in the file
+        lines = (line.replace('"', '') for line in file)
 
         # Get the fieldnames from the first line
-        fieldnames = [field.strip() for field in lines[0].split(",")]
-        values = lines[1:]
-        tsv_file = csv.DictReader(values, fieldnames=fieldnames, delimiter=',')
-        return [dict(x, source='gcp_bucket') for x in tsv_file]
+        header = next(lines, None)
+        if header is None:
+            return
+        fieldnames = [field.strip() for field in header.split(",")]
+        for event in csv.DictReader(lines, fieldnames=fieldnames, delimiter=','):
+            yield dict(event, source='gcp_bucket')
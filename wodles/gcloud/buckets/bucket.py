@@ -8,6 +8,7 @@
 
 import logging
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 from sys import exit, path
 from datetime import datetime, timezone
 from json import dumps, JSONDecodeError
@@ -31,7 +32,8 @@ class WazuhGCloudBucket(WazuhGCloudIntegration):
     """Class for getting Google Cloud Storage Bucket logs"""
 
     def __init__(self, credentials_file: str, logger: logging.Logger, bucket_name: str, prefix: str = None,
-            delete_file: bool = False, only_logs_after: datetime = None, reparse : bool = False):
+            delete_file: bool = False, only_logs_after: datetime = None, reparse : bool = False,
+            discard_filter: utils.DiscardFilter = None, workers: int = 1):
         """Class constructor.
 
         Parameters
@@ -50,6 +52,10 @@ class WazuhGCloudBucket(WazuhGCloudIntegration):
             Date after which obtain logs.
         reparse : bool
             Whether to parse already parsed logs or not
+        discard_filter : utils.DiscardFilter
+            Rules used to skip events instead of sending them to analysisd.
+        workers : int
+            Number of blobs processed concurrently.
 
         Raises
         ------
@@ -57,7 +63,7 @@ class WazuhGCloudBucket(WazuhGCloudIntegration):
             If the credentials file doesn't exist or doesn't have the required
             structure.
         """
-        super().__init__(logger)
+        super().__init__(logger, discard_filter)
         self.bucket_name = bucket_name
         self.bucket = None
         try:
@@ -76,6 +82,7 @@ class WazuhGCloudBucket(WazuhGCloudIntegration):
         self.db_table_name = None
         self.datetime_format = "%Y-%m-%d %H:%M:%S.%f%z"
         self.reparse = reparse
+        self.workers = workers
 
         self.sql_create_table = """
             CREATE TABLE
@@ -165,15 +172,13 @@ class WazuhGCloudBucket(WazuhGCloudIntegration):
             except sqlite3.OperationalError:
                 pass
 
-            for blob in processed_files:
-                creation_time = datetime.strftime(blob.time_created, self.datetime_format)
-                self.db_connector.execute(self.sql_insert_processed_file.format(table_name=self.db_table_name), {
-                    'project_id': self.project_id,
-                    'bucket_name': self.bucket_name,
-                    'prefix': self.prefix,
-                    'blob_name': blob.name,
-                    'creation_time': creation_time
-                })
+            self.db_connector.executemany(self.sql_insert_processed_file.format(table_name=self.db_table_name), [{
+                'project_id': self.project_id,
+                'bucket_name': self.bucket_name,
+                'prefix': self.prefix,
+                'blob_name': blob.name,
+                'creation_time': datetime.strftime(blob.time_created, self.datetime_format)
+            } for blob in processed_files])
 
     def _get_last_creation_time(self):
         """Get the latest creation time value stored in the database for the given project, bucket_name and
@@ -236,6 +241,9 @@ class WazuhGCloudBucket(WazuhGCloudIntegration):
         checks if a particular file should be processed by taking into account the 'only_logs_after' and 'prefix', as
         well as the creation time of each blob.
 
+        The selected blobs are processed by up to `workers` threads sharing the same analysisd connection. The
+        processed files are stored in the database at the end of the execution, in a single transaction.
+
         Returns
         -------
         int
@@ -250,41 +258,51 @@ class WazuhGCloudBucket(WazuhGCloudIntegration):
 
             self.init_db()
             last_creation_time = self._get_last_creation_time()
-            previous_processed_files = self._get_last_processed_files()
+            previous_processed_files = set(self._get_last_processed_files())
 
             if self.reparse:
                 self.logger.info('Reparse Mode ON')
 
-            for blob in bucket_contents:
-                # Skip folders
-                if blob.name.endswith('/'):
-                    continue
+            with self.initialize_socket(), ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = []
+                for blob in bucket_contents:
+                    # Skip folders
+                    if blob.name.endswith('/'):
+                        continue
 
-                current_creation_time = blob.time_created
-                comparison_date = self.only_logs_after if self.only_logs_after else self.default_date
+                    current_creation_time = blob.time_created
+                    comparison_date = self.only_logs_after if self.only_logs_after else self.default_date
 
-                if current_creation_time >= comparison_date:
-                    if (current_creation_time > last_creation_time) or \
-                            (current_creation_time == last_creation_time and blob.name not in previous_processed_files):
-                        self.logger.info(f'Processing {blob.name}')
-                        processed_messages += self.process_blob(blob)
+                    if current_creation_time >= comparison_date:
+                        if (current_creation_time > last_creation_time) or \
+                                (current_creation_time == last_creation_time and
+                                 blob.name not in previous_processed_files):
+                            self.logger.info(f'Processing {blob.name}')
+                            futures.append((blob, True, executor.submit(self.process_blob, blob)))
 
-                        if current_creation_time > new_creation_time:
-                            processed_files.clear()
-                            new_creation_time = current_creation_time
+                        elif self.reparse:
+                            futures.append((blob, False, executor.submit(self.process_blob, blob)))
 
-                        processed_files.append(blob)
-
-                    elif self.reparse:
-                        processed_messages += self.process_blob(blob)
-                        processed_files.append(blob)
+                        else:
+                            self.logger.info(f'Skipping previously processed file: {blob.name}')
 
                     else:
-                        self.logger.info(f'Skipping previously processed file: {blob.name}')
+                        self.logger.info(f'The creation time of {blob.name} is older than {comparison_date}. '
+                                         f'Skipping it...')
 
-                else:
-                    self.logger.info(f'The creation time of {blob.name} is older than {comparison_date}. '
-                                     f'Skipping it...')
+                # Keep track of the processed blobs in the same order they were listed
+                try:
+                    for blob, new_blob, future in futures:
+                        processed_messages += future.result()
+
+                        if new_blob and blob.time_created > new_creation_time:
+                            processed_files.clear()
+                            new_creation_time = blob.time_created
+
+                        processed_files.append(blob)
+                finally:
+                    for _, _, future in futures:
+                        future.cancel()
 
         finally:
             # Ensure the changes are committed to the database even if an exception was raised
@@ -294,13 +312,15 @@ class WazuhGCloudBucket(WazuhGCloudIntegration):
                 self.db_connector.close()
         return processed_messages
 
-    def load_information_from_file(self, msg: str):
+    def load_information_from_file(self, file):
         raise NotImplementedError
 
     def process_blob(self, blob):
         """Format every event obtained from `load_information_from_file` and send them to Analysisd. If the
         `delete_file` was used the blob will be removed from the bucket after being processed.
 
+        The blob is read as a stream, so its events are sent while it is being downloaded.
+
         Parameters
         ----------
         blob : google.cloud.storage.blob.Blob
@@ -312,12 +332,12 @@ class WazuhGCloudBucket(WazuhGCloudIntegration):
         """
         num_events = 0
         try:
-            events = self.load_information_from_file(blob.download_as_text())
-            if len(events) > 0:
-                with self.initialize_socket():
-                    for event in events:
-                        self.send_msg(self.format_msg(dumps(event)))
-                        num_events += 1
+            with blob.open('r') as file:
+                for event in self.load_information_from_file(file):
+                    if self.event_should_be_discarded(event):
+                        continue
+                    self.send_msg(self.format_msg(dumps(event)))
+                    num_events += 1
             if self.delete_file:
                 self.bucket.delete_blob(blob.name)
         except google_exceptions.NotFound:
@@ -14,7 +14,40 @@ from sys import exit
 from os import cpu_count
 from buckets.access_logs import GCSAccessLogs
 from pubsub.subscriber import WazuhGCloudSubscriber
-from concurrent.futures import ThreadPoolExecutor
+from utils import DiscardFilter
+
+
+def get_num_threads(n_threads: int, logger) -> int:
+    """Validate the number of threads requested, truncating it to the maximum allowed.
+
+    Parameters
+    ----------
+    n_threads : int
+        Number of threads requested.
+    logger : logging.Logger
+        The logger used to warn if the number of threads is truncated.
+
+    Returns
+    -------
+    int
+        The number of threads to use.
+
+    Raises
+    ------
+    exceptions.GCloudError
+        If the number of threads is lower than the minimum allowed.
+    """
+    try:
+        max_threads = cpu_count() * 5
+    except TypeError:
+        max_threads = 5
+
+    if n_threads > max_threads:
+        n_threads = max_threads
+        logger.warning(f'Reached maximum number of threads. Truncating to {max_threads}.')
+    if n_threads < tools.min_num_threads:
+        raise exceptions.GCloudError(1202)
+    return n_threads
 
 
 def main():
@@ -27,6 +60,8 @@ def main():
         credentials_file = arguments.credentials_file
         log_level = arguments.log_level
         num_processed_messages = 0
+        discard_filter = DiscardFilter.from_arguments(arguments.discard_field, arguments.discard_regex,
+                                                      arguments.discard_match)
 
         if arguments.integration_type == "pubsub":
             if arguments.subscription_id is None:
@@ -37,41 +72,18 @@ def main():
             project = arguments.project
             subscription_id = arguments.subscription_id
             max_messages = arguments.max_messages
-            n_threads = arguments.n_threads
-
-            try:
-                max_threads = cpu_count() * 5
-            except TypeError:
-                max_threads = 5
-
-            if n_threads > max_threads:
-                n_threads = max_threads
-                logger.warning(f'Reached maximum number of threads. Truncating to {max_threads}.')
-            if n_threads < tools.min_num_threads:
-                raise exceptions.GCloudError(1202)
+            n_threads = get_num_threads(arguments.n_threads, logger)
             if max_messages < tools.min_num_messages:
                 raise exceptions.GCloudError(1203)
 
-            logger.debug(f"Setting {n_threads} thread{'s' if n_threads > 1 else ''} to pull {max_messages}"
-                         f" message{'s' if max_messages > 1 else ''} in total")
-
-            # process messages
-            with ThreadPoolExecutor() as executor:
-                futures = []
-
-                # check permissions
-                subscriber_client = WazuhGCloudSubscriber(credentials_file, project, logger, subscription_id)
-                subscriber_client.check_permissions()
-                messages_per_thread = max_messages // n_threads
-                remaining_messages = max_messages % n_threads
-                futures.append(executor.submit(subscriber_client.process_messages, messages_per_thread + remaining_messages))
-
-                if messages_per_thread > 0:
-                    for _ in range(n_threads - 1):
-                        client = WazuhGCloudSubscriber(credentials_file, project, logger, subscription_id)
-                        futures.append(executor.submit(client.process_messages, messages_per_thread))
+            logger.debug(f"Setting {n_threads} concurrent pull request{'s' if n_threads > 1 else ''} to pull "
+                         f"{max_messages} message{'s' if max_messages > 1 else ''} in total")
 
-            num_processed_messages = sum([future.result() for future in futures])
+            # process messages using a single client and analysisd connection
+            subscriber_client = WazuhGCloudSubscriber(credentials_file, project, logger, subscription_id,
+                                                      discard_filter)
+            subscriber_client.check_permissions()
+            num_processed_messages = subscriber_client.process_messages(max_messages, n_pulls=n_threads)
 
         elif arguments.integration_type == "access_logs":
             if not arguments.bucket_name:
@@ -81,7 +93,9 @@ def main():
                         "prefix": arguments.prefix,
                         "delete_file": arguments.delete_file,
                         "only_logs_after": arguments.only_logs_after,
-                        "reparse": arguments.reparse}
+                        "reparse": arguments.reparse,
+                        "discard_filter": discard_filter,
+                        "workers": get_num_threads(arguments.n_threads, logger)}
             integration = GCSAccessLogs(arguments.credentials_file, logger, **f_kwargs)
             integration.check_permissions()
             num_processed_messages = integration.process_data()
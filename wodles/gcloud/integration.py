@@ -9,12 +9,12 @@
 """This module contains tools for processing events from a Google Cloud subscription."""  # noqa: E501
 
 import logging
-import socket
+from json import loads, JSONDecodeError
 from sys import path
 from os.path import dirname, abspath
 path.insert(0, dirname(dirname(abspath(__file__))))
 import exceptions
-from utils import ANALYSISD
+from utils import ANALYSISD, AnalysisdSender, DiscardFilter
 
 
 class WazuhGCloudIntegration:
@@ -23,20 +23,48 @@ class WazuhGCloudIntegration:
     header = '1:Wazuh-GCloud:'
     key_name = 'gcp'
 
-    def __init__(self, logger: logging.Logger):
+    def __init__(self, logger: logging.Logger, discard_filter: DiscardFilter = None):
         """Instantiate a WazuhGCloudIntegration object.
 
         Parameters
         ----------
         logger: logging.Logger
             The logger that will be used to send messages to stdout.
+        discard_filter : DiscardFilter
+            Rules used to skip events instead of sending them to analysisd.
         """
         self.logger = logger
         self.socket = None
+        self.discard_filter = discard_filter or DiscardFilter([])
 
     def check_permissions(self):
         raise NotImplementedError
 
+    def event_should_be_discarded(self, event) -> bool:
+        """Check whether an event matches the discard rules and should not be sent.
+
+        Parameters
+        ----------
+        event : dict or str
+            The event to check. Strings are decoded as JSON only if there are discard rules.
+
+        Returns
+        -------
+        bool
+            True if the event should be skipped, False otherwise.
+        """
+        if not self.discard_filter:
+            return False
+        if isinstance(event, str):
+            try:
+                event = loads(event)
+            except JSONDecodeError:
+                return False
+        if isinstance(event, dict) and self.discard_filter.matches(event):
+            self.logger.debug(f'The {self.discard_filter} discard rules found a match. The event will be skipped.')
+            return True
+        return False
+
     def format_msg(self, msg: str) -> str:
         """Format a message.
 
@@ -54,12 +82,13 @@ class WazuhGCloudIntegration:
         return f'{{"integration": "gcp", "{self.key_name}": {msg}}}'
 
     def initialize_socket(self):
-        """Initialize a socket and connect it to an address.
+        """Initialize a connection to analysisd. The same connection is reused for every message sent until it is
+        closed.
 
         Returns
         -------
-        socket
-            The initialized socket to be able to use it as a context manager.
+        AnalysisdSender
+            The connected sender to be able to use it as a context manager.
 
         Raises
         ------
@@ -68,8 +97,8 @@ class WazuhGCloudIntegration:
              to analysisd.
         """
         try:
-            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
-            self.socket.connect(ANALYSISD)
+            self.socket = AnalysisdSender(ANALYSISD, header=self.header)
+            self.socket.connect()
             return self.socket
         except ConnectionRefusedError:
             raise exceptions.WazuhIntegrationInternalError(1)
@@ -92,9 +121,8 @@ class WazuhGCloudIntegration:
         exceptions.WazuhIntegrationInternalError
             If the socket is unable to send the message to analysisd.
         """
-        event_json = f'{self.header}{msg}'.encode(errors='replace')
-        self.logger.debug(f'Sending msg to analysisd: "{event_json}"')
+        self.logger.debug(f'Sending msg to analysisd: "{self.header}{msg}"')
         try:
-            self.socket.send(event_json)
+            self.socket.send(msg)
         except OSError:
             raise exceptions.WazuhIntegrationInternalError(3)
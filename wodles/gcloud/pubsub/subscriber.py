@@ -6,6 +6,8 @@
 # This program is free software; you can redistribute
 # it and/or modify it under the terms of GPLv2
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from os.path import abspath, dirname
 from sys import path
 from json import JSONDecodeError
@@ -13,6 +15,7 @@ from json import JSONDecodeError
 path.insert(0, dirname(dirname(dirname(abspath(__file__)))))
 import exceptions
 from integration import WazuhGCloudIntegration
+from utils import DiscardFilter
 
 
 try:
@@ -25,7 +28,8 @@ except ImportError as e:
 class WazuhGCloudSubscriber(WazuhGCloudIntegration):
     """Class for sending events from Google Cloud to Wazuh."""
 
-    def __init__(self, credentials_file: str, project: str, logger: logging.Logger, subscription_id: str):
+    def __init__(self, credentials_file: str, project: str, logger: logging.Logger, subscription_id: str,
+                 discard_filter: DiscardFilter = None):
         """Instantiate a WazuhGCloudSubscriber object.
 
         Parameters
@@ -38,13 +42,15 @@ class WazuhGCloudSubscriber(WazuhGCloudIntegration):
             Subscription ID.
         logger: logging.Logger
             The logger that will be used to send messages to stdout.
+        discard_filter : DiscardFilter
+            Rules used to skip messages instead of sending them to analysisd.
 
         Raises
         ------
         exceptions.GCloudError
             If the credentials file doesn't exist or have a wrong structure.
         """
-        super().__init__(logger)
+        super().__init__(logger, discard_filter)
 
         # get subscriber
         try:
@@ -112,8 +118,8 @@ class WazuhGCloudSubscriber(WazuhGCloudIntegration):
         if required_permissions.difference(response.permissions) != set():
             raise exceptions.GCloudError(1206, permissions=required_permissions.difference(response.permissions))
 
-    def pull_request(self, max_messages: int) -> int:
-        """Make request for pulling messages from the subscription and acknowledge them.
+    def pull(self, max_messages: int) -> list:
+        """Pull messages from the subscription without acknowledging them.
 
         Parameters
         ----------
@@ -122,8 +128,8 @@ class WazuhGCloudSubscriber(WazuhGCloudIntegration):
 
         Returns
         -------
-        int
-            Number of messages received and acknowledged.
+        list
+            The received messages. Empty if the deadline for the request was exceeded.
         """
         try:
             response = self.subscriber.pull(
@@ -133,40 +139,117 @@ class WazuhGCloudSubscriber(WazuhGCloudIntegration):
         except google.api_core.exceptions.DeadlineExceeded:
             self.logger.warning('Deadline exceeded when pulling messages. No more messages will be retrieved on this '
                                 'execution')
-            return 0
+            return []
+        return list(response.received_messages)
+
+    def send_messages(self, received_messages: list) -> list:
+        """Send the received messages to analysisd, skipping the ones matching the discard rules.
+
+        Parameters
+        ----------
+        received_messages : list
+            Messages returned by `pull`.
 
+        Returns
+        -------
+        list
+            The ack IDs of the messages sent or discarded.
+        """
         ack_ids = []
-        for received_message in response.received_messages:
-            formatted_message = self.format_msg(received_message.message.data.decode(errors='replace'))
-            self.logger.debug(f'Processing event: {formatted_message}')
+        for received_message in received_messages:
+            message_data = received_message.message.data.decode(errors='replace')
+            if not self.event_should_be_discarded(message_data):
+                formatted_message = self.format_msg(message_data)
+                self.logger.debug(f'Processing event: {formatted_message}')
+                self.send_msg(formatted_message)
             ack_ids.append(received_message.ack_id)
-            self.send_msg(formatted_message)
+        return ack_ids
+
+    def acknowledge(self, ack_ids: list):
+        """Acknowledge the given messages so they are not delivered again.
 
+        Parameters
+        ----------
+        ack_ids : list
+            The ack IDs of the messages to acknowledge.
+        """
         ack_ids and self.subscriber.acknowledge(
             request={'subscription': self.subscription_path, 'ack_ids': ack_ids}
         )
 
-        return len(response.received_messages)
+    def pull_request(self, max_messages: int) -> int:
+        """Make request for pulling messages from the subscription and acknowledge them.
+
+        Parameters
+        ----------
+        max_messages: int
+            Maximum number of messages to retrieve.
 
-    def process_messages(self, max_messages: int = 100) -> int:
+        Returns
+        -------
+        int
+            Number of messages received and acknowledged.
+        """
+        received_messages = self.pull(max_messages)
+        self.acknowledge(self.send_messages(received_messages))
+        return len(received_messages)
+
+    def process_messages(self, max_messages: int = 100, n_pulls: int = 1, batch_size: int = 100) -> int:
         """Process the available messages in the subscription.
 
+        Pulling, sending and acknowledging overlap: up to `n_pulls` pull requests of at most `batch_size` messages each
+        are in flight while the messages already received are sent to analysisd by the calling thread, and the
+        messages sent are acknowledged in the background. The number of messages requested never exceeds
+        `max_messages`, which bounds the messages pending to be sent.
+
         Parameters
         ----------
         max_messages: int
             Maximum number of messages to retrieve.
+        n_pulls : int
+            Maximum number of concurrent pull requests.
+        batch_size : int
+            Maximum number of messages requested by each pull request.
 
         Returns
         -------
         int
             Number of messages processed.
         """
-        with self.subscriber, self.initialize_socket():
+        with self.subscriber, self.initialize_socket(), ThreadPoolExecutor(max_workers=n_pulls + 1) as executor:
             processed_messages = 0
-            pulled_messages = self.pull_request(max_messages)
-            while pulled_messages > 0 and processed_messages < max_messages:
-                processed_messages += pulled_messages
-                # get more messages
-                if processed_messages < max_messages:
-                    pulled_messages = self.pull_request(max_messages - processed_messages)
+            requested_messages = 0
+            drained = False
+            pulls = deque()
+            acks = []
+
+            try:
+                while True:
+                    while not drained and len(pulls) < n_pulls and requested_messages < max_messages:
+                        size = min(batch_size, max_messages - requested_messages)
+                        pulls.append((size, executor.submit(self.pull, size)))
+                        requested_messages += size
+                    if not pulls:
+                        break
+
+                    size, future = pulls.popleft()
+                    received_messages = future.result()
+                    # Release the messages requested but not received
+                    requested_messages -= size - len(received_messages)
+                    if not received_messages:
+                        drained = True
+                        continue
+
+                    ack_ids = self.send_messages(received_messages)
+                    acks.append(executor.submit(self.acknowledge, ack_ids))
+                    processed_messages += len(received_messages)
+            finally:
+                # The messages received but not sent will be delivered again once their ack deadline expires
+                for _, future in pulls:
+                    future.cancel()
+
+            # Raise any error acknowledging the messages
+            for future in acks:
+                future.result()
+
         return processed_messages
@@ -8,6 +8,7 @@
 
 """Unit tests for bucket module."""
 
+import io
 import json
 import os
 import sqlite3
@@ -381,6 +382,7 @@ def test_WazuhGCloudBucket_process_data(mock_client, mock_init_db, prefix, blob_
     bucket.db_connector = mock_db_connector
     bucket._update_last_processed_files = mock_update_last_processed_files
     bucket._get_last_creation_time = mock_last_creation_time
+    bucket.initialize_socket = MagicMock()
 
     # Call the function we want to test
     processed_messages = bucket.process_data()
@@ -412,6 +414,28 @@ def test_WazuhGCloudBucket_process_data(mock_client, mock_init_db, prefix, blob_
     assert processed_messages == total_messages
 
 
+@patch('buckets.bucket.WazuhGCloudBucket.init_db')
+@patch('buckets.bucket.storage.client.Client.from_service_account_json')
+def test_WazuhGCloudBucket_process_data_workers(mock_client, mock_init_db):
+    """Test process_data processes the blobs concurrently, storing the processed files in the same order they were
+    listed."""
+    bucket = WazuhGCloudBucket(**get_wodle_config(only_logs_after=datetime(2022, 1, 1, tzinfo=pytz.UTC)),
+                               workers=4)
+    blob_list = [create_mocked_blob(blob_name=f'blob_{i}', creation_time=datetime(2022, 12, 31)) for i in range(20)]
+    bucket.bucket = MagicMock()
+    bucket.bucket.list_blobs.return_value = blob_list
+    bucket.db_connector = MagicMock()
+    bucket.initialize_socket = MagicMock()
+    bucket._get_last_creation_time = MagicMock(return_value=datetime.min.replace(tzinfo=pytz.UTC))
+    bucket._get_last_processed_files = MagicMock(return_value=[])
+    bucket._update_last_processed_files = MagicMock()
+    bucket.process_blob = MagicMock(side_effect=lambda blob: int(blob.name.split('_')[1]))
+
+    assert bucket.process_data() == sum(range(20))
+    bucket.initialize_socket.assert_called_once()
+    bucket._update_last_processed_files.assert_called_once_with(blob_list)
+
+
 @patch('buckets.bucket.storage.client.Client.from_service_account_json')
 def test_WazuhGCloudBucket_load_information_from_file(mock_client):
     """Test load_information_from_file is not implemented for this base class."""
@@ -449,6 +473,21 @@ def test_WazuhGCloudBucket_process_blob_ko(mock_client, mock_load_information):
     assert num_messages_sent == 0
 
 
+@patch('buckets.access_logs.GCSAccessLogs.send_msg')
+@patch('buckets.bucket.storage.client.Client.from_service_account_json')
+def test_GCSAccessLogs_process_blob_stream(mock_client, mock_send_msg):
+    """Test process_blob reads the blob as a text stream and sends every event contained."""
+    with open(os.path.join(data_path, "access_logs.log")) as f:
+        contents = f.read()
+    blob = create_mocked_blob("blob")
+    blob.open.return_value = io.StringIO(contents)
+    num_events = len([line for line in contents.splitlines()[1:] if line])
+    bucket = GCSAccessLogs(**get_wodle_config())
+    assert bucket.process_blob(blob) == num_events
+    blob.open.assert_called_once_with('r')
+    assert mock_send_msg.call_count == num_events
+
+
 @patch('buckets.bucket.storage.client.Client.from_service_account_json')
 def test_GCSAccessLogs__init__(mock_client):
     """Test if an instance of GCSAccessLogs is created properly."""
@@ -471,7 +510,9 @@ def test_GSCAccessLogs_load_information_from_file(mock_client, file_path):
     header = header.split(",")
     header.append("source")
     bucket = GCSAccessLogs(**get_wodle_config())
-    for event in bucket.load_information_from_file(contents):
+    events = list(bucket.load_information_from_file(io.StringIO(contents)))
+    assert len(events) == len([line for line in contents.splitlines()[1:] if line])
+    for event in events:
         keys = event.keys()
         assert set(header) == set(keys)
         for key in keys:
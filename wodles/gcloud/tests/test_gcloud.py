@@ -19,7 +19,8 @@ import gcloud
 def get_wodle_config(integration_type: str, credentials_file: str = None, log_level: int = 1,
                      subscription: str = "subscription", project: str = 'project', max_messages: int = 100,
                      n_threads: int = 100, bucket_name: str = "test_bucket", prefix: str = "",
-                     delete_file: bool = False, only_logs_after: str = None, reparse: bool = False) -> dict:
+                     delete_file: bool = False, only_logs_after: str = None, reparse: bool = False,
+                     discard_field: list = None, discard_regex: list = None, discard_match: str = 'any') -> dict:
     """Return a dict containing every parameter for the different supported integration types. Used to simulate
     different ossec.conf configurations.
 
@@ -49,6 +50,12 @@ def get_wodle_config(integration_type: str, credentials_file: str = None, log_le
         Date after which obtain logs.
     reparse : bool
         Whether to parse already parsed logs or not
+    discard_field : list
+        Event fields where the discard regexes are applied.
+    discard_regex : list
+        Regexes used to determine whether an event should be skipped.
+    discard_match : str
+        Whether all the discard rules or any of them must match to skip an event.
 
     Returns
     -------
@@ -58,22 +65,27 @@ def get_wodle_config(integration_type: str, credentials_file: str = None, log_le
     return {'integration_type': integration_type, 'credentials_file': credentials_file, 'log_level': log_level,
             'subscription_id': subscription, 'project': project, 'max_messages': max_messages, 'n_threads': n_threads,
             'bucket_name': bucket_name, 'prefix': prefix, 'delete_file': delete_file, 'only_logs_after': only_logs_after,
-            'reparse': reparse}
+            'reparse': reparse, 'discard_field': discard_field, 'discard_regex': discard_regex,
+            'discard_match': discard_match}
 
 
 @pytest.mark.parametrize('integration_type', ['pubsub', 'access_logs'])
 @patch('gcloud.GCSAccessLogs')
 @patch('gcloud.WazuhGCloudSubscriber')
-@patch('gcloud.ThreadPoolExecutor')
 @patch('gcloud.tools.get_stdout_logger')
 @patch('gcloud.cpu_count', side_effect=TypeError)
-def test_gcloud(mock_cpu_count, mock_logger, mock_threads, mock_subscriber, mock_access_logs, integration_type):
+def test_gcloud(mock_cpu_count, mock_logger, mock_subscriber, mock_access_logs, integration_type):
     """Test gcloud module run and exits without errors using valid configurations."""
     kwargs = get_wodle_config(integration_type=integration_type)
     with patch('tools.get_script_arguments', return_value=Namespace(**kwargs)), pytest.raises(SystemExit) as err:
         gcloud.main()
     assert err.type == SystemExit
     assert err.value.code == 0
+    if integration_type == 'pubsub':
+        mock_subscriber.assert_called_once()
+        mock_subscriber.return_value.process_messages.assert_called_once_with(kwargs['max_messages'],
+                                                                              n_pulls=kwargs['n_threads'] if
+                                                                              kwargs['n_threads'] <= 5 else 5)
 
 
 @pytest.mark.parametrize('parameters, errcode', [
@@ -42,12 +42,12 @@ def test_WazuhGCloudIntegration_format_msg():
     assert msg_json.get('gcp') == test_message
 
 
-@patch('integration.socket.socket')
+@patch('utils.socket.socket')
 def test_WazuhGCloudIntegration_initialize_socket(mock_socket):
     """Test initialize_socket establish a connection with the ANALYSISD socket."""
     integration = WazuhGCloudIntegration(logger=MagicMock())
     integration.initialize_socket()
-    integration.socket.connect.assert_called_with(ANALYSISD)
+    mock_socket.return_value.connect.assert_called_with(ANALYSISD)
 
 
 @pytest.mark.parametrize('raised_exception, errcode', [
@@ -69,12 +69,15 @@ def test_WazuhGCloudIntegration_process_data():
         integration.process_data()
 
 
-@patch('integration.socket.socket')
+@patch('utils.socket.socket')
 def test_WazuhGCloudIntegration_send_message(mock_socket):
-    """Test if messages are sent to Wazuh queue socket."""
+    """Test if messages are sent to Wazuh queue socket using the same connection."""
     integration = WazuhGCloudIntegration(logger=MagicMock())
     with integration.initialize_socket():
         integration.send_msg(test_message)
+        integration.send_msg(test_message)
+    mock_socket.return_value.connect.assert_called_once_with(ANALYSISD)
+    assert mock_socket.return_value.send.call_count == 2
     mock_socket.return_value.send.assert_called_with(
         f'{WazuhGCloudIntegration.header}{test_message}'.encode(errors='replace'))
 
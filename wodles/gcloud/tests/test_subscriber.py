@@ -19,7 +19,8 @@ from google.api_core import exceptions as google_exceptions
 
 sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))  # noqa: E501
 from pubsub.subscriber import WazuhGCloudSubscriber
-from exceptions import GCloudError
+from exceptions import GCloudError, WazuhIntegrationInternalError
+from utils import DiscardFilter
 
 
 data_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data/')
@@ -130,6 +131,22 @@ def test_WazuhGCloudSubscriber_pull_request(mock_credentials, mock_send_msg, num
                                                        'max_messages': num_messages})
 
 
+@patch('pubsub.subscriber.WazuhGCloudSubscriber.send_msg')
+@patch('pubsub.subscriber.pubsub.subscriber.Client.from_service_account_file')
+def test_WazuhGCloudSubscriber_pull_request_discarded(mock_credentials, mock_send_msg):
+    """Test pull_request acknowledges the messages matching the discard rules without sending them."""
+    messages = [b'{"severity": "DEBUG"}', b'{"severity": "ERROR"}', b'plain text']
+    message_list = [MagicMock(ack_id=str(i), message=MagicMock(data=data)) for i, data in enumerate(messages)]
+    pubsub = WazuhGCloudSubscriber(**get_wodle_config(), discard_filter=DiscardFilter([('severity', '^DEBUG$')]))
+    pubsub.subscriber.pull.return_value = MagicMock(received_messages=message_list)
+    assert pubsub.pull_request(max_messages=MAX_MESSAGES) == len(messages)
+    mock_send_msg.assert_has_calls([call(pubsub.format_msg(messages[1].decode())),
+                                    call(pubsub.format_msg(messages[2].decode()))])
+    assert mock_send_msg.call_count == 2
+    pubsub.subscriber.acknowledge.assert_called_once_with(
+        request={'subscription': pubsub.subscription_path, 'ack_ids': ['0', '1', '2']})
+
+
 @patch('pubsub.subscriber.WazuhGCloudSubscriber.send_msg')
 @patch('pubsub.subscriber.pubsub.subscriber.Client.from_service_account_file')
 def test_WazuhGCloudSubscriber_pull_request_ko(mock_credentials, mock_send_msg):
@@ -139,12 +156,45 @@ def test_WazuhGCloudSubscriber_pull_request_ko(mock_credentials, mock_send_msg):
     assert pubsub.pull_request(max_messages=MAX_MESSAGES) == 0
 
 
+@pytest.mark.parametrize('n_pulls, batch_size, available_messages, expected_messages', [
+    (1, 100, 250, MAX_MESSAGES),
+    (1, 30, 250, MAX_MESSAGES),
+    (4, 30, 250, MAX_MESSAGES),
+    (4, 30, 50, 50),
+    (2, 100, 0, 0),
+])
+@patch('pubsub.subscriber.pubsub.subscriber.Client.from_service_account_file')
+def test_WazuhGCloudSubscriber_process_messages(mock_credentials, n_pulls, batch_size, available_messages,
+                                                expected_messages):
+    """Test process_messages pulls messages until the required number of messages is reached or no more messages are
+    available, acknowledging every message sent."""
+    pubsub = WazuhGCloudSubscriber(**get_wodle_config())
+    pubsub.initialize_socket = MagicMock()
+    pubsub.send_msg = MagicMock()
+    messages = [MagicMock(ack_id=str(i), message=MagicMock(data=b'{}')) for i in range(available_messages)]
+
+    def pull(request):
+        size = request['max_messages']
+        assert size <= batch_size
+        received = messages[:size]
+        del messages[:size]
+        return MagicMock(received_messages=received)
+
+    pubsub.subscriber.pull.side_effect = pull
+    assert pubsub.process_messages(max_messages=MAX_MESSAGES, n_pulls=n_pulls,
+                                   batch_size=batch_size) == expected_messages
+    assert pubsub.send_msg.call_count == expected_messages
+    acked = [ack_id for c in pubsub.subscriber.acknowledge.call_args_list for ack_id in c.kwargs['request']['ack_ids']]
+    assert sorted(acked, key=int) == [str(i) for i in range(expected_messages)]
+
+
 @patch('pubsub.subscriber.pubsub.subscriber.Client.from_service_account_file')
-def test_WazuhGCloudSubscriber_process_messages(mock_credentials):
-    """Test process_messages invoke the pull_request function several times until the required number of messages is
-    returned."""
+def test_WazuhGCloudSubscriber_process_messages_send_ko(mock_credentials):
+    """Test process_messages does not acknowledge the messages that could not be sent."""
     pubsub = WazuhGCloudSubscriber(**get_wodle_config())
     pubsub.initialize_socket = MagicMock()
-    pubsub.pull_request = MagicMock(return_value=MAX_MESSAGES/2)
-    assert pubsub.process_messages(max_messages=MAX_MESSAGES) == MAX_MESSAGES
-    pubsub.pull_request.assert_has_calls([call(MAX_MESSAGES), call(MAX_MESSAGES/2)])
+    pubsub.send_msg = MagicMock(side_effect=WazuhIntegrationInternalError(3))
+    pubsub.subscriber.pull.return_value = MagicMock(received_messages=[MagicMock(message=MagicMock(data=b'{}'))])
+    with pytest.raises(WazuhIntegrationInternalError):
+        pubsub.process_messages(max_messages=MAX_MESSAGES)
+    pubsub.subscriber.acknowledge.assert_not_called()
@@ -70,12 +70,26 @@ def get_script_arguments():
                         default=None, type=arg_valid_date)
 
     parser.add_argument('-t', '--num_threads', dest='n_threads', type=int,
-                        help='Number of threads', required=False, default=min_num_threads)
+                        help='Number of concurrent pull requests or blobs processed concurrently', required=False, default=min_num_threads)
     
     parser.add_argument('--reparse', action='store_true', dest='reparse', 
                         help='Parse the log, even if its been parsed before', default=False)
 
-    return parser.parse_args()
+    parser.add_argument('--discard_field', dest='discard_field', type=str, action='append',
+                        help='Event field where the discard_regex is applied to determine if an event should be '
+                             'skipped. Nested fields are separated by dots. Can be used several times.')
+
+    parser.add_argument('--discard_regex', dest='discard_regex', type=str, action='append',
+                        help='Regex applied to the discard_field to determine if an event should be skipped.')
+
+    parser.add_argument('--discard_match', dest='discard_match', type=str, choices=['any', 'all'], default='any',
+                        help='Skip events matching any of the discard rules or only those matching all of them.')
+
+    arguments = parser.parse_args()
+    if len(arguments.discard_field or []) != len(arguments.discard_regex or []):
+        parser.error('each --discard_field must have a --discard_regex')
+
+    return arguments
 
 
 def get_stdout_logger(name: str, level: int = 0) -> logging.Logger:
@@ -2,8 +2,14 @@
 # Created by Wazuh, Inc. <info@wazuh.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 
+import errno
 import os
+import re
+import socket
 import subprocess
+import threading
+import time
+from collections import deque
 from functools import lru_cache
 from sys import exit
 
@@ -138,3 +144,276 @@ def get_wazuh_type() -> str:
 
 
 ANALYSISD = os.path.join(find_wazuh_path(), 'queue', 'sockets', 'queue')
+
+# Socket errors raised while analysisd is not listening, for instance, while it is being restarted
+RECONNECT_ERRNOS = {errno.ENOENT, errno.ECONNREFUSED, errno.ENOTCONN}
+
+
+class AnalysisdSender:
+    """
+    Send events to analysisd through a long-lived connection to its datagram socket.
+
+    Events are buffered until `batch_size` of them are pending, and then sent one datagram per event. If analysisd is
+    not listening, the connection is retried up to `max_retries` times, keeping at most `max_buffer_size` pending events.
+    When the buffer is full, the oldest event is discarded.
+
+    Sent and discarded events are counted in the `sent` and `dropped` attributes. Instances can be shared between
+    threads.
+    """
+
+    def __init__(self, socket_path: str = ANALYSISD, header: str = '', batch_size: int = 1,
+                 max_buffer_size: int = 10000, max_retries: int = 5, retry_interval: float = 1):
+        """
+        Class constructor.
+
+        Parameters
+        ----------
+        socket_path : str
+            Path of the analysisd datagram socket.
+        header : str
+            Header to prepend to every event.
+        batch_size : int
+            Number of pending events that triggers sending them.
+        max_buffer_size : int
+            Maximum number of pending events.
+        max_retries : int
+            Number of reconnection attempts before giving up.
+        retry_interval : float
+            Seconds to wait between reconnection attempts.
+        """
+        self.socket_path = socket_path
+        self.header = header
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_interval = retry_interval
+        self.sent = 0
+        self.dropped = 0
+        self._buffer = deque()
+        self._max_buffer_size = max(max_buffer_size, batch_size)
+        self._socket = None
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            self.close()
+
+    def connect(self):
+        """
+        Connect to the analysisd socket, replacing the current connection if any.
+
+        Raises
+        ------
+        OSError
+            If the connection could not be established.
+        """
+        with self._lock:
+            self.close()
+            s = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            try:
+                s.connect(self.socket_path)
+            except OSError:
+                s.close()
+                raise
+            self._socket = s
+
+    def close(self):
+        """Close the connection to the analysisd socket. Pending events are kept."""
+        with self._lock:
+            if self._socket is not None:
+                self._socket.close()
+                self._socket = None
+
+    @property
+    def pending(self) -> int:
+        """Number of events waiting to be sent."""
+        return len(self._buffer)
+
+    def send(self, msg: str):
+        """
+        Add an event to the buffer, sending the pending events if the batch is complete.
+
+        Parameters
+        ----------
+        msg : str
+            Event to send, without header.
+
+        Raises
+        ------
+        OSError
+            If the pending events could not be sent. See `flush`.
+        """
+        with self._lock:
+            self._append(msg)
+            if len(self._buffer) >= self.batch_size:
+                self.flush()
+
+    def _append(self, msg: str):
+        """Add an event to the buffer, discarding the oldest one if it is full. The lock must be held."""
+        if len(self._buffer) >= self._max_buffer_size:
+            self._buffer.popleft()
+            self.dropped += 1
+        self._buffer.append(f'{self.header}{msg}'.encode(errors='replace'))
+
+    def send_batch(self, msgs):
+        """
+        Send several events. Every event is added to the buffer before sending the pending ones, so they are kept to
+        be sent by `flush` if analysisd is not available.
+
+        Parameters
+        ----------
+        msgs : Iterable[str]
+            Events to send, without header.
+
+        Raises
+        ------
+        OSError
+            If the pending events could not be sent. See `flush`.
+        """
+        with self._lock:
+            for msg in msgs:
+                self._append(msg)
+            self.flush()
+
+    def flush(self):
+        """
+        Send all the pending events, reconnecting to analysisd if it is not listening.
+
+        Raises
+        ------
+        OSError
+            If analysisd did not become available after `max_retries` attempts, in which case the pending events are
+            kept, or if the event could not be sent for any other reason. Events too long to fit in a datagram
+            (EMSGSIZE) are discarded before raising.
+        """
+        with self._lock:
+            attempts = 0
+            while self._buffer:
+                try:
+                    if self._socket is None:
+                        self.connect()
+                    self._socket.send(self._buffer[0])
+                except OSError as e:
+                    if e.errno == errno.EMSGSIZE:
+                        self._buffer.popleft()
+                        self.dropped += 1
+                        raise
+                    self.close()
+                    if e.errno not in RECONNECT_ERRNOS or attempts >= self.max_retries:
+                        raise
+                    attempts += 1
+                    time.sleep(self.retry_interval)
+                    continue
+
+                self._buffer.popleft()
+                self.sent += 1
+
+
+class DiscardFilter:
+    """
+    Rules used to discard events before sending them to analysisd.
+
+    Each rule applies a regex to the values of a field of the event. Nested fields are referred to using dots, like
+    `detail.service.name`, and the lists found along the path are traversed so the rule matches if any of their items
+    does. Fields are split and regexes compiled once, when the filter is created.
+    """
+
+    def __init__(self, rules, match_all: bool = False):
+        """
+        Class constructor.
+
+        Parameters
+        ----------
+        rules : iterable of tuple
+            Pairs of field and regex. Rules missing any of them are ignored.
+        match_all : bool
+            Whether every rule must match to discard an event or just one of them.
+        """
+        self.rules = [(field, tuple(field.split('.')), re.compile(regex)) for field, regex in rules if field and regex]
+        self.match_all = match_all
+
+    @classmethod
+    def from_arguments(cls, fields, regexes, match: str = 'any'):
+        """
+        Build a filter from the values of the discard script arguments.
+
+        Parameters
+        ----------
+        fields : str or list of str or None
+            Fields where the regexes are applied.
+        regexes : str or list of str or None
+            Regexes to apply, in the same order as the fields.
+        match : str
+            'all' if every rule must match to discard an event, 'any' otherwise.
+
+        Returns
+        -------
+        DiscardFilter
+            The filter built.
+
+        Raises
+        ------
+        ValueError
+            If the number of fields and regexes differ.
+        """
+        fields = [fields] if isinstance(fields, str) else fields or []
+        regexes = [regexes] if isinstance(regexes, str) else regexes or []
+        if len(fields) != len(regexes):
+            raise ValueError('Each discard field must have a discard regex.')
+        return cls(zip(fields, regexes), match_all=match == 'all')
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    def __str__(self):
+        return f' {"and" if self.match_all else "or"} '.join(f'"{regex.pattern}" in "{field}"'
+                                                               for field, _, regex in self.rules)
+
+    @staticmethod
+    def _get_values(event, keys: tuple) -> list:
+        """Get the values found in the path of keys, traversing the lists found along it."""
+        values = [event]
+        for key in keys:
+            next_values = []
+            pending = values
+            while pending:
+                value = pending.pop()
+                if isinstance(value, dict):
+                    if key in value:
+                        next_values.append(value[key])
+                elif isinstance(value, list):
+                    pending.extend(value)
+            values = next_values
+        return values
+
+    @staticmethod
+    def _match_value(regex: re.Pattern, value) -> bool:
+        """Check if a string, or any string of a list, matches the regex."""
+        if isinstance(value, str):
+            return regex.match(value) is not None
+        return isinstance(value, list) and any(DiscardFilter._match_value(regex, item) for item in value)
+
+    def matches(self, event: dict) -> bool:
+        """
+        Check whether an event should be discarded.
+
+        Parameters
+        ----------
+        event : dict
+            Event to check.
+
+        Returns
+        -------
+        bool
+            True if the event matches the rules, False otherwise or if there are no rules.
+        """
+        if not self.rules:
+            return False
+        check = all if self.match_all else any
+        return check(any(self._match_value(regex, value) for value in self._get_values(event, keys))
+                     for _, keys, regex in self.rules)